@@ -1,11 +1,12 @@
 """Provide pre-made queries on top of the recorder component."""
 from __future__ import annotations
 
+import asyncio
 from collections import defaultdict
 from collections.abc import Iterable
 from datetime import datetime as dt, timedelta
+from functools import partial
 from itertools import groupby
-import json
 import logging
 import time
 from typing import cast
@@ -15,12 +16,24 @@ from sqlalchemy import and_, bindparam, func, not_, or_
 from sqlalchemy.ext import baked
 import voluptuous as vol
 
-from homeassistant.components import recorder
+from homeassistant.components import recorder, websocket_api
 from homeassistant.components.http import HomeAssistantView
+from homeassistant.components.http.stream import (
+    async_stream_in_executor,
+    async_stream_json_list,
+)
 from homeassistant.components.recorder.models import (
+    EMPTY_JSON_OBJECT,
+    StateAttributes,
     States,
-    process_timestamp,
-    process_timestamp_to_utc_isoformat,
+    process_datetime_to_timestamp,
+    process_float_timestamp_to_utc_isoformat,
+)
+from homeassistant.components.recorder.statistics import (
+    PERIOD_5MINUTE,
+    PERIOD_HOUR,
+    STATISTICS_TABLES,
+    statistics_during_period,
 )
 from homeassistant.components.recorder.util import execute, session_scope
 from homeassistant.const import (
@@ -30,12 +43,15 @@ from homeassistant.const import (
     CONF_INCLUDE,
     HTTP_BAD_REQUEST,
 )
-from homeassistant.core import Context, HomeAssistant, State, split_entity_id
+from homeassistant.core import Context, HomeAssistant, State, callback, split_entity_id
 import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.entityfilter import (
     CONF_ENTITY_GLOBS,
     INCLUDE_EXCLUDE_BASE_FILTER_SCHEMA,
+    convert_include_exclude_filter,
 )
+from homeassistant.helpers.event import async_call_later, async_track_state_change_event
+from homeassistant.helpers.json import json_dumps, json_loads
 import homeassistant.util.dt as dt_util
 
 # mypy: allow-untyped-defs, no-check-untyped-defs
@@ -48,6 +64,13 @@ CONF_ORDER = "use_include_order"
 STATE_KEY = "state"
 LAST_CHANGED_KEY = "last_changed"
 
+# Keys of the compressed state format
+COMPRESSED_START_KEY = "start"
+COMPRESSED_TIMES_KEY = "t"
+COMPRESSED_STATES_KEY = "s"
+COMPRESSED_ATTRIBUTES_KEY = "a"
+COMPRESSED_LAST_CHANGED_KEY = "lc"
+
 GLOB_TO_SQL_CHARS = {
     42: "%",  # *
     46: "_",  # .
@@ -83,16 +106,39 @@ QUERY_STATES = [
     States.entity_id,
     States.state,
     States.attributes,
-    States.last_changed,
-    States.last_updated,
+    StateAttributes.shared_attrs,
+    States.last_changed_ts,
+    States.last_updated_ts,
 ]
 
 HISTORY_BAKERY = "history_bakery"
+HISTORY_FILTERS = "history_filters"
+HISTORY_ENTITY_FILTER = "history_entity_filter"
+
+# Rows fetched from the database at a time when streaming
+HISTORY_STREAM_YIELD_PER = 1000
+# Entities sent in one websocket message when streaming
+HISTORY_STREAM_ENTITIES_PER_MESSAGE = 25
+# Seconds state changes are collected before they are sent to subscribers
+HISTORY_SUBSCRIBE_COALESCE_SECONDS = 1
+
+# Statistics periods served for a requested resolution, longest first
+STATISTICS_PERIODS = (
+    (PERIOD_HOUR, STATISTICS_TABLES[PERIOD_HOUR].duration),
+    (PERIOD_5MINUTE, STATISTICS_TABLES[PERIOD_5MINUTE].duration),
+)
+
+
+def _query_states(session):
+    """Query the states columns joined with their shared attributes."""
+    return session.query(*QUERY_STATES).outerjoin(
+        StateAttributes, States.attributes_id == StateAttributes.attributes_id
+    )
 
 
 def get_significant_states(hass, *args, **kwargs):
     """Wrap _get_significant_states with a sql session."""
-    with session_scope(hass=hass) as session:
+    with session_scope(hass=hass, read_only=True) as session:
         return _get_significant_states(hass, session, *args, **kwargs)
 
 
@@ -116,20 +162,58 @@ def _get_significant_states(
     """
     timer_start = time.perf_counter()
 
-    baked_query = hass.data[HISTORY_BAKERY](
-        lambda session: session.query(*QUERY_STATES)
+    states = execute(
+        _significant_states_query(
+            hass,
+            session,
+            start_time,
+            end_time,
+            entity_ids,
+            filters,
+            significant_changes_only,
+        )
+    )
+
+    if _LOGGER.isEnabledFor(logging.DEBUG):
+        elapsed = time.perf_counter() - timer_start
+        _LOGGER.debug("get_significant_states took %fs", elapsed)
+
+    return _sorted_states_to_json(
+        hass,
+        session,
+        states,
+        start_time,
+        entity_ids,
+        filters,
+        include_start_time_state,
+        minimal_response,
     )
 
+
+def _significant_states_query(
+    hass,
+    session,
+    start_time,
+    end_time,
+    entity_ids,
+    filters,
+    significant_changes_only,
+):
+    """Return the query of the significant states sorted by entity and time."""
+    baked_query = hass.data[HISTORY_BAKERY](_query_states)
+
     if significant_changes_only:
         baked_query += lambda q: q.filter(
             (
                 States.domain.in_(SIGNIFICANT_DOMAINS)
-                | (States.last_changed == States.last_updated)
+                | (States.last_changed_ts == States.last_updated_ts)
             )
-            & (States.last_updated > bindparam("start_time"))
+            & (States.last_updated_ts > bindparam("start_time_ts"))
         )
     else:
-        baked_query += lambda q: q.filter(States.last_updated > bindparam("start_time"))
+        baked_query += lambda q: q.filter(
+            States.last_updated_ts > bindparam("start_time_ts")
+        )
 
     if entity_ids is not None:
         baked_query += lambda q: q.filter(
@@ -141,58 +225,47 @@ def _get_significant_states(
             filters.bake(baked_query)
 
     if end_time is not None:
-        baked_query += lambda q: q.filter(States.last_updated < bindparam("end_time"))
-
-    baked_query += lambda q: q.order_by(States.entity_id, States.last_updated)
-
-    states = execute(
-        baked_query(session).params(
-            start_time=start_time, end_time=end_time, entity_ids=entity_ids
+        baked_query += lambda q: q.filter(
+            States.last_updated_ts < bindparam("end_time_ts")
         )
-    )
 
-    if _LOGGER.isEnabledFor(logging.DEBUG):
-        elapsed = time.perf_counter() - timer_start
-        _LOGGER.debug("get_significant_states took %fs", elapsed)
+    baked_query += lambda q: q.order_by(States.entity_id, States.last_updated_ts)
 
-    return _sorted_states_to_json(
-        hass,
-        session,
-        states,
-        start_time,
-        entity_ids,
-        filters,
-        include_start_time_state,
-        minimal_response,
+    return baked_query(session).params(
+        start_time_ts=process_datetime_to_timestamp(start_time),
+        end_time_ts=end_time and process_datetime_to_timestamp(end_time),
+        entity_ids=entity_ids,
     )
 
 
 def state_changes_during_period(hass, start_time, end_time=None, entity_id=None):
     """Return states changes during UTC period start_time - end_time."""
-    with session_scope(hass=hass) as session:
-        baked_query = hass.data[HISTORY_BAKERY](
-            lambda session: session.query(*QUERY_STATES)
-        )
+    with session_scope(hass=hass, read_only=True) as session:
+        baked_query = hass.data[HISTORY_BAKERY](_query_states)
 
         baked_query += lambda q: q.filter(
-            (States.last_changed == States.last_updated)
-            & (States.last_updated > bindparam("start_time"))
+            (States.last_changed_ts == States.last_updated_ts)
+            & (States.last_updated_ts > bindparam("start_time_ts"))
         )
 
         if end_time is not None:
             baked_query += lambda q: q.filter(
-                States.last_updated < bindparam("end_time")
+                States.last_updated_ts < bindparam("end_time_ts")
             )
 
         if entity_id is not None:
-            baked_query += lambda q: q.filter_by(entity_id=bindparam("entity_id"))
+            baked_query += lambda q: q.filter(
+                States.entity_id == bindparam("entity_id")
+            )
             entity_id = entity_id.lower()
 
-        baked_query += lambda q: q.order_by(States.entity_id, States.last_updated)
+        baked_query += lambda q: q.order_by(States.entity_id, States.last_updated_ts)
 
         states = execute(
             baked_query(session).params(
-                start_time=start_time, end_time=end_time, entity_id=entity_id
+                start_time_ts=process_datetime_to_timestamp(start_time),
+                end_time_ts=end_time and process_datetime_to_timestamp(end_time),
+                entity_id=entity_id,
             )
         )
 
@@ -205,18 +278,20 @@ def get_last_state_changes(hass, number_of_states, entity_id):
     """Return the last number_of_states."""
     start_time = dt_util.utcnow()
 
-    with session_scope(hass=hass) as session:
-        baked_query = hass.data[HISTORY_BAKERY](
-            lambda session: session.query(*QUERY_STATES)
+    with session_scope(hass=hass, read_only=True) as session:
+        baked_query = hass.data[HISTORY_BAKERY](_query_states)
+        baked_query += lambda q: q.filter(
+            States.last_changed_ts == States.last_updated_ts
         )
-        baked_query += lambda q: q.filter(States.last_changed == States.last_updated)
 
         if entity_id is not None:
-            baked_query += lambda q: q.filter_by(entity_id=bindparam("entity_id"))
+            baked_query += lambda q: q.filter(
+                States.entity_id == bindparam("entity_id")
+            )
             entity_id = entity_id.lower()
 
         baked_query += lambda q: q.order_by(
-            States.entity_id, States.last_updated.desc()
+            States.entity_id, States.last_updated_ts.desc()
         )
 
         baked_query += lambda q: q.limit(bindparam("number_of_states"))
@@ -248,7 +323,7 @@ def get_states(hass, utc_point_in_time, entity_ids=None, run=None, filters=None)
         if run is None:
             return []
 
-    with session_scope(hass=hass) as session:
+    with session_scope(hass=hass, read_only=True) as session:
         return _get_states_with_session(
             hass, session, utc_point_in_time, entity_ids, run, filters
         )
@@ -273,13 +348,14 @@ def _get_states_with_session(
     # We have more than one entity to look at (most commonly we want
     # all entities,) so we need to do a search on all states since the
     # last recorder run started.
-    query = session.query(*QUERY_STATES)
+    query = _query_states(session)
 
     most_recent_states_by_date = session.query(
         States.entity_id.label("max_entity_id"),
-        func.max(States.last_updated).label("max_last_updated"),
+        func.max(States.last_updated_ts).label("max_last_updated"),
     ).filter(
-        (States.last_updated >= run.start) & (States.last_updated < utc_point_in_time)
+        (States.last_updated_ts >= process_datetime_to_timestamp(run.start))
+        & (States.last_updated_ts < process_datetime_to_timestamp(utc_point_in_time))
     )
 
     if entity_ids:
@@ -295,7 +371,7 @@ def _get_states_with_session(
         most_recent_states_by_date,
         and_(
             States.entity_id == most_recent_states_by_date.c.max_entity_id,
-            States.last_updated == most_recent_states_by_date.c.max_last_updated,
+            States.last_updated_ts == most_recent_states_by_date.c.max_last_updated,
         ),
     )
 
@@ -321,18 +397,17 @@ def _get_states_with_session(
 def _get_single_entity_states_with_session(hass, session, utc_point_in_time, entity_id):
     # Use an entirely different (and extremely fast) query if we only
     # have a single entity id
-    baked_query = hass.data[HISTORY_BAKERY](
-        lambda session: session.query(*QUERY_STATES)
-    )
+    baked_query = hass.data[HISTORY_BAKERY](_query_states)
     baked_query += lambda q: q.filter(
-        States.last_updated < bindparam("utc_point_in_time"),
+        States.last_updated_ts < bindparam("utc_point_in_time_ts"),
         States.entity_id == bindparam("entity_id"),
     )
-    baked_query += lambda q: q.order_by(States.last_updated.desc())
+    baked_query += lambda q: q.order_by(States.last_updated_ts.desc())
     baked_query += lambda q: q.limit(1)
 
     query = baked_query(session).params(
-        utc_point_in_time=utc_point_in_time, entity_id=entity_id
+        utc_point_in_time_ts=process_datetime_to_timestamp(utc_point_in_time),
+        entity_id=entity_id,
     )
 
     return [LazyState(row) for row in execute(query)]
@@ -366,65 +441,172 @@ def _sorted_states_to_json(
             result[ent_id] = []
 
     # Get the states at the start time
-    timer_start = time.perf_counter()
     if include_start_time_state:
-        run = recorder.run_information_from_instance(hass, start_time)
-        for state in _get_states_with_session(
-            hass, session, start_time, entity_ids, run=run, filters=filters
+        for state in _get_start_time_states(
+            hass, session, start_time, entity_ids, filters
         ):
-            state.last_changed = start_time
-            state.last_updated = start_time
             result[state.entity_id].append(state)
 
+    # Append all changes to it
+    for ent_id, group in groupby(states, lambda state: state.entity_id):
+        _append_entity_states(result[ent_id], ent_id, group, minimal_response)
+
+    # Filter out the empty lists if some states had 0 results.
+    return {key: val for key, val in result.items() if val}
+
+
+def _stream_sorted_states(
+    hass,
+    session,
+    states,
+    start_time,
+    entity_ids,
+    filters=None,
+    include_start_time_state=True,
+    minimal_response=False,
+):
+    """Yield the entity id and the states of each entity in entity_id order.
+
+    Like _sorted_states_to_json, but only the states of one entity
+    are held at a time besides the states at the start time.
+    """
+    start_time_states = {}
+    if include_start_time_state:
+        start_time_states = {
+            state.entity_id: state
+            for state in _get_start_time_states(
+                hass, session, start_time, entity_ids, filters
+            )
+        }
+    # Entities that did not change are yielded in between
+    # the entities that did to keep the entity_id order
+    unchanged_ids = sorted(start_time_states, reverse=True)
+
+    for ent_id, group in groupby(states, lambda state: state.entity_id):
+        while unchanged_ids and unchanged_ids[-1] < ent_id:
+            unchanged_id = unchanged_ids.pop()
+            if unchanged_id in start_time_states:
+                yield unchanged_id, [start_time_states.pop(unchanged_id)]
+        ent_results = []
+        if ent_id in start_time_states:
+            ent_results.append(start_time_states.pop(ent_id))
+        _append_entity_states(ent_results, ent_id, group, minimal_response)
+        yield ent_id, ent_results
+
+    for unchanged_id in reversed(unchanged_ids):
+        if unchanged_id in start_time_states:
+            yield unchanged_id, [start_time_states.pop(unchanged_id)]
+
+
+def _get_start_time_states(hass, session, start_time, entity_ids, filters):
+    """Return the states at the start time as the first data points."""
+    timer_start = time.perf_counter()
+    run = recorder.run_information_from_instance(hass, start_time)
+    states = _get_states_with_session(
+        hass, session, start_time, entity_ids, run=run, filters=filters
+    )
+    for state in states:
+        state.last_changed = start_time
+        state.last_updated = start_time
+
     if _LOGGER.isEnabledFor(logging.DEBUG):
         elapsed = time.perf_counter() - timer_start
-        _LOGGER.debug("getting %d first datapoints took %fs", len(result), elapsed)
+        _LOGGER.debug("getting %d first datapoints took %fs", len(states), elapsed)
+
+    return states
+
+
+def _append_entity_states(ent_results, ent_id, group, minimal_response):
+    """Append the states of an entity to the states at the start time."""
+    domain = split_entity_id(ent_id)[0]
+    if not minimal_response or domain in NEED_ATTRIBUTE_DOMAINS:
+        ent_results.extend(LazyState(db_state) for db_state in group)
+
+    # With minimal response we only provide a native
+    # State for the first and last response. All the states
+    # in-between only provide the "state" and the
+    # "last_changed".
+    if not ent_results:
+        ent_results.append(LazyState(next(group)))
+
+    prev_state = ent_results[-1]
+    initial_state_count = len(ent_results)
 
     # Called in a tight loop so cache the function
     # here
-    _process_timestamp_to_utc_isoformat = process_timestamp_to_utc_isoformat
+    _process_float_timestamp_to_utc_isoformat = process_float_timestamp_to_utc_isoformat
+
+    for db_state in group:
+        # With minimal response we do not care about attribute
+        # changes so we can filter out duplicate states
+        if db_state.state == prev_state.state:
+            continue
+
+        ent_results.append(
+            {
+                STATE_KEY: db_state.state,
+                LAST_CHANGED_KEY: _process_float_timestamp_to_utc_isoformat(
+                    db_state.last_changed_ts
+                ),
+            }
+        )
+        prev_state = db_state
 
-    # Append all changes to it
-    for ent_id, group in groupby(states, lambda state: state.entity_id):
-        domain = split_entity_id(ent_id)[0]
-        ent_results = result[ent_id]
-        if not minimal_response or domain in NEED_ATTRIBUTE_DOMAINS:
-            ent_results.extend(LazyState(db_state) for db_state in group)
-
-        # With minimal response we only provide a native
-        # State for the first and last response. All the states
-        # in-between only provide the "state" and the
-        # "last_changed".
-        if not ent_results:
-            ent_results.append(LazyState(next(group)))
-
-        prev_state = ent_results[-1]
-        initial_state_count = len(ent_results)
-
-        for db_state in group:
-            # With minimal response we do not care about attribute
-            # changes so we can filter out duplicate states
-            if db_state.state == prev_state.state:
-                continue
-
-            ent_results.append(
-                {
-                    STATE_KEY: db_state.state,
-                    LAST_CHANGED_KEY: _process_timestamp_to_utc_isoformat(
-                        db_state.last_changed
-                    ),
-                }
-            )
-            prev_state = db_state
+    if prev_state and len(ent_results) != initial_state_count:
+        # There was at least one state change
+        # replace the last minimal state with
+        # a full state
+        ent_results[-1] = LazyState(prev_state)
 
-        if prev_state and len(ent_results) != initial_state_count:
-            # There was at least one state change
-            # replace the last minimal state with
-            # a full state
-            ent_results[-1] = LazyState(prev_state)
 
-    # Filter out the empty lists if some states had 0 results.
-    return {key: val for key, val in result.items() if val}
+def _compress_entity_states(ent_id, states):
+    """Return the states of an entity as parallel arrays.
+
+    The attributes of the first state are sent once with the entity
+    and after that only when they change, keyed by the index of the
+    state. The times are offsets in seconds from the first
+    last_updated and last_changed is only sent where it differs.
+    """
+    first_state = states[0]
+    start = first_state.last_updated_timestamp
+    times = []
+    state_values = []
+    changed_attributes = {}
+    last_changed = {}
+    prev_attributes = first_state.shared_attrs_json
+
+    for index, state in enumerate(states):
+        if isinstance(state, dict):
+            # A state of a minimal response, the attributes are unchanged
+            last_updated_ts = last_changed_ts = process_datetime_to_timestamp(
+                dt_util.parse_datetime(state[LAST_CHANGED_KEY])
+            )
+        else:
+            last_updated_ts = state.last_updated_timestamp
+            last_changed_ts = state.last_changed_timestamp
+            attributes = state.shared_attrs_json
+            if attributes != prev_attributes:
+                changed_attributes[index] = state.attributes
+                prev_attributes = attributes
+        times.append(round(last_updated_ts - start, 3))
+        state_values.append(
+            state[STATE_KEY] if isinstance(state, dict) else state.state
+        )
+        if last_changed_ts != last_updated_ts:
+            last_changed[index] = round(last_changed_ts - start, 3)
+
+    compressed = {
+        "entity_id": ent_id,
+        "attributes": first_state.attributes,
+        COMPRESSED_START_KEY: start,
+        COMPRESSED_TIMES_KEY: times,
+        COMPRESSED_STATES_KEY: state_values,
+    }
+    if changed_attributes:
+        compressed[COMPRESSED_ATTRIBUTES_KEY] = changed_attributes
+    if last_changed:
+        compressed[COMPRESSED_LAST_CHANGED_KEY] = last_changed
+    return compressed
 
 
 def get_state(hass, utc_point_in_time, entity_id, run=None):
@@ -440,19 +622,382 @@ async def async_setup(hass, config):
     filters = sqlalchemy_filter_from_include_exclude_conf(conf)
 
     hass.data[HISTORY_BAKERY] = baked.bakery()
+    hass.data[HISTORY_FILTERS] = filters
+    hass.data[HISTORY_ENTITY_FILTER] = (
+        convert_include_exclude_filter(conf) if filters else None
+    )
 
     use_include_order = conf.get(CONF_ORDER)
 
     hass.http.register_view(HistoryPeriodView(filters, use_include_order))
+    hass.http.register_view(HistoryStreamView(filters, use_include_order))
     hass.components.frontend.async_register_built_in_panel(
         "history", "history", "hass:poll-box"
     )
+    websocket_api.async_register_command(hass, ws_get_statistics_during_period)
+    websocket_api.async_register_command(hass, ws_stream)
+    websocket_api.async_register_command(hass, ws_subscribe)
 
     return True
 
 
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "history/statistics_during_period",
+        vol.Required("start_time"): str,
+        vol.Optional("end_time"): str,
+        vol.Optional("statistic_ids"): [str],
+        vol.Optional("period", default=PERIOD_HOUR): vol.Any(
+            PERIOD_5MINUTE, PERIOD_HOUR
+        ),
+    }
+)
+@websocket_api.async_response
+async def ws_get_statistics_during_period(hass, connection, msg):
+    """Handle statistics websocket command.
+
+    Graphs of long periods are served from the five minute or hourly
+    statistics instead of the states.
+    """
+    start_time = dt_util.parse_datetime(msg["start_time"])
+    if start_time is None:
+        connection.send_error(msg["id"], "invalid_start_time", "Invalid start_time")
+        return
+
+    end_time = None
+    if "end_time" in msg:
+        end_time = dt_util.parse_datetime(msg["end_time"])
+        if end_time is None:
+            connection.send_error(msg["id"], "invalid_end_time", "Invalid end_time")
+            return
+        end_time = dt_util.as_utc(end_time)
+
+    statistics = await hass.async_add_executor_job(
+        statistics_during_period,
+        hass,
+        dt_util.as_utc(start_time),
+        end_time,
+        msg.get("statistic_ids"),
+        msg["period"],
+    )
+    connection.send_result(msg["id"], statistics)
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "history/stream",
+        vol.Required("start_time"): str,
+        vol.Optional("end_time"): str,
+        vol.Optional("entity_ids"): [str],
+        vol.Optional("include_start_time_state", default=True): bool,
+        vol.Optional("significant_changes_only", default=True): bool,
+        vol.Optional("minimal_response", default=False): bool,
+        vol.Optional("compressed_state_format", default=False): bool,
+    }
+)
+@websocket_api.async_response
+async def ws_stream(hass, connection, msg):
+    """Handle history stream websocket command.
+
+    The states are sent as events of a few entities each, followed
+    by an event marking the stream complete. Unsubscribing stops
+    the stream.
+    """
+    msg_id = msg["id"]
+    start_time = dt_util.parse_datetime(msg["start_time"])
+    if start_time is None:
+        connection.send_error(msg_id, "invalid_start_time", "Invalid start_time")
+        return
+
+    end_time = None
+    if "end_time" in msg:
+        end_time = dt_util.parse_datetime(msg["end_time"])
+        if end_time is None:
+            connection.send_error(msg_id, "invalid_end_time", "Invalid end_time")
+            return
+        end_time = dt_util.as_utc(end_time)
+
+    entity_ids = msg.get("entity_ids")
+    if entity_ids is not None:
+        entity_ids = [entity_id.lower() for entity_id in entity_ids]
+
+    connection.subscriptions[msg_id] = asyncio.current_task().cancel
+    connection.send_result(msg_id)
+
+    async def _async_send_message(message):
+        connection.send_message(message)
+
+    try:
+        await async_stream_in_executor(
+            hass,
+            partial(
+                _stream_ws_messages,
+                msg_id,
+                partial(
+                    _stream_significant_states_json,
+                    hass,
+                    dt_util.as_utc(start_time),
+                    end_time,
+                    entity_ids,
+                    hass.data[HISTORY_FILTERS],
+                    msg["include_start_time_state"],
+                    msg["significant_changes_only"],
+                    msg["minimal_response"],
+                    msg["compressed_state_format"],
+                ),
+            ),
+            _async_send_message,
+        )
+    finally:
+        connection.subscriptions.pop(msg_id, None)
+
+    connection.send_message(
+        websocket_api.messages.event_message(msg_id, {"complete": True})
+    )
+
+
+def _stream_ws_messages(msg_id, entities_json):
+    """Yield websocket event messages of the serialized states of a few entities."""
+    batch = []
+    for entity_id, states_json in entities_json():
+        batch.append(f"{json_dumps(entity_id)}:{states_json}")
+        if len(batch) == HISTORY_STREAM_ENTITIES_PER_MESSAGE:
+            yield _ws_states_message(msg_id, batch)
+            batch = []
+    if batch:
+        yield _ws_states_message(msg_id, batch)
+
+
+def _ws_states_message(msg_id, batch):
+    """Return an event message of states that are already serialized."""
+    return (
+        f'{{"id":{msg_id},"type":"event","event":{{"states":{{{",".join(batch)}}}}}}}'
+    )
+
+
+def _stream_significant_states_json(
+    hass,
+    start_time,
+    end_time,
+    entity_ids,
+    filters,
+    include_start_time_state,
+    significant_changes_only,
+    minimal_response,
+    compressed_state_format=False,
+):
+    """Yield the entity id and the serialized states of each entity."""
+    with session_scope(hass=hass, stream=True) as session:
+        query = _significant_states_query(
+            hass,
+            session,
+            start_time,
+            end_time,
+            entity_ids,
+            filters,
+            significant_changes_only,
+        ).with_post_criteria(lambda q: q.yield_per(HISTORY_STREAM_YIELD_PER))
+        for entity_id, states in _stream_sorted_states(
+            hass,
+            session,
+            query,
+            start_time,
+            entity_ids,
+            filters,
+            include_start_time_state,
+            minimal_response,
+        ):
+            if compressed_state_format:
+                states = _compress_entity_states(entity_id, states)
+            yield entity_id, json_dumps(states)
+
+
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "history/subscribe",
+        vol.Required("start_time"): str,
+        vol.Required("entity_ids"): [str],
+        vol.Optional("include_start_time_state", default=True): bool,
+        vol.Optional("significant_changes_only", default=True): bool,
+        vol.Optional("minimal_response", default=False): bool,
+    }
+)
+@websocket_api.async_response
+async def ws_subscribe(hass, connection, msg):
+    """Handle history subscribe websocket command.
+
+    The states since the start time are read from the database once,
+    after that the state changes of the entities are sent as they
+    happen, collected for HISTORY_SUBSCRIBE_COALESCE_SECONDS.
+    """
+    msg_id = msg["id"]
+    start_time = dt_util.parse_datetime(msg["start_time"])
+    if start_time is None:
+        connection.send_error(msg_id, "invalid_start_time", "Invalid start_time")
+        return
+
+    entity_filter = hass.data[HISTORY_ENTITY_FILTER]
+    entity_ids = [
+        entity_id
+        for entity_id in (entity_id.lower() for entity_id in msg["entity_ids"])
+        if split_entity_id(entity_id)[0] not in IGNORE_DOMAINS
+        and (entity_filter is None or entity_filter(entity_id))
+    ]
+    significant_changes_only = msg["significant_changes_only"]
+    minimal_response = msg["minimal_response"]
+    pending: dict[str, list[dict]] = {}
+    cancel_flush = None
+    history_sent = False
+
+    @callback
+    def _async_send_pending(_now=None):
+        """Send the state changes collected since the last message."""
+        nonlocal cancel_flush
+        cancel_flush = None
+        if not pending:
+            return
+        connection.send_message(
+            websocket_api.messages.event_message(msg_id, {"states": dict(pending)})
+        )
+        pending.clear()
+
+    @callback
+    def _async_state_changed(event):
+        nonlocal cancel_flush
+        new_state = event.data["new_state"]
+        if new_state is None:
+            return
+        old_state = event.data["old_state"]
+        if (
+            significant_changes_only
+            and old_state is not None
+            and old_state.state == new_state.state
+            and new_state.domain not in SIGNIFICANT_DOMAINS
+        ):
+            return
+        if minimal_response and new_state.domain not in NEED_ATTRIBUTE_DOMAINS:
+            state_dict = {
+                STATE_KEY: new_state.state,
+                LAST_CHANGED_KEY: new_state.last_changed.isoformat(),
+            }
+        else:
+            state_dict = _state_as_history_dict(new_state)
+        pending.setdefault(new_state.entity_id, []).append(state_dict)
+        if history_sent and cancel_flush is None:
+            cancel_flush = async_call_later(
+                hass, HISTORY_SUBSCRIBE_COALESCE_SECONDS, _async_send_pending
+            )
+
+    # The changes after end_time are sent from the state machine,
+    # the states the recorder did not commit yet are taken from there
+    end_time = dt_util.utcnow()
+    current_states = [
+        state for state in map(hass.states.get, entity_ids) if state is not None
+    ]
+    unsub_state_changed = async_track_state_change_event(
+        hass, entity_ids, _async_state_changed
+    )
+
+    @callback
+    def _async_unsubscribe():
+        unsub_state_changed()
+        if cancel_flush:
+            cancel_flush()
+
+    connection.subscriptions[msg_id] = _async_unsubscribe
+    connection.send_result(msg_id)
+
+    try:
+        history_message = await hass.async_add_executor_job(
+            _subscribe_history_message_json,
+            hass,
+            msg_id,
+            dt_util.as_utc(start_time),
+            end_time,
+            entity_ids,
+            hass.data[HISTORY_FILTERS],
+            msg["include_start_time_state"],
+            significant_changes_only,
+            minimal_response,
+            current_states,
+        )
+    except Exception:
+        if connection.subscriptions.pop(msg_id, None):
+            _async_unsubscribe()
+        raise
+
+    if msg_id not in connection.subscriptions:
+        # Unsubscribed while the history was read
+        return
+    connection.send_message(history_message)
+    history_sent = True
+    _async_send_pending()
+
+
+def _subscribe_history_message_json(
+    hass,
+    msg_id,
+    start_time,
+    end_time,
+    entity_ids,
+    filters,
+    include_start_time_state,
+    significant_changes_only,
+    minimal_response,
+    current_states,
+):
+    """Return the event message of the states until the subscription."""
+    with session_scope(hass=hass, read_only=True) as session:
+        result = _get_significant_states(
+            hass,
+            session,
+            start_time,
+            end_time,
+            entity_ids,
+            filters,
+            include_start_time_state,
+            significant_changes_only,
+            minimal_response,
+        )
+
+    for state in current_states:
+        ent_results = result.get(state.entity_id)
+        if ent_results and (
+            ent_results[-1].last_updated_timestamp >= state.last_updated.timestamp()
+        ):
+            continue
+        if state.last_updated >= start_time:
+            result.setdefault(state.entity_id, []).append(_state_as_history_dict(state))
+
+    return json_dumps(websocket_api.messages.event_message(msg_id, {"states": result}))
+
+
+def _state_as_history_dict(state):
+    """Return a state in the format of the states read from the database."""
+    return {
+        "entity_id": state.entity_id,
+        STATE_KEY: state.state,
+        "attributes": dict(state.attributes),
+        LAST_CHANGED_KEY: state.last_changed.isoformat(),
+        "last_updated": state.last_updated.isoformat(),
+    }
+
+
+def _statistics_period(resolution: timedelta) -> str | None:
+    """Return the longest statistics period that fits in a resolution."""
+    for period, duration in STATISTICS_PERIODS:
+        if resolution >= duration:
+            return period
+    return None
+
+
 class HistoryPeriodView(HomeAssistantView):
-    """Handle history period requests."""
+    """Handle history period requests.
+
+    When the client asks for a resolution of at least five minutes the
+    five minute or hourly statistics of the entities are returned
+    instead of their states.
+    """
 
     url = "/api/history/period"
     name = "api:history:view-period"
@@ -504,9 +1049,31 @@ class HistoryPeriodView(HomeAssistantView):
         )
 
         minimal_response = "minimal_response" in request.query
+        compressed_state_format = "compressed_state_format" in request.query
 
         hass = request.app["hass"]
 
+        resolution_str = request.query.get("resolution")
+        if resolution_str:
+            try:
+                resolution = timedelta(seconds=int(resolution_str))
+            except ValueError:
+                return self.json_message("Invalid resolution", HTTP_BAD_REQUEST)
+            if entity_ids and (period := _statistics_period(resolution)):
+                statistics = await hass.async_add_executor_job(
+                    statistics_during_period,
+                    hass,
+                    start_time,
+                    end_time,
+                    entity_ids,
+                    period,
+                )
+                # Entities without statistics are only in the states
+                if statistics.keys() == set(entity_ids):
+                    return self.json(
+                        [statistics[entity_id] for entity_id in entity_ids]
+                    )
+
         if (
             not include_start_time_state
             and entity_ids
@@ -514,17 +1081,24 @@ class HistoryPeriodView(HomeAssistantView):
         ):
             return self.json([])
 
+        return await self._async_history_response(
+            request,
+            hass,
+            start_time,
+            end_time,
+            entity_ids,
+            include_start_time_state,
+            significant_changes_only,
+            minimal_response,
+            compressed_state_format,
+        )
+
+    async def _async_history_response(self, request, hass, *args) -> web.Response:
+        """Return the history of the parsed request."""
         return cast(
             web.Response,
             await hass.async_add_executor_job(
-                self._sorted_significant_states_json,
-                hass,
-                start_time,
-                end_time,
-                entity_ids,
-                include_start_time_state,
-                significant_changes_only,
-                minimal_response,
+                self._sorted_significant_states_json, hass, *args
             ),
         )
 
@@ -537,11 +1111,12 @@ class HistoryPeriodView(HomeAssistantView):
         include_start_time_state,
         significant_changes_only,
         minimal_response,
+        compressed_state_format,
     ):
         """Fetch significant stats from the database as json."""
         timer_start = time.perf_counter()
 
-        with session_scope(hass=hass) as session:
+        with session_scope(hass=hass, read_only=True) as session:
             result = _get_significant_states(
                 hass,
                 session,
@@ -572,9 +1147,58 @@ class HistoryPeriodView(HomeAssistantView):
             sorted_result.extend(result)
             result = sorted_result
 
+        if compressed_state_format:
+            result = [
+                _compress_entity_states(states[0].entity_id, states)
+                for states in result
+            ]
+
         return self.json(result)
 
 
+class HistoryStreamView(HistoryPeriodView):
+    """Handle history period requests with a chunked response.
+
+    The states are serialized entity by entity in entity_id order
+    and sent as they are read from the database, the included
+    entities are not put first.
+    """
+
+    url = "/api/history/stream"
+    name = "api:history:view-stream"
+    extra_urls = ["/api/history/stream/{datetime}"]
+
+    async def _async_history_response(
+        self,
+        request,
+        hass,
+        start_time,
+        end_time,
+        entity_ids,
+        include_start_time_state,
+        significant_changes_only,
+        minimal_response,
+        compressed_state_format,
+    ) -> web.StreamResponse:
+        """Stream the history of the parsed request."""
+
+        def _states_json():
+            for _, states_json in _stream_significant_states_json(
+                hass,
+                start_time,
+                end_time,
+                entity_ids,
+                self.filters,
+                include_start_time_state,
+                significant_changes_only,
+                minimal_response,
+                compressed_state_format,
+            ):
+                yield states_json
+
+        return await async_stream_json_list(hass, request, _states_json)
+
+
 def sqlalchemy_filter_from_include_exclude_conf(conf):
     """Build a sql filter from config."""
     filters = Filters()
@@ -708,12 +1332,27 @@ class LazyState(State):
         self._last_updated = None
         self._context = None
 
+    @property
+    def shared_attrs_json(self):
+        """State attributes as stored in the database.
+
+        Equal attributes are stored once so comparing the stored
+        strings avoids decoding the attributes.
+        """
+        # Rows written before the state_attributes table
+        # existed keep their attributes in the states table
+        return self._row.shared_attrs or self._row.attributes
+
     @property  # type: ignore
     def attributes(self):
         """State attributes."""
         if not self._attributes:
+            shared_attrs = self.shared_attrs_json
+            if shared_attrs is None or shared_attrs == EMPTY_JSON_OBJECT:
+                self._attributes = {}
+                return self._attributes
             try:
-                self._attributes = json.loads(self._row.attributes)
+                self._attributes = json_loads(shared_attrs)
             except ValueError:
                 # When json.loads fails
                 _LOGGER.exception("Error converting row to state: %s", self._row)
@@ -741,7 +1380,7 @@ class LazyState(State):
     def last_changed(self):
         """Last changed datetime."""
         if not self._last_changed:
-            self._last_changed = process_timestamp(self._row.last_changed)
+            self._last_changed = dt_util.utc_from_timestamp(self._row.last_changed_ts)
         return self._last_changed
 
     @last_changed.setter
@@ -753,7 +1392,7 @@ class LazyState(State):
     def last_updated(self):
         """Last updated datetime."""
         if not self._last_updated:
-            self._last_updated = process_timestamp(self._row.last_updated)
+            self._last_updated = dt_util.utc_from_timestamp(self._row.last_updated_ts)
         return self._last_updated
 
     @last_updated.setter
@@ -761,6 +1400,20 @@ class LazyState(State):
         """Set last updated datetime."""
         self._last_updated = value
 
+    @property
+    def last_changed_timestamp(self):
+        """Last changed as a timestamp."""
+        if self._last_changed:
+            return self._last_changed.timestamp()
+        return self._row.last_changed_ts
+
+    @property
+    def last_updated_timestamp(self):
+        """Last updated as a timestamp."""
+        if self._last_updated:
+            return self._last_updated.timestamp()
+        return self._row.last_updated_ts
+
     def as_dict(self):
         """Return a dict representation of the LazyState.
 
@@ -771,14 +1424,14 @@ class LazyState(State):
         if self._last_changed:
             last_changed_isoformat = self._last_changed.isoformat()
         else:
-            last_changed_isoformat = process_timestamp_to_utc_isoformat(
-                self._row.last_changed
+            last_changed_isoformat = process_float_timestamp_to_utc_isoformat(
+                self._row.last_changed_ts
             )
         if self._last_updated:
             last_updated_isoformat = self._last_updated.isoformat()
         else:
-            last_updated_isoformat = process_timestamp_to_utc_isoformat(
-                self._row.last_updated
+            last_updated_isoformat = process_float_timestamp_to_utc_isoformat(
+                self._row.last_updated_ts
             )
         return {
             "entity_id": self.entity_id,
@@ -788,6 +1441,14 @@ class LazyState(State):
             "last_updated": last_updated_isoformat,
         }
 
+    def as_json(self):
+        """Return the JSON of the dict representation of the LazyState."""
+        return json_dumps(self.as_dict())
+
+    def attributes_json(self):
+        """Return the JSON of the attributes of the LazyState."""
+        return json_dumps(self._attributes or self.attributes)
+
     def __eq__(self, other):
         """Return the comparison."""
         return (
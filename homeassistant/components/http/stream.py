@@ -0,0 +1,76 @@
+"""Support for responses streamed while they are generated in the executor."""
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable, Iterator
+from itertools import islice
+import threading
+
+from aiohttp import web
+
+from homeassistant.const import CONTENT_TYPE_JSON
+from homeassistant.core import HomeAssistant
+
+# Chunks generated by one executor job, the
+# generator is not advanced until they are sent
+STREAM_CHUNKS_PER_JOB = 16
+
+
+async def async_stream_json_list(
+    hass: HomeAssistant,
+    request: web.Request,
+    json_chunks: Callable[[], Iterator[str]],
+) -> web.StreamResponse:
+    """Respond with a JSON list of the chunks generated in the executor.
+
+    Each chunk is one or more comma separated JSON values. The
+    response is chunked and sent while the chunks are generated.
+    """
+    response = web.StreamResponse()
+    response.content_type = CONTENT_TYPE_JSON
+    response.enable_chunked_encoding()
+    response.enable_compression()
+    await response.prepare(request)
+
+    separator = b"["
+
+    async def _async_write(chunk):
+        nonlocal separator
+        await response.write(separator + chunk.encode("UTF-8"))
+        separator = b","
+
+    await async_stream_in_executor(hass, json_chunks, _async_write)
+    await response.write(b"[]" if separator == b"[" else b"]")
+    await response.write_eof()
+    return response
+
+
+async def async_stream_in_executor(
+    hass: HomeAssistant,
+    chunks: Callable[[], Iterator],
+    async_send: Callable[[str], Awaitable[None]],
+) -> None:
+    """Send the chunks generated in the executor as they come.
+
+    Each executor job generates up to STREAM_CHUNKS_PER_JOB chunks and
+    the next one only starts when they are sent, so a slow client neither
+    holds an executor thread nor makes the chunks pile up.
+    """
+    generator = chunks()
+    lock = threading.Lock()
+
+    def _next_chunks():
+        with lock:
+            return list(islice(generator, STREAM_CHUNKS_PER_JOB))
+
+    def _close():
+        # Waits for a job that still runs after the stream was cancelled
+        with lock:
+            generator.close()
+
+    try:
+        while batch := await hass.async_add_executor_job(_next_chunks):
+            for chunk in batch:
+                await async_send(chunk)
+    finally:
+        # The generator may hold resources, like a database session, until closed
+        hass.async_add_executor_job(_close)
@@ -2,7 +2,6 @@
 from __future__ import annotations
 
 import asyncio
-import json
 import logging
 from typing import Any, Callable
 
@@ -17,14 +16,27 @@ import voluptuous as vol
 
 from homeassistant import exceptions
 from homeassistant.const import CONTENT_TYPE_JSON, HTTP_OK, HTTP_SERVICE_UNAVAILABLE
-from homeassistant.core import Context, is_callback
-from homeassistant.helpers.json import JSONEncoder
+from homeassistant.core import Context, State, is_callback
+from homeassistant.helpers.json import json_bytes
 
 from .const import KEY_AUTHENTICATED, KEY_HASS
 
 _LOGGER = logging.getLogger(__name__)
 
 
+def _json_body(result: Any) -> bytes:
+    """Serialize result to JSON reusing the JSON cached on states."""
+    if isinstance(result, State):
+        return result.as_json().encode("utf-8")
+    if (
+        isinstance(result, list)
+        and result
+        and all(isinstance(item, State) for item in result)
+    ):
+        return f"[{','.join(state.as_json() for state in result)}]".encode("utf-8")
+    return json_bytes(result)
+
+
 class HomeAssistantView:
     """Base view for all views."""
 
@@ -51,7 +63,7 @@ class HomeAssistantView:
     ) -> web.Response:
         """Return a JSON response."""
         try:
-            msg = json.dumps(result, cls=JSONEncoder, allow_nan=False).encode("UTF-8")
+            msg = _json_body(result)
         except (ValueError, TypeError) as err:
             _LOGGER.error("Unable to serialize to JSON: %s\n%s", err, result)
             raise HTTPInternalServerError from err
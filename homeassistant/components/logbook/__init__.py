@@ -1,22 +1,40 @@
 """Event parser and human readable log generator."""
+from __future__ import annotations
+
+import asyncio
 from contextlib import suppress
 from datetime import timedelta
-from itertools import groupby
-import json
+from itertools import groupby, islice
+import logging
 import re
+import threading
+from typing import NamedTuple
 
 import sqlalchemy
 from sqlalchemy.orm import aliased
 from sqlalchemy.sql.expression import literal
 import voluptuous as vol
 
+from homeassistant.components import websocket_api
 from homeassistant.components.automation import EVENT_AUTOMATION_TRIGGERED
 from homeassistant.components.history import sqlalchemy_filter_from_include_exclude_conf
 from homeassistant.components.http import HomeAssistantView
+from homeassistant.components.http.stream import async_stream_json_list
+from homeassistant.components.recorder.const import (
+    DATA_INSTANCE,
+    SIGNAL_RECORDER_EVENTS_PURGED,
+)
 from homeassistant.components.recorder.models import (
+    EMPTY_JSON_OBJECT,
+    EventData,
     Events,
+    EventTypes,
+    StateAttributes,
     States,
-    process_timestamp_to_utc_isoformat,
+    db_json_dumps,
+    process_datetime_to_timestamp,
+    process_float_timestamp_to_utc_isoformat,
+    state_attributes_json,
 )
 from homeassistant.components.recorder.util import session_scope
 from homeassistant.components.script import EVENT_SCRIPT_STARTED
@@ -27,6 +45,7 @@ from homeassistant.const import (
     ATTR_ICON,
     ATTR_NAME,
     ATTR_SERVICE,
+    ATTR_UNIT_OF_MEASUREMENT,
     EVENT_CALL_SERVICE,
     EVENT_HOMEASSISTANT_START,
     EVENT_HOMEASSISTANT_STOP,
@@ -37,31 +56,54 @@ from homeassistant.const import (
 from homeassistant.core import DOMAIN as HA_DOMAIN, callback, split_entity_id
 from homeassistant.exceptions import InvalidEntityFormatError
 import homeassistant.helpers.config_validation as cv
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
 from homeassistant.helpers.entityfilter import (
     INCLUDE_EXCLUDE_BASE_FILTER_SCHEMA,
     convert_include_exclude_filter,
     generate_filter,
 )
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.integration_platform import (
     async_process_integration_platforms,
 )
+from homeassistant.helpers.json import json_dumps, json_loads
 from homeassistant.loader import bind_hass
 import homeassistant.util.dt as dt_util
+from homeassistant.util.lru import LRU
 
-ENTITY_ID_JSON_TEMPLATE = '"entity_id": "{}"'
-ENTITY_ID_JSON_EXTRACT = re.compile('"entity_id": "([^"]+)"')
-DOMAIN_JSON_EXTRACT = re.compile('"domain": "([^"]+)"')
-ICON_JSON_EXTRACT = re.compile('"icon": "([^"]+)"')
+_LOGGER = logging.getLogger(__name__)
+
+ENTITY_ID_JSON_TEMPLATE = '"entity_id":"{}"'
+# Rows recorded before the JSON became compact have a space after the colon
+OLD_FORMAT_ENTITY_ID_JSON_TEMPLATE = '"entity_id": "{}"'
+ENTITY_ID_JSON_EXTRACT = re.compile('"entity_id": ?"([^"]+)"')
+DOMAIN_JSON_EXTRACT = re.compile('"domain": ?"([^"]+)"')
+ICON_JSON_EXTRACT = re.compile('"icon": ?"([^"]+)"')
 
 ATTR_MESSAGE = "message"
 
 CONTINUOUS_DOMAINS = ["proximity", "sensor"]
 
 DOMAIN = "logbook"
+DATA_CONTEXT_ORIGINS = "logbook_context_origins"
+DATA_FILTERS = "logbook_filters"
+DATA_ENTITIES_FILTER = "logbook_entities_filter"
+
+# Contexts whose origin events are kept between requests
+CONTEXT_ORIGIN_CACHE_SIZE = 2048
+
+# Entries serialized together when the logbook is streamed
+ENTRIES_PER_CHUNK = 100
+
+# Seconds events are collected before they are sent to event stream subscribers
+EVENT_STREAM_COALESCE_SECONDS = 1
+
+# Seconds the event stream waits for the recorder to commit the events
+# fired before it, after that the replay may miss the latest of them
+EVENT_STREAM_COMMIT_TIMEOUT = 10
 
 GROUP_BY_MINUTES = 15
 
-EMPTY_JSON_OBJECT = "{}"
 UNIT_OF_MEASUREMENT_JSON = '"unit_of_measurement":'
 
 HA_DOMAIN_ENTITY_ID = f"{HA_DOMAIN}."
@@ -87,9 +129,9 @@ ALL_EVENT_TYPES = [
 ]
 
 EVENT_COLUMNS = [
-    Events.event_type,
-    Events.event_data,
-    Events.time_fired,
+    EventTypes.event_type,
+    EventData.shared_data,
+    Events.time_fired_ts,
     Events.context_id,
     Events.context_user_id,
     Events.context_parent_id,
@@ -128,6 +170,12 @@ def async_log_entry(hass, name, message, domain=None, entity_id=None, context=No
 async def async_setup(hass, config):
     """Logbook setup."""
     hass.data[DOMAIN] = {}
+    context_origins = hass.data[DATA_CONTEXT_ORIGINS] = ContextOriginCache(
+        CONTEXT_ORIGIN_CACHE_SIZE
+    )
+    async_dispatcher_connect(
+        hass, SIGNAL_RECORDER_EVENTS_PURGED, context_origins.purge_before
+    )
 
     @callback
     def log_message(service):
@@ -160,7 +208,10 @@ async def async_setup(hass, config):
         filters = None
         entities_filter = None
 
+    hass.data[DATA_FILTERS] = filters
+    hass.data[DATA_ENTITIES_FILTER] = entities_filter
     hass.http.register_view(LogbookView(conf, filters, entities_filter))
+    websocket_api.async_register_command(hass, ws_event_stream)
 
     hass.services.async_register(DOMAIN, "log", log_message, schema=LOG_MESSAGE_SCHEMA)
 
@@ -180,6 +231,159 @@ async def _process_logbook_platform(hass, domain, platform):
     platform.async_describe_events(hass, _async_describe_event)
 
 
+@websocket_api.websocket_command(
+    {
+        vol.Required("type"): "logbook/event_stream",
+        vol.Required("start_time"): str,
+        vol.Optional("entity_ids"): cv.entity_ids,
+    }
+)
+@websocket_api.async_response
+async def ws_event_stream(hass, connection, msg):
+    """Handle logbook event stream websocket command.
+
+    The entries since the start time are read from the database once,
+    after that the entries of the events are sent as they are fired,
+    collected for EVENT_STREAM_COALESCE_SECONDS.
+    """
+    msg_id = msg["id"]
+    start_time = dt_util.parse_datetime(msg["start_time"])
+    if start_time is None:
+        connection.send_error(msg_id, "invalid_start_time", "Invalid start_time")
+        return
+
+    entity_ids = msg.get("entity_ids")
+    entities_filter = hass.data[DATA_ENTITIES_FILTER]
+    if entity_ids is not None:
+        entities_filter = generate_filter([], entity_ids, [], [])
+    context_lookup = ContextLookup(hass.data[DATA_CONTEXT_ORIGINS])
+    pending = []
+    cancel_flush = None
+    replayed = False
+
+    @callback
+    def _async_send_pending(_now=None):
+        """Send the entries of the events collected since the last message."""
+        nonlocal cancel_flush
+        cancel_flush = None
+        entries = list(
+            humanify(hass, pending, EntityAttributeCache(hass), context_lookup)
+        )
+        pending.clear()
+        if entries:
+            connection.send_message(
+                websocket_api.messages.event_message(msg_id, {"events": entries})
+            )
+
+    @callback
+    def _async_event(event):
+        nonlocal cancel_flush
+        if not _keep_live_event(hass, event, entities_filter):
+            return
+        lazy_event = LazyEventPartialState(LiveEventRow.from_event(event))
+        context_lookup.add(lazy_event)
+        if event.event_type == EVENT_CALL_SERVICE or (
+            event.event_type != EVENT_STATE_CHANGED
+            and not _keep_event(hass, lazy_event, entities_filter)
+        ):
+            return
+        pending.append(lazy_event)
+        if replayed and cancel_flush is None:
+            cancel_flush = async_call_later(
+                hass, EVENT_STREAM_COALESCE_SECONDS, _async_send_pending
+            )
+
+    # The events fired after end_time are sent as they are fired
+    end_time = dt_util.utcnow()
+    unsubs = [
+        hass.bus.async_listen(event_type, _async_event)
+        for event_type in {*ALL_EVENT_TYPES, *hass.data[DOMAIN]}
+    ]
+
+    @callback
+    def _async_unsubscribe():
+        for unsub in unsubs:
+            unsub()
+        if cancel_flush:
+            cancel_flush()
+
+    connection.subscriptions[msg_id] = _async_unsubscribe
+    connection.send_result(msg_id)
+
+    try:
+        # The events fired before end_time may not be committed yet
+        await _async_commit_recorder(hass)
+        replay_message = await hass.async_add_executor_job(
+            _replay_message_json,
+            hass,
+            msg_id,
+            dt_util.as_utc(start_time),
+            end_time,
+            entity_ids,
+            hass.data[DATA_FILTERS],
+            hass.data[DATA_ENTITIES_FILTER],
+        )
+    except Exception:
+        if connection.subscriptions.pop(msg_id, None):
+            _async_unsubscribe()
+        raise
+
+    if msg_id not in connection.subscriptions:
+        # Unsubscribed while the events were read
+        return
+    connection.send_message(replay_message)
+    replayed = True
+    _async_send_pending()
+
+
+async def _async_commit_recorder(hass):
+    """Wait a bounded time for the recorder to commit the events fired so far."""
+    instance = hass.data[DATA_INSTANCE]
+    if instance.migration_in_progress or not instance.is_alive():
+        return
+    try:
+        await asyncio.wait_for(instance.async_commit(), EVENT_STREAM_COMMIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        _LOGGER.debug("The recorder did not commit the events in time")
+
+
+def _replay_message_json(
+    hass, msg_id, start_time, end_time, entity_ids, filters, entities_filter
+):
+    """Return the event message of the entries until the subscription."""
+    return json_dumps(
+        websocket_api.messages.event_message(
+            msg_id,
+            {
+                "events": _get_events(
+                    hass,
+                    start_time,
+                    end_time,
+                    entity_ids,
+                    filters,
+                    entities_filter,
+                )
+            },
+        )
+    )
+
+
+def _keep_live_event(hass, event, entities_filter):
+    """Return if an event passes the filters the database query applies."""
+    if event.event_type != EVENT_STATE_CHANGED:
+        return True
+    new_state = event.data.get("new_state")
+    old_state = event.data.get("old_state")
+    if new_state is None or old_state is None or new_state.state == old_state.state:
+        return False
+    if (
+        new_state.domain in CONTINUOUS_DOMAINS
+        and ATTR_UNIT_OF_MEASUREMENT in new_state.attributes
+    ):
+        return False
+    return entities_filter is None or entities_filter(new_state.entity_id)
+
+
 class LogbookView(HomeAssistantView):
     """Handle logbook view requests."""
 
@@ -240,21 +444,27 @@ class LogbookView(HomeAssistantView):
             )
 
         def json_events():
-            """Fetch events and generate JSON."""
-            return self.json(
-                _get_events(
-                    hass,
-                    start_day,
-                    end_day,
-                    entity_ids,
-                    self.filters,
-                    self.entities_filter,
-                    entity_matches_only,
-                    context_id,
-                )
+            """Fetch events and generate JSON a few entries at a time."""
+            entries = _stream_events(
+                hass,
+                start_day,
+                end_day,
+                entity_ids,
+                self.filters,
+                self.entities_filter,
+                entity_matches_only,
+                context_id,
+                stream=True,
             )
+            while True:
+                chunk = [
+                    json_dumps(entry) for entry in islice(entries, ENTRIES_PER_CHUNK)
+                ]
+                if not chunk:
+                    return
+                yield ",".join(chunk)
 
-        return await hass.async_add_executor_job(json_events)
+        return await async_stream_json_list(hass, request, json_events)
 
 
 def humanify(hass, events, entity_attr_cache, context_lookup):
@@ -422,18 +632,48 @@ def _get_events(
     context_id=None,
 ):
     """Get events for a period of time."""
+    return list(
+        _stream_events(
+            hass,
+            start_day,
+            end_day,
+            entity_ids,
+            filters,
+            entities_filter,
+            entity_matches_only,
+            context_id,
+        )
+    )
+
+
+def _stream_events(
+    hass,
+    start_day,
+    end_day,
+    entity_ids=None,
+    filters=None,
+    entities_filter=None,
+    entity_matches_only=False,
+    context_id=None,
+    stream=False,
+):
+    """Yield the logbook entries of a period of time as they are read.
+
+    With stream the session is taken from the pool of the streamed
+    responses since the entries are read as the client receives them.
+    """
     assert not (
         entity_ids and context_id
     ), "can't pass in both entity_ids and context_id"
 
     entity_attr_cache = EntityAttributeCache(hass)
-    context_lookup = {None: None}
+    context_lookup = ContextLookup(hass.data[DATA_CONTEXT_ORIGINS])
 
     def yield_events(query):
         """Yield Events that are not filtered away."""
         for row in query.yield_per(1000):
             event = LazyEventPartialState(row)
-            context_lookup.setdefault(event.context_id, event)
+            context_lookup.add(event)
             if event.event_type == EVENT_CALL_SERVICE:
                 continue
             if event.event_type == EVENT_STATE_CHANGED or _keep_event(
@@ -444,14 +684,17 @@ def _get_events(
     if entity_ids is not None:
         entities_filter = generate_filter([], entity_ids, [], [])
 
-    with session_scope(hass=hass) as session:
+    with session_scope(hass=hass, read_only=True, stream=stream) as session:
         old_state = aliased(States, name="old_state")
+        event_type_ids = _event_type_ids(
+            session, [*ALL_EVENT_TYPES, *hass.data.get(DOMAIN, {})]
+        )
 
         if entity_ids is not None:
             query = _generate_events_query_without_states(session)
             query = _apply_event_time_filter(query, start_day, end_day)
             query = _apply_event_types_filter(
-                hass, query, ALL_EVENT_TYPES_EXCEPT_STATE_CHANGED
+                hass, query, ALL_EVENT_TYPES_EXCEPT_STATE_CHANGED, event_type_ids
             )
             if entity_matches_only:
                 # When entity_matches_only is provided, contexts and events that do not
@@ -464,26 +707,26 @@ def _get_events(
                 )
             )
         else:
-            query = _generate_events_query(session)
+            query = _generate_events_query(session).select_from(Events)
             query = _apply_event_time_filter(query, start_day, end_day)
             query = _apply_events_types_and_states_filter(
-                hass, query, old_state
+                hass, query, old_state, event_type_ids
             ).filter(
-                (States.last_updated == States.last_changed)
-                | (Events.event_type != EVENT_STATE_CHANGED)
+                (States.last_updated_ts == States.last_changed_ts)
+                | _not_state_changed_matcher(event_type_ids)
             )
             if filters:
                 query = query.filter(
-                    filters.entity_filter() | (Events.event_type != EVENT_STATE_CHANGED)
+                    filters.entity_filter() | _not_state_changed_matcher(event_type_ids)
                 )
 
             if context_id is not None:
                 query = query.filter(Events.context_id == context_id)
 
-        query = query.order_by(Events.time_fired)
+        query = query.order_by(Events.time_fired_ts)
 
-        return list(
-            humanify(hass, yield_events(query), entity_attr_cache, context_lookup)
+        yield from humanify(
+            hass, yield_events(query), entity_attr_cache, context_lookup
         )
 
 
@@ -494,47 +737,92 @@ def _generate_events_query(session):
         States.entity_id,
         States.domain,
         States.attributes,
+        StateAttributes.shared_attrs,
     )
 
 
 def _generate_events_query_without_states(session):
-    return session.query(
-        *EVENT_COLUMNS,
-        literal(None).label("state"),
-        literal(None).label("entity_id"),
-        literal(None).label("domain"),
-        literal(None).label("attributes"),
+    return _outerjoin_event_type_and_data(
+        session.query(
+            *EVENT_COLUMNS,
+            literal(None).label("state"),
+            literal(None).label("entity_id"),
+            literal(None).label("domain"),
+            literal(None).label("attributes"),
+            literal(None).label("shared_attrs"),
+        ).select_from(Events)
     )
 
 
 def _generate_states_query(session, start_day, end_day, old_state, entity_ids):
     return (
-        _generate_events_query(session)
-        .outerjoin(Events, (States.event_id == Events.event_id))
+        _outerjoin_event_type_and_data(
+            _generate_events_query(session)
+            .select_from(States)
+            .outerjoin(Events, (States.event_id == Events.event_id))
+        )
         .outerjoin(old_state, (States.old_state_id == old_state.state_id))
+        .outerjoin(
+            StateAttributes, (States.attributes_id == StateAttributes.attributes_id)
+        )
         .filter(_missing_state_matcher(old_state))
         .filter(_continuous_entity_matcher())
-        .filter((States.last_updated > start_day) & (States.last_updated < end_day))
         .filter(
-            (States.last_updated == States.last_changed)
+            (States.last_updated_ts > process_datetime_to_timestamp(start_day))
+            & (States.last_updated_ts < process_datetime_to_timestamp(end_day))
+        )
+        .filter(
+            (States.last_updated_ts == States.last_changed_ts)
             & States.entity_id.in_(entity_ids)
         )
     )
 
 
-def _apply_events_types_and_states_filter(hass, query, old_state):
+def _apply_events_types_and_states_filter(hass, query, old_state, event_type_ids):
     events_query = (
-        query.outerjoin(States, (Events.event_id == States.event_id))
+        _outerjoin_event_type_and_data(query)
+        .outerjoin(States, (Events.event_id == States.event_id))
         .outerjoin(old_state, (States.old_state_id == old_state.state_id))
+        .outerjoin(
+            StateAttributes, (States.attributes_id == StateAttributes.attributes_id)
+        )
         .filter(
-            (Events.event_type != EVENT_STATE_CHANGED)
+            _not_state_changed_matcher(event_type_ids)
             | _missing_state_matcher(old_state)
         )
         .filter(
-            (Events.event_type != EVENT_STATE_CHANGED) | _continuous_entity_matcher()
+            _not_state_changed_matcher(event_type_ids) | _continuous_entity_matcher()
         )
     )
-    return _apply_event_types_filter(hass, events_query, ALL_EVENT_TYPES)
+    return _apply_event_types_filter(
+        hass, events_query, ALL_EVENT_TYPES, event_type_ids
+    )
+
+
+def _outerjoin_event_type_and_data(query):
+    return query.outerjoin(
+        EventTypes, (Events.event_type_id == EventTypes.event_type_id)
+    ).outerjoin(EventData, (Events.data_id == EventData.data_id))
+
+
+def _event_type_ids(session, event_types):
+    """Return the ids of the event types that have been recorded.
+
+    Events are filtered by event type id so the event type
+    strings only have to be compared in the event_types table.
+    """
+    return dict(
+        session.query(EventTypes.event_type, EventTypes.event_type_id).filter(
+            EventTypes.event_type.in_(event_types)
+        )
+    )
+
+
+def _not_state_changed_matcher(event_type_ids):
+    state_changed_type_id = event_type_ids.get(EVENT_STATE_CHANGED)
+    if state_changed_type_id is None:
+        return sqlalchemy.true()
+    return Events.event_type_id != state_changed_type_id
 
 
 def _missing_state_matcher(old_state):
@@ -555,19 +843,30 @@ def _continuous_entity_matcher():
     #
     return sqlalchemy.or_(
         sqlalchemy.not_(States.domain.in_(CONTINUOUS_DOMAINS)),
-        sqlalchemy.not_(States.attributes.contains(UNIT_OF_MEASUREMENT_JSON)),
+        sqlalchemy.not_(
+            sqlalchemy.func.coalesce(
+                StateAttributes.shared_attrs, States.attributes
+            ).contains(UNIT_OF_MEASUREMENT_JSON)
+        ),
     )
 
 
 def _apply_event_time_filter(events_query, start_day, end_day):
     return events_query.filter(
-        (Events.time_fired > start_day) & (Events.time_fired < end_day)
+        (Events.time_fired_ts > process_datetime_to_timestamp(start_day))
+        & (Events.time_fired_ts < process_datetime_to_timestamp(end_day))
     )
 
 
-def _apply_event_types_filter(hass, query, event_types):
+def _apply_event_types_filter(hass, query, event_types, event_type_ids):
     return query.filter(
-        Events.event_type.in_(event_types + list(hass.data.get(DOMAIN, {})))
+        Events.event_type_id.in_(
+            [
+                event_type_ids[event_type]
+                for event_type in (*event_types, *hass.data.get(DOMAIN, {}))
+                if event_type in event_type_ids
+            ]
+        )
     )
 
 
@@ -575,8 +874,12 @@ def _apply_event_entity_id_matchers(events_query, entity_ids):
     return events_query.filter(
         sqlalchemy.or_(
             *[
-                Events.event_data.contains(ENTITY_ID_JSON_TEMPLATE.format(entity_id))
+                EventData.shared_data.contains(template.format(entity_id))
                 for entity_id in entity_ids
+                for template in (
+                    ENTITY_ID_JSON_TEMPLATE,
+                    OLD_FORMAT_ENTITY_ID_JSON_TEMPLATE,
+                )
             ]
         )
     )
@@ -682,8 +985,10 @@ class LazyEventPartialState:
     __slots__ = [
         "_row",
         "_event_data",
+        "_shared_data",
         "_time_fired_isoformat",
         "_attributes",
+        "_shared_attrs",
         "event_type",
         "entity_id",
         "state",
@@ -691,6 +996,7 @@ class LazyEventPartialState:
         "context_id",
         "context_user_id",
         "context_parent_id",
+        "time_fired_ts",
         "time_fired_minute",
     ]
 
@@ -698,8 +1004,13 @@ class LazyEventPartialState:
         """Init the lazy event."""
         self._row = row
         self._event_data = None
+        # Events without data have no event_data row
+        self._shared_data = self._row.shared_data or EMPTY_JSON_OBJECT
         self._time_fired_isoformat = None
         self._attributes = None
+        # Rows written before the state_attributes table
+        # existed keep their attributes in the states table
+        self._shared_attrs = self._row.shared_attrs or self._row.attributes
         self.event_type = self._row.event_type
         self.entity_id = self._row.entity_id
         self.state = self._row.state
@@ -707,7 +1018,11 @@ class LazyEventPartialState:
         self.context_id = self._row.context_id
         self.context_user_id = self._row.context_user_id
         self.context_parent_id = self._row.context_parent_id
-        self.time_fired_minute = self._row.time_fired.minute
+        self.time_fired_ts = self._row.time_fired_ts
+        if self.time_fired_ts is None:
+            # Like time_fired_isoformat, events without a time are shown now
+            self.time_fired_ts = dt_util.utcnow().timestamp()
+        self.time_fired_minute = int(self.time_fired_ts // 60 % 60)
 
     @property
     def attributes_icon(self):
@@ -715,7 +1030,7 @@ class LazyEventPartialState:
         if self._attributes:
             return self._attributes.get(ATTR_ICON)
 
-        result = ICON_JSON_EXTRACT.search(self._row.attributes)
+        result = ICON_JSON_EXTRACT.search(self._shared_attrs or EMPTY_JSON_OBJECT)
         return result and result.group(1)
 
     @property
@@ -724,7 +1039,7 @@ class LazyEventPartialState:
         if self._event_data:
             return self._event_data.get(ATTR_ENTITY_ID)
 
-        result = ENTITY_ID_JSON_EXTRACT.search(self._row.event_data)
+        result = ENTITY_ID_JSON_EXTRACT.search(self._shared_data)
         return result and result.group(1)
 
     @property
@@ -733,43 +1048,80 @@ class LazyEventPartialState:
         if self._event_data:
             return self._event_data.get(ATTR_DOMAIN)
 
-        result = DOMAIN_JSON_EXTRACT.search(self._row.event_data)
+        result = DOMAIN_JSON_EXTRACT.search(self._shared_data)
         return result and result.group(1)
 
     @property
     def attributes(self):
         """State attributes."""
         if not self._attributes:
-            if (
-                self._row.attributes is None
-                or self._row.attributes == EMPTY_JSON_OBJECT
-            ):
+            if self._shared_attrs is None or self._shared_attrs == EMPTY_JSON_OBJECT:
                 self._attributes = {}
             else:
-                self._attributes = json.loads(self._row.attributes)
+                self._attributes = json_loads(self._shared_attrs)
         return self._attributes
 
     @property
     def data(self):
         """Event data."""
         if not self._event_data:
-            if self._row.event_data == EMPTY_JSON_OBJECT:
+            if self._shared_data == EMPTY_JSON_OBJECT:
                 self._event_data = {}
             else:
-                self._event_data = json.loads(self._row.event_data)
+                self._event_data = json_loads(self._shared_data)
         return self._event_data
 
     @property
     def time_fired_isoformat(self):
         """Time event was fired in utc isoformat."""
         if not self._time_fired_isoformat:
-            self._time_fired_isoformat = process_timestamp_to_utc_isoformat(
-                self._row.time_fired or dt_util.utcnow()
-            )
+            if self._row.time_fired_ts is None:
+                self._time_fired_isoformat = dt_util.utcnow().isoformat()
+            else:
+                self._time_fired_isoformat = process_float_timestamp_to_utc_isoformat(
+                    self._row.time_fired_ts
+                )
 
         return self._time_fired_isoformat
 
 
+class LiveEventRow(NamedTuple):
+    """The columns the logbook reads of an event that was just fired."""
+
+    event_type: str
+    shared_data: str | None
+    time_fired_ts: float
+    context_id: str | None
+    context_user_id: str | None
+    context_parent_id: str | None
+    state: str | None = None
+    entity_id: str | None = None
+    domain: str | None = None
+    attributes: str | None = None
+    shared_attrs: str | None = None
+
+    @classmethod
+    def from_event(cls, event):
+        """Create the row of an event."""
+        row = cls(
+            event.event_type,
+            None,
+            event.time_fired.timestamp(),
+            event.context.id,
+            event.context.user_id,
+            event.context.parent_id,
+        )
+        if event.event_type != EVENT_STATE_CHANGED:
+            return row._replace(shared_data=db_json_dumps(event.data))
+        new_state = event.data["new_state"]
+        return row._replace(
+            state=new_state.state,
+            entity_id=new_state.entity_id,
+            domain=new_state.domain,
+            shared_attrs=state_attributes_json(new_state),
+        )
+
+
 class EntityAttributeCache:
     """A cache to lookup static entity_id attribute.
 
@@ -801,3 +1153,67 @@ class EntityAttributeCache:
             self._cache[entity_id][attribute] = event.attributes.get(attribute)
 
         return self._cache[entity_id][attribute]
+
+
+class ContextOriginCache:
+    """The earliest event seen of recent contexts, shared between requests.
+
+    Events are read in executor threads so access is serialized.
+    """
+
+    def __init__(self, maxsize):
+        """Init the cache."""
+        self._lock = threading.Lock()
+        self._events = LRU(maxsize)
+
+    def get(self, context_id):
+        """Return the earliest event seen with the context."""
+        with self._lock:
+            return self._events.get(context_id)
+
+    def add(self, event):
+        """Remember the event unless an earlier one of its context is known."""
+        with self._lock:
+            cached = self._events.get(event.context_id)
+            if cached is None or event.time_fired_ts < cached.time_fired_ts:
+                self._events[event.context_id] = event
+
+    def purge_before(self, timestamp):
+        """Forget the events the recorder purged."""
+        with self._lock:
+            for context_id, event in self._events.items():
+                if event.time_fired_ts < timestamp:
+                    self._events.pop(context_id)
+
+
+class ContextLookup:
+    """Lookup the event that started a context.
+
+    The first event of each context in the requested period is used,
+    unless an earlier event of the context is cached from a previous
+    request. Contexts that started before the period are looked up in
+    the cache.
+    """
+
+    def __init__(self, origins):
+        """Init the lookup."""
+        self._origins = origins
+        self._events = {None: None}
+
+    def add(self, event):
+        """Add an event in the order the events were fired."""
+        context_id = event.context_id
+        if context_id in self._events:
+            return
+        cached = self._origins.get(context_id)
+        if cached is not None and cached.time_fired_ts < event.time_fired_ts:
+            self._events[context_id] = cached
+            return
+        self._events[context_id] = event
+        self._origins.add(event)
+
+    def get(self, context_id):
+        """Return the event that started the context."""
+        if context_id in self._events:
+            return self._events[context_id]
+        return self._origins.get(context_id)
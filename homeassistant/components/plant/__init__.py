@@ -311,14 +311,14 @@ class Plant(Entity):
             return
 
         _LOGGER.debug("Initializing values for %s from the database", self._name)
-        with session_scope(hass=self.hass) as session:
+        with session_scope(hass=self.hass, read_only=True) as session:
             query = (
                 session.query(States)
                 .filter(
                     (States.entity_id == entity_id.lower())
                     and (States.last_updated > start_date)
                 )
-                .order_by(States.last_updated.asc())
+                .order_by(States.last_updated_ts.asc())
             )
             states = execute(query, to_native=True, validate_entity_ids=False)
 
@@ -4,7 +4,9 @@ from __future__ import annotations
 import asyncio
 import concurrent.futures
 from datetime import datetime, timedelta
+from itertools import groupby
 import logging
+import os
 import queue
 import sqlite3
 import threading
@@ -14,10 +16,10 @@ from typing import Any, Callable, NamedTuple
 from sqlalchemy import create_engine, event as sqlalchemy_event, exc, select
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import scoped_session, sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import QueuePool, StaticPool
 import voluptuous as vol
 
-from homeassistant.components import persistent_notification
+from homeassistant.components import persistent_notification, websocket_api
 from homeassistant.const import (
     ATTR_ENTITY_ID,
     CONF_EXCLUDE,
@@ -28,28 +30,56 @@ from homeassistant.const import (
     EVENT_TIME_CHANGED,
     MATCH_ALL,
 )
-from homeassistant.core import CoreState, HomeAssistant, callback
+from homeassistant.core import CoreState, Event, HomeAssistant, callback
+from homeassistant.helpers import discovery
 import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.entityfilter import (
     INCLUDE_EXCLUDE_BASE_FILTER_SCHEMA,
     INCLUDE_EXCLUDE_FILTER_SCHEMA_INNER,
     convert_include_exclude_filter,
 )
-from homeassistant.helpers.event import async_track_time_interval, track_time_change
+from homeassistant.helpers.event import (
+    async_track_time_interval,
+    track_time_change,
+    track_utc_time_change,
+)
 from homeassistant.helpers.typing import ConfigType
 from homeassistant.loader import bind_hass
 import homeassistant.util.dt as dt_util
-
-from . import migration, purge
-from .const import CONF_DB_INTEGRITY_CHECK, DATA_INSTANCE, DOMAIN, SQLITE_URL_PREFIX
-from .models import Base, Events, RecorderRuns, States
-from .pool import RecorderPool
+from homeassistant.util.lru import LRU
+
+from . import migration, purge, repack, statistics
+from .const import (
+    CONF_DB_INTEGRITY_CHECK,
+    DATA_INSTANCE,
+    DOMAIN,
+    MAX_READ_POOL_SIZE,
+    MAX_STREAM_POOL_SIZE,
+    SQLITE_MAX_BIND_VARS,
+    SQLITE_URL_PREFIX,
+)
+from .metrics import RecorderMetrics
+from .models import (
+    EMPTY_JSON_OBJECT,
+    Base,
+    EventData,
+    Events,
+    EventTypes,
+    RecorderRuns,
+    StateAttributes,
+    States,
+    StatisticsShortTerm,
+    state_attributes_json,
+)
+from .pool import QueryTimings, RecorderPool, track_query_timings
+from .spill import SPILL_FILE_NAME, SpillFile
 from .util import (
     dburl_to_path,
     end_incomplete_runs,
     move_away_broken_database,
     session_scope,
     setup_connection_for_dialect,
+    setup_read_connection_for_dialect,
     validate_or_move_away_sqlite_database,
 )
 
@@ -65,6 +95,12 @@ ATTR_APPLY_FILTER = "apply_filter"
 
 MAX_QUEUE_BACKLOG = 30000
 
+# The number of spilled events written to the spill file at once
+SPILL_FLUSH_EVENTS = 1000
+
+# The number of replayed spilled events written in one commit
+SPILL_REPLAY_COMMIT_EVENTS = 1000
+
 SERVICE_PURGE_SCHEMA = vol.Schema(
     {
         vol.Optional(ATTR_KEEP_DAYS): cv.positive_int,
@@ -83,9 +119,11 @@ DEFAULT_DB_RETRY_WAIT = 3
 DEFAULT_COMMIT_INTERVAL = 1
 KEEPALIVE_TIME = 30
 
-# Controls how often we clean up
-# States and Events objects
-EXPIRE_AFTER_COMMITS = 120
+# The number of shared attributes, event data and event type ids
+# kept in memory to avoid looking them up in the database
+STATE_ATTRIBUTES_ID_CACHE_SIZE = 2048
+EVENT_DATA_ID_CACHE_SIZE = 2048
+EVENT_TYPE_ID_CACHE_SIZE = 2048
 
 CONF_AUTO_PURGE = "auto_purge"
 CONF_DB_URL = "db_url"
@@ -95,6 +133,7 @@ CONF_PURGE_KEEP_DAYS = "purge_keep_days"
 CONF_PURGE_INTERVAL = "purge_interval"
 CONF_EVENT_TYPES = "event_types"
 CONF_COMMIT_INTERVAL = "commit_interval"
+CONF_METRICS_SENSORS = "metrics_sensors"
 
 INVALIDATED_ERR = "Database connection invalidated"
 CONNECTIVITY_ERR = "Error in database connectivity during commit"
@@ -132,6 +171,7 @@ CONFIG_SCHEMA = vol.Schema(
                     vol.Optional(
                         CONF_DB_INTEGRITY_CHECK, default=DEFAULT_DB_INTEGRITY_CHECK
                     ): cv.boolean,
+                    vol.Optional(CONF_METRICS_SENSORS, default=False): cv.boolean,
                 }
             ),
         )
@@ -161,7 +201,7 @@ def run_information(hass, point_in_time: datetime | None = None):
     if run_info:
         return run_info
 
-    with session_scope(hass=hass) as session:
+    with session_scope(hass=hass, read_only=True) as session:
         return run_information_with_session(session, point_in_time)
 
 
@@ -220,10 +260,24 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     instance.async_initialize()
     instance.start()
     _async_register_services(hass, instance)
+    websocket_api.async_register_command(hass, ws_metrics)
+    if conf[CONF_METRICS_SENSORS]:
+        hass.async_create_task(
+            discovery.async_load_platform(hass, "sensor", DOMAIN, {}, config)
+        )
 
     return await instance.async_db_ready
 
 
+@websocket_api.websocket_command({vol.Required("type"): "recorder/metrics"})
+@callback
+def ws_metrics(
+    hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict
+) -> None:
+    """Return the performance metrics of the recorder."""
+    connection.send_result(msg["id"], hass.data[DATA_INSTANCE].metrics_as_dict())
+
+
 @callback
 def _async_register_services(hass, instance):
     """Register recorder services."""
@@ -262,10 +316,28 @@ class PurgeTask(NamedTuple):
     apply_filter: bool
 
 
+class StatisticsTask(NamedTuple):
+    """An object to insert into the recorder queue to run a statistics task."""
+
+    start: datetime
+
+
 class WaitTask:
     """An object to insert into the recorder queue to tell it set the _queue_watch event."""
 
 
+class CommitTask(NamedTuple):
+    """An object to insert into the recorder queue to commit the events before it."""
+
+    done: asyncio.Event
+
+
+class SpillReplayTask(NamedTuple):
+    """An object to insert into the recorder queue to record the spilled events."""
+
+    events: list[Event]
+
+
 class Recorder(threading.Thread):
     """A threaded recorder class."""
 
@@ -297,23 +369,44 @@ class Recorder(threading.Thread):
         self.async_recorder_ready = asyncio.Event()
         self._queue_watch = threading.Event()
         self.engine: Any = None
+        self.read_engine: Any = None
+        self.stream_engine: Any = None
+        self.read_query_timings = QueryTimings()
+        self.repack_progress = repack.RepackProgress()
+        self.metrics = RecorderMetrics()
         self.run_info: Any = None
 
         self.entity_filter = entity_filter
         self.exclude_t = exclude_t
 
         self._timechanges_seen = 0
-        self._commits_without_expire = 0
         self._keepalive_count = 0
         self._old_states = {}
-        self._pending_expunge = []
+        self._pending_events = []
+        self._pending_recorded_events: list[Event] = []
+        self._pending_states = []
+        self._entity_shared_attrs = {}
+        self._state_attributes_ids = LRU(STATE_ATTRIBUTES_ID_CACHE_SIZE)
+        self._pending_state_attributes = {}
+        self._event_data_ids = LRU(EVENT_DATA_ID_CACHE_SIZE)
+        self._pending_event_data = {}
+        self._event_type_ids = LRU(EVENT_TYPE_ID_CACHE_SIZE)
+        self._pending_event_types = {}
+        self._last_compiled_statistics = None
         self.event_session = None
         self.get_session = None
+        self.get_read_session = None
+        self.get_stream_session = None
         self._completed_database_setup = None
         self._event_listener = None
         self.async_migration_event = asyncio.Event()
         self.migration_in_progress = False
         self._queue_watcher = None
+        self._spill_file = SpillFile(hass.config.path(SPILL_FILE_NAME))
+        self._spilled_events: list[Event] | None = None
+        self._spill_flushing = False
+        self._spill_flush_task: asyncio.Task | None = None
+        self._replay_spill_after_commit = False
 
         self.enabled = True
 
@@ -321,6 +414,18 @@ class Recorder(threading.Thread):
         """Enable or disable recording events and states."""
         self.enabled = enable
 
+    def metrics_as_dict(self) -> dict[str, Any]:
+        """Return the performance metrics of the recorder."""
+        return {
+            "queue_size": self.queue.qsize(),
+            "spilling": self._spilled_events is not None,
+            "spilled_events": self._spill_file.written,
+            "replayed_events": self._spill_file.replayed,
+            **self.metrics.as_dict(),
+            "read_queries": self.read_query_timings.as_dict(),
+            "repack": self.repack_progress.as_dict(),
+        }
+
     @callback
     def async_initialize(self):
         """Initialize the recorder."""
@@ -333,19 +438,21 @@ class Recorder(threading.Thread):
 
     @callback
     def _async_check_queue(self, *_):
-        """Periodic check of the queue size to ensure we do not exaust memory.
+        """Periodic check of the queue size.
 
-        The queue grows during migraton or if something really goes wrong.
+        The queue grows during migraton or if something really goes wrong,
+        the events beyond MAX_QUEUE_BACKLOG are spilled to disk.
         """
         size = self.queue.qsize()
         _LOGGER.debug("Recorder queue size is: %s", size)
-        if self.queue.qsize() <= MAX_QUEUE_BACKLOG:
+        if self._spilled_events is None:
             return
-        _LOGGER.error(
-            "The recorder queue reached the maximum size of %s; Events are no longer being recorded",
-            MAX_QUEUE_BACKLOG,
+        _LOGGER.warning(
+            "The recorder queue is at %s events; %s events were spilled to %s so far",
+            size,
+            self._spill_file.written + len(self._spilled_events),
+            self._spill_file.path,
         )
-        self._async_stop_queue_watcher_and_event_listener()
 
     @callback
     def _async_stop_queue_watcher_and_event_listener(self):
@@ -415,6 +522,12 @@ class Recorder(threading.Thread):
             """Shut down the Recorder."""
             if not hass_started.done():
                 hass_started.set_result(shutdown_task)
+            # The spilled events are recorded on the next start
+            spilled_events = asyncio.run_coroutine_threadsafe(
+                self._async_stop_spilling(), self.hass.loop
+            ).result()
+            if spilled_events:
+                self._spill_file.write_events(spilled_events)
             self.queue.put(None)
             self.hass.add_job(self._async_stop_queue_watcher_and_event_listener)
             self.join()
@@ -458,6 +571,18 @@ class Recorder(threading.Thread):
         """Trigger the purge."""
         self.queue.put(PurgeTask(self.keep_days, repack=False, apply_filter=False))
 
+    async def async_commit(self):
+        """Wait until the events queued so far are committed."""
+        done = asyncio.Event()
+        self.queue.put(CommitTask(done))
+        await done.wait()
+
+    @callback
+    def async_periodic_statistics(self, now):
+        """Trigger the statistics compilation of the period that just ended."""
+        start = statistics.period_start(now) - StatisticsShortTerm.duration
+        self.queue.put(StatisticsTask(start))
+
     def run(self):
         """Start processing events to save."""
         shutdown_task = object()
@@ -511,6 +636,17 @@ class Recorder(threading.Thread):
             # Purge every night at 4:12am
             track_time_change(self.hass, self.async_purge, hour=4, minute=12, second=0)
 
+        # Compile statistics every 5 minutes, including
+        # the periods that ended while we were not running
+        self._schedule_compile_missing_statistics()
+        track_utc_time_change(
+            self.hass, self.async_periodic_statistics, minute="/5", second=10
+        )
+
+        # Events spilled before the last shutdown are older than the queue
+        if self._spill_file.has_events:
+            self._replay_spilled_events([])
+
         _LOGGER.debug("Recorder processing the queue")
         self.hass.add_job(self._async_recorder_ready)
         self._run_event_loop()
@@ -525,6 +661,8 @@ class Recorder(threading.Thread):
                 self._process_one_event_or_recover(event)
             except Exception as err:  # pylint: disable=broad-except
                 _LOGGER.exception("Error while processing event %s: %s", event, err)
+            if self._spilled_events is not None and self.queue.empty():
+                self.hass.add_job(self._async_replay_spilled_events)
 
         self._shutdown()
 
@@ -602,19 +740,91 @@ class Recorder(threading.Thread):
 
     def _run_purge(self, keep_days, repack, apply_filter):
         """Purge the database."""
+        # Pending states may reference shared attributes
+        # that the purge is about to remove
+        self._commit_event_session_or_retry()
         if purge.purge_old_data(self, keep_days, repack, apply_filter):
             return
         # Schedule a new purge task if this one didn't finish
         self.queue.put(PurgeTask(keep_days, repack, apply_filter))
 
+    def _run_repack(self):
+        """Run one step of the incremental repack."""
+        # Pending events are written before each step
+        self._commit_event_session_or_retry()
+        if repack.repack_database_step(self):
+            return
+        # Queue the next step behind the events that arrived meanwhile
+        self.queue.put(repack.RepackTask())
+
+    def _schedule_compile_missing_statistics(self):
+        """Queue the statistics of the periods missed since they were last compiled.
+
+        Periods older than keep_days are skipped as their states are purged.
+        """
+        last_start = self._last_compiled_statistics
+        if last_start is None:
+            return
+        now = dt_util.utcnow()
+        start = max(
+            last_start + StatisticsShortTerm.duration,
+            statistics.period_start(now - timedelta(days=self.keep_days)),
+        )
+        end = statistics.period_start(now) - StatisticsShortTerm.duration
+        while start <= end:
+            self.queue.put(StatisticsTask(start))
+            start += StatisticsShortTerm.duration
+
+    def _run_statistics(self, start):
+        """Compile the statistics of the period starting at start."""
+        # The states of the period may still be pending
+        self._commit_event_session_or_retry()
+        statistics.compile_statistics(self, start)
+
+    def _replay_spilled_events(self, events):
+        """Record the spilled events ahead of the events queued after them."""
+        replayed = 0
+        try:
+            if self._spill_file.has_events:
+                for replayed, event in enumerate(self._spill_file.replay_events(), 1):
+                    self._process_one_event(event)
+                    if not replayed % SPILL_REPLAY_COMMIT_EVENTS:
+                        self._commit_event_session_or_retry()
+        except (OSError, ValueError):
+            _LOGGER.exception("Error replaying the spilled events")
+
+        for event in events:
+            self._process_one_event(event)
+        self._commit_event_session_or_retry()
+        _LOGGER.info("Recorded %s spilled events", replayed + len(events))
+
     def _process_one_event(self, event):
         """Process one event."""
         if isinstance(event, PurgeTask):
             self._run_purge(event.keep_days, event.repack, event.apply_filter)
             return
+        if isinstance(event, StatisticsTask):
+            self._run_statistics(event.start)
+            return
+        if isinstance(event, repack.RepackTask):
+            self._run_repack()
+            return
         if isinstance(event, WaitTask):
+            if self._spilled_events is not None:
+                # Wait behind the spilled events not queued yet
+                self.hass.add_job(self._async_replay_spilled_events, event)
+                return
             self._queue_watch.set()
             return
+        if isinstance(event, SpillReplayTask):
+            self._replay_spilled_events(event.events)
+            return
+        if isinstance(event, CommitTask):
+            try:
+                self._commit_event_session_or_retry()
+            finally:
+                self.hass.loop.call_soon_threadsafe(event.done.set)
+            return
         if event.event_type == EVENT_TIME_CHANGED:
             self._keepalive_count += 1
             if self._keepalive_count >= KEEPALIVE_TIME:
@@ -630,40 +840,33 @@ class Recorder(threading.Thread):
         if not self.enabled:
             return
 
-        try:
-            if event.event_type == EVENT_STATE_CHANGED:
-                dbevent = Events.from_event(event, event_data="{}")
-            else:
-                dbevent = Events.from_event(event)
-            dbevent.created = event.time_fired
-            self.event_session.add(dbevent)
-        except (TypeError, ValueError):
-            _LOGGER.warning("Event is not JSON serializable: %s", event)
-            return
-
+        # Rows are collected as plain dicts and bulk inserted
+        # when the session is committed.
+        serialize_start = time.perf_counter()
+        dbevent = Events.row_from_event(event)
         if event.event_type == EVENT_STATE_CHANGED:
+            # The data of state_changed events is stored with the state
+            shared_data = EMPTY_JSON_OBJECT
+        else:
             try:
-                dbstate = States.from_event(event)
-                has_new_state = event.data.get("new_state")
-                if dbstate.entity_id in self._old_states:
-                    old_state = self._old_states.pop(dbstate.entity_id)
-                    if old_state.state_id:
-                        dbstate.old_state_id = old_state.state_id
-                    else:
-                        dbstate.old_state = old_state
-                if not has_new_state:
-                    dbstate.state = None
-                dbstate.event = dbevent
-                dbstate.created = event.time_fired
-                self.event_session.add(dbstate)
-                if has_new_state:
-                    self._old_states[dbstate.entity_id] = dbstate
-                    self._pending_expunge.append(dbstate)
+                shared_data = EventData.shared_data_from_event(event)
             except (TypeError, ValueError):
-                _LOGGER.warning(
-                    "State is not JSON serializable: %s",
-                    event.data.get("new_state"),
-                )
+                _LOGGER.warning("Event is not JSON serializable: %s", event)
+                return
+
+        dbevent["created"] = event.time_fired
+        dbevent["event_type_id"], pending_event_type = self._event_type_id_or_pending(
+            event.event_type
+        )
+        dbevent["data_id"], pending_event_data = self._event_data_id_or_pending(
+            shared_data
+        )
+        self._pending_events.append((dbevent, pending_event_type, pending_event_data))
+        self._pending_recorded_events.append(event)
+
+        if event.event_type == EVENT_STATE_CHANGED:
+            self._process_state_changed_event(event, dbevent)
+        self.metrics.serialize_duration.observe(time.perf_counter() - serialize_start)
 
         # If they do not have a commit interval
         # than we commit right away
@@ -682,12 +885,22 @@ class Recorder(threading.Thread):
 
     def _commit_event_session_or_retry(self):
         """Commit the event session if there is work to do."""
-        if not self.event_session.new and not self.event_session.dirty:
+        if (
+            not self._pending_events
+            and not self.event_session.new
+            and not self.event_session.dirty
+        ):
             return
+        events = len(self._pending_events)
         tries = 1
         while tries <= self.db_max_retries:
+            commit_start = time.perf_counter()
             try:
                 self._commit_event_session()
+                self.metrics.record_commit(events, time.perf_counter() - commit_start)
+                if self._replay_spill_after_commit:
+                    self._replay_spill_after_commit = False
+                    self.queue.put(SpillReplayTask([]))
                 return
             except (exc.InternalError, exc.OperationalError) as err:
                 _LOGGER.error(
@@ -697,30 +910,290 @@ class Recorder(threading.Thread):
                     self.db_retry_wait,
                 )
                 if tries == self.db_max_retries:
+                    self._spill_pending_events()
                     raise
 
+                self.metrics.commit_retries += 1
+                # The pending rows are kept until the commit succeeds
+                # so they are written again on the next try.
+                self.event_session.rollback()
                 tries += 1
                 time.sleep(self.db_retry_wait)
 
+    def _process_state_changed_event(self, event, dbevent):
+        """Add the states row of a state_changed event to the pending rows."""
+        dbstate = States.row_from_event(event)
+        entity_id = dbstate["entity_id"]
+        new_state = event.data.get("new_state")
+        pending_attributes = None
+
+        if new_state:
+            try:
+                shared_attrs = self._shared_attrs_from_state(entity_id, new_state)
+            except (TypeError, ValueError):
+                _LOGGER.warning("State is not JSON serializable: %s", new_state)
+                return
+            attributes_id = self._state_attributes_ids.get(shared_attrs)
+            if attributes_id is None:
+                pending_attributes = self._pending_state_attributes.get(shared_attrs)
+                if pending_attributes is None:
+                    pending_attributes = self._pending_state_attributes[
+                        shared_attrs
+                    ] = {
+                        "attributes_id": None,
+                        "hash": StateAttributes.hash_shared_attrs(shared_attrs),
+                        "shared_attrs": shared_attrs,
+                    }
+            dbstate["attributes_id"] = attributes_id
+        else:
+            dbstate["state"] = None
+            dbstate["attributes_id"] = None
+            self._entity_shared_attrs.pop(entity_id, None)
+
+        dbstate["created"] = event.time_fired
+        self._pending_states.append(
+            (
+                dbstate,
+                dbevent,
+                self._old_states.pop(entity_id, None),
+                pending_attributes,
+            )
+        )
+        if new_state:
+            self._old_states[entity_id] = dbstate
+
+    def _event_type_id_or_pending(self, event_type):
+        """Return the id of an event type or the pending event_types row."""
+        event_type_id = self._event_type_ids.get(event_type)
+        if event_type_id is not None:
+            return event_type_id, None
+        pending_event_type = self._pending_event_types.get(event_type)
+        if pending_event_type is None:
+            pending_event_type = self._pending_event_types[event_type] = {
+                "event_type_id": None,
+                "event_type": event_type,
+            }
+        return None, pending_event_type
+
+    def _event_data_id_or_pending(self, shared_data):
+        """Return the id of the event data or the pending event_data row.
+
+        Events without data do not get an event_data row.
+        """
+        if shared_data == EMPTY_JSON_OBJECT:
+            return None, None
+        data_id = self._event_data_ids.get(shared_data)
+        if data_id is not None:
+            return data_id, None
+        pending_event_data = self._pending_event_data.get(shared_data)
+        if pending_event_data is None:
+            pending_event_data = self._pending_event_data[shared_data] = {
+                "data_id": None,
+                "hash": EventData.hash_shared_data(shared_data),
+                "shared_data": shared_data,
+            }
+        return None, pending_event_data
+
+    def _shared_attrs_from_state(self, entity_id, state):
+        """Return the serialized attributes of a state.
+
+        Most entities keep the same attributes between updates so the
+        last serialized attributes of each entity are reused when they
+        have not changed.
+        """
+        attributes = state.attributes
+        cached = self._entity_shared_attrs.get(entity_id)
+        if cached is not None and (cached[0] is attributes or cached[0] == attributes):
+            return cached[1]
+        shared_attrs = state_attributes_json(state)
+        self._entity_shared_attrs[entity_id] = (attributes, shared_attrs)
+        return shared_attrs
+
     def _commit_event_session(self):
-        self._commits_without_expire += 1
-
-        if self._pending_expunge:
-            self.event_session.flush()
-            for dbstate in self._pending_expunge:
-                # Expunge the state so its not expired
-                # until we use it later for dbstate.old_state
-                if dbstate in self.event_session:
-                    self.event_session.expunge(dbstate)
-            self._pending_expunge = []
+        if self._pending_events:
+            self._insert_pending_rows()
         self.event_session.commit()
+        for shared_attrs, row in self._pending_state_attributes.items():
+            self._state_attributes_ids[shared_attrs] = row["attributes_id"]
+        for shared_data, row in self._pending_event_data.items():
+            self._event_data_ids[shared_data] = row["data_id"]
+        for event_type, row in self._pending_event_types.items():
+            self._event_type_ids[event_type] = row["event_type_id"]
+        self._clear_pending_rows()
+
+    def _spill_pending_events(self):
+        """Spill the events of the pending rows a commit failed to write.
+
+        They are replayed after the next commit that succeeds.
+        """
+        if not self._pending_recorded_events:
+            return
+        try:
+            self._spill_file.write_events(self._pending_recorded_events)
+        except OSError as err:
+            _LOGGER.error(
+                "Error spilling %s events: %s", len(self._pending_recorded_events), err
+            )
+            return
+        _LOGGER.warning(
+            "Spilled %s events that could not be committed to %s",
+            len(self._pending_recorded_events),
+            self._spill_file.path,
+        )
+        self._replay_spill_after_commit = True
+
+    def _clear_pending_rows(self):
+        """Forget the rows waiting to be inserted."""
+        self._pending_events = []
+        self._pending_recorded_events = []
+        self._pending_states = []
+        self._pending_state_attributes = {}
+        self._pending_event_data = {}
+        self._pending_event_types = {}
+
+    def _insert_pending_rows(self):
+        """Insert the pending events and states in the order they were recorded.
+
+        The database assigns the primary keys. Only the keys of rows
+        that other rows reference are read back, the other rows are
+        written with one executemany per run of consecutive rows.
+        """
+        if self._pending_state_attributes:
+            self._insert_pending_shared_rows(
+                StateAttributes,
+                "attributes_id",
+                "shared_attrs",
+                self._pending_state_attributes,
+            )
+        if self._pending_event_data:
+            self._insert_pending_shared_rows(
+                EventData, "data_id", "shared_data", self._pending_event_data
+            )
+        if self._pending_event_types:
+            self._insert_pending_event_types()
+
+        for dbevent, event_type, event_data in self._pending_events:
+            # Keys given out by a failed commit were rolled back
+            dbevent.pop("event_id", None)
+            if event_type is not None:
+                dbevent["event_type_id"] = event_type["event_type_id"]
+            if event_data is not None:
+                dbevent["data_id"] = event_data["data_id"]
+        state_events = {id(pending[1]) for pending in self._pending_states}
+        self._insert_rows(
+            Events, [pending[0] for pending in self._pending_events], state_events
+        )
+
+        if self._pending_states:
+            self._insert_pending_states()
+
+    def _insert_pending_states(self):
+        """Insert the pending states linked to their event and previous state.
+
+        A state of an entity that changed again before the commit must
+        be inserted before the next state can reference it.
+        """
+        # The states kept in _old_states are referenced by the next commit
+        referenced = {id(dbstate) for dbstate in self._old_states.values()}
+        for _, _, old_state, _ in self._pending_states:
+            if old_state is not None:
+                referenced.add(id(old_state))
+
+        run = []
+        run_states = set()
+        for dbstate, dbevent, old_state, attributes in self._pending_states:
+            if old_state is not None and id(old_state) in run_states:
+                self._insert_states(run, referenced)
+                run = []
+                run_states = set()
+            dbstate.pop("state_id", None)
+            dbstate["event_id"] = dbevent["event_id"]
+            if attributes is not None:
+                dbstate["attributes_id"] = attributes["attributes_id"]
+            run.append((dbstate, old_state))
+            run_states.add(id(dbstate))
+        self._insert_states(run, referenced)
+
+    def _insert_states(self, states, referenced):
+        """Insert states whose previous states have their keys."""
+        for dbstate, old_state in states:
+            dbstate["old_state_id"] = old_state and old_state["state_id"]
+        self._insert_rows(States, [state[0] for state in states], referenced)
+
+    def _insert_rows(self, model, rows, fetch_keys):
+        """Insert rows in order and read back the keys of the rows in fetch_keys.
+
+        The keys are read with a round trip per row or with RETURNING
+        where the database driver supports it.
+        """
+        for fetch, run in groupby(rows, lambda row: id(row) in fetch_keys):
+            self.event_session.bulk_insert_mappings(
+                model, list(run), return_defaults=fetch
+            )
+
+    def _insert_pending_shared_rows(self, model, id_key, shared_key, pending):
+        """Find or insert the shared attributes or event data of the pending rows.
+
+        Existing rows are looked up by hash and matched on the
+        serialized content so a hash collision never shares a row.
+        """
+        # Ids given out by a failed commit were rolled back
+        for row in pending.values():
+            row[id_key] = None
+        id_column = getattr(model, id_key)
+        shared_column = getattr(model, shared_key)
+        hashes = list({row["hash"] for row in pending.values()})
+        for idx in range(0, len(hashes), SQLITE_MAX_BIND_VARS):
+            for row_id, shared in self.event_session.execute(
+                select([id_column, shared_column]).where(
+                    model.hash.in_(hashes[idx : idx + SQLITE_MAX_BIND_VARS])
+                )
+            ):
+                if shared in pending:
+                    pending[shared][id_key] = row_id
+        self._insert_new_shared_rows(model, id_key, pending)
+
+    def _insert_pending_event_types(self):
+        """Find or insert the event types of the pending events."""
+        pending = self._pending_event_types
+        # Ids given out by a failed commit were rolled back
+        for row in pending.values():
+            row["event_type_id"] = None
+        event_types = list(pending)
+        for idx in range(0, len(event_types), SQLITE_MAX_BIND_VARS):
+            for event_type_id, event_type in self.event_session.execute(
+                select([EventTypes.event_type_id, EventTypes.event_type]).where(
+                    EventTypes.event_type.in_(
+                        event_types[idx : idx + SQLITE_MAX_BIND_VARS]
+                    )
+                )
+            ):
+                pending[event_type]["event_type_id"] = event_type_id
+        self._insert_new_shared_rows(EventTypes, "event_type_id", pending)
+
+    def _insert_new_shared_rows(self, model, id_key, pending):
+        """Insert the pending rows that were not found in the database."""
+        new_rows = []
+        for row in pending.values():
+            if row[id_key] is None:
+                del row[id_key]
+                new_rows.append(row)
+        if new_rows:
+            self.event_session.bulk_insert_mappings(
+                model, new_rows, return_defaults=True
+            )
 
-        # Expire is an expensive operation (frequently more expensive
-        # than the flush and commit itself) so we only
-        # do it after EXPIRE_AFTER_COMMITS commits
-        if self._commits_without_expire == EXPIRE_AFTER_COMMITS:
-            self._commits_without_expire = 0
-            self.event_session.expire_all()
+    def evict_purged_state_attributes(self, attributes_ids):
+        """Forget the shared attributes ids removed by a purge."""
+        for shared_attrs, attributes_id in self._state_attributes_ids.items():
+            if attributes_id in attributes_ids:
+                self._state_attributes_ids.pop(shared_attrs)
+
+    def evict_purged_event_data(self, data_ids):
+        """Forget the event data ids removed by a purge."""
+        for shared_data, data_id in self._event_data_ids.items():
+            if data_id in data_ids:
+                self._event_data_ids.pop(shared_data)
 
     def _handle_sqlite_corruption(self):
         """Handle the sqlite3 database being corrupt."""
@@ -733,6 +1206,7 @@ class Recorder(threading.Thread):
     def _close_event_session(self):
         """Close the event session."""
         self._old_states = {}
+        self._clear_pending_rows()
 
         if not self.event_session:
             return
@@ -762,8 +1236,82 @@ class Recorder(threading.Thread):
 
     @callback
     def event_listener(self, event):
-        """Listen for new events and put them in the process queue."""
-        self.queue.put(event)
+        """Listen for new events and put them in the process queue.
+
+        Once the queue is full the events are spilled until
+        the recorder has caught up with the queue.
+
+        While spilling, time changed events are dropped. The recorder
+        never stores them, they only pace the keep alive and the commit
+        interval, and the replay commits on its own. Events that cannot
+        be serialized are dropped with a warning like the recorder does,
+        and the events of a spill file write that fails are logged and
+        dropped.
+        """
+        if self._spilled_events is None:
+            if self.queue.qsize() <= MAX_QUEUE_BACKLOG:
+                self.queue.put(event)
+                return
+            _LOGGER.warning(
+                "The recorder queue reached the maximum size of %s; Events are spilled to %s until the recorder catches up",
+                MAX_QUEUE_BACKLOG,
+                self._spill_file.path,
+            )
+            self._spilled_events = []
+
+        # Time changed events are not recorded, see above
+        if event.event_type != EVENT_TIME_CHANGED:
+            self._spilled_events.append(event)
+
+        if self._spill_flushing:
+            return
+        if not self.queue.qsize():
+            self._async_replay_spilled_events()
+        elif len(self._spilled_events) >= SPILL_FLUSH_EVENTS:
+            self._spill_flushing = True
+            self._spill_flush_task = self.hass.async_create_task(
+                self._async_flush_spilled_events(self._spilled_events)
+            )
+            self._spilled_events = []
+
+    @callback
+    def _async_replay_spilled_events(self, wait_task=None):
+        """Queue the spilled events once the recorder caught up.
+
+        A wait_task is queued again behind the spilled events.
+        """
+        if not (
+            self._spilled_events is None or self._spill_flushing or self.queue.qsize()
+        ):
+            _LOGGER.warning(
+                "The recorder caught up with its queue; Events are no longer "
+                "spilled and the %s spilled events are recorded",
+                self._spill_file.written
+                - self._spill_file.replayed
+                + len(self._spilled_events),
+            )
+            self.queue.put(SpillReplayTask(self._spilled_events))
+            self._spilled_events = None
+        if wait_task is not None:
+            self.queue.put(wait_task)
+
+    async def _async_stop_spilling(self):
+        """Wait for the spilled events being written and return the others."""
+        if self._spill_flush_task is not None:
+            await self._spill_flush_task
+        spilled_events, self._spilled_events = self._spilled_events, None
+        return spilled_events
+
+    async def _async_flush_spilled_events(self, events):
+        """Write the spilled events to the spill file."""
+        try:
+            await self.hass.async_add_executor_job(
+                self._spill_file.write_events, events
+            )
+        except OSError as err:
+            _LOGGER.error("Error spilling %s events: %s", len(events), err)
+        finally:
+            self._spill_flushing = False
 
     def block_till_done(self):
         """Block till all events processed.
@@ -812,8 +1360,53 @@ class Recorder(threading.Thread):
 
         Base.metadata.create_all(self.engine)
         self.get_session = scoped_session(sessionmaker(bind=self.engine))
+        self._setup_read_connection()
         _LOGGER.debug("Connected to recorder database")
 
+    def _setup_read_connection(self):
+        """Create the bounded pools used for queries outside the recorder thread.
+
+        Streamed responses get a pool of their own so clients reading
+        them slowly cannot starve the other queries. An in memory sqlite
+        database only exists on the connection of the recorder engine,
+        so reads share that engine.
+        """
+        engine = stream_engine = self.engine
+        if self.db_url != SQLITE_URL_PREFIX and ":memory:" not in self.db_url:
+            engine = self.read_engine = self._create_read_engine(
+                min(MAX_READ_POOL_SIZE, os.cpu_count() or 1)
+            )
+            stream_engine = self.stream_engine = self._create_read_engine(
+                MAX_STREAM_POOL_SIZE
+            )
+
+        track_query_timings(engine, self.read_query_timings, self.ident)
+        if stream_engine is not engine:
+            track_query_timings(stream_engine, self.read_query_timings, self.ident)
+        self.get_read_session = scoped_session(sessionmaker(bind=engine))
+        # Streams are generated in several executor jobs, possibly on
+        # different threads, so their sessions are not thread scoped
+        self.get_stream_session = sessionmaker(bind=stream_engine)
+
+    def _create_read_engine(self, pool_size):
+        """Create an engine with a bounded pool of read connections."""
+        kwargs = {
+            "poolclass": QueuePool,
+            "pool_size": pool_size,
+            "max_overflow": 0,
+        }
+        if self._using_file_sqlite:
+            kwargs["connect_args"] = {"check_same_thread": False}
+        engine = create_engine(self.db_url, **kwargs)
+        dialect_name = engine.dialect.name
+
+        def setup_read_connection(dbapi_connection, connection_record):
+            """Dbapi specific read connection settings."""
+            setup_read_connection_for_dialect(dialect_name, dbapi_connection)
+
+        sqlalchemy_event.listen(engine, "connect", setup_read_connection)
+        return engine
+
     @property
     def _using_file_sqlite(self):
         """Short version to check if we are using sqlite3 as a file."""
@@ -823,9 +1416,20 @@ class Recorder(threading.Thread):
 
     def _close_connection(self):
         """Close the connection."""
+        self._state_attributes_ids.clear()
+        self._event_data_ids.clear()
+        self._event_type_ids.clear()
+        if self.read_engine:
+            self.read_engine.dispose()
+        if self.stream_engine:
+            self.stream_engine.dispose()
         self.engine.dispose()
         self.engine = None
+        self.read_engine = None
+        self.stream_engine = None
         self.get_session = None
+        self.get_read_session = None
+        self.get_stream_session = None
 
     def _setup_run(self):
         """Log the start of the current run."""
@@ -836,6 +1440,7 @@ class Recorder(threading.Thread):
             session.add(self.run_info)
             session.flush()
             session.expunge(self.run_info)
+            self._last_compiled_statistics = statistics.last_compiled_period(session)
 
         self._open_event_session()
 
@@ -6,5 +6,27 @@ DOMAIN = "recorder"
 
 CONF_DB_INTEGRITY_CHECK = "db_integrity_check"
 
+# Dispatched with the timestamp the events were purged before
+SIGNAL_RECORDER_EVENTS_PURGED = "recorder_events_purged"
+
+# The maximum number of pooled connections used to run history,
+# logbook and statistics queries alongside the recorder thread
+MAX_READ_POOL_SIZE = 8
+
+# The maximum number of pooled connections used by streamed history and
+# logbook responses, which slow clients may hold for a long time
+MAX_STREAM_POOL_SIZE = 2
+
 # The maximum number of rows (events) we purge in one delete statement
 MAX_ROWS_TO_PURGE = 1000
+
+# The maximum number of the oldest rows we purge by id range in one
+# delete statement, a range needs no bind parameter per row
+MAX_ROWS_TO_PURGE_BY_RANGE = 10000
+
+# The maximum number of bind parameters in a statement
+# supported by older versions of SQLite
+SQLITE_MAX_BIND_VARS = 999
+
+# The value of PRAGMA auto_vacuum for INCREMENTAL
+SQLITE_AUTO_VACUUM_INCREMENTAL = 2
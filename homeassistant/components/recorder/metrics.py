@@ -0,0 +1,116 @@
+"""Performance metrics of the recorder thread."""
+from __future__ import annotations
+
+from collections import Counter, deque
+from collections.abc import Sequence
+import time
+from typing import Any
+
+# The upper bounds of the histogram buckets
+DURATION_BUCKETS = (0.0001, 0.001, 0.01, 0.1, 1.0, 10.0)
+EVENTS_PER_COMMIT_BUCKETS = (1, 10, 100, 1000, 10000)
+
+# The window the event rate is averaged over in seconds
+EVENT_RATE_WINDOW = 60
+
+
+class Histogram:
+    """Count observations in buckets with their total and maximum."""
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        """Initialize the histogram."""
+        self._bounds = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        """Add an observation."""
+        for idx, bound in enumerate(self._bounds):
+            if value <= bound:
+                break
+        else:
+            idx = len(self._bounds)
+        self._counts[idx] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        """Return the mean of the observations."""
+        return self.total / self.count if self.count else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the histogram as a dictionary.
+
+        The buckets count the observations up to and including their bound.
+        """
+        buckets = {}
+        cumulative = 0
+        for bound, count in zip([*self._bounds, "+Inf"], self._counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.mean,
+            "max": self.max,
+            "buckets": buckets,
+        }
+
+
+class RecorderMetrics:
+    """Counters and histograms maintained by the recorder thread.
+
+    Only the recorder thread updates them, readers get a
+    consistent enough snapshot without locking.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the metrics."""
+        self.commits = 0
+        self.committed_events = 0
+        self.commit_retries = 0
+        self.purged_rows: Counter[str] = Counter()
+        self.events_per_commit = Histogram(EVENTS_PER_COMMIT_BUCKETS)
+        self.commit_duration = Histogram(DURATION_BUCKETS)
+        self.serialize_duration = Histogram(DURATION_BUCKETS)
+        self._recent_commits: deque[tuple[float, int]] = deque()
+
+    def record_commit(self, events: int, duration: float) -> None:
+        """Record a commit of events that took duration seconds."""
+        self.commits += 1
+        self.committed_events += events
+        self.events_per_commit.observe(events)
+        self.commit_duration.observe(duration)
+        now = time.monotonic()
+        self._recent_commits.append((now, events))
+        while self._recent_commits[0][0] < now - EVENT_RATE_WINDOW:
+            self._recent_commits.popleft()
+
+    @property
+    def events_per_second(self) -> float:
+        """Return the committed events per second over the rate window."""
+        window_start = time.monotonic() - EVENT_RATE_WINDOW
+        # Copied first as the recorder thread appends concurrently
+        recent_commits = list(self._recent_commits)
+        return (
+            sum(events for when, events in recent_commits if when >= window_start)
+            / EVENT_RATE_WINDOW
+        )
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the metrics as a dictionary."""
+        return {
+            "commits": self.commits,
+            "committed_events": self.committed_events,
+            "commit_retries": self.commit_retries,
+            "events_per_second": self.events_per_second,
+            "purged_rows": dict(self.purged_rows),
+            "events_per_commit": self.events_per_commit.as_dict(),
+            "commit_duration": self.commit_duration.as_dict(),
+            "serialize_duration": self.serialize_duration.as_dict(),
+        }
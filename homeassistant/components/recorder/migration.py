@@ -2,7 +2,7 @@
 import logging
 
 import sqlalchemy
-from sqlalchemy import ForeignKeyConstraint, MetaData, Table, text
+from sqlalchemy import ForeignKeyConstraint, MetaData, Table, func, select, text
 from sqlalchemy.exc import (
     InternalError,
     OperationalError,
@@ -11,11 +11,28 @@ from sqlalchemy.exc import (
 )
 from sqlalchemy.schema import AddConstraint, DropConstraint
 
-from .models import SCHEMA_VERSION, TABLE_STATES, Base, SchemaChanges
+from .const import SQLITE_AUTO_VACUUM_INCREMENTAL, SQLITE_MAX_BIND_VARS
+from .models import (
+    EMPTY_JSON_OBJECT,
+    SCHEMA_VERSION,
+    TABLE_STATES,
+    Base,
+    EventData,
+    Events,
+    EventTypes,
+    SchemaChanges,
+    StateAttributes,
+    States,
+    process_datetime_to_timestamp,
+)
 from .util import session_scope
 
 _LOGGER = logging.getLogger(__name__)
 
+# The number of rows moved to the state_attributes or event_data
+# table or given timestamps in one transaction during migration
+MIGRATE_BATCH_SIZE = 10000
+
 
 def raise_if_exception_missing_str(ex, match_substrs):
     """Raise an exception if the exception and cause do not contain the match substrs."""
@@ -312,7 +329,7 @@ def _update_states_table_with_foreign_key_options(connection, engine):
             )
 
 
-def _apply_update(engine, session, new_version, old_version):
+def _apply_update(engine, session, new_version, old_version):  # noqa: C901
     """Perform operations to bring schema up to date."""
     connection = session.connection()
     if new_version == 1:
@@ -415,25 +432,334 @@ def _apply_update(engine, session, new_version, old_version):
             )
     elif new_version == 14:
         _modify_columns(connection, engine, "events", ["event_type VARCHAR(64)"])
+    elif new_version == 15:
+        # The state_attributes table is created by create_all
+        _add_columns(connection, "states", ["attributes_id INTEGER"])
+        _create_index(connection, "states", "ix_states_attributes_id")
+        _migrate_attributes_to_state_attributes(session)
+    elif new_version == 16:
+        # The event_data and event_types tables are created by create_all
+        _add_columns(connection, "events", ["data_id INTEGER", "event_type_id INTEGER"])
+        _create_index(connection, "events", "ix_events_data_id")
+        _create_index(connection, "events", "ix_events_event_type_id_time_fired")
+        _migrate_event_types_to_event_types(session)
+        _drop_index(connection, "events", "ix_events_event_type_time_fired")
+        _migrate_event_data_to_event_data(session)
+    elif new_version == 17:
+        # The statistics tables are created by create_all
+        pass
+    elif new_version == 18:
+        _add_columns(connection, "events", ["time_fired_ts DOUBLE PRECISION"])
+        _add_columns(
+            connection,
+            "states",
+            ["last_changed_ts DOUBLE PRECISION", "last_updated_ts DOUBLE PRECISION"],
+        )
+        _migrate_datetimes_to_timestamps(session)
+        # Range queries now use the timestamps
+        _create_index(connection, "events", "ix_events_time_fired_ts")
+        _create_index(connection, "events", "ix_events_event_type_id_time_fired_ts")
+        _create_index(connection, "states", "ix_states_last_updated_ts")
+        _create_index(connection, "states", "ix_states_entity_id_last_updated_ts")
+        _drop_index(connection, "events", "ix_events_time_fired")
+        _drop_index(connection, "events", "ix_events_event_type_id_time_fired")
+        _drop_index(connection, "states", "ix_states_last_updated")
+        _drop_index(connection, "states", "ix_states_entity_id_last_updated")
+    elif new_version == 19:
+        _create_index(connection, "events", "ix_events_time_fired_ts_event_type_id")
+        _drop_index(connection, "events", "ix_events_time_fired_ts")
+    elif new_version == 20:
+        if engine.dialect.name == "sqlite":
+            _enable_sqlite_incremental_vacuum(session)
     else:
         raise ValueError(f"No schema migration defined for version {new_version}")
 
 
+def _enable_sqlite_incremental_vacuum(session):
+    """Enable incremental vacuum so the repack never vacuums the whole database.
+
+    Changing auto_vacuum of an existing database only takes effect
+    after a full vacuum.
+    """
+    connection = session.connection()
+    if (
+        connection.execute(text("PRAGMA auto_vacuum")).scalar()
+        == SQLITE_AUTO_VACUUM_INCREMENTAL
+    ):
+        return
+    _LOGGER.warning(
+        "Vacuuming the database to enable incremental vacuum. Note: this can "
+        "take several minutes on large databases and slow computers. Please "
+        "be patient!"
+    )
+    # VACUUM cannot run inside a transaction
+    session.commit()
+    connection = session.connection()
+    connection.execute(text("PRAGMA auto_vacuum=INCREMENTAL"))
+    connection.execute(text("VACUUM"))
+
+
+def _migrate_attributes_to_state_attributes(session):
+    """Move the attributes stored in each states row to the state_attributes table."""
+    _LOGGER.warning(
+        "Moving state attributes to the state_attributes table. Note: this can "
+        "take several minutes on large databases and slow computers. Please "
+        "be patient!"
+    )
+    _move_to_shared_table(
+        session,
+        States.state_id,
+        States.attributes,
+        "attributes_id",
+        StateAttributes.attributes_id,
+        StateAttributes.shared_attrs,
+        StateAttributes.hash_shared_attrs,
+    )
+
+
+def _migrate_event_types_to_event_types(session):
+    """Move the event type stored in each events row to the event_types table.
+
+    Events are updated in batches of event ids that are committed
+    separately so an interrupted migration continues where it stopped.
+    """
+    event_type_ids = {
+        event_type: event_type_id
+        for event_type_id, event_type in session.execute(
+            select([EventTypes.event_type_id, EventTypes.event_type])
+        )
+    }
+    next_id = max(event_type_ids.values(), default=0)
+    for batch in _batches_by_row_id(session, Events.event_id, Events.event_type):
+        rows = [(row, event_type) for row, event_type in batch if event_type]
+        if not rows:
+            continue
+
+        new_rows = []
+        for _, event_type in rows:
+            if event_type in event_type_ids:
+                continue
+            next_id += 1
+            event_type_ids[event_type] = next_id
+            new_rows.append({"event_type_id": next_id, "event_type": event_type})
+        if new_rows:
+            session.execute(EventTypes.__table__.insert(), new_rows)
+
+        session.execute(
+            Events.__table__.update()
+            .where(Events.event_id == sqlalchemy.bindparam("b_event_id"))
+            .values(
+                event_type_id=sqlalchemy.bindparam("b_event_type_id"), event_type=None
+            ),
+            [
+                {"b_event_id": row, "b_event_type_id": event_type_ids[event_type]}
+                for row, event_type in rows
+            ],
+        )
+        session.commit()
+        _LOGGER.debug("Moved the event types of %s events", len(rows))
+
+
+def _migrate_event_data_to_event_data(session):
+    """Move the data stored in each events row to the event_data table."""
+    _LOGGER.warning(
+        "Moving event data to the event_data table. Note: this can "
+        "take several minutes on large databases and slow computers. Please "
+        "be patient!"
+    )
+    # Events without data do not get an event_data row
+    _move_to_shared_table(
+        session,
+        Events.event_id,
+        Events.event_data,
+        "data_id",
+        EventData.data_id,
+        EventData.shared_data,
+        EventData.hash_shared_data,
+        EMPTY_JSON_OBJECT,
+    )
+
+
+def _migrate_datetimes_to_timestamps(session):
+    """Fill the timestamp columns of the events and states from their datetimes."""
+    _LOGGER.warning(
+        "Adding timestamps to the events and states tables. Note: this can "
+        "take several minutes on large databases and slow computers. Please "
+        "be patient!"
+    )
+    _fill_timestamps(session, Events.event_id, {"time_fired_ts": Events.time_fired})
+    _fill_timestamps(
+        session,
+        States.state_id,
+        {
+            "last_updated_ts": States.last_updated,
+            "last_changed_ts": States.last_changed,
+        },
+    )
+
+
+def _fill_timestamps(session, row_id, timestamp_columns):
+    """Set each timestamp column to the seconds since the epoch of its datetime.
+
+    The first datetime column is required, rows without it keep
+    their other timestamps unset too. Rows are updated in batches
+    that are committed separately so an interrupted migration
+    continues where it stopped.
+    """
+    table = row_id.table
+    keys = list(timestamp_columns)
+    for batch in _batches_by_row_id(
+        session, row_id, table.c[keys[0]], *timestamp_columns.values()
+    ):
+        rows = [
+            (row, datetimes)
+            for row, timestamp, *datetimes in batch
+            if timestamp is None and datetimes[0] is not None
+        ]
+        if not rows:
+            continue
+
+        session.execute(
+            table.update()
+            .where(row_id == sqlalchemy.bindparam("b_row_id"))
+            .values({key: sqlalchemy.bindparam(f"b_{key}") for key in keys}),
+            [
+                {
+                    "b_row_id": row,
+                    **{
+                        f"b_{key}": process_datetime_to_timestamp(value or datetimes[0])
+                        for key, value in zip(keys, datetimes)
+                    },
+                }
+                for row, datetimes in rows
+            ],
+        )
+        session.commit()
+        _LOGGER.debug("Added timestamps to %s rows of %s", len(rows), table.name)
+
+
+def _batches_by_row_id(session, row_id, *columns):
+    """Yield the rows of a table in batches ordered by their primary key.
+
+    Walking the primary key reads every row once, selecting the rows
+    left to migrate by an unindexed column scans the table per batch.
+    """
+    last_id = 0
+    while True:
+        rows = session.execute(
+            select([row_id, *columns])
+            .where(row_id > last_id)
+            .order_by(row_id)
+            .limit(MIGRATE_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield rows
+
+
+def _move_to_shared_table(
+    session,
+    row_id,
+    legacy_column,
+    foreign_key,
+    shared_id,
+    shared_column,
+    hash_func,
+    empty_value=None,
+):
+    """Replace the serialized content of each row with a reference to a shared row.
+
+    Rows whose content is empty_value are cleared without a reference.
+    Rows are moved in batches that are committed separately so an
+    interrupted migration continues where it stopped.
+    """
+    table = row_id.table
+    shared_table = shared_id.table
+    for batch in _batches_by_row_id(session, row_id, legacy_column):
+        rows = []
+        empty = []
+        for row, shared in batch:
+            if shared is None:
+                continue
+            if shared == empty_value:
+                empty.append({"b_row_id": row})
+            else:
+                rows.append((row, shared))
+        if empty:
+            session.execute(
+                table.update()
+                .where(row_id == sqlalchemy.bindparam("b_row_id"))
+                .values({legacy_column.key: None}),
+                empty,
+            )
+        if not rows:
+            session.commit()
+            continue
+
+        shared_ids = {}
+        new_shared = {shared: hash_func(shared) for _, shared in rows}
+        hashes = list(set(new_shared.values()))
+        for idx in range(0, len(hashes), SQLITE_MAX_BIND_VARS):
+            for existing_id, shared in session.execute(
+                select([shared_id, shared_column]).where(
+                    shared_table.c.hash.in_(hashes[idx : idx + SQLITE_MAX_BIND_VARS])
+                )
+            ):
+                if shared in new_shared:
+                    shared_ids[shared] = existing_id
+
+        next_id = session.execute(select([func.max(shared_id)])).scalar() or 0
+        new_rows = []
+        for shared, shared_hash in new_shared.items():
+            if shared in shared_ids:
+                continue
+            next_id += 1
+            shared_ids[shared] = next_id
+            new_rows.append(
+                {
+                    shared_id.key: next_id,
+                    "hash": shared_hash,
+                    shared_column.key: shared,
+                }
+            )
+        if new_rows:
+            session.execute(shared_table.insert(), new_rows)
+
+        session.execute(
+            table.update()
+            .where(row_id == sqlalchemy.bindparam("b_row_id"))
+            .values(
+                {
+                    foreign_key: sqlalchemy.bindparam("b_shared_id"),
+                    legacy_column.key: None,
+                }
+            ),
+            [
+                {"b_row_id": row, "b_shared_id": shared_ids[shared]}
+                for row, shared in rows
+            ],
+        )
+        session.commit()
+        _LOGGER.debug("Moved %s rows of %s", len(rows), table.name)
+
+
 def _inspect_schema_version(engine, session):
     """Determine the schema version by inspecting the db structure.
 
     When the schema version is not present in the db, either db was just
     created with the correct schema, or this is a db created before schema
-    versions were tracked. For now, we'll test if the changes for schema
-    version 1 are present to make the determination. Eventually this logic
-    can be removed and we can assume a new db is being created.
+    versions were tracked. For now, we'll test if the index on the
+    time the events were fired is present to make the determination.
+    Eventually this logic can be removed and we can assume a new db is
+    being created.
     """
     inspector = sqlalchemy.inspect(engine)
     indexes = inspector.get_indexes("events")
 
     for index in indexes:
-        if index["column_names"] == ["time_fired"]:
-            # Schema addition from version 1 detected. New DB.
+        if index["column_names"] == ["time_fired_ts", "event_type_id"]:
+            # Schema addition from version 19 detected. New DB.
             session.add(SchemaChanges(schema_version=SCHEMA_VERSION))
             return SCHEMA_VERSION
 
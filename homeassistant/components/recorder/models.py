@@ -1,11 +1,16 @@
 """Models for SQLAlchemy."""
+from datetime import timedelta
+from functools import lru_cache
 import json
 import logging
+import zlib
 
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
     DateTime,
+    Float,
     ForeignKey,
     Index,
     Integer,
@@ -13,36 +18,78 @@ from sqlalchemy import (
     Text,
     distinct,
 )
-from sqlalchemy.dialects import mysql
+from sqlalchemy.dialects import mysql, postgresql
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm.session import Session
 
 from homeassistant.const import MAX_LENGTH_EVENT_TYPE
 from homeassistant.core import Context, Event, EventOrigin, State, split_entity_id
-from homeassistant.helpers.json import JSONEncoder
+from homeassistant.helpers.json import JSONEncoder, json_loads
 import homeassistant.util.dt as dt_util
 
 # SQLAlchemy Schema
 # pylint: disable=invalid-name
 Base = declarative_base()
 
-SCHEMA_VERSION = 14
+SCHEMA_VERSION = 20
 
 _LOGGER = logging.getLogger(__name__)
 
 DB_TIMEZONE = "+00:00"
 
 TABLE_EVENTS = "events"
+TABLE_EVENT_DATA = "event_data"
+TABLE_EVENT_TYPES = "event_types"
 TABLE_STATES = "states"
+TABLE_STATE_ATTRIBUTES = "state_attributes"
+TABLE_STATISTICS = "statistics"
+TABLE_STATISTICS_SHORT_TERM = "statistics_short_term"
 TABLE_RECORDER_RUNS = "recorder_runs"
 TABLE_SCHEMA_CHANGES = "schema_changes"
 
-ALL_TABLES = [TABLE_STATES, TABLE_EVENTS, TABLE_RECORDER_RUNS, TABLE_SCHEMA_CHANGES]
+ALL_TABLES = [
+    TABLE_STATES,
+    TABLE_STATE_ATTRIBUTES,
+    TABLE_EVENTS,
+    TABLE_EVENT_DATA,
+    TABLE_EVENT_TYPES,
+    TABLE_RECORDER_RUNS,
+    TABLE_SCHEMA_CHANGES,
+    TABLE_STATISTICS,
+    TABLE_STATISTICS_SHORT_TERM,
+]
+
+EMPTY_JSON_OBJECT = "{}"
+
+# The same timestamps are formatted again and again, as
+# last_changed repeats across the states of an entity
+TIMESTAMP_ISOFORMAT_CACHE_SIZE = 2048
 
 DATETIME_TYPE = DateTime(timezone=True).with_variant(
     mysql.DATETIME(timezone=True, fsp=6), "mysql"
 )
+# Seconds since the epoch, a single precision float
+# is not precise enough for the microseconds
+TIMESTAMP_TYPE = (
+    Float()
+    .with_variant(mysql.DOUBLE(asdecimal=False), "mysql")
+    .with_variant(postgresql.DOUBLE_PRECISION(), "postgresql")
+)
+
+
+def _timestamp_default(datetime_column):
+    """Return a default for a timestamp column from its datetime column.
+
+    Rows created without going through row_from_event get
+    their timestamps from the datetimes they were given.
+    """
+
+    def _default(context):
+        value = context.get_current_parameters().get(datetime_column)
+        return process_datetime_to_timestamp(value or dt_util.utcnow())
+
+    return _default
 
 
 class Events(Base):  # type: ignore
@@ -57,39 +104,90 @@ class Events(Base):  # type: ignore
     event_type = Column(String(MAX_LENGTH_EVENT_TYPE))
     event_data = Column(Text().with_variant(mysql.LONGTEXT, "mysql"))
     origin = Column(String(32))
-    time_fired = Column(DATETIME_TYPE, index=True)
+    time_fired = Column(DATETIME_TYPE)
     created = Column(DATETIME_TYPE, default=dt_util.utcnow)
+    time_fired_ts = Column(TIMESTAMP_TYPE, default=_timestamp_default("time_fired"))
     context_id = Column(String(36), index=True)
     context_user_id = Column(String(36), index=True)
     context_parent_id = Column(String(36), index=True)
+    data_id = Column(Integer, ForeignKey("event_data.data_id"), index=True)
+    event_type_id = Column(Integer, ForeignKey("event_types.event_type_id"))
+    event_data_rel = relationship("EventData", lazy="joined")
+    event_type_rel = relationship("EventTypes", lazy="joined")
 
     __table_args__ = (
         # Used for fetching events at a specific time
         # see logbook
-        Index("ix_events_event_type_time_fired", "event_type", "time_fired"),
+        Index(
+            "ix_events_event_type_id_time_fired_ts", "event_type_id", "time_fired_ts"
+        ),
+        # Covers the event type filter of time range scans ordered
+        # by time, see logbook and purge
+        Index(
+            "ix_events_time_fired_ts_event_type_id", "time_fired_ts", "event_type_id"
+        ),
     )
 
     def __repr__(self) -> str:
         """Return string representation of instance for debugging."""
         return (
             f"<recorder.Events("
-            f"id={self.event_id}, type='{self.event_type}', data='{self.event_data}', "
-            f"origin='{self.origin}', time_fired='{self.time_fired}'"
+            f"id={self.event_id}, type_id={self.event_type_id}, "
+            f"data_id={self.data_id}, origin='{self.origin}', "
+            f"time_fired='{self.time_fired}'"
             f")>"
         )
 
     @staticmethod
-    def from_event(event, event_data=None):
+    def from_event(event):
         """Create an event database object from a native event."""
-        return Events(
-            event_type=event.event_type,
-            event_data=event_data or json.dumps(event.data, cls=JSONEncoder),
-            origin=str(event.origin.value),
-            time_fired=event.time_fired,
-            context_id=event.context.id,
-            context_user_id=event.context.user_id,
-            context_parent_id=event.context.parent_id,
-        )
+        return Events(**Events.row_from_event(event))
+
+    @staticmethod
+    def row_from_event(event):
+        """Create the column values of an events row from a native event.
+
+        The recorder bulk inserts these rows without creating ORM objects.
+        The event type and data are stored in the event_types and
+        event_data tables, see EventTypes and EventData.
+        """
+        return {
+            "event_type": None,
+            "event_data": None,
+            "origin": str(event.origin.value),
+            "time_fired": event.time_fired,
+            "time_fired_ts": process_datetime_to_timestamp(event.time_fired),
+            "context_id": event.context.id,
+            "context_user_id": event.context.user_id,
+            "context_parent_id": event.context.parent_id,
+        }
+
+    @property
+    def shared_event_type(self):
+        """Return the event type of the event.
+
+        Rows written before the event_types table existed
+        keep their event type in the events table.
+        """
+        if self.event_type is not None:
+            return self.event_type
+        if self.event_type_rel is not None:
+            return self.event_type_rel.event_type
+        return None
+
+    @property
+    def shared_data(self):
+        """Return the serialized data of the event.
+
+        Rows written before the event_data table existed keep their
+        data in the events table. Events without data have no
+        event_data row.
+        """
+        if self.event_data is not None:
+            return self.event_data
+        if self.event_data_rel is not None:
+            return self.event_data_rel.shared_data
+        return EMPTY_JSON_OBJECT
 
     def to_native(self, validate_entity_id=True):
         """Convert to a natve HA Event."""
@@ -100,8 +198,8 @@ class Events(Base):  # type: ignore
         )
         try:
             return Event(
-                self.event_type,
-                json.loads(self.event_data),
+                self.shared_event_type,
+                json_loads(self.shared_data),
                 EventOrigin(self.origin),
                 process_timestamp(self.time_fired),
                 context=context,
@@ -112,6 +210,87 @@ class Events(Base):  # type: ignore
             return None
 
 
+class EventData(Base):  # type: ignore
+    """Event data history.
+
+    Event data shared by many events is only stored once
+    and found by the hash of its serialized form.
+    """
+
+    __table_args__ = {
+        "mysql_default_charset": "utf8mb4",
+        "mysql_collate": "utf8mb4_unicode_ci",
+    }
+    __tablename__ = TABLE_EVENT_DATA
+    data_id = Column(Integer, primary_key=True)
+    hash = Column(BigInteger, index=True)
+    shared_data = Column(Text().with_variant(mysql.LONGTEXT, "mysql"))
+
+    def __repr__(self) -> str:
+        """Return string representation of instance for debugging."""
+        return (
+            f"<recorder.EventData("
+            f"id={self.data_id}, hash='{self.hash}', data='{self.shared_data}'"
+            f")>"
+        )
+
+    @staticmethod
+    def from_event(event):
+        """Create object from an event."""
+        shared_data = EventData.shared_data_from_event(event)
+        return EventData(
+            shared_data=shared_data, hash=EventData.hash_shared_data(shared_data)
+        )
+
+    @staticmethod
+    def shared_data_from_event(event):
+        """Serialize the data of an event."""
+        return db_json_dumps(event.data)
+
+    @staticmethod
+    def hash_shared_data(shared_data):
+        """Return the hash of the serialized data."""
+        return zlib.crc32(shared_data.encode("utf-8"))
+
+    def to_native(self):
+        """Convert to an event data dictionary."""
+        try:
+            return json_loads(self.shared_data)
+        except ValueError:
+            # When json.loads fails
+            _LOGGER.exception("Error converting row to event data: %s", self)
+            return {}
+
+
+class EventTypes(Base):  # type: ignore
+    """Event types that have been recorded.
+
+    Events refer to their type by id so the type string
+    is only stored once.
+    """
+
+    __table_args__ = {
+        "mysql_default_charset": "utf8mb4",
+        "mysql_collate": "utf8mb4_unicode_ci",
+    }
+    __tablename__ = TABLE_EVENT_TYPES
+    event_type_id = Column(Integer, primary_key=True)
+    event_type = Column(String(MAX_LENGTH_EVENT_TYPE), index=True, unique=True)
+
+    def __repr__(self) -> str:
+        """Return string representation of instance for debugging."""
+        return (
+            f"<recorder.EventTypes("
+            f"id={self.event_type_id}, event_type='{self.event_type}'"
+            f")>"
+        )
+
+    @staticmethod
+    def from_event(event):
+        """Create object from an event."""
+        return EventTypes(event_type=event.event_type)
+
+
 class States(Base):  # type: ignore
     """State change history."""
 
@@ -128,19 +307,27 @@ class States(Base):  # type: ignore
     event_id = Column(
         Integer, ForeignKey("events.event_id", ondelete="CASCADE"), index=True
     )
+    attributes_id = Column(
+        Integer, ForeignKey("state_attributes.attributes_id"), index=True
+    )
     last_changed = Column(DATETIME_TYPE, default=dt_util.utcnow)
-    last_updated = Column(DATETIME_TYPE, default=dt_util.utcnow, index=True)
+    last_updated = Column(DATETIME_TYPE, default=dt_util.utcnow)
     created = Column(DATETIME_TYPE, default=dt_util.utcnow)
+    last_changed_ts = Column(TIMESTAMP_TYPE, default=_timestamp_default("last_changed"))
+    last_updated_ts = Column(
+        TIMESTAMP_TYPE, default=_timestamp_default("last_updated"), index=True
+    )
     old_state_id = Column(
         Integer, ForeignKey("states.state_id", ondelete="NO ACTION"), index=True
     )
     event = relationship("Events", uselist=False)
     old_state = relationship("States", remote_side=[state_id])
+    state_attributes = relationship("StateAttributes", lazy="joined")
 
     __table_args__ = (
         # Used for fetching the state of entities at a specific time
         # (get_states in history.py)
-        Index("ix_states_entity_id_last_updated", "entity_id", "last_updated"),
+        Index("ix_states_entity_id_last_updated_ts", "entity_id", "last_updated_ts"),
     )
 
     def __repr__(self) -> str:
@@ -157,26 +344,61 @@ class States(Base):  # type: ignore
     @staticmethod
     def from_event(event):
         """Create object from a state_changed event."""
+        return States(**States.row_from_event(event))
+
+    @staticmethod
+    def row_from_event(event):
+        """Create the column values of a states row from a state_changed event.
+
+        The recorder bulk inserts these rows without creating ORM objects.
+        The attributes are stored in the state_attributes table, see
+        StateAttributes.
+        """
         entity_id = event.data["entity_id"]
         state = event.data.get("new_state")
 
-        dbstate = States(entity_id=entity_id)
-
         # State got deleted
         if state is None:
-            dbstate.state = ""
-            dbstate.domain = split_entity_id(entity_id)[0]
-            dbstate.attributes = "{}"
-            dbstate.last_changed = event.time_fired
-            dbstate.last_updated = event.time_fired
+            time_fired_ts = process_datetime_to_timestamp(event.time_fired)
+            return {
+                "entity_id": entity_id,
+                "domain": split_entity_id(entity_id)[0],
+                "state": "",
+                "attributes": None,
+                "last_changed": event.time_fired,
+                "last_updated": event.time_fired,
+                "last_changed_ts": time_fired_ts,
+                "last_updated_ts": time_fired_ts,
+            }
+
+        last_updated_ts = process_datetime_to_timestamp(state.last_updated)
+        if state.last_changed == state.last_updated:
+            last_changed_ts = last_updated_ts
         else:
-            dbstate.domain = state.domain
-            dbstate.state = state.state
-            dbstate.attributes = json.dumps(dict(state.attributes), cls=JSONEncoder)
-            dbstate.last_changed = state.last_changed
-            dbstate.last_updated = state.last_updated
-
-        return dbstate
+            last_changed_ts = process_datetime_to_timestamp(state.last_changed)
+        return {
+            "entity_id": entity_id,
+            "domain": state.domain,
+            "state": state.state,
+            "attributes": None,
+            "last_changed": state.last_changed,
+            "last_updated": state.last_updated,
+            "last_changed_ts": last_changed_ts,
+            "last_updated_ts": last_updated_ts,
+        }
+
+    @property
+    def shared_attrs(self):
+        """Return the serialized attributes of the state.
+
+        Rows written before the state_attributes table existed
+        keep their attributes in the states table.
+        """
+        if self.attributes is not None:
+            return self.attributes
+        if self.state_attributes is not None:
+            return self.state_attributes.shared_attrs
+        return EMPTY_JSON_OBJECT
 
     def to_native(self, validate_entity_id=True):
         """Convert to an HA state object."""
@@ -184,7 +406,7 @@ class States(Base):  # type: ignore
             return State(
                 self.entity_id,
                 self.state,
-                json.loads(self.attributes),
+                json_loads(self.shared_attrs),
                 process_timestamp(self.last_changed),
                 process_timestamp(self.last_updated),
                 # Join the events table on event_id to get the context instead
@@ -198,6 +420,135 @@ class States(Base):  # type: ignore
             return None
 
 
+class StateAttributes(Base):  # type: ignore
+    """State attribute change history.
+
+    Attributes shared by many states are only stored once
+    and found by the hash of their serialized form.
+    """
+
+    __table_args__ = {
+        "mysql_default_charset": "utf8mb4",
+        "mysql_collate": "utf8mb4_unicode_ci",
+    }
+    __tablename__ = TABLE_STATE_ATTRIBUTES
+    attributes_id = Column(Integer, primary_key=True)
+    hash = Column(BigInteger, index=True)
+    shared_attrs = Column(Text().with_variant(mysql.LONGTEXT, "mysql"))
+
+    def __repr__(self) -> str:
+        """Return string representation of instance for debugging."""
+        return (
+            f"<recorder.StateAttributes("
+            f"id={self.attributes_id}, hash='{self.hash}', attributes='{self.shared_attrs}'"
+            f")>"
+        )
+
+    @staticmethod
+    def from_event(event):
+        """Create object from a state_changed event."""
+        shared_attrs = StateAttributes.shared_attrs_from_event(event)
+        return StateAttributes(
+            shared_attrs=shared_attrs,
+            hash=StateAttributes.hash_shared_attrs(shared_attrs),
+        )
+
+    @staticmethod
+    def shared_attrs_from_event(event):
+        """Serialize the attributes of the new state of a state_changed event."""
+        state = event.data.get("new_state")
+        if state is None:
+            return EMPTY_JSON_OBJECT
+        return state_attributes_json(state)
+
+    @staticmethod
+    def hash_shared_attrs(shared_attrs):
+        """Return the hash of the serialized attributes."""
+        return zlib.crc32(shared_attrs.encode("utf-8"))
+
+    def to_native(self):
+        """Convert to a dict of state attributes."""
+        try:
+            return json_loads(self.shared_attrs)
+        except ValueError:
+            # When json.loads fails
+            _LOGGER.exception("Error converting row to state attributes: %s", self)
+            return {}
+
+
+class StatisticsBase:
+    """Statistics of an entity over a period starting at start."""
+
+    id = Column(Integer, primary_key=True)
+    created = Column(DATETIME_TYPE, default=dt_util.utcnow)
+    statistic_id = Column(String(255))
+    start = Column(DATETIME_TYPE, index=True)
+    mean = Column(Float)
+    min = Column(Float)
+    max = Column(Float)
+    last = Column(Float)
+    sum = Column(Float)
+
+    duration: timedelta
+
+    def __repr__(self) -> str:
+        """Return string representation of instance for debugging."""
+        return (
+            f"<recorder.{type(self).__name__}("
+            f"id={self.id}, statistic_id='{self.statistic_id}', "
+            f"start='{self.start}', mean={self.mean}, min={self.min}, "
+            f"max={self.max}, last={self.last}, sum={self.sum}"
+            f")>"
+        )
+
+    @classmethod
+    def row_from_stats(cls, statistic_id, start, stats):
+        """Create the column values of a statistics row.
+
+        The recorder bulk inserts these rows without creating ORM objects.
+        """
+        return {
+            "statistic_id": statistic_id,
+            "start": start,
+            "created": dt_util.utcnow(),
+            **stats,
+        }
+
+
+class Statistics(Base, StatisticsBase):  # type: ignore
+    """Hourly statistics.
+
+    Compiled from the short term statistics and kept when the
+    states they were compiled from are purged.
+    """
+
+    __table_args__ = (
+        # Used for fetching statistics for a certain entity at a specific time
+        Index("ix_statistics_statistic_id_start", "statistic_id", "start", unique=True),
+    )
+    __tablename__ = TABLE_STATISTICS
+    duration = timedelta(hours=1)
+
+
+class StatisticsShortTerm(Base, StatisticsBase):  # type: ignore
+    """Five minute statistics.
+
+    Compiled from the states and purged together with them.
+    """
+
+    __table_args__ = (
+        # Used for fetching statistics for a certain entity at a specific time
+        Index(
+            "ix_statistics_short_term_statistic_id_start",
+            "statistic_id",
+            "start",
+            unique=True,
+        ),
+    )
+    __tablename__ = TABLE_STATISTICS_SHORT_TERM
+    duration = timedelta(minutes=5)
+
+
 class RecorderRuns(Base):  # type: ignore
     """Representation of recorder run."""
 
@@ -234,13 +585,17 @@ class RecorderRuns(Base):  # type: ignore
         assert session is not None, "RecorderRuns need to be persisted"
 
         query = session.query(distinct(States.entity_id)).filter(
-            States.last_updated >= self.start
+            States.last_updated_ts >= process_datetime_to_timestamp(self.start)
         )
 
         if point_in_time is not None:
-            query = query.filter(States.last_updated < point_in_time)
+            query = query.filter(
+                States.last_updated_ts < process_datetime_to_timestamp(point_in_time)
+            )
         elif self.end is not None:
-            query = query.filter(States.last_updated < self.end)
+            query = query.filter(
+                States.last_updated_ts < process_datetime_to_timestamp(self.end)
+            )
 
         return [row[0] for row in query]
 
@@ -286,3 +641,33 @@ def process_timestamp_to_utc_isoformat(ts):
     if ts.tzinfo is None:
         return f"{ts.isoformat()}{DB_TIMEZONE}"
     return ts.astimezone(dt_util.UTC).isoformat()
+
+
+def process_datetime_to_timestamp(ts):
+    """Process a datetime into seconds since the epoch.
+
+    Naive datetimes read from the database are in UTC.
+    """
+    if ts.tzinfo is None:
+        return ts.replace(tzinfo=dt_util.UTC).timestamp()
+    return ts.timestamp()
+
+
+@lru_cache(maxsize=TIMESTAMP_ISOFORMAT_CACHE_SIZE)
+def process_float_timestamp_to_utc_isoformat(ts):
+    """Process seconds since the epoch into UTC isotime."""
+    return dt_util.utc_from_timestamp(ts).isoformat()
+
+
+def db_json_dumps(data):
+    """Serialize data for the database like json.dumps does.
+
+    Rows are shared by the hash of their serialized data, so the data
+    must be serialized like the rows already in the database.
+    """
+    return json.dumps(data, cls=JSONEncoder)
+
+
+def state_attributes_json(state):
+    """Serialize the attributes of a state for the database."""
+    return db_json_dumps(dict(state.attributes))
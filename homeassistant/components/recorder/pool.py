@@ -1,8 +1,16 @@
-"""A pool for sqlite connections."""
+"""Connection pools for the recorder database."""
+from __future__ import annotations
+
 import threading
+import time
+from typing import Any
 
+from sqlalchemy import event as sqlalchemy_event
+from sqlalchemy.engine import Engine
 from sqlalchemy.pool import NullPool, StaticPool
 
+QUERY_START_TIME = "_recorder_query_start_time"
+
 
 class RecorderPool(StaticPool, NullPool):
     """A hybird of NullPool and StaticPool.
@@ -32,3 +40,53 @@ class RecorderPool(StaticPool, NullPool):
         return super(  # pylint: disable=bad-super-call
             NullPool, self
         )._create_connection()
+
+
+class QueryTimings:
+    """Aggregate timings of the queries executed on an engine."""
+
+    def __init__(self) -> None:
+        """Initialize the timings."""
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+
+    def record(self, elapsed: float) -> None:
+        """Record the time a single query took."""
+        with self._lock:
+            self.count += 1
+            self.total += elapsed
+            if elapsed > self.slowest:
+                self.slowest = elapsed
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the timings as a dictionary."""
+        with self._lock:
+            return {
+                "count": self.count,
+                "total": self.total,
+                "mean": self.total / self.count if self.count else 0.0,
+                "max": self.slowest,
+            }
+
+
+def track_query_timings(
+    engine: Engine, timings: QueryTimings, skip_thread_id: int | None = None
+) -> None:
+    """Record the time each query on the engine takes into timings.
+
+    Queries executed by the thread with skip_thread_id are not recorded.
+    """
+
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        if context is not None and threading.get_ident() != skip_thread_id:
+            setattr(context, QUERY_START_TIME, time.perf_counter())
+
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        start_time = getattr(context, QUERY_START_TIME, None)
+        if start_time is not None:
+            timings.record(time.perf_counter() - start_time)
+
+    sqlalchemy_event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    sqlalchemy_event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -6,14 +6,33 @@ import logging
 import time
 from typing import TYPE_CHECKING
 
+from sqlalchemy import Column, func
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm.session import Session
 from sqlalchemy.sql.expression import distinct
 
+from homeassistant.helpers.dispatcher import dispatcher_send
 import homeassistant.util.dt as dt_util
 
-from .const import MAX_ROWS_TO_PURGE
-from .models import Events, RecorderRuns, States
+from .const import (
+    MAX_ROWS_TO_PURGE,
+    MAX_ROWS_TO_PURGE_BY_RANGE,
+    SIGNAL_RECORDER_EVENTS_PURGED,
+)
+from .models import (
+    TABLE_EVENT_DATA,
+    TABLE_EVENTS,
+    TABLE_STATE_ATTRIBUTES,
+    TABLE_STATES,
+    EventData,
+    Events,
+    EventTypes,
+    RecorderRuns,
+    StateAttributes,
+    States,
+    StatisticsShortTerm,
+    process_datetime_to_timestamp,
+)
 from .repack import repack_database
 from .util import session_scope
 
@@ -34,22 +53,25 @@ def purge_old_data(
 ) -> bool:
     """Purge events and states older than purge_days ago.
 
-    Cleans up an timeframe of an hour, based on the oldest record.
+    Cleans up the oldest states and events, returns False until
+    there is nothing left to purge.
     """
     purge_before = dt_util.utcnow() - timedelta(days=purge_days)
     _LOGGER.debug(
         "Purging states and events before target %s",
         purge_before.isoformat(sep=" ", timespec="seconds"),
     )
+    purge_before_ts = process_datetime_to_timestamp(purge_before)
     try:
         with session_scope(session=instance.get_session()) as session:  # type: ignore
-            # Purge a max of MAX_ROWS_TO_PURGE, based on the oldest states or events record
-            event_ids = _select_event_ids_to_purge(session, purge_before)
-            state_ids = _select_state_ids_to_purge(session, purge_before, event_ids)
-            if state_ids:
-                _purge_state_ids(session, state_ids)
-            if event_ids:
-                _purge_event_ids(session, event_ids)
+            # The states go first as they reference the events
+            purged_states = _purge_oldest_states(instance, session, purge_before_ts)
+            purged_events = _purge_oldest_events(instance, session, purge_before_ts)
+            if purged_events:
+                dispatcher_send(
+                    instance.hass, SIGNAL_RECORDER_EVENTS_PURGED, purge_before_ts
+                )
+            if purged_states or purged_events:
                 # If states or events purging isn't processing the purge_before yet,
                 # return false, as we are not done yet.
                 _LOGGER.debug("Purging hasn't fully completed yet")
@@ -58,6 +80,7 @@ def purge_old_data(
                 _LOGGER.debug("Cleanup filtered data hasn't fully completed yet")
                 return False
             _purge_old_recorder_runs(instance, session, purge_before)
+            _purge_old_short_term_statistics(session, purge_before)
         if repack:
             repack_database(instance)
     except OperationalError as err:
@@ -74,35 +97,222 @@ def purge_old_data(
     return True
 
 
-def _select_event_ids_to_purge(session: Session, purge_before: datetime) -> list[int]:
-    """Return a list of event ids to purge."""
-    events = (
-        session.query(Events.event_id)
-        .filter(Events.time_fired < purge_before)
-        .limit(MAX_ROWS_TO_PURGE)
+def _select_oldest_id_range(
+    session: Session, id_column: Column, time_column: Column, purge_before_ts: float
+) -> tuple[int, int, bool] | None:
+    """Return the id range of the oldest rows to purge and if all rows in it are.
+
+    Ids are given in the order the rows are recorded so the range of
+    the oldest rows normally holds no row to keep. Such a range is
+    purged with range conditions on the primary key and the indexes
+    instead of a list of ids.
+    """
+    oldest = (
+        session.query(id_column.label("row_id"))
+        .filter(time_column < purge_before_ts)
+        .order_by(time_column)
+        .limit(MAX_ROWS_TO_PURGE_BY_RANGE)
+        .subquery()
+    )
+    first_id, last_id, count = session.query(
+        func.min(oldest.c.row_id),
+        func.max(oldest.c.row_id),
+        func.count(oldest.c.row_id),
+    ).one()
+    if first_id is None:
+        return None
+    # The range holds rows to keep when it holds more rows than the oldest
+    # ones, as when the clock went back while recording. Counting stops
+    # after one more row so a sparse range is not scanned to the end.
+    in_range = (
+        session.query(id_column.label("row_id"))
+        .filter(id_column.between(first_id, last_id))
+        .limit(count + 1)
+        .subquery()
+    )
+    only_purged = (
+        session.query(func.count(in_range.c.row_id)).scalar() == count  # type: ignore
+    )
+    return first_id, last_id, only_purged
+
+
+def _purge_oldest_states(
+    instance: Recorder, session: Session, purge_before_ts: float
+) -> bool:
+    """Purge the oldest states before purge_before_ts, return if any were."""
+    id_range = _select_oldest_id_range(
+        session, States.state_id, States.last_updated_ts, purge_before_ts
+    )
+    if id_range is None:
+        return False
+    first_id, last_id, only_purged = id_range
+    if not only_purged:
+        states = (
+            session.query(States.state_id, States.attributes_id)
+            .filter(States.last_updated_ts < purge_before_ts)
+            .order_by(States.last_updated_ts)
+            .limit(MAX_ROWS_TO_PURGE)
+            .all()
+        )
+        _LOGGER.debug("Selected %s state ids to remove", len(states))
+        state_ids, attributes_ids = _state_and_attributes_ids(states)
+        _purge_state_ids(instance, session, state_ids)
+        _purge_unused_attributes_ids(instance, session, attributes_ids)
+        return True
+
+    attributes_ids = {
+        attributes_id
+        for (attributes_id,) in session.query(distinct(States.attributes_id))
+        .filter(States.state_id.between(first_id, last_id))
+        .filter(States.attributes_id.isnot(None))
+    }
+    disconnected_rows = (
+        session.query(States)
+        .filter(States.old_state_id.between(first_id, last_id))
+        .update({"old_state_id": None}, synchronize_session=False)
+    )
+    _LOGGER.debug("Updated %s states to remove old_state_id", disconnected_rows)
+    deleted_rows = (
+        session.query(States)
+        .filter(States.state_id.between(first_id, last_id))
+        .delete(synchronize_session=False)
+    )
+    _LOGGER.debug("Deleted %s states from %s to %s", deleted_rows, first_id, last_id)
+    instance.metrics.purged_rows[TABLE_STATES] += deleted_rows
+    _purge_unused_attributes_ids(instance, session, attributes_ids)
+    return True
+
+
+def _purge_oldest_events(
+    instance: Recorder, session: Session, purge_before_ts: float
+) -> bool:
+    """Purge the oldest events before purge_before_ts, return if any were."""
+    id_range = _select_oldest_id_range(
+        session, Events.event_id, Events.time_fired_ts, purge_before_ts
+    )
+    if id_range is None:
+        return False
+    first_id, last_id, only_purged = id_range
+    if not only_purged:
+        events = (
+            session.query(Events.event_id, Events.data_id)
+            .filter(Events.time_fired_ts < purge_before_ts)
+            .order_by(Events.time_fired_ts)
+            .limit(MAX_ROWS_TO_PURGE)
+            .all()
+        )
+        _LOGGER.debug("Selected %s event ids to remove", len(events))
+        event_ids, data_ids = _event_and_data_ids(events)
+        states = (
+            session.query(States.state_id, States.attributes_id)
+            .filter(States.last_updated_ts < purge_before_ts)
+            .filter(States.event_id.in_(event_ids))
+            .all()
+        )
+        state_ids, attributes_ids = _state_and_attributes_ids(states)
+        if state_ids:
+            _purge_state_ids(instance, session, state_ids)
+            _purge_unused_attributes_ids(instance, session, attributes_ids)
+        _purge_event_ids(instance, session, event_ids)
+        _purge_unused_data_ids(instance, session, data_ids)
+        return True
+
+    # The events of states that are not purged yet are kept
+    # until the next time
+    referenced_id = (
+        session.query(func.min(States.event_id))
+        .filter(States.event_id.between(first_id, last_id))
+        .scalar()
+    )
+    if referenced_id is not None:
+        last_id = referenced_id - 1
+        if last_id < first_id:
+            return False
+
+    data_ids = {
+        data_id
+        for (data_id,) in session.query(distinct(Events.data_id))
+        .filter(Events.event_id.between(first_id, last_id))
+        .filter(Events.data_id.isnot(None))
+    }
+    deleted_rows = (
+        session.query(Events)
+        .filter(Events.event_id.between(first_id, last_id))
+        .delete(synchronize_session=False)
+    )
+    _LOGGER.debug("Deleted %s events from %s to %s", deleted_rows, first_id, last_id)
+    instance.metrics.purged_rows[TABLE_EVENTS] += deleted_rows
+    _purge_unused_data_ids(instance, session, data_ids)
+    return True
+
+
+def _event_and_data_ids(events: list) -> tuple[list[int], set[int]]:
+    """Split event rows into the event ids and the referenced data ids."""
+    event_ids = [event.event_id for event in events]
+    data_ids = {event.data_id for event in events if event.data_id}
+    return event_ids, data_ids
+
+
+def _purge_unused_data_ids(
+    instance: Recorder, session: Session, data_ids: set[int]
+) -> None:
+    """Delete the shared event data no longer referenced by any event."""
+    if not data_ids:
+        return
+    still_used_ids = {
+        data_id
+        for (data_id,) in session.query(distinct(Events.data_id))
+        .filter(Events.data_id.in_(data_ids))
         .all()
+    }
+    unused_ids = data_ids - still_used_ids
+    if not unused_ids:
+        return
+    deleted_rows = (
+        session.query(EventData)
+        .filter(EventData.data_id.in_(unused_ids))
+        .delete(synchronize_session=False)
     )
-    _LOGGER.debug("Selected %s event ids to remove", len(events))
-    return [event.event_id for event in events]
+    _LOGGER.debug("Deleted %s data events", deleted_rows)
+    instance.metrics.purged_rows[TABLE_EVENT_DATA] += deleted_rows
+    instance.evict_purged_event_data(unused_ids)
 
 
-def _select_state_ids_to_purge(
-    session: Session, purge_before: datetime, event_ids: list[int]
-) -> list[int]:
-    """Return a list of state ids to purge."""
-    if not event_ids:
-        return []
-    states = (
-        session.query(States.state_id)
-        .filter(States.last_updated < purge_before)
-        .filter(States.event_id.in_(event_ids))
+def _state_and_attributes_ids(states: list) -> tuple[list[int], set[int]]:
+    """Split state rows into the state ids and the referenced attributes ids."""
+    state_ids = [state.state_id for state in states]
+    attributes_ids = {state.attributes_id for state in states if state.attributes_id}
+    return state_ids, attributes_ids
+
+
+def _purge_unused_attributes_ids(
+    instance: Recorder, session: Session, attributes_ids: set[int]
+) -> None:
+    """Delete the shared attributes no longer referenced by any state."""
+    if not attributes_ids:
+        return
+    still_used_ids = {
+        attributes_id
+        for (attributes_id,) in session.query(distinct(States.attributes_id))
+        .filter(States.attributes_id.in_(attributes_ids))
         .all()
+    }
+    unused_ids = attributes_ids - still_used_ids
+    if not unused_ids:
+        return
+    deleted_rows = (
+        session.query(StateAttributes)
+        .filter(StateAttributes.attributes_id.in_(unused_ids))
+        .delete(synchronize_session=False)
     )
-    _LOGGER.debug("Selected %s state ids to remove", len(states))
-    return [state.state_id for state in states]
+    _LOGGER.debug("Deleted %s attribute states", deleted_rows)
+    instance.metrics.purged_rows[TABLE_STATE_ATTRIBUTES] += deleted_rows
+    instance.evict_purged_state_attributes(unused_ids)
 
 
-def _purge_state_ids(session: Session, state_ids: list[int]) -> None:
+def _purge_state_ids(
+    instance: Recorder, session: Session, state_ids: list[int]
+) -> None:
     """Disconnect states and delete by state id."""
 
     # Update old_state_id to NULL before deleting to ensure
@@ -122,9 +332,12 @@ def _purge_state_ids(session: Session, state_ids: list[int]) -> None:
         .delete(synchronize_session=False)
     )
     _LOGGER.debug("Deleted %s states", deleted_rows)
+    instance.metrics.purged_rows[TABLE_STATES] += deleted_rows
 
 
-def _purge_event_ids(session: Session, event_ids: list[int]) -> None:
+def _purge_event_ids(
+    instance: Recorder, session: Session, event_ids: list[int]
+) -> None:
     """Delete by event id."""
     deleted_rows = (
         session.query(Events)
@@ -132,6 +345,7 @@ def _purge_event_ids(session: Session, event_ids: list[int]) -> None:
         .delete(synchronize_session=False)
     )
     _LOGGER.debug("Deleted %s events", deleted_rows)
+    instance.metrics.purged_rows[TABLE_EVENTS] += deleted_rows
 
 
 def _purge_old_recorder_runs(
@@ -148,6 +362,19 @@ def _purge_old_recorder_runs(
     _LOGGER.debug("Deleted %s recorder_runs", deleted_rows)
 
 
+def _purge_old_short_term_statistics(session: Session, purge_before: datetime) -> None:
+    """Purge the short term statistics of the purged states.
+
+    The hourly statistics are kept.
+    """
+    deleted_rows = (
+        session.query(StatisticsShortTerm)
+        .filter(StatisticsShortTerm.start < purge_before)
+        .delete(synchronize_session=False)
+    )
+    _LOGGER.debug("Deleted %s short term statistics", deleted_rows)
+
+
 def _purge_filtered_data(instance: Recorder, session: Session) -> bool:
     """Remove filtered states and events that shouldn't be in the database."""
     _LOGGER.debug("Cleanup filtered data")
@@ -159,57 +386,73 @@ def _purge_filtered_data(instance: Recorder, session: Session) -> bool:
         if not instance.entity_filter(entity_id)
     ]
     if len(excluded_entity_ids) > 0:
-        _purge_filtered_states(session, excluded_entity_ids)
+        _purge_filtered_states(instance, session, excluded_entity_ids)
         return False
 
     # Check if excluded event_types are in database
     excluded_event_types: list[str] = [
         event_type
-        for (event_type,) in session.query(distinct(Events.event_type)).all()
+        for (event_type,) in session.query(
+            func.coalesce(EventTypes.event_type, Events.event_type)
+        )
+        .select_from(Events)
+        .outerjoin(EventTypes, Events.event_type_id == EventTypes.event_type_id)
+        .distinct()
+        .all()
         if event_type in instance.exclude_t
     ]
     if len(excluded_event_types) > 0:
-        _purge_filtered_events(session, excluded_event_types)
+        _purge_filtered_events(instance, session, excluded_event_types)
         return False
 
     return True
 
 
-def _purge_filtered_states(session: Session, excluded_entity_ids: list[str]) -> None:
+def _purge_filtered_states(
+    instance: Recorder, session: Session, excluded_entity_ids: list[str]
+) -> None:
     """Remove filtered states and linked events."""
-    state_ids: list[int]
-    event_ids: list[int | None]
-    state_ids, event_ids = zip(
-        *(
-            session.query(States.state_id, States.event_id)
-            .filter(States.entity_id.in_(excluded_entity_ids))
-            .limit(MAX_ROWS_TO_PURGE)
-            .all()
-        )
+    states = (
+        session.query(States.state_id, States.event_id, States.attributes_id)
+        .filter(States.entity_id.in_(excluded_entity_ids))
+        .limit(MAX_ROWS_TO_PURGE)
+        .all()
     )
-    event_ids = [id_ for id_ in event_ids if id_ is not None]
+    state_ids, attributes_ids = _state_and_attributes_ids(states)
+    event_ids = [state.event_id for state in states if state.event_id is not None]
     _LOGGER.debug(
         "Selected %s state_ids to remove that should be filtered", len(state_ids)
     )
-    _purge_state_ids(session, state_ids)
-    _purge_event_ids(session, event_ids)  # type: ignore  # type of event_ids already narrowed to 'list[int]'
+    _purge_state_ids(instance, session, state_ids)
+    _purge_event_ids(instance, session, event_ids)
+    _purge_unused_attributes_ids(instance, session, attributes_ids)
 
 
-def _purge_filtered_events(session: Session, excluded_event_types: list[str]) -> None:
+def _purge_filtered_events(
+    instance: Recorder, session: Session, excluded_event_types: list[str]
+) -> None:
     """Remove filtered events and linked states."""
     events: list[Events] = (
-        session.query(Events.event_id)
-        .filter(Events.event_type.in_(excluded_event_types))
+        session.query(Events.event_id, Events.data_id)
+        .outerjoin(EventTypes, Events.event_type_id == EventTypes.event_type_id)
+        .filter(
+            EventTypes.event_type.in_(excluded_event_types)
+            | Events.event_type.in_(excluded_event_types)
+        )
         .limit(MAX_ROWS_TO_PURGE)
         .all()
     )
-    event_ids: list[int] = [event.event_id for event in events]
+    event_ids, data_ids = _event_and_data_ids(events)
     _LOGGER.debug(
         "Selected %s event_ids to remove that should be filtered", len(event_ids)
     )
     states: list[States] = (
-        session.query(States.state_id).filter(States.event_id.in_(event_ids)).all()
+        session.query(States.state_id, States.attributes_id)
+        .filter(States.event_id.in_(event_ids))
+        .all()
     )
-    state_ids: list[int] = [state.state_id for state in states]
-    _purge_state_ids(session, state_ids)
-    _purge_event_ids(session, event_ids)
+    state_ids, attributes_ids = _state_and_attributes_ids(states)
+    _purge_state_ids(instance, session, state_ids)
+    _purge_event_ids(instance, session, event_ids)
+    _purge_unused_attributes_ids(instance, session, attributes_ids)
+    _purge_unused_data_ids(instance, session, data_ids)
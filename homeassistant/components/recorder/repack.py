@@ -1,35 +1,180 @@
 """Purge repack helper."""
 from __future__ import annotations
 
+from datetime import datetime
 import logging
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import SQLAlchemyError
+
+import homeassistant.util.dt as dt_util
+
+from .const import SQLITE_AUTO_VACUUM_INCREMENTAL
+from .models import (
+    TABLE_EVENT_DATA,
+    TABLE_EVENT_TYPES,
+    TABLE_EVENTS,
+    TABLE_RECORDER_RUNS,
+    TABLE_STATE_ATTRIBUTES,
+    TABLE_STATES,
+    TABLE_STATISTICS,
+    TABLE_STATISTICS_SHORT_TERM,
+)
 
 if TYPE_CHECKING:
     from . import Recorder
 
 _LOGGER = logging.getLogger(__name__)
 
+# The number of free pages a single incremental vacuum step releases
+SQLITE_PAGES_PER_STEP = 2048
+
+# The tables repacked one per step on the server databases
+REPACK_TABLES = [
+    TABLE_STATES,
+    TABLE_STATE_ATTRIBUTES,
+    TABLE_EVENTS,
+    TABLE_EVENT_DATA,
+    TABLE_EVENT_TYPES,
+    TABLE_STATISTICS_SHORT_TERM,
+    TABLE_STATISTICS,
+    TABLE_RECORDER_RUNS,
+]
+
+
+class RepackTask:
+    """An object to insert into the recorder queue to run a repack step."""
+
+
+class RepackProgress:
+    """Track the progress of the incremental repack."""
+
+    def __init__(self) -> None:
+        """Initialize the progress."""
+        self.running = False
+        self.steps = 0
+        self.completed = 0
+        self.total = 0
+        self.full_rebuild = False
+        self.last_finished: datetime | None = None
+
+    def start(self, total: int, full_rebuild: bool = False) -> None:
+        """Start a new repack of total units."""
+        self.running = True
+        self.steps = 0
+        self.completed = 0
+        self.total = total
+        self.full_rebuild = full_rebuild
+
+    def finish(self) -> None:
+        """Mark the repack finished."""
+        self.running = False
+        self.last_finished = dt_util.utcnow()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the progress as a dictionary."""
+        return {
+            "running": self.running,
+            "steps": self.steps,
+            "completed": self.completed,
+            "total": self.total,
+            "full_rebuild": self.full_rebuild,
+            "last_finished": self.last_finished,
+        }
+
 
 def repack_database(instance: Recorder) -> None:
-    """Repack based on engine type."""
+    """Start an incremental repack based on engine type.
+
+    On sqlite the repack runs in small steps queued behind the pending
+    events so the recorder keeps committing while it runs. The tables
+    of the server databases are repacked from the executor on a
+    connection of their own as the server runs them concurrently.
 
-    # Execute sqlite command to free up space on disk
-    if instance.engine.dialect.name == "sqlite":
-        _LOGGER.debug("Vacuuming SQL DB to free space")
-        instance.engine.execute("VACUUM")
+    OPTIMIZE TABLE rebuilds each MySQL table in full, which needs
+    free disk space for a copy of the table. The repack progress
+    reports it as a full rebuild.
+    """
+    progress = instance.repack_progress
+    if progress.running:
+        _LOGGER.debug("Repack already in progress")
         return
 
-    # Execute postgresql vacuum command to free up space on disk
-    if instance.engine.dialect.name == "postgresql":
-        _LOGGER.debug("Vacuuming SQL DB to free space")
-        with instance.engine.connect().execution_options(
-            isolation_level="AUTOCOMMIT"
-        ) as conn:
-            conn.execute("VACUUM")
+    dialect_name = instance.engine.dialect.name
+    if dialect_name in ("postgresql", "mysql"):
+        progress.start(len(REPACK_TABLES), full_rebuild=dialect_name == "mysql")
+        instance.hass.add_job(_repack_tables, instance.engine, progress)
         return
 
+    # The free pages to release on sqlite are counted by the first step
+    progress.start(0)
+    instance.queue.put(RepackTask())
+
+
+def repack_database_step(instance: Recorder) -> bool:
+    """Run one bounded step of the sqlite repack, returns True when finished."""
+    progress = instance.repack_progress
+    try:
+        if instance.engine.dialect.name == "sqlite":
+            finished = _repack_sqlite_step(instance, progress)
+        else:
+            finished = True
+    except SQLAlchemyError as err:
+        _LOGGER.warning("Error repacking database: %s", err)
+        finished = True
+
+    progress.steps += 1
+    if finished:
+        progress.finish()
+    return finished
+
+
+def _repack_sqlite_step(instance: Recorder, progress: RepackProgress) -> bool:
+    """Release a bounded number of free pages."""
+    with instance.engine.connect() as conn:
+        if progress.steps == 0:
+            auto_vacuum = conn.execute(text("PRAGMA auto_vacuum")).scalar()
+            if auto_vacuum != SQLITE_AUTO_VACUUM_INCREMENTAL:
+                # Enabled by the schema migration, a full vacuum
+                # would block the recorder until it is done
+                _LOGGER.warning(
+                    "Incremental vacuum is not enabled on the database, "
+                    "skipping the repack"
+                )
+                return True
+            _LOGGER.debug("Vacuuming SQL DB to free space")
+            progress.total = conn.execute(text("PRAGMA freelist_count")).scalar()
+
+        conn.execute(text(f"PRAGMA incremental_vacuum({SQLITE_PAGES_PER_STEP})"))
+        remaining = conn.execute(text("PRAGMA freelist_count")).scalar()
+
+    progress.completed = max(progress.total - remaining, 0)
+    return remaining == 0
+
+
+def _repack_tables(engine: Engine, progress: RepackProgress) -> None:
+    """Repack the tables of a server database one at a time."""
+    try:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            for table in REPACK_TABLES:
+                _repack_table(conn, table)
+                progress.steps += 1
+                progress.completed += 1
+    except SQLAlchemyError as err:
+        _LOGGER.warning("Error repacking database: %s", err)
+    progress.finish()
+
+
+def _repack_table(conn: Connection, table: str) -> None:
+    """Repack a table of a server database."""
+    # Execute postgresql vacuum command to free up space on disk
+    if conn.dialect.name == "postgresql":
+        _LOGGER.debug("Vacuuming %s to free space", table)
+        conn.execute(text(f"VACUUM {table}"))
+
     # Optimize mysql / mariadb tables to free up space on disk
-    if instance.engine.dialect.name == "mysql":
-        _LOGGER.debug("Optimizing SQL DB to free space")
-        instance.engine.execute("OPTIMIZE TABLE states, events, recorder_runs")
-        return
+    else:
+        _LOGGER.debug("Optimizing %s to free space", table)
+        conn.execute(text(f"OPTIMIZE TABLE {table}"))
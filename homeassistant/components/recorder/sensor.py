@@ -0,0 +1,108 @@
+"""Sensors of the recorder performance metrics."""
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Callable, NamedTuple
+
+from homeassistant.components.sensor import SensorEntity
+from homeassistant.const import TIME_MILLISECONDS
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType, StateType
+
+from . import Recorder
+from .const import DATA_INSTANCE
+
+SCAN_INTERVAL = timedelta(seconds=30)
+
+
+class MetricDescription(NamedTuple):
+    """Describe a recorder metric sensor."""
+
+    name: str
+    unit: str | None
+    value: Callable[[Recorder], StateType]
+
+
+METRICS: dict[str, MetricDescription] = {
+    "queue_size": MetricDescription(
+        "Recorder queue size", "events", lambda instance: instance.queue.qsize()
+    ),
+    "events_per_second": MetricDescription(
+        "Recorder events per second",
+        "events/s",
+        lambda instance: round(instance.metrics.events_per_second, 2),
+    ),
+    "commit_duration": MetricDescription(
+        "Recorder commit duration",
+        TIME_MILLISECONDS,
+        lambda instance: round(instance.metrics.commit_duration.mean * 1000, 2),
+    ),
+    "commit_retries": MetricDescription(
+        "Recorder commit retries",
+        None,
+        lambda instance: instance.metrics.commit_retries,
+    ),
+    "purged_rows": MetricDescription(
+        "Recorder purged rows",
+        "rows",
+        lambda instance: sum(instance.metrics.purged_rows.values()),
+    ),
+}
+
+
+async def async_setup_platform(
+    hass: HomeAssistant,
+    config: ConfigType,
+    async_add_entities: AddEntitiesCallback,
+    discovery_info: DiscoveryInfoType | None = None,
+) -> None:
+    """Set up the recorder metric sensors."""
+    if discovery_info is None:
+        return
+
+    instance = hass.data[DATA_INSTANCE]
+    async_add_entities(
+        (
+            RecorderMetricSensor(instance, key, description)
+            for key, description in METRICS.items()
+        ),
+        True,
+    )
+
+
+class RecorderMetricSensor(SensorEntity):
+    """A sensor polling one metric of the recorder."""
+
+    def __init__(
+        self, instance: Recorder, key: str, description: MetricDescription
+    ) -> None:
+        """Initialize the sensor."""
+        self._instance = instance
+        self._key = key
+        self._description = description
+        self._state: StateType = None
+
+    @property
+    def name(self) -> str:
+        """Return the name of the sensor."""
+        return self._description.name
+
+    @property
+    def unique_id(self) -> str:
+        """Return the unique id of the sensor."""
+        return f"recorder_{self._key}"
+
+    @property
+    def unit_of_measurement(self) -> str | None:
+        """Return the unit the metric is expressed in."""
+        return self._description.unit
+
+    @property
+    def state(self) -> StateType:
+        """Return the state of the sensor."""
+        return self._state
+
+    async def async_update(self) -> None:
+        """Read the metric from the recorder."""
+        self._state = self._description.value(self._instance)
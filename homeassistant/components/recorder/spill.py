@@ -0,0 +1,114 @@
+"""Spill file for the events the recorder queue has no room for."""
+from __future__ import annotations
+
+from collections.abc import Iterable, Iterator
+import logging
+import os
+import struct
+import threading
+from typing import Any
+
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import Context, Event, EventOrigin, State
+from homeassistant.helpers.json import json_loads
+import homeassistant.util.dt as dt_util
+
+from .models import db_json_dumps
+
+_LOGGER = logging.getLogger(__name__)
+
+SPILL_FILE_NAME = "home-assistant_v2.spill"
+
+# Each record is the length of the serialized event followed by the event
+RECORD_HEADER = struct.Struct(">I")
+
+
+class SpillFile:
+    """An append only file of serialized events.
+
+    The event loop appends the events that overflow the recorder
+    queue and the recorder thread replays them once it caught up.
+    """
+
+    def __init__(self, path: str) -> None:
+        """Initialize the spill file."""
+        self.path = path
+        self._lock = threading.Lock()
+        self.written = 0
+        self.replayed = 0
+
+    @property
+    def has_events(self) -> bool:
+        """Return if there are spilled events to replay."""
+        return os.path.exists(self._replay_path) or os.path.exists(self.path)
+
+    @property
+    def _replay_path(self) -> str:
+        """Return the path of the events being replayed."""
+        return f"{self.path}.replay"
+
+    def write_events(self, events: Iterable[Event]) -> None:
+        """Append events to the file."""
+        records = []
+        for event in events:
+            try:
+                payload = db_json_dumps(event.as_dict()).encode("utf-8")
+            except (TypeError, ValueError):
+                _LOGGER.warning("Event is not JSON serializable: %s", event)
+                continue
+            records.append(RECORD_HEADER.pack(len(payload)))
+            records.append(payload)
+
+        with self._lock, open(self.path, "ab") as spill:
+            spill.writelines(records)
+        self.written += len(records) // 2
+
+    def replay_events(self) -> Iterator[Event]:
+        """Read the spilled events in the order they were written.
+
+        The events are moved aside first so events spilled while
+        replaying wait for the next replay. The replayed events are
+        removed once all of them are read, a record cut short by
+        a crash ends the file.
+        """
+        with self._lock:
+            if not os.path.exists(self._replay_path):
+                os.replace(self.path, self._replay_path)
+
+        with open(self._replay_path, "rb") as spill:
+            while header := spill.read(RECORD_HEADER.size):
+                if len(header) < RECORD_HEADER.size:
+                    break
+                (length,) = RECORD_HEADER.unpack(header)
+                payload = spill.read(length)
+                if len(payload) < length:
+                    _LOGGER.warning("Ignoring truncated event in %s", self.path)
+                    break
+                self.replayed += 1
+                yield _event_from_dict(json_loads(payload))
+
+        os.unlink(self._replay_path)
+
+
+def _event_from_dict(event_dict: dict[str, Any]) -> Event:
+    """Restore an event serialized with Event.as_dict."""
+    data = event_dict["data"]
+    if event_dict["event_type"] == EVENT_STATE_CHANGED:
+        data["old_state"] = _state_from_dict(data.get("old_state"))
+        data["new_state"] = _state_from_dict(data.get("new_state"))
+
+    return Event(
+        event_dict["event_type"],
+        data,
+        EventOrigin(event_dict["origin"]),
+        dt_util.parse_datetime(event_dict["time_fired"]),
+        Context(**event_dict["context"]),
+    )
+
+
+def _state_from_dict(state_dict: dict[str, Any] | None) -> State | None:
+    """Restore a state including the parent of its context."""
+    state = State.from_dict(state_dict)
+    if state is not None:
+        state.context = Context(**state_dict["context"])  # type: ignore[index]
+    return state
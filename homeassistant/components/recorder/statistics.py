@@ -0,0 +1,344 @@
+"""Statistics helper."""
+from __future__ import annotations
+
+from collections.abc import Iterator
+from datetime import datetime
+from itertools import groupby
+import logging
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import func
+from sqlalchemy.orm.session import Session
+
+from homeassistant.const import (
+    ATTR_DEVICE_CLASS,
+    ATTR_UNIT_OF_MEASUREMENT,
+    DEVICE_CLASS_ENERGY,
+    ENERGY_KILO_WATT_HOUR,
+    ENERGY_WATT_HOUR,
+)
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.json import json_loads
+import homeassistant.util.dt as dt_util
+
+from .models import (
+    EMPTY_JSON_OBJECT,
+    StateAttributes,
+    States,
+    Statistics,
+    StatisticsBase,
+    StatisticsShortTerm,
+    process_datetime_to_timestamp,
+    process_timestamp,
+    process_timestamp_to_utc_isoformat,
+)
+from .util import session_scope
+
+if TYPE_CHECKING:
+    from . import Recorder
+
+_LOGGER = logging.getLogger(__name__)
+
+STATISTICS_DOMAINS = ("sensor",)
+
+# Sensors measuring a meter reading also get a running sum
+# of the increases that survives meter resets
+SUM_UNITS = (ENERGY_KILO_WATT_HOUR, ENERGY_WATT_HOUR)
+
+PERIOD_5MINUTE = "5minute"
+PERIOD_HOUR = "hour"
+
+STATISTICS_TABLES: dict[str, type[StatisticsBase]] = {
+    PERIOD_5MINUTE: StatisticsShortTerm,
+    PERIOD_HOUR: Statistics,
+}
+
+QUERY_STATISTICS = ["statistic_id", "start", "mean", "min", "max", "last", "sum"]
+
+
+def period_start(point_in_time: datetime) -> datetime:
+    """Return the start of the five minute period containing point_in_time."""
+    point_in_time = dt_util.as_utc(point_in_time)
+    return point_in_time.replace(
+        minute=point_in_time.minute - point_in_time.minute % 5,
+        second=0,
+        microsecond=0,
+    )
+
+
+def compile_statistics(instance: Recorder, start: datetime) -> None:
+    """Compile the statistics of the five minute period starting at start.
+
+    When the period closes an hour the hourly statistics are
+    compiled from the short term statistics of that hour.
+    """
+    end = start + StatisticsShortTerm.duration
+    with session_scope(session=instance.get_session()) as session:  # type: ignore
+        if _statistics_compiled(session, StatisticsShortTerm, start):
+            _LOGGER.debug("Statistics already compiled for %s-%s", start, end)
+        else:
+            _compile_short_term_statistics(instance.hass, session, start, end)
+        hour_start = end - Statistics.duration
+        if end.minute == 0 and not _statistics_compiled(
+            session, Statistics, hour_start
+        ):
+            _compile_hourly_statistics(session, hour_start, end)
+
+
+def last_compiled_period(session: Session) -> datetime | None:
+    """Return the start of the last compiled five minute period."""
+    last_start = session.query(func.max(StatisticsShortTerm.start)).scalar()
+    return process_timestamp(last_start)
+
+
+def _statistics_compiled(
+    session: Session, table: type[StatisticsBase], start: datetime
+) -> bool:
+    """Return if statistics exist for the period starting at start."""
+    return session.query(table.id).filter(table.start == start).first() is not None
+
+
+def _compile_short_term_statistics(
+    hass: HomeAssistant, session: Session, start: datetime, end: datetime
+) -> None:
+    """Compile the short term statistics from the states of a period.
+
+    The value at the start of the period is the last value of the
+    previous period so the statistics are compiled incrementally
+    without looking up older states.
+    """
+    previous = {
+        row.statistic_id: row
+        for row in session.query(
+            StatisticsShortTerm.statistic_id,
+            StatisticsShortTerm.last,
+            StatisticsShortTerm.sum,
+        ).filter(StatisticsShortTerm.start == start - StatisticsShortTerm.duration)
+    }
+    rows = []
+    compiled = set()
+    non_numeric: set[str] = set()
+    for entity_id, states in groupby(
+        _numeric_states_during_period(session, start, end, non_numeric),
+        lambda state: state[0],
+    ):
+        compiled.add(entity_id)
+        prev = previous.get(entity_id)
+        stats = _compile_states(
+            [state[1:] for state in states],
+            start,
+            end,
+            prev and prev.last,
+            prev and prev.sum,
+        )
+        rows.append(StatisticsShortTerm.row_from_stats(entity_id, start, stats))
+
+    # Entities that did not change keep their value for the whole period,
+    # unless they became unavailable or otherwise non-numeric
+    for entity_id, prev in previous.items():
+        if entity_id in compiled or entity_id in non_numeric or prev.last is None:
+            continue
+        if not _has_numeric_state(hass, entity_id):
+            continue
+        rows.append(
+            StatisticsShortTerm.row_from_stats(
+                entity_id,
+                start,
+                {
+                    "mean": prev.last,
+                    "min": prev.last,
+                    "max": prev.last,
+                    "last": prev.last,
+                    "sum": prev.sum,
+                },
+            )
+        )
+
+    if rows:
+        session.execute(StatisticsShortTerm.__table__.insert(), rows)
+    _LOGGER.debug(
+        "Compiled short term statistics of %s entities for %s-%s",
+        len(rows),
+        start,
+        end,
+    )
+
+
+def _has_numeric_state(hass: HomeAssistant, entity_id: str) -> bool:
+    """Return if the current state of an entity is a number."""
+    state = hass.states.get(entity_id)
+    if state is None:
+        return False
+    try:
+        float(state.state)
+    except ValueError:
+        return False
+    return True
+
+
+def _numeric_states_during_period(
+    session: Session, start: datetime, end: datetime, non_numeric: set[str]
+) -> Iterator[tuple[str, float, datetime, bool]]:
+    """Yield (entity_id, value, last_updated, has_sum) of the numeric states.
+
+    Only entities with a unit of measurement have statistics. The
+    entities with non-numeric states are added to non_numeric.
+    """
+    query = (
+        session.query(
+            States.entity_id,
+            States.state,
+            States.last_updated_ts,
+            func.coalesce(StateAttributes.shared_attrs, States.attributes),
+        )
+        .outerjoin(
+            StateAttributes, States.attributes_id == StateAttributes.attributes_id
+        )
+        .filter(States.domain.in_(STATISTICS_DOMAINS))
+        .filter(States.last_updated_ts >= process_datetime_to_timestamp(start))
+        .filter(States.last_updated_ts < process_datetime_to_timestamp(end))
+        .order_by(States.entity_id, States.last_updated_ts)
+    )
+    attributes_cache: dict[str, dict[str, Any]] = {}
+    for entity_id, state, last_updated_ts, shared_attrs in query:
+        try:
+            value = float(state)
+        except (TypeError, ValueError):
+            non_numeric.add(entity_id)
+            continue
+        shared_attrs = shared_attrs or EMPTY_JSON_OBJECT
+        attributes = attributes_cache.get(shared_attrs)
+        if attributes is None:
+            attributes = attributes_cache[shared_attrs] = json_loads(shared_attrs)
+        unit = attributes.get(ATTR_UNIT_OF_MEASUREMENT)
+        if unit is None:
+            continue
+        has_sum = (
+            unit in SUM_UNITS
+            or attributes.get(ATTR_DEVICE_CLASS) == DEVICE_CLASS_ENERGY
+        )
+        yield entity_id, value, dt_util.utc_from_timestamp(last_updated_ts), has_sum
+
+
+def _compile_states(
+    states: list[tuple[float, datetime, bool]],
+    start: datetime,
+    end: datetime,
+    start_value: float | None,
+    start_sum: float | None,
+) -> dict[str, float | None]:
+    """Compile the statistics of the states of one entity.
+
+    The mean is weighted by the time each value was held.
+    """
+    values = [value for value, _, _ in states]
+    if start_value is not None:
+        values.append(start_value)
+
+    weighted_sum = 0.0
+    held_since = start if start_value is not None else states[0][1]
+    held_value = start_value if start_value is not None else states[0][0]
+    for value, last_updated, _ in states:
+        weighted_sum += held_value * (last_updated - held_since).total_seconds()
+        held_since, held_value = last_updated, value
+    weighted_sum += held_value * (end - held_since).total_seconds()
+    duration = (
+        end - (start if start_value is not None else states[0][1])
+    ).total_seconds()
+
+    stats: dict[str, float | None] = {
+        "mean": weighted_sum / duration if duration else held_value,
+        "min": min(values),
+        "max": max(values),
+        "last": held_value,
+        "sum": None,
+    }
+
+    if states[-1][2]:
+        total = start_sum or 0.0
+        previous_value = start_value
+        for value, _, _ in states:
+            if previous_value is not None:
+                # A decrease is a meter reset, count from zero
+                total += value - previous_value if value >= previous_value else value
+            previous_value = value
+        stats["sum"] = total
+
+    return stats
+
+
+def _compile_hourly_statistics(
+    session: Session, start: datetime, end: datetime
+) -> None:
+    """Compile the hourly statistics from the short term statistics of an hour."""
+    query = (
+        session.query(
+            StatisticsShortTerm.statistic_id,
+            StatisticsShortTerm.mean,
+            StatisticsShortTerm.min,
+            StatisticsShortTerm.max,
+            StatisticsShortTerm.last,
+            StatisticsShortTerm.sum,
+        )
+        .filter(StatisticsShortTerm.start >= start)
+        .filter(StatisticsShortTerm.start < end)
+        .order_by(StatisticsShortTerm.statistic_id, StatisticsShortTerm.start)
+    )
+    rows = []
+    for statistic_id, group in groupby(query, lambda row: row.statistic_id):
+        periods = list(group)
+        rows.append(
+            Statistics.row_from_stats(
+                statistic_id,
+                start,
+                {
+                    "mean": sum(row.mean for row in periods) / len(periods),
+                    "min": min(row.min for row in periods),
+                    "max": max(row.max for row in periods),
+                    "last": periods[-1].last,
+                    "sum": periods[-1].sum,
+                },
+            )
+        )
+
+    if rows:
+        session.execute(Statistics.__table__.insert(), rows)
+    _LOGGER.debug(
+        "Compiled hourly statistics of %s entities for %s-%s", len(rows), start, end
+    )
+
+
+def statistics_during_period(
+    hass: HomeAssistant,
+    start_time: datetime,
+    end_time: datetime | None = None,
+    statistic_ids: list[str] | None = None,
+    period: str = PERIOD_HOUR,
+) -> dict[str, list[dict[str, Any]]]:
+    """Return the statistics of the periods starting between start_time and end_time."""
+    table = STATISTICS_TABLES[period]
+    with session_scope(hass=hass, read_only=True) as session:
+        query = session.query(
+            *(getattr(table, column) for column in QUERY_STATISTICS)
+        ).filter(table.start >= start_time)
+        if end_time is not None:
+            query = query.filter(table.start < end_time)
+        if statistic_ids is not None:
+            query = query.filter(table.statistic_id.in_(statistic_ids))
+        query = query.order_by(table.statistic_id, table.start)
+
+        return {
+            statistic_id: [
+                {
+                    "statistic_id": statistic_id,
+                    "start": process_timestamp_to_utc_isoformat(row.start),
+                    "mean": row.mean,
+                    "min": row.min,
+                    "max": row.max,
+                    "last": row.last,
+                    "sum": row.sum,
+                }
+                for row in group
+            ]
+            for statistic_id, group in groupby(query, lambda row: row.statistic_id)
+        }
@@ -37,11 +37,27 @@ MAX_RESTART_TIME = timedelta(minutes=10)
 
 @contextmanager
 def session_scope(
-    *, hass: HomeAssistant | None = None, session: Session | None = None
+    *,
+    hass: HomeAssistant | None = None,
+    session: Session | None = None,
+    read_only: bool = False,
+    stream: bool = False,
 ) -> Generator[Session, None, None]:
-    """Provide a transactional scope around a series of operations."""
+    """Provide a transactional scope around a series of operations.
+
+    With read_only the session is checked out of the read pool
+    which is shared by the queries running alongside the recorder.
+    With stream it is checked out of the pool of the streamed
+    responses, it is not scoped to the current thread.
+    """
     if session is None and hass is not None:
-        session = hass.data[DATA_INSTANCE].get_session()
+        instance = hass.data[DATA_INSTANCE]
+        if stream:
+            session = instance.get_stream_session()
+        elif read_only:
+            session = instance.get_read_session()
+        else:
+            session = instance.get_session()
 
     if session is None:
         raise RuntimeError("Session required")
@@ -248,6 +264,9 @@ def setup_connection_for_dialect(dialect_name, dbapi_connection):
     if dialect_name == "sqlite":
         old_isolation = dbapi_connection.isolation_level
         dbapi_connection.isolation_level = None
+        # Only takes effect on a new database, an existing one
+        # is converted by the schema migration
+        execute_on_connection(dbapi_connection, "PRAGMA auto_vacuum=INCREMENTAL")
         execute_on_connection(dbapi_connection, "PRAGMA journal_mode=WAL")
         dbapi_connection.isolation_level = old_isolation
         # WAL mode only needs to be setup once
@@ -261,6 +280,23 @@ def setup_connection_for_dialect(dialect_name, dbapi_connection):
     return False
 
 
+def setup_read_connection_for_dialect(dialect_name, dbapi_connection):
+    """Execute statements needed for a read only connection."""
+    if dialect_name == "sqlite":
+        # The database is in WAL mode so readers never block the writer
+        execute_on_connection(dbapi_connection, "PRAGMA query_only=ON")
+    elif dialect_name == "mysql":
+        execute_on_connection(dbapi_connection, "SET session wait_timeout=28800")
+        execute_on_connection(dbapi_connection, "SET SESSION TRANSACTION READ ONLY")
+    elif dialect_name == "postgresql":
+        execute_on_connection(
+            dbapi_connection, "SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY"
+        )
+        # Session characteristics set inside a transaction
+        # are reverted if that transaction is rolled back
+        dbapi_connection.commit()
+
+
 def end_incomplete_runs(session, start_time):
     """End any incomplete recorder runs."""
     for run in session.query(RecorderRuns).filter_by(end=None):
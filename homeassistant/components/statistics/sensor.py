@@ -5,7 +5,10 @@ import statistics
 
 import voluptuous as vol
 
-from homeassistant.components.recorder.models import States
+from homeassistant.components.recorder.models import (
+    States,
+    process_datetime_to_timestamp,
+)
 from homeassistant.components.recorder.util import execute, session_scope
 from homeassistant.components.sensor import PLATFORM_SCHEMA, SensorEntity
 from homeassistant.const import (
@@ -324,7 +327,7 @@ class StatisticsSensor(SensorEntity):
 
         _LOGGER.debug("%s: initializing values from the database", self.entity_id)
 
-        with session_scope(hass=self.hass) as session:
+        with session_scope(hass=self.hass, read_only=True) as session:
             query = session.query(States).filter(
                 States.entity_id == self._entity_id.lower()
             )
@@ -336,11 +339,14 @@ class StatisticsSensor(SensorEntity):
                     self.entity_id,
                     records_older_then,
                 )
-                query = query.filter(States.last_updated >= records_older_then)
+                query = query.filter(
+                    States.last_updated_ts
+                    >= process_datetime_to_timestamp(records_older_then)
+                )
             else:
                 _LOGGER.debug("%s: retrieving all records", self.entity_id)
 
-            query = query.order_by(States.last_updated.desc()).limit(
+            query = query.order_by(States.last_updated_ts.desc()).limit(
                 self._sampling_size
             )
             states = execute(query, to_native=True, validate_entity_ids=False)
@@ -7,7 +7,8 @@ from typing import Any
 
 import voluptuous as vol
 
-from homeassistant.core import Event
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import Event, State
 from homeassistant.helpers import config_validation as cv
 from homeassistant.util.json import (
     find_paths_unserializable_data,
@@ -32,6 +33,11 @@ BASE_COMMAND_MESSAGE_SCHEMA = vol.Schema({vol.Required("id"): cv.positive_int})
 IDEN_TEMPLATE = "__IDEN__"
 IDEN_JSON_TEMPLATE = '"__IDEN__"'
 
+DATA_TEMPLATE = "__DATA__"
+DATA_JSON_TEMPLATE = '"__DATA__"'
+
+STATE_CHANGED_DATA_KEYS = {"entity_id", "old_state", "new_state"}
+
 
 def result_message(iden: int, result: Any = None) -> dict:
     """Return a success result message."""
@@ -72,9 +78,44 @@ def _cached_event_message(event: Event) -> str:
     The IDEN_TEMPLATE is used which will be replaced
     with the actual iden in cached_event_message
     """
+    if (
+        event.event_type == EVENT_STATE_CHANGED
+        and event.data.keys() == STATE_CHANGED_DATA_KEYS
+    ):
+        try:
+            data_json = _state_changed_data_json(event.data)
+        except (ValueError, TypeError):
+            # Serialized again below to report the bad data
+            pass
+        else:
+            event_dict = {**event.as_dict(), "data": DATA_TEMPLATE}
+            return message_to_json(event_message(IDEN_TEMPLATE, event_dict)).replace(
+                DATA_JSON_TEMPLATE, data_json, 1
+            )
+
     return message_to_json(event_message(IDEN_TEMPLATE, event))
 
 
+def _state_changed_data_json(data: dict[str, Any]) -> str:
+    """Serialize the data of a state_changed event.
+
+    The states reuse their cached JSON, the old state was
+    serialized already as the new state of the previous event.
+    """
+    return (
+        f'{{"entity_id":{const.JSON_DUMP(data["entity_id"])},'
+        f'"old_state":{_state_json(data["old_state"])},'
+        f'"new_state":{_state_json(data["new_state"])}}}'
+    )
+
+
+def _state_json(state: Any) -> str:
+    """Return the cached JSON of a state."""
+    if isinstance(state, State):
+        return state.as_json()
+    return const.JSON_DUMP(state)
+
+
 def message_to_json(message: Any) -> str:
     """Serialize a websocket message to json."""
     try:
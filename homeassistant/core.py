@@ -27,6 +27,7 @@ import yarl
 from homeassistant import block_async_io, loader, util
 from homeassistant.const import (
     ATTR_DOMAIN,
+    ATTR_ENTITY_ID,
     ATTR_FRIENDLY_NAME,
     ATTR_NOW,
     ATTR_SECONDS,
@@ -58,6 +59,7 @@ from homeassistant.exceptions import (
     ServiceNotFound,
     Unauthorized,
 )
+from homeassistant.helpers.json import json_dumps
 from homeassistant.util import location
 from homeassistant.util.async_ import (
     fire_coroutine_threadsafe,
@@ -647,12 +649,87 @@ class Event:
         )
 
 
+class ListenerProfile:
+    """Cumulative time spent running one event listener."""
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self) -> None:
+        """Initialize the profile."""
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, elapsed: float) -> None:
+        """Record one run of the listener."""
+        self.count += 1
+        self.total += elapsed
+        if elapsed > self.max:
+            self.max = elapsed
+
+    def as_dict(self) -> dict[str, float]:
+        """Return the profile as a dictionary."""
+        return {"count": self.count, "total": self.total, "max": self.max}
+
+
+def _listener_name(target: Callable) -> str:
+    """Return the name a listener is profiled under."""
+    while isinstance(target, functools.partial):
+        target = target.func
+    name = getattr(target, "__qualname__", None) or repr(target)
+    return f"{getattr(target, '__module__', None)}.{name}"
+
+
+def _profiled_job(job: HassJob, profile: ListenerProfile) -> HassJob:
+    """Return a job that records the time job takes into profile.
+
+    The time of a coroutine includes the time it awaits.
+    """
+    target = job.target
+
+    if job.job_type == HassJobType.Coroutinefunction:
+
+        async def _profiled_coroutine(*args: Any) -> None:
+            start = monotonic()
+            try:
+                await target(*args)
+            finally:
+                profile.record(monotonic() - start)
+
+        return HassJob(_profiled_coroutine)
+
+    def _profiled(*args: Any) -> None:
+        start = monotonic()
+        try:
+            target(*args)
+        finally:
+            profile.record(monotonic() - start)
+
+    if job.job_type == HassJobType.Callback:
+        return HassJob(callback(_profiled))
+    return HassJob(_profiled)
+
+
 class EventBus:
     """Allow the firing of and listening for events."""
 
     def __init__(self, hass: HomeAssistant) -> None:
-        """Initialize a new event bus."""
+        """Initialize a new event bus.
+
+        The listener lists are replaced instead of changed in place when
+        a listener is added or removed, so firing iterates them without
+        making a copy.
+        """
         self._listeners: dict[str, list[tuple[HassJob, Callable | None]]] = {}
+        self._entity_id_listeners: dict[
+            str, dict[str, list[tuple[HassJob, Callable | None]]]
+        ] = {}
+        self._domain_listeners: dict[
+            str, dict[str, list[tuple[HassJob, Callable | None]]]
+        ] = {}
+        self._keyed_listener_count: dict[str, int] = {}
+        self._keyed_dispatchers: dict[str, tuple[HassJob, Callable | None]] = {}
+        self._listener_profile: dict[str, ListenerProfile] | None = None
         self._hass = hass
 
     @callback
@@ -661,13 +738,40 @@ class EventBus:
 
         This method must be run in the event loop.
         """
-        return {key: len(self._listeners[key]) for key in self._listeners}
+        # The keyed listeners are counted instead of their dispatcher
+        return {
+            key: len(self._listeners[key])
+            - (key in self._keyed_dispatchers)
+            + self._keyed_listener_count.get(key, 0)
+            for key in self._listeners
+        }
 
     @property
     def listeners(self) -> dict[str, int]:
         """Return dictionary with events and the number of listeners."""
         return run_callback_threadsafe(self._hass.loop, self.async_listeners).result()
 
+    @callback
+    def async_set_profiling(self, enabled: bool) -> None:
+        """Start or stop recording the time each listener takes.
+
+        Starting again discards the previous profile.
+
+        This method must be run in the event loop.
+        """
+        self._listener_profile = {} if enabled else None
+
+    @callback
+    def async_listener_profile(self) -> dict[str, dict[str, float]]:
+        """Return the time spent per listener since profiling started.
+
+        This method must be run in the event loop.
+        """
+        return {
+            name: profile.as_dict()
+            for name, profile in (self._listener_profile or {}).items()
+        }
+
     def fire(
         self,
         event_type: str,
@@ -696,21 +800,31 @@ class EventBus:
         if len(event_type) > MAX_LENGTH_EVENT_TYPE:
             raise MaxLengthExceeded(event_type, "event_type", MAX_LENGTH_EVENT_TYPE)
 
-        listeners = self._listeners.get(event_type, [])
+        listeners = self._listeners.get(event_type)
 
         # EVENT_HOMEASSISTANT_CLOSE should go only to his listeners
-        match_all_listeners = self._listeners.get(MATCH_ALL)
-        if match_all_listeners is not None and event_type != EVENT_HOMEASSISTANT_CLOSE:
-            listeners = match_all_listeners + listeners
+        match_all_listeners = None
+        if event_type != EVENT_HOMEASSISTANT_CLOSE:
+            match_all_listeners = self._listeners.get(MATCH_ALL)
 
         event = Event(event_type, event_data, origin, time_fired, context)
 
         if event_type != EVENT_TIME_CHANGED:
             _LOGGER.debug("Bus:Handling %s", event)
 
-        if not listeners:
-            return
+        if match_all_listeners is not None:
+            for job in self._async_filter_listeners(match_all_listeners, event):
+                self._hass.async_add_hass_job(job, event)
+        if listeners is not None:
+            for job in self._async_filter_listeners(listeners, event):
+                self._hass.async_add_hass_job(job, event)
 
+    @callback
+    def _async_filter_listeners(
+        self, listeners: list[tuple[HassJob, Callable | None]], event: Event
+    ) -> list[HassJob]:
+        """Return the jobs of the listeners whose filter accepts the event."""
+        jobs = []
         for job, event_filter in listeners:
             if event_filter is not None:
                 try:
@@ -719,7 +833,51 @@ class EventBus:
                 except Exception:  # pylint: disable=broad-except
                     _LOGGER.exception("Error in event filter")
                     continue
-            self._hass.async_add_hass_job(job, event)
+            jobs.append(self._async_profile_job(job))
+        return jobs
+
+    @callback
+    def _async_profile_job(self, job: HassJob) -> HassJob:
+        """Return the job to run for a listener, timed while profiling.
+
+        The keyed listeners are timed instead of their dispatcher.
+        """
+        if (
+            self._listener_profile is None
+            or job.target == self._async_run_keyed_listeners
+        ):
+            return job
+        name = _listener_name(job.target)
+        profile = self._listener_profile.get(name)
+        if profile is None:
+            profile = self._listener_profile[name] = ListenerProfile()
+        return _profiled_job(job, profile)
+
+    @callback
+    def _async_run_keyed_listeners(self, event: Event) -> None:
+        """Run the listeners keyed by the entity_id or domain of an event.
+
+        This is the dispatcher listening for the event type. The keys
+        are looked up when the event is handled, so listeners added by
+        a keyed listener run for events fired before they were added.
+        An error in one listener is logged without skipping the others.
+        """
+        entity_id: str = event.data[ATTR_ENTITY_ID]
+        for keyed_listeners, key in (
+            (self._entity_id_listeners, entity_id),
+            (self._domain_listeners, entity_id.partition(".")[0]),
+            (self._domain_listeners, MATCH_ALL),
+        ):
+            listeners = keyed_listeners.get(event.event_type, {}).get(key)
+            if listeners is None:
+                continue
+            for job in self._async_filter_listeners(listeners, event):
+                try:
+                    self._hass.async_run_hass_job(job, event)
+                except Exception:  # pylint: disable=broad-except
+                    _LOGGER.exception(
+                        "Error while processing event %s for %s", event, key
+                    )
 
     def listen(self, event_type: str, listener: Callable) -> CALLBACK_TYPE:
         """Listen for all events or events of a specific type.
@@ -765,7 +923,10 @@ class EventBus:
     def _async_listen_filterable_job(
         self, event_type: str, filterable_job: tuple[HassJob, Callable | None]
     ) -> CALLBACK_TYPE:
-        self._listeners.setdefault(event_type, []).append(filterable_job)
+        self._listeners[event_type] = [
+            *self._listeners.get(event_type, ()),
+            filterable_job,
+        ]
 
         def remove_listener() -> None:
             """Remove the listener."""
@@ -773,6 +934,66 @@ class EventBus:
 
         return remove_listener
 
+    @callback
+    def async_listen_keyed(
+        self,
+        event_type: str,
+        listener: Callable,
+        *,
+        entity_ids: Iterable[str] = (),
+        domains: Iterable[str] = (),
+        event_filter: Callable | None = None,
+    ) -> CALLBACK_TYPE:
+        """Listen for events of a specific type by the entity_id in their data.
+
+        The listener runs for the events of the entity_ids and of all
+        entities in the domains, the MATCH_ALL domain matches every
+        entity. Entity ids and domains are looked up separately, so an
+        entity id only matches itself.
+        Looking up the keys replaces calling an event filter per listener.
+
+        The keyed listeners of an event type are run by one dispatcher
+        listening for the event type. Like other listeners it runs in
+        the order it was added, with the first keyed listener of the
+        event type.
+
+        An optional event_filter, which must be a callable decorated with
+        @callback that returns a boolean value, determines if the
+        listener callable should run.
+
+        This method must be run in the event loop.
+        """
+        if event_filter is not None and not is_callback(event_filter):
+            raise HomeAssistantError(f"Event filter {event_filter} is not a callback")
+        keys = (
+            (self._entity_id_listeners, list(entity_ids)),
+            (self._domain_listeners, list(domains)),
+        )
+        filterable_job = (HassJob(listener), event_filter)
+        for listeners_by_type, type_keys in keys:
+            if not type_keys:
+                continue
+            keyed_listeners = listeners_by_type.setdefault(event_type, {})
+            for key in type_keys:
+                keyed_listeners[key] = [*keyed_listeners.get(key, ()), filterable_job]
+        self._keyed_listener_count[event_type] = (
+            self._keyed_listener_count.get(event_type, 0) + 1
+        )
+        if event_type not in self._keyed_dispatchers:
+            dispatcher = (
+                HassJob(self._async_run_keyed_listeners),
+                _async_has_entity_id_str,
+            )
+            self._keyed_dispatchers[event_type] = dispatcher
+            self._async_listen_filterable_job(event_type, dispatcher)
+
+        @callback
+        def remove_listener() -> None:
+            """Remove the listener."""
+            self._async_remove_keyed_listener(event_type, keys, filterable_job)
+
+        return remove_listener
+
     def listen_once(
         self, event_type: str, listener: Callable[[Event], None]
     ) -> CALLBACK_TYPE:
@@ -826,6 +1047,89 @@ class EventBus:
 
         return self._async_listen_filterable_job(event_type, filterable_job)
 
+    @callback
+    def async_listen_batched(
+        self,
+        event_type: str,
+        listener: Callable[[list[Event]], Any],
+        max_delay: float = 0,
+        max_batch: int | None = None,
+        event_filter: Callable | None = None,
+    ) -> CALLBACK_TYPE:
+        """Listen for events of a specific type delivered in batches.
+
+        The listener is called with the list of events fired since its
+        previous call, at most max_delay seconds after the first of them.
+        With the default max_delay of 0 the events fired during one
+        iteration of the event loop are delivered together. A batch that
+        reaches max_batch events is delivered right away.
+
+        An optional event_filter, which must be a callable decorated with
+        @callback that returns a boolean value, determines if an event is
+        added to the batch.
+
+        Events still pending when the listener is removed are dropped.
+
+        This method must be run in the event loop.
+        """
+        if event_filter is not None and not is_callback(event_filter):
+            raise HomeAssistantError(f"Event filter {event_filter} is not a callback")
+
+        job = HassJob(listener)
+        pending: list[Event] = []
+        scheduled: asyncio.Handle | asyncio.Task[None] | None = None
+        removed = False
+
+        @callback
+        def _flush() -> None:
+            """Deliver the pending events to the listener."""
+            nonlocal pending, scheduled
+            scheduled = None
+            events, pending = pending, []
+            if events:
+                self._hass.async_run_hass_job(self._async_profile_job(job), events)
+
+        async def _async_flush() -> None:
+            """Deliver the events fired in this iteration of the event loop."""
+            _flush()
+
+        @callback
+        def _batching_listener(event: Event) -> None:
+            """Add the event to the batch and schedule its delivery."""
+            nonlocal scheduled
+            # The listener may have been lined up before it was removed
+            if removed:
+                return
+            pending.append(event)
+            if max_batch is not None and len(pending) >= max_batch:
+                if scheduled is not None:
+                    scheduled.cancel()
+                _flush()
+            elif scheduled is None:
+                if max_delay:
+                    scheduled = self._hass.loop.call_later(max_delay, _flush)
+                else:
+                    # A task runs after the listeners of the events already
+                    # fired and is awaited by async_block_till_done
+                    scheduled = self._hass.async_create_task(_async_flush())
+
+        remove_batching_listener = self._async_listen_filterable_job(
+            event_type, (HassJob(_batching_listener), event_filter)
+        )
+
+        @callback
+        def remove_listener() -> None:
+            """Remove the listener and drop the pending events."""
+            nonlocal scheduled, removed
+            removed = True
+            remove_batching_listener()
+            if scheduled is not None:
+                scheduled.cancel()
+                scheduled = None
+            pending.clear()
+
+        return remove_listener
+
     @callback
     def _async_remove_listener(
         self, event_type: str, filterable_job: tuple[HassJob, Callable | None]
@@ -835,17 +1139,68 @@ class EventBus:
         This method must be run in the event loop.
         """
         try:
-            self._listeners[event_type].remove(filterable_job)
-
-            # delete event_type list if empty
-            if not self._listeners[event_type]:
-                self._listeners.pop(event_type)
+            listeners = [*self._listeners[event_type]]
+            listeners.remove(filterable_job)
         except (KeyError, ValueError):
             # KeyError is key event_type listener did not exist
             # ValueError if listener did not exist within event_type
             _LOGGER.exception(
                 "Unable to remove unknown job listener %s", filterable_job
             )
+            return
+
+        # delete event_type list if empty
+        if listeners:
+            self._listeners[event_type] = listeners
+        else:
+            self._listeners.pop(event_type)
+
+    @callback
+    def _async_remove_keyed_listener(
+        self,
+        event_type: str,
+        keys: tuple[tuple[dict, list[str]], ...],
+        filterable_job: tuple[HassJob, Callable | None],
+    ) -> None:
+        """Remove a listener of a specific event_type by key.
+
+        This method must be run in the event loop.
+        """
+        for listeners_by_type, type_keys in keys:
+            if not type_keys:
+                continue
+            keyed_listeners = listeners_by_type[event_type]
+            for key in type_keys:
+                listeners = [*keyed_listeners[key]]
+                listeners.remove(filterable_job)
+                if listeners:
+                    keyed_listeners[key] = listeners
+                else:
+                    del keyed_listeners[key]
+            if not keyed_listeners:
+                del listeners_by_type[event_type]
+
+        self._keyed_listener_count[event_type] -= 1
+        if not self._keyed_listener_count[event_type]:
+            del self._keyed_listener_count[event_type]
+            self._async_remove_listener(
+                event_type, self._keyed_dispatchers.pop(event_type)
+            )
+
+
+@callback
+def _async_has_entity_id_str(event: Event) -> bool:
+    """Return if the event has a single entity_id to dispatch on."""
+    return isinstance(event.data.get(ATTR_ENTITY_ID), str)
+
+
+def _validate_state(entity_id: str, state: str) -> None:
+    """Raise if state is not a valid state of entity_id."""
+    if not valid_state(state):
+        raise InvalidStateError(
+            f"Invalid state encountered for entity ID: {entity_id}. "
+            "State max length is 255 characters."
+        )
 
 
 class State:
@@ -871,6 +1226,8 @@ class State:
         "domain",
         "object_id",
         "_as_dict",
+        "_as_json",
+        "_attributes_json",
     ]
 
     def __init__(
@@ -892,11 +1249,7 @@ class State:
                 "Format should be <domain>.<object_id>"
             )
 
-        if not valid_state(state):
-            raise InvalidStateError(
-                f"Invalid state encountered for entity ID: {entity_id}. "
-                "State max length is 255 characters."
-            )
+        _validate_state(entity_id, state)
 
         self.entity_id = entity_id.lower()
         self.state = state
@@ -906,6 +1259,49 @@ class State:
         self.context = context or Context()
         self.domain, self.object_id = split_entity_id(self.entity_id)
         self._as_dict: dict[str, Collection[Any]] | None = None
+        self._as_json: str | None = None
+        self._attributes_json: str | None = None
+
+    def _async_successor(
+        self,
+        state: str,
+        attributes: Mapping[str, Any],
+        last_changed: datetime.datetime | None,
+        last_updated: datetime.datetime,
+        context: Context,
+    ) -> State:
+        """Return the next state of the entity of this state.
+
+        The entity_id is not validated and split again and the read-only
+        mapping of attributes is reused when they are passed as one.
+        Subclasses of State go through the constructor instead.
+        """
+        if type(self) is not State:  # pylint: disable=unidiomatic-typecheck
+            return State(
+                self.entity_id, state, attributes, last_changed, last_updated, context
+            )
+
+        _validate_state(self.entity_id, state)
+
+        successor: State = object.__new__(State)
+        successor.entity_id = self.entity_id
+        successor.domain = self.domain
+        successor.object_id = self.object_id
+        successor.state = state
+        successor.attributes = (
+            attributes
+            if isinstance(attributes, MappingProxyType)
+            else MappingProxyType(attributes)
+        )
+        successor.last_updated = last_updated
+        successor.last_changed = last_changed or last_updated
+        successor.context = context
+        successor._as_dict = None
+        successor._as_json = None
+        successor._attributes_json = (
+            self._attributes_json if successor.attributes is self.attributes else None
+        )
+        return successor
 
     @property
     def name(self) -> str:
@@ -938,6 +1334,39 @@ class State:
             }
         return self._as_dict
 
+    def as_json(self) -> str:
+        """Return the JSON of the dict representation of the State.
+
+        Async friendly.
+
+        The JSON is serialized once and shared by all consumers of the
+        state. Raises TypeError or ValueError if the attributes can not
+        be serialized.
+        """
+        if self._as_json is None:
+            as_dict = self.as_dict()
+            self._as_json = (
+                f'{{"entity_id":{json_dumps(self.entity_id)},'
+                f'"state":{json_dumps(self.state)},'
+                f'"attributes":{self.attributes_json()},'
+                f'"last_changed":"{as_dict["last_changed"]}",'
+                f'"last_updated":"{as_dict["last_updated"]}",'
+                f'"context":{json_dumps(as_dict["context"])}}}'
+            )
+        return self._as_json
+
+    def attributes_json(self) -> str:
+        """Return the JSON of the attributes of the State.
+
+        Async friendly.
+
+        States that kept the attributes of their previous state reuse its
+        JSON.
+        """
+        if self._attributes_json is None:
+            self._attributes_json = json_dumps(dict(self.attributes))
+        return self._attributes_json
+
     @classmethod
     def from_dict(cls, json_dict: dict) -> Any:
         """Initialize a state from a dict.
@@ -993,11 +1422,18 @@ class State:
 
 
 class StateMachine:
-    """Helper class that tracks the state of different entities."""
+    """Helper class that tracks the state of different entities.
+
+    The states are also indexed by domain, with the entity ids sorted
+    per domain on demand. Updating a state keeps the sorted entity ids,
+    adding or removing one drops those of its domain.
+    """
 
     def __init__(self, bus: EventBus, loop: asyncio.events.AbstractEventLoop) -> None:
         """Initialize state machine."""
         self._states: dict[str, State] = {}
+        self._domain_index: dict[str, dict[str, State]] = {}
+        self._sorted_entity_ids: dict[str | None, list[str]] = {}
         self._reservations: set[str] = set()
         self._bus = bus
         self._loop = loop
@@ -1021,12 +1457,12 @@ class StateMachine:
             return list(self._states)
 
         if isinstance(domain_filter, str):
-            domain_filter = (domain_filter.lower(),)
+            return list(self._domain_index.get(domain_filter.lower(), ()))
 
         return [
-            state.entity_id
-            for state in self._states.values()
-            if state.domain in domain_filter
+            entity_id
+            for domain_states in self._async_domain_states(domain_filter)
+            for entity_id in domain_states
         ]
 
     @callback
@@ -1041,10 +1477,11 @@ class StateMachine:
             return len(self._states)
 
         if isinstance(domain_filter, str):
-            domain_filter = (domain_filter.lower(),)
+            return len(self._domain_index.get(domain_filter.lower(), ()))
 
-        return len(
-            [None for state in self._states.values() if state.domain in domain_filter]
+        return sum(
+            len(domain_states)
+            for domain_states in self._async_domain_states(domain_filter)
         )
 
     def all(self, domain_filter: str | Iterable | None = None) -> list[State]:
@@ -1063,10 +1500,40 @@ class StateMachine:
             return list(self._states.values())
 
         if isinstance(domain_filter, str):
-            domain_filter = (domain_filter.lower(),)
+            domain_states = self._domain_index.get(domain_filter.lower())
+            return [] if domain_states is None else list(domain_states.values())
+
+        return [
+            state
+            for domain_states in self._async_domain_states(domain_filter)
+            for state in domain_states.values()
+        ]
+
+    @callback
+    def async_all_sorted(self, domain_filter: str | None = None) -> list[State]:
+        """Create a list of the states of a domain sorted by entity id.
+
+        This method must be run in the event loop.
+        """
+        if domain_filter is None:
+            states = self._states
+        else:
+            domain_filter = domain_filter.lower()
+            states = self._domain_index.get(domain_filter, {})
 
+        entity_ids = self._sorted_entity_ids.get(domain_filter)
+        if entity_ids is None:
+            entity_ids = self._sorted_entity_ids[domain_filter] = sorted(states)
+
+        return [states[entity_id] for entity_id in entity_ids]
+
+    @callback
+    def _async_domain_states(self, domains: Iterable[str]) -> list[dict[str, State]]:
+        """Return the indexed states of each domain."""
         return [
-            state for state in self._states.values() if state.domain in domain_filter
+            self._domain_index[domain]
+            for domain in dict.fromkeys(domains)
+            if domain in self._domain_index
         ]
 
     def get(self, entity_id: str) -> State | None:
@@ -1110,6 +1577,13 @@ class StateMachine:
         if old_state is None:
             return False
 
+        domain_states = self._domain_index[old_state.domain]
+        del domain_states[entity_id]
+        if not domain_states:
+            del self._domain_index[old_state.domain]
+        self._sorted_entity_ids.pop(old_state.domain, None)
+        self._sorted_entity_ids.pop(None, None)
+
         self._bus.async_fire(
             EVENT_STATE_CHANGED,
             {"entity_id": entity_id, "old_state": old_state, "new_state": None},
@@ -1194,7 +1668,9 @@ class StateMachine:
             last_changed = None
         else:
             same_state = old_state.state == new_state and not force_update
-            same_attr = old_state.attributes == MappingProxyType(attributes)
+            same_attr = (
+                attributes is old_state.attributes or old_state.attributes == attributes
+            )
             last_changed = old_state.last_changed if same_state else None
 
         if same_state and same_attr:
@@ -1205,16 +1681,25 @@ class StateMachine:
 
         now = dt_util.utcnow()
 
-        state = State(
-            entity_id,
-            new_state,
-            attributes,
-            last_changed,
-            now,
-            context,
-            old_state is None,
-        )
+        if old_state is None:
+            state = State(entity_id, new_state, attributes, None, now, context)
+        else:
+            state = old_state._async_successor(  # pylint: disable=protected-access
+                new_state,
+                # Unchanged attributes share the read-only mapping of the old state
+                old_state.attributes if same_attr else attributes,
+                last_changed,
+                now,
+                context,
+            )
         self._states[entity_id] = state
+        domain_states = self._domain_index.get(state.domain)
+        if domain_states is None:
+            domain_states = self._domain_index[state.domain] = {}
+        if old_state is None:
+            self._sorted_entity_ids.pop(state.domain, None)
+            self._sorted_entity_ids.pop(None, None)
+        domain_states[entity_id] = state
         self._bus.async_fire(
             EVENT_STATE_CHANGED,
             {"entity_id": entity_id, "old_state": old_state, "new_state": state},
@@ -49,6 +49,11 @@ class _DeviceIndex(NamedTuple):
     connections: dict[tuple[str, str], str]
 
 
+class _DeviceEntriesIndex(NamedTuple):
+    area_id: dict[str, dict[str, None]]
+    config_entries: dict[str, dict[str, None]]
+
+
 @attr.s(slots=True, frozen=True)
 class DeviceEntry:
     """Device Registry Entry."""
@@ -157,6 +162,7 @@ class DeviceRegistry:
     deleted_devices: dict[str, DeletedDeviceEntry]
     _registered_index: _DeviceIndex
     _deleted_index: _DeviceIndex
+    _entries_index: _DeviceEntriesIndex
 
     def __init__(self, hass: HomeAssistant) -> None:
         """Initialize the device registry."""
@@ -204,6 +210,7 @@ class DeviceRegistry:
         else:
             devices_index = self._registered_index
             self.devices[device.id] = device
+            _update_device_in_entries_index(self._entries_index, None, device)
 
         _add_device_to_index(devices_index, device)
 
@@ -215,6 +222,7 @@ class DeviceRegistry:
         else:
             devices_index = self._registered_index
             self.devices.pop(device.id)
+            _update_device_in_entries_index(self._entries_index, device, None)
 
         _remove_device_from_index(devices_index, device)
 
@@ -225,17 +233,20 @@ class DeviceRegistry:
         devices_index = self._registered_index
         _remove_device_from_index(devices_index, old_device)
         _add_device_to_index(devices_index, new_device)
+        _update_device_in_entries_index(self._entries_index, old_device, new_device)
 
     def _clear_index(self) -> None:
         """Clear the index."""
         self._registered_index = _DeviceIndex(identifiers={}, connections={})
         self._deleted_index = _DeviceIndex(identifiers={}, connections={})
+        self._entries_index = _DeviceEntriesIndex(area_id={}, config_entries={})
 
     def _rebuild_index(self) -> None:
         """Create the index after loading devices."""
         self._clear_index()
         for device in self.devices.values():
             _add_device_to_index(self._registered_index, device)
+            _update_device_in_entries_index(self._entries_index, None, device)
         for deleted_device in self.deleted_devices.values():
             _add_device_to_index(self._deleted_index, deleted_device)
 
@@ -574,7 +585,7 @@ class DeviceRegistry:
     def async_clear_config_entry(self, config_entry_id: str) -> None:
         """Clear config entry from registry entries."""
         now_time = time.time()
-        for device in list(self.devices.values()):
+        for device in self._async_entries_for("config_entries", config_entry_id):
             self._async_update_device(device.id, remove_config_entry_id=config_entry_id)
         for deleted_device in list(self.deleted_devices.values()):
             config_entries = deleted_device.config_entries
@@ -615,9 +626,14 @@ class DeviceRegistry:
     @callback
     def async_clear_area_id(self, area_id: str) -> None:
         """Clear area id from registry entries."""
-        for dev_id, device in self.devices.items():
-            if area_id == device.area_id:
-                self._async_update_device(dev_id, area_id=None)
+        for device in self._async_entries_for("area_id", area_id):
+            self._async_update_device(device.id, area_id=None)
+
+    @callback
+    def _async_entries_for(self, attr_name: str, value: str) -> list[DeviceEntry]:
+        """Return the devices with an indexed attribute set to or containing value."""
+        device_ids = getattr(self._entries_index, attr_name).get(value, ())
+        return [self.devices[device_id] for device_id in device_ids]
 
 
 @callback
@@ -645,7 +661,8 @@ async def async_get_registry(hass: HomeAssistant) -> DeviceRegistry:
 @callback
 def async_entries_for_area(registry: DeviceRegistry, area_id: str) -> list[DeviceEntry]:
     """Return entries that match an area."""
-    return [device for device in registry.devices.values() if device.area_id == area_id]
+    # pylint: disable=protected-access
+    return registry._async_entries_for("area_id", area_id)
 
 
 @callback
@@ -653,11 +670,8 @@ def async_entries_for_config_entry(
     registry: DeviceRegistry, config_entry_id: str
 ) -> list[DeviceEntry]:
     """Return entries that match a config entry."""
-    return [
-        device
-        for device in registry.devices.values()
-        if config_entry_id in device.config_entries
-    ]
+    # pylint: disable=protected-access
+    return registry._async_entries_for("config_entries", config_entry_id)
 
 
 @callback
@@ -805,3 +819,38 @@ def _remove_device_from_index(
     for connection in device.connections:
         if connection in devices_index.connections:
             del devices_index.connections[connection]
+
+
+def _device_entries_index_keys(
+    device: DeviceEntry | None,
+) -> tuple[set[str], set[str]]:
+    """Return the area and config entries a device is indexed by."""
+    if device is None:
+        return set(), set()
+    area_ids = set() if device.area_id is None else {device.area_id}
+    return area_ids, device.config_entries
+
+
+def _update_device_in_entries_index(
+    entries_index: _DeviceEntriesIndex,
+    old_device: DeviceEntry | None,
+    new_device: DeviceEntry | None,
+) -> None:
+    """Move a device to the index of its new area and config entries.
+
+    Devices stay in place for the keys that did not change.
+    """
+    device = new_device or old_device
+    assert device is not None
+    for index, old_keys, new_keys in zip(
+        entries_index,
+        _device_entries_index_keys(old_device),
+        _device_entries_index_keys(new_device),
+    ):
+        for key in old_keys - new_keys:
+            device_ids = index[key]
+            del device_ids[device.id]
+            if not device_ids:
+                del index[key]
+        for key in new_keys - old_keys:
+            index.setdefault(key, {})[device.id] = None
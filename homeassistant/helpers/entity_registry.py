@@ -12,7 +12,7 @@ from __future__ import annotations
 from collections import OrderedDict
 from collections.abc import Iterable
 import logging
-from typing import TYPE_CHECKING, Any, Callable, cast
+from typing import TYPE_CHECKING, Any, Callable, NamedTuple, cast
 
 import attr
 
@@ -71,6 +71,15 @@ ENTITY_DESCRIBING_ATTRIBUTES = {
 }
 
 
+class _EntityIndex(NamedTuple):
+    """The entity ids of the entries by the value of each attribute."""
+
+    device_id: dict[str, dict[str, None]]
+    area_id: dict[str, dict[str, None]]
+    config_entry_id: dict[str, dict[str, None]]
+    platform: dict[str, dict[str, None]]
+
+
 @attr.s(slots=True, frozen=True)
 class RegistryEntry:
     """Entity Registry Entry."""
@@ -151,6 +160,7 @@ class EntityRegistry:
         self.hass = hass
         self.entities: dict[str, RegistryEntry]
         self._index: dict[tuple[str, str, str], str] = {}
+        self._entries_index = _EntityIndex({}, {}, {}, {})
         self._store = hass.helpers.storage.Store(STORAGE_VERSION, STORAGE_KEY)
         self.hass.bus.async_listen(
             EVENT_DEVICE_REGISTRY_UPDATED, self.async_device_modified
@@ -452,9 +462,9 @@ class EntityRegistry:
         if not new_values:
             return old
 
-        self._remove_index(old)
         new = attr.evolve(old, **new_values)
-        self._register_entry(new)
+        self.entities[entity_id] = new
+        self._update_index(old, new)
 
         self.async_schedule_save()
 
@@ -544,19 +554,20 @@ class EntityRegistry:
     @callback
     def async_clear_config_entry(self, config_entry: str) -> None:
         """Clear config entry from registry entries."""
-        for entity_id in [
-            entity_id
-            for entity_id, entry in self.entities.items()
-            if config_entry == entry.config_entry_id
-        ]:
-            self.async_remove(entity_id)
+        for entry in self._async_entries_for("config_entry_id", config_entry):
+            self.async_remove(entry.entity_id)
 
     @callback
     def async_clear_area_id(self, area_id: str) -> None:
         """Clear area id from registry entries."""
-        for entity_id, entry in self.entities.items():
-            if area_id == entry.area_id:
-                self._async_update_entity(entity_id, area_id=None)
+        for entry in self._async_entries_for("area_id", area_id):
+            self._async_update_entity(entry.entity_id, area_id=None)
+
+    @callback
+    def _async_entries_for(self, attr_name: str, value: str) -> list[RegistryEntry]:
+        """Return the entries with an indexed attribute set to value."""
+        entity_ids = getattr(self._entries_index, attr_name).get(value, ())
+        return [self.entities[entity_id] for entity_id in entity_ids]
 
     def _register_entry(self, entry: RegistryEntry) -> None:
         self.entities[entry.entity_id] = entry
@@ -564,6 +575,7 @@ class EntityRegistry:
 
     def _add_index(self, entry: RegistryEntry) -> None:
         self._index[(entry.domain, entry.platform, entry.unique_id)] = entry.entity_id
+        self._add_entries_index(entry, _EntityIndex._fields)
 
     def _unregister_entry(self, entry: RegistryEntry) -> None:
         self._remove_index(entry)
@@ -571,9 +583,47 @@ class EntityRegistry:
 
     def _remove_index(self, entry: RegistryEntry) -> None:
         del self._index[(entry.domain, entry.platform, entry.unique_id)]
+        self._remove_entries_index(entry, _EntityIndex._fields)
+
+    def _update_index(self, old: RegistryEntry, new: RegistryEntry) -> None:
+        del self._index[(old.domain, old.platform, old.unique_id)]
+        self._index[(new.domain, new.platform, new.unique_id)] = new.entity_id
+        # Entries stay in place in the index of the values that did not change
+        changed: Iterable[str] = _EntityIndex._fields
+        if old.entity_id == new.entity_id:
+            changed = [
+                attr_name
+                for attr_name in changed
+                if getattr(old, attr_name) != getattr(new, attr_name)
+            ]
+        self._remove_entries_index(old, changed)
+        self._add_entries_index(new, changed)
+
+    def _add_entries_index(
+        self, entry: RegistryEntry, attr_names: Iterable[str]
+    ) -> None:
+        for attr_name in attr_names:
+            value = getattr(entry, attr_name)
+            if value is not None:
+                entries_index = getattr(self._entries_index, attr_name)
+                entries_index.setdefault(value, {})[entry.entity_id] = None
+
+    def _remove_entries_index(
+        self, entry: RegistryEntry, attr_names: Iterable[str]
+    ) -> None:
+        for attr_name in attr_names:
+            value = getattr(entry, attr_name)
+            if value is None:
+                continue
+            entries_index = getattr(self._entries_index, attr_name)
+            entity_ids = entries_index[value]
+            del entity_ids[entry.entity_id]
+            if not entity_ids:
+                del entries_index[value]
 
     def _rebuild_index(self) -> None:
         self._index = {}
+        self._entries_index = _EntityIndex({}, {}, {}, {})
         for entry in self.entities.values():
             self._add_index(entry)
 
@@ -605,11 +655,11 @@ def async_entries_for_device(
     registry: EntityRegistry, device_id: str, include_disabled_entities: bool = False
 ) -> list[RegistryEntry]:
     """Return entries that match a device."""
+    # pylint: disable=protected-access
     return [
         entry
-        for entry in registry.entities.values()
-        if entry.device_id == device_id
-        and (not entry.disabled_by or include_disabled_entities)
+        for entry in registry._async_entries_for("device_id", device_id)
+        if not entry.disabled_by or include_disabled_entities
     ]
 
 
@@ -618,7 +668,8 @@ def async_entries_for_area(
     registry: EntityRegistry, area_id: str
 ) -> list[RegistryEntry]:
     """Return entries that match an area."""
-    return [entry for entry in registry.entities.values() if entry.area_id == area_id]
+    # pylint: disable=protected-access
+    return registry._async_entries_for("area_id", area_id)
 
 
 @callback
@@ -626,11 +677,17 @@ def async_entries_for_config_entry(
     registry: EntityRegistry, config_entry_id: str
 ) -> list[RegistryEntry]:
     """Return entries that match a config entry."""
-    return [
-        entry
-        for entry in registry.entities.values()
-        if entry.config_entry_id == config_entry_id
-    ]
+    # pylint: disable=protected-access
+    return registry._async_entries_for("config_entry_id", config_entry_id)
+
+
+@callback
+def async_entries_for_platform(
+    registry: EntityRegistry, platform: str
+) -> list[RegistryEntry]:
+    """Return entries that match a platform."""
+    # pylint: disable=protected-access
+    return registry._async_entries_for("platform", platform)
 
 
 @callback
@@ -722,10 +779,7 @@ async def async_migrate_entries(
     """Migrator of unique IDs."""
     ent_reg = await async_get_registry(hass)
 
-    for entry in ent_reg.entities.values():
-        if entry.config_entry_id != config_entry_id:
-            continue
-
+    for entry in async_entries_for_config_entry(ent_reg, config_entry_id):
         updates = entry_callback(entry)
 
         if updates is not None:
@@ -2,7 +2,8 @@
 from __future__ import annotations
 
 import asyncio
-from collections.abc import Awaitable, Iterable
+from collections.abc import Awaitable, Hashable, Iterable
+from concurrent.futures import ThreadPoolExecutor
 import copy
 from dataclasses import dataclass
 from datetime import datetime, timedelta
@@ -17,6 +18,7 @@ from homeassistant.const import (
     ATTR_ENTITY_ID,
     ATTR_NOW,
     EVENT_CORE_CONFIG_UPDATE,
+    EVENT_HOMEASSISTANT_STOP,
     EVENT_STATE_CHANGED,
     EVENT_TIME_CHANGED,
     MATCH_ALL,
@@ -28,6 +30,7 @@ from homeassistant.core import (
     Event,
     HassJob,
     HomeAssistant,
+    ListenerProfile,
     State,
     callback,
     split_entity_id,
@@ -36,24 +39,36 @@ from homeassistant.exceptions import TemplateError
 from homeassistant.helpers.entity_registry import EVENT_ENTITY_REGISTRY_UPDATED
 from homeassistant.helpers.ratelimit import KeyedRateLimit
 from homeassistant.helpers.sun import get_astral_event_next
-from homeassistant.helpers.template import RenderInfo, Template, result_as_boolean
+from homeassistant.helpers.template import (
+    RenderInfo,
+    RenderInLoopError,
+    StatesSnapshot,
+    Template,
+    result_as_boolean,
+)
 from homeassistant.helpers.typing import TemplateVarsType
 from homeassistant.loader import bind_hass
 from homeassistant.util import dt as dt_util
 from homeassistant.util.async_ import run_callback_threadsafe
 
-TRACK_STATE_CHANGE_CALLBACKS = "track_state_change_callbacks"
-TRACK_STATE_CHANGE_LISTENER = "track_state_change_listener"
-
-TRACK_STATE_ADDED_DOMAIN_CALLBACKS = "track_state_added_domain_callbacks"
-TRACK_STATE_ADDED_DOMAIN_LISTENER = "track_state_added_domain_listener"
-
-TRACK_STATE_REMOVED_DOMAIN_CALLBACKS = "track_state_removed_domain_callbacks"
-TRACK_STATE_REMOVED_DOMAIN_LISTENER = "track_state_removed_domain_listener"
-
 TRACK_ENTITY_REGISTRY_UPDATED_CALLBACKS = "track_entity_registry_updated_callbacks"
 TRACK_ENTITY_REGISTRY_UPDATED_LISTENER = "track_entity_registry_updated_listener"
 
+TRACK_TEMPLATE_SCHEDULER = "track_template_scheduler"
+
+# Batched templates rendering slower than this many seconds in the event
+# loop move to the template workers when they are enabled
+TEMPLATE_WORKER_THRESHOLD = 0.01
+# Templates rendering faster than this many seconds of CPU time in a
+# worker move back to the event loop
+TEMPLATE_LOOP_THRESHOLD = 0.002
+# The seconds of CPU time a render in a worker may take
+TEMPLATE_WORKER_CPU_BUDGET = 1.0
+# Templates exceeding their CPU budget this many times in a row are no
+# longer rendered until their trackers are set up again
+TEMPLATE_WORKER_MAX_BUDGET_FAILURES = 3
+TEMPLATE_WORKERS = 2
+
 _ALL_LISTENER = "all"
 _DOMAINS_LISTENER = "domains"
 _ENTITIES_LISTENER = "entities"
@@ -240,64 +255,18 @@ def async_track_state_change_event(
     Unlike async_track_state_change, async_track_state_change_event
     passes the full event to the callback.
 
-    In order to avoid having to iterate a long list
-    of EVENT_STATE_CHANGED and fire and create a job
-    for each one, we keep a dict of entity ids that
-    care about the state change events so we can
-    do a fast dict lookup to route events.
+    The event bus indexes the listeners by entity_id so
+    routing a state change event is a dict lookup instead
+    of creating a job for every listener that returns right
+    away because the entity_id does not match.
     """
     entity_ids = _async_string_to_lower_list(entity_ids)
     if not entity_ids:
         return _remove_empty_listener
 
-    entity_callbacks = hass.data.setdefault(TRACK_STATE_CHANGE_CALLBACKS, {})
-
-    if TRACK_STATE_CHANGE_LISTENER not in hass.data:
-
-        @callback
-        def _async_state_change_filter(event: Event) -> bool:
-            """Filter state changes by entity_id."""
-            return event.data.get("entity_id") in entity_callbacks
-
-        @callback
-        def _async_state_change_dispatcher(event: Event) -> None:
-            """Dispatch state changes by entity_id."""
-            entity_id = event.data.get("entity_id")
-
-            if entity_id not in entity_callbacks:
-                return
-
-            for job in entity_callbacks[entity_id][:]:
-                try:
-                    hass.async_run_hass_job(job, event)
-                except Exception:  # pylint: disable=broad-except
-                    _LOGGER.exception(
-                        "Error while processing state change for %s", entity_id
-                    )
-
-        hass.data[TRACK_STATE_CHANGE_LISTENER] = hass.bus.async_listen(
-            EVENT_STATE_CHANGED,
-            _async_state_change_dispatcher,
-            event_filter=_async_state_change_filter,
-        )
-
-    job = HassJob(action)
-
-    for entity_id in entity_ids:
-        entity_callbacks.setdefault(entity_id, []).append(job)
-
-    @callback
-    def remove_listener() -> None:
-        """Remove state change listener."""
-        _async_remove_indexed_listeners(
-            hass,
-            TRACK_STATE_CHANGE_CALLBACKS,
-            TRACK_STATE_CHANGE_LISTENER,
-            entity_ids,
-            job,
-        )
-
-    return remove_listener
+    return hass.bus.async_listen_keyed(
+        EVENT_STATE_CHANGED, action, entity_ids=entity_ids
+    )
 
 
 @callback
@@ -392,26 +361,6 @@ def async_track_entity_registry_updated_event(
     return remove_listener
 
 
-@callback
-def _async_dispatch_domain_event(
-    hass: HomeAssistant, event: Event, callbacks: dict[str, list]
-) -> None:
-    domain = split_entity_id(event.data["entity_id"])[0]
-
-    if domain not in callbacks and MATCH_ALL not in callbacks:
-        return
-
-    listeners = callbacks.get(domain, []) + callbacks.get(MATCH_ALL, [])
-
-    for job in listeners:
-        try:
-            hass.async_run_hass_job(job, event)
-        except Exception:  # pylint: disable=broad-except
-            _LOGGER.exception(
-                "Error while processing event %s for domain %s", event, domain
-            )
-
-
 @bind_hass
 def async_track_state_added_domain(
     hass: HomeAssistant,
@@ -423,46 +372,17 @@ def async_track_state_added_domain(
     if not domains:
         return _remove_empty_listener
 
-    domain_callbacks = hass.data.setdefault(TRACK_STATE_ADDED_DOMAIN_CALLBACKS, {})
-
-    if TRACK_STATE_ADDED_DOMAIN_LISTENER not in hass.data:
-
-        @callback
-        def _async_state_change_filter(event: Event) -> bool:
-            """Filter state changes by entity_id."""
-            return event.data.get("old_state") is None
-
-        @callback
-        def _async_state_change_dispatcher(event: Event) -> None:
-            """Dispatch state changes by entity_id."""
-            if event.data.get("old_state") is not None:
-                return
-
-            _async_dispatch_domain_event(hass, event, domain_callbacks)
-
-        hass.data[TRACK_STATE_ADDED_DOMAIN_LISTENER] = hass.bus.async_listen(
-            EVENT_STATE_CHANGED,
-            _async_state_change_dispatcher,
-            event_filter=_async_state_change_filter,
-        )
-
-    job = HassJob(action)
-
-    for domain in domains:
-        domain_callbacks.setdefault(domain, []).append(job)
-
     @callback
-    def remove_listener() -> None:
-        """Remove state change listener."""
-        _async_remove_indexed_listeners(
-            hass,
-            TRACK_STATE_ADDED_DOMAIN_CALLBACKS,
-            TRACK_STATE_ADDED_DOMAIN_LISTENER,
-            domains,
-            job,
-        )
-
-    return remove_listener
+    def _async_state_added_filter(event: Event) -> bool:
+        """Filter state changes of added entities."""
+        return event.data.get("old_state") is None
+
+    return hass.bus.async_listen_keyed(
+        EVENT_STATE_CHANGED,
+        action,
+        domains=domains,
+        event_filter=_async_state_added_filter,
+    )
 
 
 @bind_hass
@@ -476,46 +396,17 @@ def async_track_state_removed_domain(
     if not domains:
         return _remove_empty_listener
 
-    domain_callbacks = hass.data.setdefault(TRACK_STATE_REMOVED_DOMAIN_CALLBACKS, {})
-
-    if TRACK_STATE_REMOVED_DOMAIN_LISTENER not in hass.data:
-
-        @callback
-        def _async_state_change_filter(event: Event) -> bool:
-            """Filter state changes by entity_id."""
-            return event.data.get("new_state") is None
-
-        @callback
-        def _async_state_change_dispatcher(event: Event) -> None:
-            """Dispatch state changes by entity_id."""
-            if event.data.get("new_state") is not None:
-                return
-
-            _async_dispatch_domain_event(hass, event, domain_callbacks)
-
-        hass.data[TRACK_STATE_REMOVED_DOMAIN_LISTENER] = hass.bus.async_listen(
-            EVENT_STATE_CHANGED,
-            _async_state_change_dispatcher,
-            event_filter=_async_state_change_filter,
-        )
-
-    job = HassJob(action)
-
-    for domain in domains:
-        domain_callbacks.setdefault(domain, []).append(job)
-
     @callback
-    def remove_listener() -> None:
-        """Remove state change listener."""
-        _async_remove_indexed_listeners(
-            hass,
-            TRACK_STATE_REMOVED_DOMAIN_CALLBACKS,
-            TRACK_STATE_REMOVED_DOMAIN_LISTENER,
-            domains,
-            job,
-        )
-
-    return remove_listener
+    def _async_state_removed_filter(event: Event) -> bool:
+        """Filter state changes of removed entities."""
+        return event.data.get("new_state") is None
+
+    return hass.bus.async_listen_keyed(
+        EVENT_STATE_CHANGED,
+        action,
+        domains=domains,
+        event_filter=_async_state_removed_filter,
+    )
 
 
 @callback
@@ -767,6 +658,432 @@ def async_track_template(
 track_template = threaded_listener_factory(async_track_template)
 
 
+class _TemplateScheduler:
+    """Re-render the templates of batched trackers once per loop iteration.
+
+    Batched trackers are indexed by the entities, domains and all states
+    the last render of their templates depended on. A state change marks
+    the dependent trackers dirty and a single task re-renders them once
+    the events queued in the same loop iteration are processed. Templates
+    with the same source and no variables are rendered once per flush.
+
+    The renders of all trackers are profiled per template source, the
+    profile of a source is dropped with its last tracker. When the
+    workers are enabled, templates of batched trackers that render
+    slowly in the event loop render in a thread pool against a snapshot
+    of the states instead, until they render fast again. Templates
+    reading the registries always render in the event loop and templates
+    that exceed their CPU budget too often are no longer rendered.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the scheduler."""
+        self.hass = hass
+        self._track_states: dict[_TrackTemplateResultInfo, TrackStates] = {}
+        self._all: set[_TrackTemplateResultInfo] = set()
+        self._domains: dict[str, set[_TrackTemplateResultInfo]] = {}
+        self._entities: dict[str, set[_TrackTemplateResultInfo]] = {}
+        self._pending: dict[_TrackTemplateResultInfo, list[Event]] = {}
+        self._flush_scheduled = False
+        self._render_cache: dict[tuple[str, bool], RenderInfo] | None = None
+        self._unsub_state_changed: CALLBACK_TYPE | None = None
+        self.render_profile: dict[str, ListenerProfile] = {}
+        self._source_trackers: dict[str, int] = {}
+        self._executor: ThreadPoolExecutor | None = None
+        self._unsub_stop: CALLBACK_TYPE | None = None
+        self._offloaded: set[str] = set()
+        self._loop_only: set[str] = set()
+        self._budget_failures: dict[str, int] = {}
+        self._disabled: dict[str, RenderInfo] = {}
+        self._worker_results: dict[int, RenderInfo] = {}
+
+    @callback
+    def async_set_workers(self, enabled: bool) -> None:
+        """Start or stop rendering slow templates in worker threads."""
+        if enabled == (self._executor is not None):
+            return
+
+        if enabled:
+            self._executor = ThreadPoolExecutor(
+                max_workers=TEMPLATE_WORKERS, thread_name_prefix="TemplateWorker"
+            )
+            self._unsub_stop = self.hass.bus.async_listen_once(
+                EVENT_HOMEASSISTANT_STOP, self._async_stop_workers
+            )
+            return
+
+        if self._unsub_stop is not None:
+            self._unsub_stop()
+            self._unsub_stop = None
+        self._offloaded.clear()
+        self._budget_failures.clear()
+        self._disabled.clear()
+        assert self._executor is not None
+        self._executor.shutdown(wait=False)
+        self._executor = None
+
+    @callback
+    def _async_stop_workers(self, event: Event) -> None:
+        """Stop the workers when Home Assistant stops."""
+        self._unsub_stop = None
+        self.async_set_workers(False)
+
+    @callback
+    def async_render_to_info(
+        self, track_template_: TrackTemplate, strict: bool = False
+    ) -> RenderInfo:
+        """Render a template and record the time it took.
+
+        Returns the result of the render in a worker during a flush and
+        the last failed render of a template that is no longer rendered.
+        """
+        info = self._worker_results.pop(id(track_template_), None)
+        if info is not None:
+            return info
+
+        template = track_template_.template
+        info = self._disabled.get(template.template)
+        if info is not None:
+            return info
+        cache_key = None
+        if self._render_cache is not None and not track_template_.variables:
+            # pylint: disable=protected-access
+            cache_key = (template.template, bool(template._strict))
+            info = self._render_cache.get(cache_key)
+            if info is not None:
+                return info
+
+        start = time.monotonic()
+        info = template.async_render_to_info(track_template_.variables, strict=strict)
+        elapsed = time.monotonic() - start
+        self._record_render(template.template, elapsed)
+        if (
+            self._executor is not None
+            and elapsed > TEMPLATE_WORKER_THRESHOLD
+            and template.template not in self._loop_only
+        ):
+            self._offloaded.add(template.template)
+
+        if cache_key is not None:
+            self._render_cache[cache_key] = info  # type: ignore[index]
+        return info
+
+    @callback
+    def async_add_sources(self, sources: Iterable[str]) -> None:
+        """Count a tracker rendering the template sources."""
+        for source in sources:
+            self._source_trackers[source] = self._source_trackers.get(source, 0) + 1
+
+    @callback
+    def async_remove_sources(self, sources: Iterable[str]) -> None:
+        """Forget the sources no tracker renders anymore."""
+        for source in sources:
+            trackers = self._source_trackers[source] - 1
+            if trackers:
+                self._source_trackers[source] = trackers
+                continue
+            del self._source_trackers[source]
+            self.render_profile.pop(source, None)
+            self._offloaded.discard(source)
+            self._loop_only.discard(source)
+            self._budget_failures.pop(source, None)
+            self._disabled.pop(source, None)
+
+    @callback
+    def _record_render(self, source: str, elapsed: float) -> None:
+        # The tracker was removed while its template rendered in a worker
+        if source not in self._source_trackers:
+            return
+        profile = self.render_profile.get(source)
+        if profile is None:
+            profile = self.render_profile[source] = ListenerProfile()
+        profile.record(elapsed)
+
+    @callback
+    def async_update_tracker(
+        self, tracker: _TrackTemplateResultInfo, track_states: TrackStates
+    ) -> None:
+        """Index a tracker by the states its templates depend on."""
+        self._async_unindex_tracker(tracker)
+        self._track_states[tracker] = track_states
+
+        if track_states.all_states:
+            self._all.add(tracker)
+        else:
+            for domain in track_states.domains:
+                self._domains.setdefault(domain, set()).add(tracker)
+            for entity_id in track_states.entities:
+                self._entities.setdefault(entity_id, set()).add(tracker)
+
+        if self._unsub_state_changed is None:
+            self._unsub_state_changed = self.hass.bus.async_listen(
+                EVENT_STATE_CHANGED, self._async_state_changed
+            )
+
+    @callback
+    def async_remove_tracker(self, tracker: _TrackTemplateResultInfo) -> None:
+        """Stop re-rendering the templates of a tracker."""
+        self._async_unindex_tracker(tracker)
+        self._pending.pop(tracker, None)
+
+        if not self._track_states and self._unsub_state_changed is not None:
+            self._unsub_state_changed()
+            self._unsub_state_changed = None
+
+    @callback
+    def _async_unindex_tracker(self, tracker: _TrackTemplateResultInfo) -> None:
+        track_states = self._track_states.pop(tracker, None)
+        if track_states is None:
+            return
+
+        self._all.discard(tracker)
+        for index, keys in (
+            (self._domains, track_states.domains),
+            (self._entities, track_states.entities),
+        ):
+            for key in keys:
+                trackers = index[key]
+                trackers.discard(tracker)
+                if not trackers:
+                    del index[key]
+
+    @callback
+    def _async_state_changed(self, event: Event) -> None:
+        """Mark the trackers depending on the changed entity dirty."""
+        entity_id = event.data[ATTR_ENTITY_ID]
+        dependents = [
+            *self._all,
+            *self._domains.get(split_entity_id(entity_id)[0], ()),
+            *self._entities.get(entity_id, ()),
+        ]
+        if not dependents:
+            return
+
+        for tracker in dependents:
+            events = self._pending.setdefault(tracker, [])
+            # A tracker indexed by both domain and entity sees the event twice
+            if not events or events[-1] is not event:
+                events.append(event)
+
+        if not self._flush_scheduled:
+            self._async_schedule_flush()
+
+    @callback
+    def _async_schedule_flush(self) -> None:
+        self._flush_scheduled = True
+        self.hass.async_create_task(self._async_flush())
+
+    async def _async_flush(self) -> None:
+        """Re-render the dirty trackers.
+
+        State changes while templates render in the workers are left
+        for the next flush, which starts after this one finished.
+        """
+        pending, self._pending = self._pending, {}
+        try:
+            if self._executor is not None and self._offloaded:
+                await self._async_render_in_workers(pending)
+
+            self._render_cache = {}
+            for tracker, events in pending.items():
+                # Removed by the action of a tracker refreshed before it
+                if tracker not in self._track_states:
+                    continue
+                try:
+                    tracker.async_refresh_events(events)
+                except Exception:  # pylint: disable=broad-except
+                    _LOGGER.exception(
+                        "Error while rendering templates of %s",
+                        tracker._track_templates,  # pylint: disable=protected-access
+                    )
+        finally:
+            self._render_cache = None
+            self._worker_results = {}
+            self._flush_scheduled = False
+
+        if self._pending:
+            self._async_schedule_flush()
+
+    async def _async_render_in_workers(
+        self, pending: dict[_TrackTemplateResultInfo, list[Event]]
+    ) -> None:
+        """Render the slow templates triggered by the pending events."""
+        renders: dict[Hashable, list[TrackTemplate]] = {}
+        for tracker, events in pending.items():
+            for track_template_ in tracker.async_triggered_templates(events):
+                template = track_template_.template
+                if template.template not in self._offloaded:
+                    continue
+                disabled_info = self._disabled.get(template.template)
+                if disabled_info is not None:
+                    self._worker_results[id(track_template_)] = disabled_info
+                    continue
+                key: Hashable = id(track_template_)
+                if not track_template_.variables:
+                    # pylint: disable=protected-access
+                    key = (template.template, bool(template._strict))
+                renders.setdefault(key, []).append(track_template_)
+
+        if not renders:
+            return
+
+        assert self._executor is not None
+        snapshot = StatesSnapshot(self.hass)
+        results = await asyncio.gather(
+            *(
+                self.hass.loop.run_in_executor(
+                    self._executor, _render_in_worker, track_templates[0], snapshot
+                )
+                for track_templates in renders.values()
+            ),
+            return_exceptions=True,
+        )
+
+        for track_templates, result in zip(renders.values(), results):
+            source = track_templates[0].template.template
+            # The trackers were removed while the template rendered
+            if source not in self._source_trackers:
+                continue
+            # Without a result of the worker the template renders in the loop
+            if isinstance(result, RenderInLoopError):
+                self._offloaded.discard(source)
+                self._loop_only.add(source)
+                continue
+            if isinstance(result, BaseException):
+                _LOGGER.error(
+                    "Error rendering template %s in a worker", source, exc_info=result
+                )
+                self._offloaded.discard(source)
+                continue
+
+            info, elapsed, cpu_time = result
+            self._record_render(source, elapsed)
+            if cpu_time < TEMPLATE_LOOP_THRESHOLD:
+                self._offloaded.discard(source)
+            self._async_check_budget(source, info)
+            for track_template_ in track_templates:
+                self._worker_results[id(track_template_)] = info
+
+    @callback
+    def _async_check_budget(self, source: str, info: RenderInfo) -> None:
+        """Stop rendering a template that exceeds its CPU budget too often."""
+        if info.exception is None or not isinstance(
+            info.exception.__cause__, TimeoutError
+        ):
+            self._budget_failures.pop(source, None)
+            return
+
+        failures = self._budget_failures[source] = (
+            self._budget_failures.get(source, 0) + 1
+        )
+        if failures < TEMPLATE_WORKER_MAX_BUDGET_FAILURES:
+            return
+
+        _LOGGER.warning(
+            "Template %s exceeded its render CPU budget of %s seconds %s times "
+            "in a row and is no longer rendered",
+            source,
+            TEMPLATE_WORKER_CPU_BUDGET,
+            failures,
+        )
+        self._disabled[source] = info
+
+
+def _render_in_worker(
+    track_template_: TrackTemplate, snapshot: StatesSnapshot
+) -> tuple[RenderInfo, float, float]:
+    """Render a template in a worker thread.
+
+    Returns the render with the seconds and the CPU seconds it took.
+    """
+    start = time.monotonic()
+    cpu_start = time.thread_time()
+    info = track_template_.template.render_to_info_from_snapshot(
+        snapshot, track_template_.variables, TEMPLATE_WORKER_CPU_BUDGET
+    )
+    return info, time.monotonic() - start, time.thread_time() - cpu_start
+
+
+class _TemplateSchedulerSubscription:
+    """Track the states a batched tracker depends on through the scheduler."""
+
+    def __init__(
+        self,
+        scheduler: _TemplateScheduler,
+        tracker: _TrackTemplateResultInfo,
+        track_states: TrackStates,
+    ) -> None:
+        """Subscribe the tracker."""
+        self._scheduler = scheduler
+        self._tracker = tracker
+        self._last_track_states = track_states
+        scheduler.async_update_tracker(tracker, track_states)
+
+    @property
+    def listeners(self) -> dict:
+        """State changes that will cause a re-render."""
+        track_states = self._last_track_states
+        return {
+            _ALL_LISTENER: track_states.all_states,
+            _ENTITIES_LISTENER: track_states.entities,
+            _DOMAINS_LISTENER: track_states.domains,
+        }
+
+    @callback
+    def async_update_listeners(self, new_track_states: TrackStates) -> None:
+        """Update the index of the tracker based on the new TrackStates."""
+        if new_track_states == self._last_track_states:
+            return
+        self._last_track_states = new_track_states
+        self._scheduler.async_update_tracker(self._tracker, new_track_states)
+
+    @callback
+    def async_remove(self) -> None:
+        """Unsubscribe the tracker."""
+        self._scheduler.async_remove_tracker(self._tracker)
+
+
+@callback
+def _async_template_scheduler(hass: HomeAssistant) -> _TemplateScheduler:
+    """Return the template scheduler of a hass instance."""
+    scheduler: _TemplateScheduler | None = hass.data.get(TRACK_TEMPLATE_SCHEDULER)
+    if scheduler is None:
+        scheduler = hass.data[TRACK_TEMPLATE_SCHEDULER] = _TemplateScheduler(hass)
+    return scheduler
+
+
+@callback
+@bind_hass
+def async_set_template_workers(hass: HomeAssistant, enabled: bool) -> None:
+    """Start or stop rendering slow batched templates in worker threads.
+
+    Templates of batched trackers whose render in the event loop takes
+    longer than TEMPLATE_WORKER_THRESHOLD render in a thread pool against
+    a snapshot of the states, a render that uses more than
+    TEMPLATE_WORKER_CPU_BUDGET seconds of CPU time fails. Templates move
+    back to the event loop once they render in less than
+    TEMPLATE_LOOP_THRESHOLD. Templates reading the registries stay in
+    the event loop and templates failing their budget
+    TEMPLATE_WORKER_MAX_BUDGET_FAILURES times in a row are no longer
+    rendered.
+    """
+    _async_template_scheduler(hass).async_set_workers(enabled)
+
+
+@callback
+@bind_hass
+def async_template_render_profile(hass: HomeAssistant) -> dict[str, dict[str, float]]:
+    """Return the renders of tracked templates per template source.
+
+    The profile holds the number of renders and their total and
+    maximum time in seconds.
+    """
+    return {
+        source: profile.as_dict()
+        for source, profile in _async_template_scheduler(hass).render_profile.items()
+    }
+
+
 class _TrackTemplateResultInfo:
     """Handle removal / refresh of tracker."""
 
@@ -775,33 +1092,42 @@ class _TrackTemplateResultInfo:
         hass: HomeAssistant,
         track_templates: Iterable[TrackTemplate],
         action: Callable,
+        batched: bool = False,
     ):
         """Handle removal / refresh of tracker init."""
         self.hass = hass
         self._job = HassJob(action)
+        self._batched = batched
+        self._scheduler = _async_template_scheduler(hass)
 
         for track_template_ in track_templates:
             track_template_.template.hass = hass
         self._track_templates = track_templates
+        self._sources = [
+            track_template_.template.template for track_template_ in track_templates
+        ]
 
         self._last_result: dict[Template, str | TemplateError] = {}
 
         self._rate_limit = KeyedRateLimit(hass)
         self._info: dict[Template, RenderInfo] = {}
-        self._track_state_changes: _TrackStateChangeFiltered | None = None
+        self._track_state_changes: (
+            _TrackStateChangeFiltered | _TemplateSchedulerSubscription | None
+        ) = None
         self._time_listeners: dict[Template, Callable] = {}
 
     def async_setup(self, raise_on_template_error: bool, strict: bool = False) -> None:
         """Activation of template tracking."""
+        self._scheduler.async_add_sources(self._sources)
         for track_template_ in self._track_templates:
             template = track_template_.template
-            variables = track_template_.variables
-            self._info[template] = info = template.async_render_to_info(
-                variables, strict=strict
+            self._info[template] = info = self._scheduler.async_render_to_info(
+                track_template_, strict=strict
             )
 
             if info.exception:
                 if raise_on_template_error:
+                    self._scheduler.async_remove_sources(self._sources)
                     raise info.exception
                 _LOGGER.error(
                     "Error while processing template: %s",
@@ -809,9 +1135,15 @@ class _TrackTemplateResultInfo:
                     exc_info=info.exception,
                 )
 
-        self._track_state_changes = async_track_state_change_filtered(
-            self.hass, _render_infos_to_track_states(self._info.values()), self._refresh
-        )
+        track_states = _render_infos_to_track_states(self._info.values())
+        if self._batched:
+            self._track_state_changes = _TemplateSchedulerSubscription(
+                self._scheduler, self, track_states
+            )
+        else:
+            self._track_state_changes = async_track_state_change_filtered(
+                self.hass, track_states, self._refresh
+            )
         self._update_time_listeners()
         _LOGGER.debug(
             "Template group %s listens for %s",
@@ -863,6 +1195,7 @@ class _TrackTemplateResultInfo:
         """Cancel the listener."""
         assert self._track_state_changes
         self._track_state_changes.async_remove()
+        self._scheduler.async_remove_sources(self._sources)
         self._rate_limit.async_remove()
         for template in list(self._time_listeners):
             self._time_listeners.pop(template)()
@@ -916,8 +1249,8 @@ class _TrackTemplateResultInfo:
             )
 
         self._rate_limit.async_triggered(template, now)
-        self._info[template] = info = template.async_render_to_info(
-            track_template_.variables
+        self._info[template] = info = self._scheduler.async_render_to_info(
+            track_template_
         )
 
         try:
@@ -955,12 +1288,79 @@ class _TrackTemplateResultInfo:
         replayed is True if the event is being replayed because the
         rate limit was hit.
         """
+        now = event.time_fired if not replayed and event else dt_util.utcnow()
+        self._render_templates(
+            event,
+            [
+                (track_template_, event, now)
+                for track_template_ in track_templates or self._track_templates
+            ],
+        )
+
+    @callback
+    def async_refresh_events(self, events: list[Event]) -> None:
+        """Refresh the templates triggered by a batch of state changes.
+
+        Each template renders at most once, for the last event that
+        changed an entity it references or otherwise the last event
+        that triggers it, so referenced entities bypass the rate limit
+        as they do without batching. The action is called with the
+        last of the events the templates rendered for.
+        """
+        renders, event = self._triggered_renders(events)
+        if event is not None:
+            self._render_templates(event, renders)
+
+    @callback
+    def async_triggered_templates(self, events: list[Event]) -> list[TrackTemplate]:
+        """Return the templates a batch of state changes triggers."""
+        return [
+            track_template_
+            for track_template_, _, _ in self._triggered_renders(events)[0]
+        ]
+
+    @callback
+    def _triggered_renders(
+        self, events: list[Event]
+    ) -> tuple[list[tuple[TrackTemplate, Event | None, datetime]], Event | None]:
+        """Return the templates to render with their events and the last event."""
+        renders: list[tuple[TrackTemplate, Event | None, datetime]] = []
+        last_index = -1
+        for track_template_ in self._track_templates:
+            info = self._info[track_template_.template]
+            triggering_index = None
+            for index in range(len(events) - 1, -1, -1):
+                event = events[index]
+                if not _event_triggers_rerender(event, info):
+                    continue
+                if triggering_index is None:
+                    triggering_index = index
+                if event.data[ATTR_ENTITY_ID] in info.entities:
+                    triggering_index = index
+                    break
+
+            if triggering_index is not None:
+                event = events[triggering_index]
+                renders.append((track_template_, event, event.time_fired))
+                last_index = max(last_index, triggering_index)
+
+        return renders, events[last_index] if renders else None
+
+    @callback
+    def _render_templates(
+        self,
+        event: Event | None,
+        renders: list[tuple[TrackTemplate, Event | None, datetime]],
+    ) -> None:
+        """Render templates for the events that triggered them.
+
+        The action is called with event if any result changed.
+        """
         updates = []
         info_changed = False
-        now = event.time_fired if not replayed and event else dt_util.utcnow()
 
-        for track_template_ in track_templates or self._track_templates:
-            update = self._render_template_if_ready(track_template_, now, event)
+        for track_template_, render_event, now in renders:
+            update = self._render_template_if_ready(track_template_, now, render_event)
             if not update:
                 continue
 
@@ -1026,6 +1426,7 @@ def async_track_template_result(
     action: TrackTemplateResultListener,
     raise_on_template_error: bool = False,
     strict: bool = False,
+    batched: bool = False,
 ) -> _TrackTemplateResultInfo:
     """Add a listener that fires when the result of a template changes.
 
@@ -1056,13 +1457,18 @@ def async_track_template_result(
         tracking.
     strict
         When set to True, raise on undefined variables.
+    batched
+        When set to True, the templates are re-rendered once per loop
+        iteration for all state changes queued in it instead of once
+        per state change. Only the latest result is delivered, which
+        suits entities but not triggers.
 
     Returns
     -------
     Info object used to unregister the listener, and refresh the template.
 
     """
-    tracker = _TrackTemplateResultInfo(hass, track_templates, action)
+    tracker = _TrackTemplateResultInfo(hass, track_templates, action, batched)
     tracker.async_setup(raise_on_template_error, strict=strict)
     return tracker
 
@@ -1,8 +1,27 @@
-"""Helpers to help with encoding Home Assistant objects in JSON."""
+"""Helpers to help with encoding Home Assistant objects in JSON.
+
+json_bytes, json_dumps and json_loads are the fast JSON backend of Home
+Assistant. They use orjson when it is installed and the standard library
+otherwise. They serialize the same types as JSONEncoder and, like json.dumps
+with allow_nan=False, raise ValueError for NaN and infinity. Non-string keys
+of dictionaries are converted to strings.
+
+The output is compact and not escaped to ASCII, so it differs from the
+output of json.dumps. Data that is compared or hashed against JSON written
+by json.dumps must keep being serialized with json.dumps.
+"""
+from __future__ import annotations
+
 from datetime import datetime, timedelta
 import json
+import math
 from typing import Any
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
 
 class JSONEncoder(json.JSONEncoder):
     """JSONEncoder that supports Home Assistant objects."""
@@ -36,3 +55,89 @@ class ExtendedJSONEncoder(JSONEncoder):
             return super().default(o)
         except TypeError:
             return {"__type": str(type(o)), "repr": repr(o)}
+
+
+def json_encoder_default(obj: Any) -> Any:
+    """Convert the Home Assistant objects the fast backend does not know.
+
+    Raises TypeError for other objects.
+    """
+    if isinstance(obj, set):
+        return list(obj)
+    if hasattr(obj, "as_dict"):
+        return obj.as_dict()
+    raise TypeError
+
+
+def json_bytes(obj: Any) -> bytes:
+    """Serialize obj to JSON bytes.
+
+    Raises ValueError if obj contains NaN or infinity.
+    """
+    if orjson is None:
+        return json.dumps(
+            obj,
+            cls=JSONEncoder,
+            allow_nan=False,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+    data = orjson.dumps(
+        obj, option=orjson.OPT_NON_STR_KEYS, default=json_encoder_default
+    )
+    # orjson serializes NaN and infinity as null
+    nulls = data.count(b"null")
+    if nulls and _has_non_finite_float(obj, nulls):
+        raise ValueError("Out of range float values are not JSON compliant")
+    return data
+
+
+def _has_non_finite_float(obj: Any, nulls: int) -> bool:
+    """Return if obj contains a NaN or infinite float.
+
+    The walk stops once as many None values as nulls were written are
+    found, the nulls are all accounted for then.
+    """
+    to_process = [obj]
+    while to_process:
+        obj = to_process.pop()
+        if obj is None:
+            nulls -= 1
+            if not nulls:
+                return False
+        elif isinstance(obj, float):
+            if not math.isfinite(obj):
+                return True
+        elif isinstance(obj, dict):
+            to_process.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            to_process.extend(obj)
+        elif hasattr(obj, "as_dict"):
+            to_process.append(obj.as_dict())
+    return False
+
+
+def json_dumps(obj: Any) -> str:
+    """Serialize obj to a JSON string.
+
+    Raises ValueError if obj contains NaN or infinity.
+    """
+    return json_bytes(obj).decode("utf-8")
+
+
+def json_loads(data: bytes | str) -> Any:
+    """Parse JSON data.
+
+    Falls back to the standard library for the NaN and infinity
+    literals it writes, which the fast backend rejects.
+    """
+    if orjson is None:
+        return json.loads(data)
+    try:
+        return orjson.loads(data)
+    except orjson.JSONDecodeError:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        if b"NaN" not in data and b"Infinity" not in data:
+            raise
+        return json.loads(data)
@@ -17,9 +17,11 @@ from operator import attrgetter
 import random
 import re
 import sys
+import threading
+import time
+from types import CodeType
 from typing import Any, Callable, cast
 from urllib.parse import urlencode as urllib_urlencode
-import weakref
 
 import jinja2
 from jinja2 import contextfilter, contextfunction
@@ -38,16 +40,18 @@ from homeassistant.const import (
 from homeassistant.core import (
     HomeAssistant,
     State,
+    StateMachine,
     callback,
     split_entity_id,
     valid_entity_id,
 )
-from homeassistant.exceptions import TemplateError
+from homeassistant.exceptions import HomeAssistantError, TemplateError
 from homeassistant.helpers import entity_registry, location as loc_helper
 from homeassistant.helpers.typing import TemplateVarsType
 from homeassistant.loader import bind_hass
 from homeassistant.util import convert, dt as dt_util, location as loc_util
 from homeassistant.util.async_ import run_callback_threadsafe
+from homeassistant.util.lru import LRU
 from homeassistant.util.thread import ThreadWithException
 
 # mypy: allow-untyped-defs, no-check-untyped-defs
@@ -56,15 +60,19 @@ _LOGGER = logging.getLogger(__name__)
 _SENTINEL = object()
 DATE_STR_FORMAT = "%Y-%m-%d %H:%M:%S"
 
-_RENDER_INFO = "template.render_info"
 _ENVIRONMENT = "template.environment"
 _ENVIRONMENT_LIMITED = "template.environment_limited"
 _ENVIRONMENT_STRICT = "template.environment_strict"
+_ENVIRONMENT_WORKER = "template.environment_worker"
+_ENVIRONMENT_STRICT_WORKER = "template.environment_strict_worker"
 
 _RE_JINJA_DELIMITERS = re.compile(r"\{%|\{\{|\{#")
 # Match "simple" ints and floats. -1.0, 1, +5, 5.0
 _IS_NUMERIC = re.compile(r"^[+-]?(?!0\d)\d*(?:\.\d*)?$")
 
+# The number of compiled template sources kept in memory
+COMPILED_TEMPLATE_CACHE_SIZE = 4096
+
 _RESERVED_NAMES = {"contextfunction", "evalcontextfunction", "environmentfunction"}
 
 _GROUP_DOMAIN_PREFIX = "group."
@@ -85,6 +93,25 @@ DOMAIN_STATES_RATE_LIMIT = timedelta(seconds=1)
 
 template_cv: ContextVar[str | None] = ContextVar("template_cv", default=None)
 
+# The render collecting the states the template being rendered depends on
+_render_info_cv: ContextVar[RenderInfo | None] = ContextVar(
+    "render_info_cv", default=None
+)
+
+# The snapshot of the states a template renders against in a worker
+_render_states_cv: ContextVar[StatesSnapshot | None] = ContextVar(
+    "render_states_cv", default=None
+)
+
+# The thread CPU time the render in a worker must finish by
+_render_deadline_cv: ContextVar[float | None] = ContextVar(
+    "render_deadline_cv", default=None
+)
+
+
+class RenderInLoopError(HomeAssistantError):
+    """Error raised by a render in a worker that must render in the event loop."""
+
 
 @bind_hass
 def attach(hass: HomeAssistant, obj: Any) -> None:
@@ -329,6 +356,16 @@ class Template:
             ret = self.hass.data[wanted_env] = TemplateEnvironment(self.hass, self._limited, self._strict)  # type: ignore[no-untyped-call]
         return ret
 
+    @property
+    def _worker_env(self) -> TemplateEnvironment:
+        wanted_env = _ENVIRONMENT_STRICT_WORKER if self._strict else _ENVIRONMENT_WORKER
+        ret: TemplateEnvironment | None = self.hass.data.get(wanted_env)
+        if ret is None:
+            ret = self.hass.data.setdefault(
+                wanted_env, WorkerTemplateEnvironment(self.hass, False, self._strict)  # type: ignore[no-untyped-call]
+            )
+        return ret
+
     def ensure_valid(self) -> None:
         """Return if template is valid."""
         if self.is_static or self._compiled_code is not None:
@@ -381,7 +418,16 @@ class Template:
             return self._parse_result(self.template)
 
         compiled = self._compiled or self._ensure_compiled(limited, strict)
+        return self._render_compiled(compiled, variables, parse_result, **kwargs)
 
+    def _render_compiled(
+        self,
+        compiled: jinja2.Template,
+        variables: TemplateVarsType,
+        parse_result: bool = True,
+        **kwargs: Any,
+    ) -> Any:
+        """Render the compiled template and parse the result."""
         if variables is not None:
             kwargs.update(variables)
 
@@ -490,7 +536,49 @@ class Template:
         self, variables: TemplateVarsType = None, strict: bool = False, **kwargs: Any
     ) -> RenderInfo:
         """Render the template and collect an entity filter."""
-        assert self.hass and _RENDER_INFO not in self.hass.data
+        return self._render_to_info(
+            partial(self.async_render, variables, strict=strict, **kwargs)
+        )
+
+    def render_to_info_from_snapshot(
+        self,
+        snapshot: StatesSnapshot,
+        variables: TemplateVarsType = None,
+        cpu_budget: float | None = None,
+    ) -> RenderInfo:
+        """Render the template against a snapshot of the states.
+
+        This method is meant to run in a worker thread. The template
+        must have been rendered in the event loop before so it is
+        compiled. A render that takes more than cpu_budget seconds
+        of the CPU time of the thread fails with a TemplateError.
+
+        Raises RenderInLoopError if the template calls a function that
+        reads the registries, which are only safe to read in the loop.
+        """
+        assert not self._limited, "limited templates render in the event loop"
+        compiled = self._worker_env.compiled_template(self.template)
+        states_token = _render_states_cv.set(snapshot)
+        deadline_token = _render_deadline_cv.set(
+            None if cpu_budget is None else time.thread_time() + cpu_budget
+        )
+        try:
+            info = self._render_to_info(
+                partial(self._render_compiled, compiled, variables)
+            )
+        finally:
+            _render_deadline_cv.reset(deadline_token)
+            _render_states_cv.reset(states_token)
+
+        if info.exception is not None and isinstance(
+            info.exception.__cause__, RenderInLoopError
+        ):
+            raise info.exception.__cause__
+        return info
+
+    def _render_to_info(self, render: Callable[[], Any]) -> RenderInfo:
+        """Run a render collecting the states it depends on."""
+        assert self.hass and _render_info_cv.get() is None
 
         render_info = RenderInfo(self)
 
@@ -500,13 +588,13 @@ class Template:
             render_info._freeze_static()
             return render_info
 
-        self.hass.data[_RENDER_INFO] = render_info
+        token = _render_info_cv.set(render_info)
         try:
-            render_info._result = self.async_render(variables, strict=strict, **kwargs)
+            render_info._result = render()
         except TemplateError as ex:
             render_info.exception = ex
         finally:
-            del self.hass.data[_RENDER_INFO]
+            _render_info_cv.reset(token)
 
         render_info._freeze()
         return render_info
@@ -579,12 +667,7 @@ class Template:
 
         self._limited = limited
         self._strict = strict
-        env = self._env
-
-        self._compiled = cast(
-            jinja2.Template,
-            jinja2.Template.from_code(env, self._compiled_code, env.globals, None),
-        )
+        self._compiled = self._env.compiled_template(self.template)
 
         return self._compiled
 
@@ -605,6 +688,49 @@ class Template:
         return 'Template("' + self.template + '")'
 
 
+class StatesSnapshot:
+    """A copy of the state machine templates render against in workers.
+
+    States are immutable, copying the mapping of entity ids to states
+    isolates a render from the changes made while it runs. The sorted
+    states are copied per domain when a render first iterates them.
+    """
+
+    __slots__ = ("_states", "_sorted_states")
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Copy the current states."""
+        self._states = {state.entity_id: state for state in hass.states.async_all()}
+        self._sorted_states: dict[str | None, list[State]] = {}
+
+    def get(self, entity_id: str) -> State | None:
+        """Return the state of entity_id or None if not found."""
+        return self._states.get(entity_id.lower())
+
+    def async_all_sorted(self, domain_filter: str | None = None) -> list[State]:
+        """Return the states of a domain or all states sorted by entity id."""
+        if domain_filter is not None:
+            domain_filter = domain_filter.lower()
+        sorted_states = self._sorted_states.get(domain_filter)
+        if sorted_states is None:
+            sorted_states = self._sorted_states[domain_filter] = sorted(
+                (
+                    state
+                    for state in self._states.values()
+                    if domain_filter is None or state.domain == domain_filter
+                ),
+                key=attrgetter("entity_id"),
+            )
+        return sorted_states
+
+    def async_entity_ids_count(self, domain_filter: str | None = None) -> int:
+        """Count the states of a domain or all states."""
+        if domain_filter is None:
+            return len(self._states)
+
+        return len(self.async_all_sorted(domain_filter))
+
+
 class AllStates:
     """Class to expose all HA states as attributes."""
 
@@ -630,12 +756,12 @@ class AllStates:
     __getitem__ = __getattr__
 
     def _collect_all(self) -> None:
-        render_info = self._hass.data.get(_RENDER_INFO)
+        render_info = _render_info_cv.get()
         if render_info is not None:
             render_info.all_states = True
 
     def _collect_all_lifecycle(self) -> None:
-        render_info = self._hass.data.get(_RENDER_INFO)
+        render_info = _render_info_cv.get()
         if render_info is not None:
             render_info.all_states_lifecycle = True
 
@@ -647,7 +773,7 @@ class AllStates:
     def __len__(self) -> int:
         """Return number of states."""
         self._collect_all_lifecycle()
-        return self._hass.states.async_entity_ids_count()
+        return _states(self._hass).async_entity_ids_count()
 
     def __call__(self, entity_id):
         """Return the states."""
@@ -676,12 +802,12 @@ class DomainStates:
     __getitem__ = __getattr__
 
     def _collect_domain(self) -> None:
-        entity_collect = self._hass.data.get(_RENDER_INFO)
+        entity_collect = _render_info_cv.get()
         if entity_collect is not None:
             entity_collect.domains.add(self._domain)
 
     def _collect_domain_lifecycle(self) -> None:
-        entity_collect = self._hass.data.get(_RENDER_INFO)
+        entity_collect = _render_info_cv.get()
         if entity_collect is not None:
             entity_collect.domains_lifecycle.add(self._domain)
 
@@ -693,7 +819,7 @@ class DomainStates:
     def __len__(self) -> int:
         """Return number of states."""
         self._collect_domain_lifecycle()
-        return self._hass.states.async_entity_ids_count(self._domain)
+        return _states(self._hass).async_entity_ids_count(self._domain)
 
     def __repr__(self) -> str:
         """Representation of Domain States."""
@@ -714,8 +840,10 @@ class TemplateState(State):
         self._collect = collect
 
     def _collect_state(self) -> None:
-        if self._collect and _RENDER_INFO in self._hass.data:
-            self._hass.data[_RENDER_INFO].entities.add(self._state.entity_id)
+        if self._collect:
+            render_info = _render_info_cv.get()
+            if render_info is not None:
+                render_info.entities.add(self._state.entity_id)
 
     # Jinja will try __getitem__ first and it avoids the need
     # to call is_safe_attribute
@@ -723,8 +851,10 @@ class TemplateState(State):
         """Return a property as an attribute for jinja."""
         if item in _COLLECTABLE_STATE_ATTRIBUTES:
             # _collect_state inlined here for performance
-            if self._collect and _RENDER_INFO in self._hass.data:
-                self._hass.data[_RENDER_INFO].entities.add(self._state.entity_id)
+            if self._collect:
+                render_info = _render_info_cv.get()
+                if render_info is not None:
+                    render_info.entities.add(self._state.entity_id)
             return getattr(self._state, item)
         if item == "entity_id":
             return self._state.entity_id
@@ -805,27 +935,46 @@ class TemplateState(State):
         return f"<template TemplateState({self._state.__repr__()})>"
 
 
+def _states(hass: HomeAssistant) -> StateMachine | StatesSnapshot:
+    """Return the states a template renders against."""
+    return _render_states_cv.get() or hass.states
+
+
+def _check_render_budget() -> None:
+    """Abort a render in a worker that used up its CPU budget."""
+    deadline = _render_deadline_cv.get()
+    if deadline is not None and time.thread_time() > deadline:
+        raise TimeoutError("Template exceeded its render CPU budget")
+
+
+def _check_render_in_loop() -> None:
+    """Abort a render in a worker that reads the registries."""
+    if _render_states_cv.get() is not None:
+        raise RenderInLoopError("Template reads the registries")
+
+
 def _collect_state(hass: HomeAssistant, entity_id: str) -> None:
-    entity_collect = hass.data.get(_RENDER_INFO)
+    entity_collect = _render_info_cv.get()
     if entity_collect is not None:
         entity_collect.entities.add(entity_id)
 
 
 def _state_generator(hass: HomeAssistant, domain: str | None) -> Generator:
     """State generator for a domain or all states."""
-    for state in sorted(hass.states.async_all(domain), key=attrgetter("entity_id")):
+    for state in _states(hass).async_all_sorted(domain):
+        _check_render_budget()
         yield TemplateState(hass, state, collect=False)
 
 
 def _get_state_if_valid(hass: HomeAssistant, entity_id: str) -> TemplateState | None:
-    state = hass.states.get(entity_id)
+    state = _states(hass).get(entity_id)
     if state is None and not valid_entity_id(entity_id):
         raise TemplateError(f"Invalid entity ID '{entity_id}'")  # type: ignore
     return _get_template_state_from_state(hass, entity_id, state)
 
 
 def _get_state(hass: HomeAssistant, entity_id: str) -> TemplateState | None:
-    return _get_template_state_from_state(hass, entity_id, hass.states.get(entity_id))
+    return _get_template_state_from_state(hass, entity_id, _states(hass).get(entity_id))
 
 
 def _get_template_state_from_state(
@@ -876,6 +1025,7 @@ def expand(hass: HomeAssistant, *args: Any) -> Iterable[State]:
     search = list(args)
     found = {}
     while search:
+        _check_render_budget()
         entity = search.pop()
         if isinstance(entity, str):
             entity_id = entity
@@ -905,6 +1055,7 @@ def expand(hass: HomeAssistant, *args: Any) -> Iterable[State]:
 
 def device_entities(hass: HomeAssistant, device_id: str) -> Iterable[str]:
     """Get entity ids for entities tied to a device."""
+    _check_render_in_loop()
     entity_reg = entity_registry.async_get(hass)
     entries = entity_registry.async_entries_for_device(entity_reg, device_id)
     return [entry.entity_id for entry in entries]
@@ -1059,7 +1210,7 @@ def state_attr(hass: HomeAssistant, entity_id: str, name: str) -> Any:
 
 def now(hass: HomeAssistant) -> datetime:
     """Record fetching now."""
-    render_info = hass.data.get(_RENDER_INFO)
+    render_info = _render_info_cv.get()
     if render_info is not None:
         render_info.has_time = True
 
@@ -1068,7 +1219,7 @@ def now(hass: HomeAssistant) -> datetime:
 
 def utcnow(hass: HomeAssistant) -> datetime:
     """Record fetching utcnow."""
-    render_info = hass.data.get(_RENDER_INFO)
+    render_info = _render_info_cv.get()
     if render_info is not None:
         render_info.has_time = True
 
@@ -1399,7 +1550,18 @@ class LoggingUndefined(jinja2.Undefined):
 
 
 class TemplateEnvironment(ImmutableSandboxedEnvironment):
-    """The Home Assistant template environment."""
+    """The Home Assistant template environment.
+
+    The code compiled from a source is shared by the environments of
+    the same class and options of all hass instances, the templates
+    bound to an environment are cached per environment. Templates may be compiled in worker
+    threads so the caches are guarded by a lock.
+    """
+
+    _code_cache: LRU[tuple[type, bool, str, bool, bool], CodeType] = LRU(
+        COMPILED_TEMPLATE_CACHE_SIZE
+    )
+    _cache_lock = threading.Lock()
 
     def __init__(self, hass, limited=False, strict=False):
         """Initialise template environment."""
@@ -1409,7 +1571,11 @@ class TemplateEnvironment(ImmutableSandboxedEnvironment):
             undefined = jinja2.StrictUndefined
         super().__init__(undefined=undefined)
         self.hass = hass
-        self.template_cache = weakref.WeakValueDictionary()
+        self._limited = bool(limited)
+        self._strict = bool(strict)
+        self.template_cache: LRU[str, jinja2.Template] = LRU(
+            COMPILED_TEMPLATE_CACHE_SIZE
+        )
         self.filters["round"] = forgiving_round
         self.filters["multiply"] = multiply
         self.filters["log"] = logarithm
@@ -1553,12 +1719,55 @@ class TemplateEnvironment(ImmutableSandboxedEnvironment):
             # any instance of this.
             return super().compile(source, name, filename, raw, defer_init)
 
-        cached = self.template_cache.get(source)
+        # The environment without hass lacks the hass filters and globals
+        key = (type(self), self.hass is None, source, self._limited, self._strict)
+        with self._cache_lock:
+            code = self._code_cache.get(key)
+
+        if code is None:
+            # Compiled outside the lock, a source compiled twice
+            # by concurrent threads yields the same code
+            code = super().compile(source)
+            with self._cache_lock:
+                self._code_cache[key] = code
+
+        return code
+
+    def compiled_template(self, source: str) -> jinja2.Template:
+        """Return the template of a source bound to this environment."""
+        with self._cache_lock:
+            compiled = self.template_cache.get(source)
+
+        if compiled is None:
+            compiled = cast(
+                jinja2.Template,
+                jinja2.Template.from_code(
+                    self, self.compile(source), self.globals, None
+                ),
+            )
+            with self._cache_lock:
+                self.template_cache[source] = compiled
+
+        return compiled
+
+
+class WorkerTemplateEnvironment(TemplateEnvironment):
+    """The template environment of renders in worker threads.
+
+    Calls and attribute lookups check the CPU budget of the render,
+    the loop environments skip the check as it slows down all renders.
+    """
 
-        if cached is None:
-            cached = self.template_cache[source] = super().compile(source)
+    # pylint: disable=no-self-argument
+    def call(__self, __context, __obj, *args, **kwargs):
+        """Call an object after checking the render budget."""
+        _check_render_budget()
+        return super().call(__context, __obj, *args, **kwargs)
 
-        return cached
+    def getattr(self, obj, attribute):
+        """Get an attribute after checking the render budget."""
+        _check_render_budget()
+        return super().getattr(obj, attribute)
 
 
 _NO_HASS_ENV = TemplateEnvironment(None)  # type: ignore[no-untyped-call]
@@ -14,6 +14,7 @@ from typing import Callable, TypeVar
 from homeassistant import core
 from homeassistant.components.websocket_api.const import JSON_DUMP
 from homeassistant.const import ATTR_NOW, EVENT_STATE_CHANGED, EVENT_TIME_CHANGED
+from homeassistant.helpers import template
 from homeassistant.helpers.entityfilter import convert_include_exclude_filter
 from homeassistant.helpers.json import JSONEncoder
 from homeassistant.util import dt as dt_util
@@ -390,6 +391,64 @@ async def json_serialize_states(hass):
     return timer() - start
 
 
+@benchmark
+async def json_serialize_states_stdlib(hass):
+    """Serialize million states with the standard library encoder."""
+    states = [
+        core.State("light.kitchen", "on", {"friendly_name": "Kitchen Lights"})
+        for _ in range(10 ** 6)
+    ]
+
+    start = timer()
+    json.dumps(states, cls=JSONEncoder)
+    return timer() - start
+
+
+@benchmark
+async def json_serialize_states_cached(hass):
+    """Serialize million states again reusing the JSON cached on them."""
+    states = [
+        core.State("light.kitchen", "on", {"friendly_name": "Kitchen Lights"})
+        for _ in range(10 ** 6)
+    ]
+    for state in states:
+        state.as_json()
+
+    start = timer()
+    ",".join(state.as_json() for state in states)
+    return timer() - start
+
+
+@benchmark
+async def template_heavy_config(hass):
+    """Set up and render a config of repeated template sources ten times.
+
+    Mimics blueprints and template entities sharing the same templates,
+    each reload creates new template objects from the same sources.
+    """
+    sources = [
+        f"{{{{ is_state('light.kitchen_{idx}', 'on') and "
+        f"states('sensor.temperature_{idx}') | float > 20 and "
+        f"state_attr('light.kitchen_{idx}', 'friendly_name') "
+        f"| regex_search('Kitchen', ignorecase=True) }}}}"
+        for idx in range(50)
+    ]
+    for idx in range(50):
+        hass.states.async_set(
+            f"light.kitchen_{idx}", "on", {"friendly_name": f"Kitchen {idx}"}
+        )
+        hass.states.async_set(f"sensor.temperature_{idx}", "21")
+
+    start = timer()
+    for _ in range(10):
+        for _ in range(40):
+            for source in sources:
+                tpl = template.Template(source, hass)
+                tpl.ensure_valid()
+                tpl.async_render()
+    return timer() - start
+
+
 def _create_state_changed_event_from_old_new(
     entity_id, event_time_fired, old_state, new_state
 ):
@@ -404,23 +463,25 @@ def _create_state_changed_event_from_old_new(
         "Row",
         [
             "event_type"
-            "event_data"
-            "time_fired"
+            "shared_data"
+            "time_fired_ts"
             "context_id"
             "context_user_id"
             "state"
             "entity_id"
             "domain"
             "attributes"
+            "shared_attrs"
             "state_id",
             "old_state_id",
         ],
     )
 
     row.event_type = EVENT_STATE_CHANGED
-    row.event_data = "{}"
-    row.attributes = attributes_json
-    row.time_fired = event_time_fired
+    row.shared_data = "{}"
+    row.attributes = None
+    row.shared_attrs = attributes_json
+    row.time_fired_ts = event_time_fired.timestamp()
     row.state = new_state and new_state.get("state")
     row.entity_id = entity_id
     row.domain = entity_id and core.split_entity_id(entity_id)[0]
@@ -10,6 +10,7 @@ from typing import Any, Callable
 
 from homeassistant.core import Event, State
 from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers.json import json_loads
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -28,8 +29,8 @@ def load_json(filename: str, default: list | dict | None = None) -> list | dict:
     Defaults to returning empty dict if file is not found.
     """
     try:
-        with open(filename, encoding="utf-8") as fdesc:
-            return json.loads(fdesc.read())  # type: ignore
+        with open(filename, "rb") as fdesc:
+            return json_loads(fdesc.read())  # type: ignore
     except FileNotFoundError:
         # This is not a fatal error
         _LOGGER.debug("JSON file not found: %s", filename)
@@ -0,0 +1,82 @@
+"""A bounded mapping that evicts the least recently used items."""
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Generic, TypeVar, overload
+
+_KT = TypeVar("_KT")
+_VT = TypeVar("_VT")
+_T = TypeVar("_T")
+
+
+class LRU(Generic[_KT, _VT]):
+    """Mapping with a maximum size that drops the least recently used item.
+
+    Lookups with get and item access mark the key as recently used.
+    Not thread safe; callers must serialize access themselves.
+    """
+
+    __slots__ = ("_data", "_maxsize")
+
+    def __init__(self, maxsize: int) -> None:
+        """Initialize the mapping."""
+        self._data: OrderedDict[_KT, _VT] = OrderedDict()
+        self._maxsize = maxsize
+
+    @property
+    def maxsize(self) -> int:
+        """Return the maximum number of items."""
+        return self._maxsize
+
+    @overload
+    def get(self, key: _KT) -> _VT | None:
+        ...
+
+    @overload
+    def get(self, key: _KT, default: _VT | _T) -> _VT | _T:
+        ...
+
+    def get(self, key, default=None):  # type: ignore
+        """Return the value for key and mark it as recently used."""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def pop(self, key: _KT, default: _VT | None = None) -> _VT | None:
+        """Remove key and return its value."""
+        return self._data.pop(key, default)
+
+    def clear(self) -> None:
+        """Remove all items."""
+        self._data.clear()
+
+    def items(self) -> list[tuple[_KT, _VT]]:
+        """Return a list of items, least recently used first."""
+        return list(self._data.items())
+
+    def __getitem__(self, key: _KT) -> _VT:
+        """Return the value for key and mark it as recently used."""
+        value = self._data[key]
+        self._data.move_to_end(key)
+        return value
+
+    def __setitem__(self, key: _KT, value: _VT) -> None:
+        """Set the value for key and evict the oldest item if full."""
+        data = self._data
+        data[key] = value
+        data.move_to_end(key)
+        if len(data) > self._maxsize:
+            data.popitem(last=False)
+
+    def __delitem__(self, key: _KT) -> None:
+        """Remove key."""
+        del self._data[key]
+
+    def __contains__(self, key: object) -> bool:
+        """Return if key is in the mapping without marking it as used."""
+        return key in self._data
+
+    def __len__(self) -> int:
+        """Return the number of items."""
+        return len(self._data)
@@ -17,7 +17,6 @@ from homeassistant.const import (
     STATE_UNKNOWN,
 )
 from homeassistant.core import CoreState
-from homeassistant.helpers.event import TRACK_STATE_CHANGE_CALLBACKS
 from homeassistant.setup import async_setup_component
 
 from tests.common import assert_setup_component
@@ -439,11 +438,12 @@ async def test_reloading_groups(hass):
         "group.second_group",
         "group.test_group",
     ]
-    assert hass.bus.async_listeners()["state_changed"] == 1
-    assert len(hass.data[TRACK_STATE_CHANGE_CALLBACKS]["hello.world"]) == 1
-    assert len(hass.data[TRACK_STATE_CHANGE_CALLBACKS]["light.bowl"]) == 1
-    assert len(hass.data[TRACK_STATE_CHANGE_CALLBACKS]["test.one"]) == 1
-    assert len(hass.data[TRACK_STATE_CHANGE_CALLBACKS]["test.two"]) == 1
+    assert hass.bus.async_listeners()["state_changed"] == 3
+    hass.states.async_set("hello.world", STATE_ON)
+    hass.states.async_set("light.Bowl", STATE_ON)
+    await hass.async_block_till_done()
+    assert group.is_on(hass, "group.test_group")
+    assert group.is_on(hass, "group.second_group")
 
     with patch(
         "homeassistant.config.load_yaml_config_file",
@@ -454,14 +454,18 @@ async def test_reloading_groups(hass):
         await hass.services.async_call(group.DOMAIN, SERVICE_RELOAD)
         await hass.async_block_till_done()
 
-    assert sorted(hass.states.async_entity_ids()) == [
+    assert sorted(hass.states.async_entity_ids(group.DOMAIN)) == [
         "group.all_tests",
         "group.hello",
     ]
-    assert hass.bus.async_listeners()["state_changed"] == 1
-    assert len(hass.data[TRACK_STATE_CHANGE_CALLBACKS]["light.bowl"]) == 1
-    assert len(hass.data[TRACK_STATE_CHANGE_CALLBACKS]["test.one"]) == 1
-    assert len(hass.data[TRACK_STATE_CHANGE_CALLBACKS]["test.two"]) == 1
+    assert hass.bus.async_listeners()["state_changed"] == 2
+    hass.states.async_set("test.one", STATE_ON)
+    await hass.async_block_till_done()
+    assert group.is_on(hass, "group.all_tests")
+    assert group.is_on(hass, "group.hello")
+    hass.states.async_set("light.Bowl", STATE_OFF)
+    await hass.async_block_till_done()
+    assert not group.is_on(hass, "group.hello")
 
 
 async def test_modify_group(hass):
@@ -6,15 +6,21 @@ import json
 from unittest.mock import patch, sentinel
 
 import pytest
+from pytest import approx
 
 from homeassistant.components import history, recorder
 from homeassistant.components.recorder.models import process_timestamp
+from homeassistant.const import HTTP_BAD_REQUEST
 import homeassistant.core as ha
 from homeassistant.helpers.json import JSONEncoder
 from homeassistant.setup import async_setup_component
 import homeassistant.util.dt as dt_util
 
-from tests.common import init_recorder_component, mock_state_change_event
+from tests.common import (
+    async_fire_time_changed,
+    init_recorder_component,
+    mock_state_change_event,
+)
 from tests.components.recorder.common import trigger_db_commit, wait_recording_done
 
 
@@ -170,6 +176,24 @@ def test_ensure_state_can_be_copied(hass_history):
     assert copy(hist[entity_id][1]) == hist[entity_id][1]
 
 
+def test_lazy_state_as_json(hass_history):
+    """Test the states from history serialize like states."""
+    hass = hass_history
+    entity_id = "sensor.test"
+    hass.states.set(entity_id, "1", {"unit": "W"})
+    wait_recording_done(hass)
+
+    hist = history.get_last_state_changes(hass, 1, entity_id)
+    lazy_state = hist[entity_id][0]
+
+    assert isinstance(lazy_state, history.LazyState)
+    assert json.loads(lazy_state.attributes_json()) == {"unit": "W"}
+    assert json.loads(lazy_state.as_json()) == json.loads(
+        json.dumps(lazy_state.as_dict())
+    )
+    assert json.loads(lazy_state.as_json())["attributes"] == {"unit": "W"}
+
+
 def test_get_significant_states(hass_history):
     """Test that only significant states are returned.
 
@@ -971,3 +995,388 @@ async def test_entity_ids_limit_via_api_with_skip_initial_state(hass, hass_clien
     assert len(response_json) == 2
     assert response_json[0][0]["entity_id"] == "light.kitchen"
     assert response_json[1][0]["entity_id"] == "light.cow"
+
+
+async def test_statistics_during_period(hass, hass_ws_client):
+    """Test history/statistics_during_period forwards to the recorder."""
+    now = dt_util.utcnow()
+    await hass.async_add_executor_job(init_recorder_component, hass)
+    await async_setup_component(hass, "history", {})
+    await hass.async_add_executor_job(hass.data[recorder.DATA_INSTANCE].block_till_done)
+
+    client = await hass_ws_client()
+    with patch(
+        "homeassistant.components.history.statistics_during_period",
+        return_value={"sensor.test": [{"statistic_id": "sensor.test"}]},
+    ) as statistics_mock:
+        await client.send_json(
+            {
+                "id": 1,
+                "type": "history/statistics_during_period",
+                "start_time": now.isoformat(),
+                "statistic_ids": ["sensor.test"],
+                "period": "5minute",
+            }
+        )
+        response = await client.receive_json()
+    assert response["success"]
+    assert response["result"] == {"sensor.test": [{"statistic_id": "sensor.test"}]}
+    assert statistics_mock.call_args[0][1:] == (now, None, ["sensor.test"], "5minute")
+
+    await client.send_json(
+        {
+            "id": 2,
+            "type": "history/statistics_during_period",
+            "start_time": now.isoformat(),
+        }
+    )
+    response = await client.receive_json()
+    assert response["success"]
+    assert response["result"] == {}
+
+    await client.send_json(
+        {
+            "id": 3,
+            "type": "history/statistics_during_period",
+            "start_time": "cats",
+        }
+    )
+    response = await client.receive_json()
+    assert not response["success"]
+    assert response["error"]["code"] == "invalid_start_time"
+
+    await client.send_json(
+        {
+            "id": 4,
+            "type": "history/statistics_during_period",
+            "start_time": now.isoformat(),
+            "end_time": "cats",
+        }
+    )
+    response = await client.receive_json()
+    assert not response["success"]
+    assert response["error"]["code"] == "invalid_end_time"
+
+
+async def test_history_period_resolution(hass, hass_client):
+    """Test the statistics are returned for a resolution of five minutes or more."""
+    now = dt_util.utcnow()
+    await hass.async_add_executor_job(init_recorder_component, hass)
+    await async_setup_component(hass, "history", {})
+    await hass.async_add_executor_job(hass.data[recorder.DATA_INSTANCE].block_till_done)
+    hass.states.async_set("sensor.test", "10")
+    await hass.async_block_till_done()
+    await hass.async_add_executor_job(trigger_db_commit, hass)
+    await hass.async_add_executor_job(hass.data[recorder.DATA_INSTANCE].block_till_done)
+
+    client = await hass_client()
+    url = f"/api/history/period/{(now - timedelta(hours=1)).isoformat()}"
+    with patch(
+        "homeassistant.components.history.statistics_during_period",
+        return_value={"sensor.test": [{"statistic_id": "sensor.test"}]},
+    ) as statistics_mock:
+        response = await client.get(
+            f"{url}?filter_entity_id=sensor.test&resolution=3600"
+        )
+        assert response.status == 200
+        assert await response.json() == [[{"statistic_id": "sensor.test"}]]
+        assert statistics_mock.call_args[0][3:] == (["sensor.test"], "hour")
+
+        response = await client.get(
+            f"{url}?filter_entity_id=sensor.test&resolution=600"
+        )
+        assert response.status == 200
+        assert statistics_mock.call_args[0][3:] == (["sensor.test"], "5minute")
+
+        # The states are returned when the resolution is too fine
+        statistics_mock.reset_mock()
+        response = await client.get(f"{url}?filter_entity_id=sensor.test&resolution=60")
+        assert response.status == 200
+        assert (await response.json())[0][0]["state"] == "10"
+        assert not statistics_mock.called
+
+    # or when an entity has no statistics
+    with patch(
+        "homeassistant.components.history.statistics_during_period",
+        return_value={},
+    ):
+        response = await client.get(
+            f"{url}?filter_entity_id=sensor.test&resolution=3600"
+        )
+        assert response.status == 200
+        assert (await response.json())[0][0]["state"] == "10"
+
+    response = await client.get(f"{url}?filter_entity_id=sensor.test&resolution=cats")
+    assert response.status == HTTP_BAD_REQUEST
+
+
+async def _async_record_lights(hass):
+    """Record the states of a few lights and return the time before them."""
+    await hass.async_add_executor_job(init_recorder_component, hass)
+    await async_setup_component(hass, "history", {})
+    await hass.async_add_executor_job(hass.data[recorder.DATA_INSTANCE].block_till_done)
+    start = dt_util.utcnow() - timedelta(seconds=1)
+    hass.states.async_set("light.kitchen", "on")
+    hass.states.async_set("light.cow", "on")
+    hass.states.async_set("light.kitchen", "off")
+    hass.states.async_set("light.bedroom", "on", {"brightness": 10})
+    await hass.async_block_till_done()
+
+    await hass.async_add_executor_job(trigger_db_commit, hass)
+    await hass.async_block_till_done()
+    await hass.async_add_executor_job(hass.data[recorder.DATA_INSTANCE].block_till_done)
+    return start
+
+
+async def test_stream_api(hass, hass_client):
+    """Test the stream view returns the same history as the period view."""
+    start = await _async_record_lights(hass)
+
+    client = await hass_client()
+    response = await client.get(f"/api/history/period/{start.isoformat()}")
+    assert response.status == 200
+    period_json = await response.json()
+
+    response = await client.get(f"/api/history/stream/{start.isoformat()}")
+    assert response.status == 200
+    assert response.headers["Content-Type"].startswith("application/json")
+    stream_json = await response.json()
+
+    assert [states[0]["entity_id"] for states in stream_json] == [
+        "light.bedroom",
+        "light.cow",
+        "light.kitchen",
+    ]
+    assert stream_json == sorted(period_json, key=lambda states: states[0]["entity_id"])
+
+    query = "?filter_entity_id=light.kitchen&minimal_response"
+    response = await client.get(f"/api/history/period/{start.isoformat()}{query}")
+    period_json = await response.json()
+    response = await client.get(f"/api/history/stream/{start.isoformat()}{query}")
+    assert response.status == 200
+    stream_json = await response.json()
+    assert len(stream_json) == 1
+    assert [state["state"] for state in stream_json[0]] == ["on", "off"]
+    assert stream_json == period_json
+
+
+async def test_stream_api_without_states(hass, hass_client):
+    """Test the stream view with no history returns an empty list."""
+    await hass.async_add_executor_job(init_recorder_component, hass)
+    await async_setup_component(hass, "history", {})
+    await hass.async_add_executor_job(hass.data[recorder.DATA_INSTANCE].block_till_done)
+
+    client = await hass_client()
+    response = await client.get(
+        f"/api/history/stream/{dt_util.utcnow().isoformat()}"
+        "?filter_entity_id=light.missing"
+    )
+    assert response.status == 200
+    assert await response.json() == []
+
+
+async def test_stream_websocket(hass, hass_ws_client):
+    """Test history/stream sends the states of each entity then completes."""
+    start = await _async_record_lights(hass)
+
+    client = await hass_ws_client()
+    with patch.object(history, "HISTORY_STREAM_ENTITIES_PER_MESSAGE", 2):
+        await client.send_json(
+            {"id": 1, "type": "history/stream", "start_time": start.isoformat()}
+        )
+        response = await client.receive_json()
+        assert response["success"]
+
+        first = await client.receive_json()
+        second = await client.receive_json()
+        complete = await client.receive_json()
+
+    assert first["id"] == second["id"] == complete["id"] == 1
+    assert list(first["event"]["states"]) == ["light.bedroom", "light.cow"]
+    assert list(second["event"]["states"]) == ["light.kitchen"]
+    assert first["event"]["states"]["light.bedroom"][0]["attributes"] == {
+        "brightness": 10
+    }
+    assert [state["state"] for state in second["event"]["states"]["light.kitchen"]] == [
+        "on",
+        "off",
+    ]
+    assert complete["event"] == {"complete": True}
+
+    await client.send_json({"id": 2, "type": "history/stream", "start_time": "cats"})
+    response = await client.receive_json()
+    assert not response["success"]
+    assert response["error"]["code"] == "invalid_start_time"
+
+    await client.send_json(
+        {
+            "id": 3,
+            "type": "history/stream",
+            "start_time": start.isoformat(),
+            "end_time": "cats",
+        }
+    )
+    response = await client.receive_json()
+    assert not response["success"]
+    assert response["error"]["code"] == "invalid_end_time"
+
+
+async def test_fetch_period_api_with_compressed_state_format(hass, hass_client):
+    """Test the period and stream views with the compressed state format."""
+    start = await _async_record_lights(hass)
+    hass.states.async_set("light.bedroom", "on", {"brightness": 20})
+    hass.states.async_set("light.bedroom", "off", {"brightness": 20})
+    await hass.async_block_till_done()
+    await hass.async_add_executor_job(trigger_db_commit, hass)
+    await hass.async_block_till_done()
+    await hass.async_add_executor_job(hass.data[recorder.DATA_INSTANCE].block_till_done)
+
+    # Attribute changes of lights are only significant with all changes
+    query = "?significant_changes_only=0"
+    client = await hass_client()
+    response = await client.get(f"/api/history/period/{start.isoformat()}{query}")
+    full_json = {states[0]["entity_id"]: states for states in await response.json()}
+
+    response = await client.get(
+        f"/api/history/period/{start.isoformat()}{query}&compressed_state_format"
+    )
+    assert response.status == 200
+    compressed_json = {
+        compressed["entity_id"]: compressed for compressed in await response.json()
+    }
+    assert compressed_json.keys() == full_json.keys()
+
+    bedroom = compressed_json["light.bedroom"]
+    assert bedroom["attributes"] == {"brightness": 10}
+    assert bedroom["s"] == ["on", "on", "off"]
+    assert bedroom["a"] == {"1": {"brightness": 20}}
+    # The attribute change did not change the state
+    assert bedroom["lc"] == {"1": bedroom["t"][0]}
+
+    for entity_id, compressed in compressed_json.items():
+        states = full_json[entity_id]
+        assert compressed["s"] == [state["state"] for state in states]
+        assert compressed["start"] == approx(
+            dt_util.parse_datetime(states[0]["last_updated"]).timestamp()
+        )
+        assert [compressed["start"] + offset for offset in compressed["t"]] == [
+            approx(dt_util.parse_datetime(state["last_updated"]).timestamp(), abs=1e-3)
+            for state in states
+        ]
+
+    response = await client.get(
+        f"/api/history/stream/{start.isoformat()}{query}&compressed_state_format"
+    )
+    assert response.status == 200
+    assert await response.json() == sorted(
+        compressed_json.values(), key=lambda compressed: compressed["entity_id"]
+    )
+
+    response = await client.get(
+        f"/api/history/period/{start.isoformat()}"
+        "?compressed_state_format&minimal_response&filter_entity_id=light.kitchen"
+    )
+    kitchen = (await response.json())[0]
+    assert kitchen["s"] == ["on", "off"]
+    assert "a" not in kitchen
+
+
+async def test_subscribe_websocket(hass, hass_ws_client):
+    """Test history/subscribe sends the history once and then the changes."""
+    start = await _async_record_lights(hass)
+
+    client = await hass_ws_client()
+    await client.send_json(
+        {
+            "id": 1,
+            "type": "history/subscribe",
+            "start_time": start.isoformat(),
+            "entity_ids": ["light.kitchen", "light.bedroom", "scene.ignored"],
+        }
+    )
+    response = await client.receive_json()
+    assert response["success"]
+
+    response = await client.receive_json()
+    assert response["type"] == "event"
+    states = response["event"]["states"]
+    assert states.keys() == {"light.bedroom", "light.kitchen"}
+    assert [state["state"] for state in states["light.kitchen"]] == ["on", "off"]
+
+    # Changes are collected and sent together
+    hass.states.async_set("light.kitchen", "on")
+    hass.states.async_set("light.bedroom", "on", {"brightness": 20})
+    hass.states.async_set("light.kitchen", "off")
+    hass.states.async_set("light.cow", "off")
+    await hass.async_block_till_done()
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=2))
+
+    response = await client.receive_json()
+    assert response["id"] == 1
+    states = response["event"]["states"]
+    # The attribute change is not significant for lights
+    assert list(states) == ["light.kitchen"]
+    assert [state["state"] for state in states["light.kitchen"]] == ["on", "off"]
+    assert states["light.kitchen"][0]["entity_id"] == "light.kitchen"
+
+    await client.send_json({"id": 2, "type": "unsubscribe_events", "subscription": 1})
+    response = await client.receive_json()
+    assert response["success"]
+
+    hass.states.async_set("light.kitchen", "on")
+    await hass.async_block_till_done()
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=4))
+
+    await client.send_json(
+        {
+            "id": 3,
+            "type": "history/subscribe",
+            "start_time": "cats",
+            "entity_ids": ["light.kitchen"],
+        }
+    )
+    response = await client.receive_json()
+    assert response["id"] == 3
+    assert response["error"]["code"] == "invalid_start_time"
+
+
+async def test_subscribe_websocket_minimal_response(hass, hass_ws_client):
+    """Test history/subscribe with minimal response and uncommitted states."""
+    start = await _async_record_lights(hass)
+
+    # The recorder does not record the change
+    instance = hass.data[recorder.DATA_INSTANCE]
+    with patch.object(instance, "enabled", False):
+        hass.states.async_set("light.cow", "off")
+        await hass.async_block_till_done()
+        await hass.async_add_executor_job(instance.block_till_done)
+
+    client = await hass_ws_client()
+    await client.send_json(
+        {
+            "id": 1,
+            "type": "history/subscribe",
+            "start_time": start.isoformat(),
+            "entity_ids": ["light.cow"],
+            "minimal_response": True,
+        }
+    )
+    response = await client.receive_json()
+    assert response["success"]
+    response = await client.receive_json()
+    # The state that is not in the database is taken from the state machine
+    assert response["event"]["states"]["light.cow"][-1]["state"] == "off"
+
+    hass.states.async_set("light.cow", "on", {"brightness": 20})
+    await hass.async_block_till_done()
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=2))
+
+    response = await client.receive_json()
+    assert response["event"]["states"] == {
+        "light.cow": [
+            {
+                "state": "on",
+                "last_changed": hass.states.get("light.cow").last_changed.isoformat(),
+            }
+        ]
+    }
@@ -1,5 +1,6 @@
 """The tests for the logbook component."""
 # pylint: disable=protected-access,invalid-name
+import asyncio
 import collections
 from datetime import datetime, timedelta
 import json
@@ -11,6 +12,7 @@ import voluptuous as vol
 from homeassistant.components import logbook, recorder
 from homeassistant.components.alexa.smart_home import EVENT_ALEXA_SMART_HOME
 from homeassistant.components.automation import EVENT_AUTOMATION_TRIGGERED
+from homeassistant.components.recorder.const import SIGNAL_RECORDER_EVENTS_PURGED
 from homeassistant.components.recorder.models import process_timestamp_to_utc_isoformat
 from homeassistant.components.script import EVENT_SCRIPT_STARTED
 from homeassistant.const import (
@@ -32,12 +34,18 @@ from homeassistant.const import (
     STATE_ON,
 )
 import homeassistant.core as ha
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 from homeassistant.helpers.entityfilter import CONF_ENTITY_GLOBS
 from homeassistant.helpers.json import JSONEncoder
 from homeassistant.setup import async_setup_component, setup_component
 import homeassistant.util.dt as dt_util
 
-from tests.common import get_test_home_assistant, init_recorder_component, mock_platform
+from tests.common import (
+    async_fire_time_changed,
+    get_test_home_assistant,
+    init_recorder_component,
+    mock_platform,
+)
 from tests.components.recorder.common import trigger_db_commit
 
 EMPTY_CONFIG = logbook.CONFIG_SCHEMA({logbook.DOMAIN: {}})
@@ -278,8 +286,8 @@ def create_state_changed_event_from_old_new(
         "Row",
         [
             "event_type"
-            "event_data"
-            "time_fired"
+            "shared_data"
+            "time_fired_ts"
             "context_id"
             "context_user_id"
             "context_parent_id"
@@ -287,15 +295,17 @@ def create_state_changed_event_from_old_new(
             "entity_id"
             "domain"
             "attributes"
+            "shared_attrs"
             "state_id",
             "old_state_id",
         ],
     )
 
     row.event_type = EVENT_STATE_CHANGED
-    row.event_data = "{}"
-    row.attributes = attributes_json
-    row.time_fired = event_time_fired
+    row.shared_data = "{}"
+    row.attributes = None
+    row.shared_attrs = attributes_json
+    row.time_fired_ts = event_time_fired.timestamp()
     row.state = new_state and new_state.get("state")
     row.entity_id = entity_id
     row.domain = entity_id and ha.split_entity_id(entity_id)[0]
@@ -1834,6 +1844,243 @@ async def test_context_filter(hass, hass_client):
     assert response.status == 400
 
 
+async def test_logbook_context_from_previous_request(hass, hass_client):
+    """Test a context that started before the period is found in the cache."""
+    await hass.async_add_executor_job(init_recorder_component, hass)
+    await async_setup_component(hass, "logbook", {})
+    await async_setup_component(hass, "automation", {})
+    await hass.async_add_executor_job(hass.data[recorder.DATA_INSTANCE].block_till_done)
+
+    context = ha.Context(id="ac5bd62de45711eaaeb351041eec8dd9")
+    start = dt_util.utcnow()
+    hass.bus.async_fire(
+        EVENT_AUTOMATION_TRIGGERED,
+        {ATTR_NAME: "Mock automation", ATTR_ENTITY_ID: "automation.alarm"},
+        context=context,
+    )
+    hass.states.async_set("light.switch", STATE_OFF)
+    await hass.async_block_till_done()
+    later = start + timedelta(hours=1)
+    with patch("homeassistant.core.dt_util.utcnow", return_value=later):
+        hass.states.async_set("light.switch", STATE_ON, context=context)
+        await hass.async_block_till_done()
+    await _async_commit_and_wait(hass)
+
+    client = await hass_client()
+    period_start = (start + timedelta(minutes=30)).isoformat()
+    params = {"end_time": (later + timedelta(minutes=1)).isoformat()}
+    response = await client.get(f"/api/logbook/{period_start}", params=params)
+    assert response.status == 200
+    assert response.headers["Transfer-Encoding"] == "chunked"
+    entries = await response.json()
+    assert len(entries) == 1
+    assert entries[0]["entity_id"] == "light.switch"
+    assert "context_event_type" not in entries[0]
+
+    # The origin of the context is cached by a request that reads it
+    response = await client.get(
+        f"/api/logbook/{(start - timedelta(minutes=1)).isoformat()}", params=params
+    )
+    assert len(await response.json()) == 2
+
+    response = await client.get(f"/api/logbook/{period_start}", params=params)
+    entries = await response.json()
+    assert len(entries) == 1
+    assert entries[0]["context_event_type"] == EVENT_AUTOMATION_TRIGGERED
+    assert entries[0]["context_entity_id"] == "automation.alarm"
+    assert entries[0]["context_name"] == "Mock automation"
+
+
+def test_context_origin_cache():
+    """Test the context origin cache keeps the earliest event of a context."""
+    cache = logbook.ContextOriginCache(2)
+    first = Mock(context_id="a", time_fired_ts=1.0)
+    cache.add(Mock(context_id="a", time_fired_ts=2.0))
+    cache.add(first)
+    cache.add(Mock(context_id="a", time_fired_ts=3.0))
+    assert cache.get("a") is first
+
+    cache.add(Mock(context_id="b", time_fired_ts=1.0))
+    cache.add(Mock(context_id="c", time_fired_ts=1.0))
+    assert cache.get("a") is None
+
+    lookup = logbook.ContextLookup(cache)
+    later = Mock(context_id="b", time_fired_ts=5.0)
+    lookup.add(later)
+    assert lookup.get("b") is cache.get("b")
+    assert lookup.get("b") is not later
+    assert lookup.get("c").time_fired_ts == 1.0
+    assert lookup.get(None) is None
+
+    # The events purged by the recorder are forgotten
+    cache.purge_before(2.0)
+    assert cache.get("b") is None
+    assert cache.get("c") is None
+
+
+async def test_context_origin_cache_purged(hass):
+    """Test the context origins are forgotten when the recorder purges events."""
+    await hass.async_add_executor_job(init_recorder_component, hass)
+    await async_setup_component(hass, "logbook", {})
+    cache = hass.data[logbook.DATA_CONTEXT_ORIGINS]
+    cache.add(Mock(context_id="a", time_fired_ts=1.0))
+    cache.add(Mock(context_id="b", time_fired_ts=3.0))
+
+    async_dispatcher_send(hass, SIGNAL_RECORDER_EVENTS_PURGED, 2.0)
+    await hass.async_block_till_done()
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+
+
+def test_event_without_time_fired():
+    """Test an event read without a time is shown at the current time."""
+    event = create_state_changed_event_from_old_new(
+        "sensor.test", dt_util.utcnow(), None, {"state": "1"}
+    )
+    event._row.time_fired_ts = None
+    now = dt_util.utcnow()
+    with patch("homeassistant.util.dt.utcnow", return_value=now):
+        event = logbook.LazyEventPartialState(event._row)
+    assert event.time_fired_ts == now.timestamp()
+    assert event.time_fired_minute == now.minute
+
+
+async def test_event_stream(hass, hass_ws_client):
+    """Test logbook/event_stream replays the period and then streams the events."""
+    await hass.async_add_executor_job(init_recorder_component, hass)
+    await async_setup_component(hass, "logbook", {})
+    await hass.async_add_executor_job(hass.data[recorder.DATA_INSTANCE].block_till_done)
+    start = dt_util.utcnow() - timedelta(seconds=1)
+
+    hass.states.async_set("light.kitchen", STATE_OFF)
+    hass.states.async_set("light.kitchen", STATE_ON)
+    logbook.async_log_entry(hass, "Alarm", "is triggered", "switch")
+    await _async_commit_and_wait(hass)
+
+    client = await hass_ws_client()
+    await client.send_json(
+        {"id": 1, "type": "logbook/event_stream", "start_time": start.isoformat()}
+    )
+    response = await client.receive_json()
+    assert response["success"]
+
+    response = await client.receive_json()
+    assert response["type"] == "event"
+    replayed = response["event"]["events"]
+    assert len(replayed) == 2
+    _assert_entry(replayed[0], entity_id="light.kitchen", state=STATE_ON)
+    _assert_entry(replayed[1], name="Alarm", message="is triggered", domain="switch")
+
+    context = ha.Context()
+    hass.bus.async_fire(
+        EVENT_CALL_SERVICE,
+        {ATTR_DOMAIN: "light", ATTR_SERVICE: "turn_off"},
+        context=context,
+    )
+    hass.states.async_set("light.kitchen", STATE_OFF, context=context)
+    # Attribute changes and continuous sensors are left out
+    hass.states.async_set("light.kitchen", STATE_OFF, {"brightness": 10})
+    hass.states.async_set("sensor.power", "10", {"unit_of_measurement": "W"})
+    hass.states.async_set("sensor.power", "20", {"unit_of_measurement": "W"})
+    logbook.async_log_entry(hass, "Door", "is open", entity_id="binary_sensor.door")
+    await hass.async_block_till_done()
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=2))
+
+    response = await client.receive_json()
+    assert response["id"] == 1
+    streamed = response["event"]["events"]
+    assert len(streamed) == 2
+    _assert_entry(streamed[0], entity_id="light.kitchen", state=STATE_OFF)
+    assert streamed[0]["context_domain"] == "light"
+    assert streamed[0]["context_service"] == "turn_off"
+    _assert_entry(streamed[1], name="Door", entity_id="binary_sensor.door")
+
+    await client.send_json({"id": 2, "type": "unsubscribe_events", "subscription": 1})
+    response = await client.receive_json()
+    assert response["success"]
+
+    await client.send_json(
+        {"id": 3, "type": "logbook/event_stream", "start_time": "cats"}
+    )
+    response = await client.receive_json()
+    assert response["id"] == 3
+    assert response["error"]["code"] == "invalid_start_time"
+
+
+async def test_event_stream_recorder_not_committing(hass, hass_ws_client):
+    """Test logbook/event_stream does not wait for a recorder that does not commit."""
+    await hass.async_add_executor_job(init_recorder_component, hass)
+    await async_setup_component(hass, "logbook", {})
+    await hass.async_add_executor_job(hass.data[recorder.DATA_INSTANCE].block_till_done)
+    start = dt_util.utcnow() - timedelta(seconds=1)
+    logbook.async_log_entry(hass, "Alarm", "is triggered", "switch")
+    await _async_commit_and_wait(hass)
+
+    async def _async_never_commit():
+        await asyncio.Event().wait()
+
+    client = await hass_ws_client()
+    instance = hass.data[recorder.DATA_INSTANCE]
+    with patch.object(logbook, "EVENT_STREAM_COMMIT_TIMEOUT", 0.01), patch.object(
+        instance, "async_commit", _async_never_commit
+    ):
+        await client.send_json(
+            {"id": 1, "type": "logbook/event_stream", "start_time": start.isoformat()}
+        )
+        response = await client.receive_json()
+        assert response["success"]
+        response = await client.receive_json()
+        assert len(response["event"]["events"]) == 1
+
+    # The commit is skipped while the database is migrated
+    with patch.object(instance, "migration_in_progress", True), patch.object(
+        instance, "async_commit"
+    ) as commit_mock:
+        await client.send_json(
+            {"id": 2, "type": "logbook/event_stream", "start_time": start.isoformat()}
+        )
+        response = await client.receive_json()
+        assert response["success"]
+        response = await client.receive_json()
+        assert len(response["event"]["events"]) == 1
+    assert not commit_mock.called
+
+
+async def test_event_stream_entity_ids(hass, hass_ws_client):
+    """Test logbook/event_stream only streams the events of the entities."""
+    await hass.async_add_executor_job(init_recorder_component, hass)
+    await async_setup_component(hass, "logbook", {})
+    await hass.async_add_executor_job(hass.data[recorder.DATA_INSTANCE].block_till_done)
+    hass.states.async_set("light.kitchen", STATE_OFF)
+    hass.states.async_set("light.bedroom", STATE_OFF)
+    await _async_commit_and_wait(hass)
+
+    client = await hass_ws_client()
+    await client.send_json(
+        {
+            "id": 1,
+            "type": "logbook/event_stream",
+            "start_time": dt_util.utcnow().isoformat(),
+            "entity_ids": ["light.kitchen"],
+        }
+    )
+    response = await client.receive_json()
+    assert response["success"]
+    response = await client.receive_json()
+    assert response["event"]["events"] == []
+
+    hass.states.async_set("light.bedroom", STATE_ON)
+    hass.states.async_set("light.kitchen", STATE_ON)
+    logbook.async_log_entry(hass, "Bedroom", "is lit", entity_id="light.bedroom")
+    await hass.async_block_till_done()
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=2))
+
+    response = await client.receive_json()
+    streamed = response["event"]["events"]
+    assert len(streamed) == 1
+    _assert_entry(streamed[0], entity_id="light.kitchen", state=STATE_ON)
+
+
 async def _async_fetch_logbook(client, params=None):
     if params is None:
         params = {}
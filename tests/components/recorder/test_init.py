@@ -1,12 +1,14 @@
 """The tests for the Recorder component."""
 # pylint: disable=protected-access
 from datetime import datetime, timedelta
+import math
 import sqlite3
 from unittest.mock import patch
 
+import pytest
+from sqlalchemy import text
 from sqlalchemy.exc import DatabaseError, OperationalError, SQLAlchemyError
 
-from homeassistant.components import recorder
 from homeassistant.components.recorder import (
     CONF_DB_URL,
     CONFIG_SCHEMA,
@@ -21,8 +23,15 @@ from homeassistant.components.recorder import (
     run_information_from_instance,
     run_information_with_session,
 )
-from homeassistant.components.recorder.const import DATA_INSTANCE
-from homeassistant.components.recorder.models import Events, RecorderRuns, States
+from homeassistant.components.recorder.const import DATA_INSTANCE, MAX_STREAM_POOL_SIZE
+from homeassistant.components.recorder.models import (
+    EventData,
+    Events,
+    EventTypes,
+    RecorderRuns,
+    StateAttributes,
+    States,
+)
 from homeassistant.components.recorder.util import session_scope
 from homeassistant.const import (
     EVENT_HOMEASSISTANT_FINAL_WRITE,
@@ -138,30 +147,197 @@ async def test_saving_state(
     assert state == _state_empty_context(hass, entity_id)
 
 
+async def test_saving_state_with_nan(
+    hass: HomeAssistant, async_setup_recorder_instance: SetupRecorderInstanceT
+):
+    """Test saving and restoring a state with NaN and infinity attributes."""
+    instance = await async_setup_recorder_instance(hass)
+
+    hass.states.async_set(
+        "test.recorder", "on", {"nan": float("nan"), "inf": float("inf")}
+    )
+    hass.bus.async_fire("test_event", {"nan": float("nan")})
+
+    await async_wait_recording_done(hass, instance)
+
+    with session_scope(hass=hass) as session:
+        db_states = list(session.query(States))
+        assert len(db_states) == 1
+        state = db_states[0].to_native()
+        event = (
+            session.query(Events)
+            .join(EventTypes)
+            .filter(EventTypes.event_type == "test_event")
+            .one()
+            .to_native()
+        )
+
+    assert math.isnan(state.attributes["nan"])
+    assert state.attributes["inf"] == float("inf")
+    assert math.isnan(event.data["nan"])
+
+
 async def test_saving_many_states(
     hass: HomeAssistant, async_setup_recorder_instance: SetupRecorderInstanceT
 ):
-    """Test we expire after many commits."""
+    """Test saving many states over many commits."""
     instance = await async_setup_recorder_instance(hass)
 
     entity_id = "test.recorder"
     attributes = {"test_attr": 5, "test_attr_10": "nice"}
 
-    with patch.object(
-        hass.data[DATA_INSTANCE].event_session, "expire_all"
-    ) as expire_all, patch.object(recorder, "EXPIRE_AFTER_COMMITS", 2):
-        for _ in range(3):
-            hass.states.async_set(entity_id, "on", attributes)
-            await async_wait_recording_done(hass, instance)
-            hass.states.async_set(entity_id, "off", attributes)
-            await async_wait_recording_done(hass, instance)
-
-    assert expire_all.called
+    for _ in range(3):
+        hass.states.async_set(entity_id, "on", attributes)
+        await async_wait_recording_done(hass, instance)
+        hass.states.async_set(entity_id, "off", attributes)
+        await async_wait_recording_done(hass, instance)
 
     with session_scope(hass=hass) as session:
         db_states = list(session.query(States))
         assert len(db_states) == 6
         assert db_states[0].event_id > 0
+        for previous, db_state in zip(db_states, db_states[1:]):
+            assert db_state.old_state_id == previous.state_id
+            assert db_state.event_id == previous.event_id + 1
+
+
+async def test_saving_rows_in_recorded_order(
+    hass: HomeAssistant, async_setup_recorder_instance: SetupRecorderInstanceT
+):
+    """Test rows whose keys are read back keep the order they were recorded in."""
+    instance = await async_setup_recorder_instance(hass)
+
+    hass.bus.async_fire("test_event_1")
+    hass.states.async_set("test.one", "on")
+    hass.bus.async_fire("test_event_2")
+    hass.bus.async_fire("test_event_3")
+    hass.states.async_set("test.one", "off")
+    hass.states.async_set("test.two", "on")
+    await async_wait_recording_done(hass, instance)
+
+    with session_scope(hass=hass) as session:
+        db_events = list(session.query(Events).order_by(Events.event_id))
+        assert [db_event.shared_event_type for db_event in db_events][-6:] == [
+            "test_event_1",
+            "state_changed",
+            "test_event_2",
+            "test_event_3",
+            "state_changed",
+            "state_changed",
+        ]
+        db_states = list(session.query(States).order_by(States.state_id))
+        assert [(db_state.entity_id, db_state.state) for db_state in db_states] == [
+            ("test.one", "on"),
+            ("test.one", "off"),
+            ("test.two", "on"),
+        ]
+        assert [db_state.event_id for db_state in db_states] == [
+            db_events[-5].event_id,
+            db_events[-2].event_id,
+            db_events[-1].event_id,
+        ]
+        assert db_states[1].old_state_id == db_states[0].state_id
+
+
+async def test_saving_many_states_in_one_commit(
+    hass: HomeAssistant, async_setup_recorder_instance: SetupRecorderInstanceT
+):
+    """Test states written in the same commit reference each other."""
+    instance = await async_setup_recorder_instance(hass)
+
+    for idx in range(5):
+        hass.states.async_set("test.one", f"on{idx}")
+        hass.states.async_set("test.two", f"on{idx}")
+    hass.bus.async_fire("test_event", {"some": "data"})
+    await async_wait_recording_done(hass, instance)
+
+    with session_scope(hass=hass) as session:
+        db_events = {db_event.event_id: db_event for db_event in session.query(Events)}
+        db_states = list(session.query(States).order_by(States.state_id))
+        assert len(db_states) == 10
+        for entity_id in ("test.one", "test.two"):
+            entity_states = [
+                db_state for db_state in db_states if db_state.entity_id == entity_id
+            ]
+            assert entity_states[0].old_state_id is None
+            for idx, db_state in enumerate(entity_states):
+                assert db_state.state == f"on{idx}"
+                assert db_events[db_state.event_id].shared_event_type == "state_changed"
+                if idx:
+                    assert db_state.old_state_id == entity_states[idx - 1].state_id
+        db_event = (
+            session.query(Events)
+            .join(EventTypes)
+            .filter(EventTypes.event_type == "test_event")
+            .one()
+        )
+        assert db_event.event_data is None
+        assert db_event.shared_data == '{"some": "data"}'
+        assert db_event.event_data_rel.shared_data == '{"some": "data"}'
+        # The data of state_changed events is stored with the state
+        assert all(
+            db_events[db_state.event_id].data_id is None for db_state in db_states
+        )
+        assert (
+            len({db_events[db_state.event_id].event_type_id for db_state in db_states})
+            == 1
+        )
+
+
+async def test_async_commit(
+    hass: HomeAssistant, async_setup_recorder_instance: SetupRecorderInstanceT
+):
+    """Test waiting for the queued events to be committed."""
+    instance = await async_setup_recorder_instance(hass)
+
+    hass.states.async_set("test.recorder", "on")
+    await hass.async_block_till_done()
+    await instance.async_commit()
+
+    with session_scope(hass=hass) as session:
+        assert session.query(States).count() == 1
+
+
+async def test_metrics_websocket(
+    hass: HomeAssistant,
+    async_setup_recorder_instance: SetupRecorderInstanceT,
+    hass_ws_client,
+):
+    """Test the recorder metrics are returned over the websocket."""
+    assert await async_setup_component(hass, "websocket_api", {})
+    instance = await async_setup_recorder_instance(hass)
+
+    hass.states.async_set("test.recorder", "on")
+    hass.states.async_set("test.recorder", "off")
+    await hass.async_block_till_done()
+    await instance.async_commit()
+
+    client = await hass_ws_client()
+    await client.send_json({"id": 1, "type": "recorder/metrics"})
+    response = await client.receive_json()
+    assert response["success"]
+    metrics = response["result"]
+    assert metrics["queue_size"] == 0
+    assert metrics["spilling"] is False
+    assert metrics["committed_events"] >= 2
+    assert metrics["events_per_second"] > 0
+    assert metrics["commit_retries"] == 0
+    assert metrics["commit_duration"]["count"] == metrics["commits"]
+    assert metrics["commit_duration"]["buckets"]["+Inf"] == metrics["commits"]
+    assert metrics["serialize_duration"]["count"] >= 2
+    assert metrics["repack"]["running"] is False
+
+
+async def test_metrics_sensors(hass: HomeAssistant):
+    """Test the recorder metrics are polled by sensors when enabled."""
+    await async_init_recorder_component(hass, {"metrics_sensors": True})
+    await hass.async_block_till_done()
+
+    state = hass.states.get("sensor.recorder_queue_size")
+    assert state.attributes["unit_of_measurement"] == "events"
+    assert int(state.state) >= 0
+    assert hass.states.get("sensor.recorder_commit_retries").state == "0"
+    assert hass.states.get("sensor.recorder_purged_rows").state == "0"
 
 
 async def test_saving_state_with_intermixed_time_changes(
@@ -198,17 +374,12 @@ def test_saving_state_with_exception(hass, hass_recorder, caplog):
     state = "restoring_from_db"
     attributes = {"test_attr": 5, "test_attr_10": "nice"}
 
-    def _throw_if_state_in_session(*args, **kwargs):
-        for obj in hass.data[DATA_INSTANCE].event_session:
-            if isinstance(obj, States):
-                raise OperationalError(
-                    "insert the state", "fake params", "forced to fail"
-                )
-
     with patch("time.sleep"), patch.object(
-        hass.data[DATA_INSTANCE].event_session,
-        "flush",
-        side_effect=_throw_if_state_in_session,
+        hass.data[DATA_INSTANCE],
+        "_insert_pending_rows",
+        side_effect=OperationalError(
+            "insert the state", "fake params", "forced to fail"
+        ),
     ):
         hass.states.set(entity_id, "fail", attributes)
         wait_recording_done(hass)
@@ -236,17 +407,12 @@ def test_saving_state_with_sqlalchemy_exception(hass, hass_recorder, caplog):
     state = "restoring_from_db"
     attributes = {"test_attr": 5, "test_attr_10": "nice"}
 
-    def _throw_if_state_in_session(*args, **kwargs):
-        for obj in hass.data[DATA_INSTANCE].event_session:
-            if isinstance(obj, States):
-                raise SQLAlchemyError(
-                    "insert the state", "fake params", "forced to fail"
-                )
-
     with patch("time.sleep"), patch.object(
-        hass.data[DATA_INSTANCE].event_session,
-        "flush",
-        side_effect=_throw_if_state_in_session,
+        hass.data[DATA_INSTANCE],
+        "_insert_pending_rows",
+        side_effect=SQLAlchemyError(
+            "insert the state", "fake params", "forced to fail"
+        ),
     ):
         hass.states.set(entity_id, "fail", attributes)
         wait_recording_done(hass)
@@ -278,8 +444,8 @@ async def test_force_shutdown_with_queue_of_writes_that_generate_exceptions(
     await async_wait_recording_done(hass, instance)
 
     with patch.object(instance, "db_retry_wait", 0.2), patch.object(
-        instance.event_session,
-        "flush",
+        instance,
+        "_insert_pending_rows",
         side_effect=OperationalError(
             "insert the state", "fake params", "forced to fail"
         ),
@@ -323,7 +489,11 @@ def test_saving_event(hass, hass_recorder):
     hass.data[DATA_INSTANCE].block_till_done()
 
     with session_scope(hass=hass) as session:
-        db_events = list(session.query(Events).filter_by(event_type=event_type))
+        db_events = list(
+            session.query(Events)
+            .join(EventTypes)
+            .filter(EventTypes.event_type == event_type)
+        )
         assert len(db_events) == 1
         db_event = db_events[0].to_native()
 
@@ -337,6 +507,45 @@ def test_saving_event(hass, hass_recorder):
     )
 
 
+def test_saving_events_shares_event_data(hass_recorder):
+    """Test events with the same data share one event_data row."""
+    hass = hass_recorder()
+
+    hass.bus.fire("test_event", {"some": "data"})
+    hass.bus.fire("test_event", {"some": "data"})
+    wait_recording_done(hass)
+    hass.bus.fire("test_event", {"some": "data"})
+    hass.bus.fire("test_event", {"other": "data"})
+    hass.bus.fire("test_event")
+    wait_recording_done(hass)
+
+    with session_scope(hass=hass) as session:
+        db_events = list(
+            session.query(Events)
+            .join(EventTypes)
+            .filter(EventTypes.event_type == "test_event")
+            .order_by(Events.event_id)
+        )
+        assert len(db_events) == 5
+        assert len({db_event.event_type_id for db_event in db_events}) == 1
+        assert db_events[0].data_id == db_events[1].data_id == db_events[2].data_id
+        assert db_events[3].data_id != db_events[0].data_id
+        assert db_events[4].data_id is None
+        assert [db_event.to_native().data for db_event in db_events] == [
+            {"some": "data"},
+            {"some": "data"},
+            {"some": "data"},
+            {"other": "data"},
+            {},
+        ]
+        assert (
+            session.query(EventData)
+            .filter(EventData.shared_data == '{"some": "data"}')
+            .count()
+            == 1
+        )
+
+
 def test_saving_state_with_commit_interval_zero(hass_recorder):
     """Test saving a state with a commit interval of zero."""
     hass = hass_recorder({"commit_interval": 0})
@@ -663,6 +872,31 @@ def test_saving_sets_old_state(hass_recorder):
         assert states[3].old_state_id == states[1].state_id
 
 
+def test_saving_state_shares_attributes(hass_recorder):
+    """Test states with the same attributes share one state_attributes row."""
+    hass = hass_recorder()
+
+    hass.states.set("test.one", "on", {"friendly_name": "One"})
+    hass.states.set("test.two", "on", {"friendly_name": "One"})
+    wait_recording_done(hass)
+    hass.states.set("test.one", "off", {"friendly_name": "One"})
+    hass.states.set("test.two", "off", {"friendly_name": "Two"})
+    wait_recording_done(hass)
+
+    with session_scope(hass=hass) as session:
+        states = list(session.query(States))
+        assert len(states) == 4
+        assert all(state.attributes is None for state in states)
+        assert len({state.attributes_id for state in states}) == 2
+        assert states[0].attributes_id == states[1].attributes_id
+        assert states[0].attributes_id == states[2].attributes_id
+
+        state_attributes = list(session.query(StateAttributes))
+        assert len(state_attributes) == 2
+        assert states[3].to_native().attributes == {"friendly_name": "Two"}
+        assert states[3].state_attributes.to_native() == {"friendly_name": "Two"}
+
+
 def test_saving_state_with_serializable_data(hass_recorder, caplog):
     """Test saving data that cannot be serialized does not crash."""
     hass = hass_recorder()
@@ -758,7 +992,11 @@ def test_service_disable_events_not_recording(hass, hass_recorder):
     event = events[0]
 
     with session_scope(hass=hass) as session:
-        db_events = list(session.query(Events).filter_by(event_type=event_type))
+        db_events = list(
+            session.query(Events)
+            .join(EventTypes)
+            .filter(EventTypes.event_type == event_type)
+        )
         assert len(db_events) == 0
 
     assert hass.services.call(
@@ -777,7 +1015,11 @@ def test_service_disable_events_not_recording(hass, hass_recorder):
     assert events[0].data != events[1].data
 
     with session_scope(hass=hass) as session:
-        db_events = list(session.query(Events).filter_by(event_type=event_type))
+        db_events = list(
+            session.query(Events)
+            .join(EventTypes)
+            .filter(EventTypes.event_type == event_type)
+        )
         assert len(db_events) == 1
         db_event = db_events[0].to_native()
 
@@ -867,6 +1109,44 @@ def test_service_disable_run_information_recorded(tmpdir):
     hass.stop()
 
 
+def test_read_session_uses_read_only_pool(tmpdir):
+    """Test queries outside the recorder thread use the read only pool."""
+    test_db_file = tmpdir.mkdir("sqlite").join("test_read_pool.db")
+    dburl = f"{SQLITE_URL_PREFIX}//{test_db_file}"
+
+    hass = get_test_home_assistant()
+    setup_component(hass, DOMAIN, {DOMAIN: {CONF_DB_URL: dburl}})
+    hass.start()
+    hass.states.set("test.read_pool", "on")
+    wait_recording_done(hass)
+
+    instance = hass.data[DATA_INSTANCE]
+    assert instance.read_engine is not None
+
+    with session_scope(hass=hass, read_only=True) as session:
+        assert session.query(States).count() == 1
+        with pytest.raises(OperationalError):
+            session.execute(text("DELETE FROM states"))
+
+    with session_scope(hass=hass, read_only=True) as session:
+        assert session.query(States).count() == 1
+
+    # Streamed responses have a pool of their own
+    assert instance.stream_engine is not None
+    assert instance.stream_engine.pool.size() == MAX_STREAM_POOL_SIZE
+    with session_scope(hass=hass, stream=True) as session:
+        assert session.bind is instance.stream_engine
+        assert session.query(States).count() == 1
+        with pytest.raises(OperationalError):
+            session.execute(text("DELETE FROM states"))
+
+    timings = instance.read_query_timings.as_dict()
+    assert timings["count"] >= 2
+    assert timings["max"] >= timings["mean"] > 0
+
+    hass.stop()
+
+
 class CannotSerializeMe:
     """A class that the JSONEncoder cannot serialize."""
 
@@ -952,7 +1232,11 @@ def test_entity_id_filter(hass_recorder):
         wait_recording_done(hass)
 
         with session_scope(hass=hass) as session:
-            db_events = list(session.query(Events).filter_by(event_type="hello"))
+            db_events = list(
+                session.query(Events)
+                .join(EventTypes)
+                .filter(EventTypes.event_type == "hello")
+            )
             assert len(db_events) == idx + 1, data
 
     for data in (
@@ -963,6 +1247,10 @@ def test_entity_id_filter(hass_recorder):
         wait_recording_done(hass)
 
         with session_scope(hass=hass) as session:
-            db_events = list(session.query(Events).filter_by(event_type="hello"))
+            db_events = list(
+                session.query(Events)
+                .join(EventTypes)
+                .filter(EventTypes.event_type == "hello")
+            )
             # Keep referring idx + 1, as no new events are being added
             assert len(db_events) == idx + 1, data
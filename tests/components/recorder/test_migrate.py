@@ -19,7 +19,13 @@ from homeassistant.bootstrap import async_setup_component
 from homeassistant.components import recorder
 from homeassistant.components.recorder import RecorderRuns, migration, models
 from homeassistant.components.recorder.const import DATA_INSTANCE
-from homeassistant.components.recorder.models import States
+from homeassistant.components.recorder.models import (
+    EventData,
+    Events,
+    EventTypes,
+    StateAttributes,
+    States,
+)
 from homeassistant.components.recorder.util import session_scope
 import homeassistant.util.dt as dt_util
 
@@ -200,14 +206,17 @@ async def test_events_during_migration_are_queued(hass):
     assert len(db_states) == 2
 
 
-async def test_events_during_migration_queue_exhausted(hass):
+async def test_events_during_migration_queue_exhausted(hass, tmpdir):
     """Test that events during migration takes so long the queue is exhausted."""
     await async_setup_component(hass, "persistent_notification", {})
     assert await recorder.async_migration_in_progress(hass) is False
 
+    spill_file = tmpdir.join("spill")
     with patch(
         "homeassistant.components.recorder.create_engine", new=create_engine_test
-    ), patch.object(recorder, "MAX_QUEUE_BACKLOG", 1):
+    ), patch.object(recorder, "MAX_QUEUE_BACKLOG", 1), patch.object(
+        recorder, "SPILL_FILE_NAME", str(spill_file)
+    ):
         await async_setup_component(
             hass, "recorder", {"recorder": {"db_url": "sqlite://"}}
         )
@@ -221,13 +230,15 @@ async def test_events_during_migration_queue_exhausted(hass):
         await hass.data[DATA_INSTANCE].async_recorder_ready.wait()
         await async_wait_recording_done_without_instance(hass)
 
+    # The events beyond the backlog are spilled and recorded after the migration
     assert await recorder.async_migration_in_progress(hass) is False
     db_states = await hass.async_add_executor_job(_get_native_states, hass, "my.entity")
-    assert len(db_states) == 1
+    assert [state.state for state in db_states] == ["on", "off"]
     hass.states.async_set("my.entity", "on", {})
     await async_wait_recording_done_without_instance(hass)
     db_states = await hass.async_add_executor_job(_get_native_states, hass, "my.entity")
-    assert len(db_states) == 2
+    assert len(db_states) == 3
+    assert not spill_file.exists()
 
 
 async def test_schema_migrate(hass):
@@ -284,6 +295,202 @@ def test_modify_column(engine_type, substr):
         assert not connection.execute.called
 
 
+def test_migrate_attributes_to_state_attributes():
+    """Test attributes stored in the states table are moved and shared."""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    models.Base.metadata.create_all(engine)
+    now = dt_util.utcnow()
+    with Session(engine) as session:
+        for idx in range(5):
+            session.add(
+                States(
+                    entity_id=f"sensor.test_{idx}",
+                    domain="sensor",
+                    state="on",
+                    attributes=f'{{"test_attr": {idx % 2}}}',
+                    last_changed=now,
+                    last_updated=now,
+                )
+            )
+        session.commit()
+
+        with patch.object(migration, "MIGRATE_BATCH_SIZE", 2):
+            migration._migrate_attributes_to_state_attributes(session)
+
+        states = session.query(States).order_by(States.state_id).all()
+        assert all(state.attributes is None for state in states)
+        assert [state.to_native().attributes["test_attr"] for state in states] == [
+            0,
+            1,
+            0,
+            1,
+            0,
+        ]
+        assert session.query(StateAttributes).count() == 2
+
+
+def test_migrate_batches_walk_the_primary_key():
+    """Test the migration reads every row once in primary key order."""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    models.Base.metadata.create_all(engine)
+    now = dt_util.utcnow()
+    with Session(engine) as session:
+        for idx in range(5):
+            session.add(
+                States(
+                    entity_id=f"sensor.test_{idx}",
+                    domain="sensor",
+                    state="on",
+                    # Rows moved before an interrupted migration
+                    attributes=None if idx < 3 else '{"test_attr": 1}',
+                    last_changed=now,
+                    last_updated=now,
+                )
+            )
+        session.commit()
+
+        with patch.object(migration, "MIGRATE_BATCH_SIZE", 2):
+            batches = list(
+                migration._batches_by_row_id(session, States.state_id, States.state)
+            )
+            assert [[row[0] for row in batch] for batch in batches] == [
+                [1, 2],
+                [3, 4],
+                [5],
+            ]
+            migration._migrate_attributes_to_state_attributes(session)
+
+        states = session.query(States).order_by(States.state_id).all()
+        assert [state.attributes_id for state in states] == [None, None, None, 1, 1]
+
+
+def test_migrate_events_to_event_types_and_event_data():
+    """Test event types and data stored in the events table are moved and shared."""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    models.Base.metadata.create_all(engine)
+    now = dt_util.utcnow()
+    with Session(engine) as session:
+        for idx in range(5):
+            session.add(
+                Events(
+                    event_type=f"test_event_{idx % 2}",
+                    event_data="{}" if idx == 4 else f'{{"test_attr": {idx % 2}}}',
+                    origin="LOCAL",
+                    time_fired=now,
+                )
+            )
+        session.commit()
+
+        with patch.object(migration, "MIGRATE_BATCH_SIZE", 2):
+            migration._migrate_event_types_to_event_types(session)
+            migration._migrate_event_data_to_event_data(session)
+
+        events = session.query(Events).order_by(Events.event_id).all()
+        assert all(event.event_type is None for event in events)
+        assert all(event.event_data is None for event in events)
+        assert [
+            (event.to_native().event_type, event.to_native().data) for event in events
+        ] == [
+            ("test_event_0", {"test_attr": 0}),
+            ("test_event_1", {"test_attr": 1}),
+            ("test_event_0", {"test_attr": 0}),
+            ("test_event_1", {"test_attr": 1}),
+            ("test_event_0", {}),
+        ]
+        assert events[4].data_id is None
+        assert session.query(EventTypes).count() == 2
+        assert session.query(EventData).count() == 2
+
+
+def test_migrate_event_types_resumes_interrupted_migration():
+    """Test event types already moved by an interrupted migration are reused."""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    models.Base.metadata.create_all(engine)
+    now = dt_util.utcnow()
+    with Session(engine) as session:
+        session.add(EventTypes(event_type_id=1, event_type="test_event_0"))
+        session.add(Events(event_type_id=1, origin="LOCAL", time_fired=now))
+        for idx in range(4):
+            session.add(
+                Events(
+                    event_type=f"test_event_{idx % 2}",
+                    origin="LOCAL",
+                    time_fired=now,
+                )
+            )
+        session.commit()
+
+        with patch.object(migration, "MIGRATE_BATCH_SIZE", 2):
+            migration._migrate_event_types_to_event_types(session)
+
+        events = session.query(Events).order_by(Events.event_id).all()
+        assert [event.event_type_id for event in events] == [1, 1, 2, 1, 2]
+        assert session.query(EventTypes).count() == 2
+
+
+def test_migrate_datetimes_to_timestamps():
+    """Test the timestamps of events and states are filled from their datetimes."""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    models.Base.metadata.create_all(engine)
+    now = dt_util.utcnow()
+    with Session(engine) as session:
+        for idx in range(5):
+            session.add(
+                Events(
+                    event_type="test_event",
+                    origin="LOCAL",
+                    time_fired=now + datetime.timedelta(seconds=idx),
+                )
+            )
+            session.add(
+                States(
+                    entity_id="sensor.test",
+                    domain="sensor",
+                    state=str(idx),
+                    last_changed=now,
+                    last_updated=now + datetime.timedelta(seconds=idx),
+                )
+            )
+        session.commit()
+        # Rows written before the timestamp columns existed, the
+        # first event was filled before the migration was interrupted
+        session.execute(
+            Events.__table__.update()
+            .where(Events.event_id > 1)
+            .values(time_fired_ts=None)
+        )
+        session.execute(
+            States.__table__.update().values(last_changed_ts=None, last_updated_ts=None)
+        )
+        session.commit()
+
+        with patch.object(migration, "MIGRATE_BATCH_SIZE", 2):
+            migration._migrate_datetimes_to_timestamps(session)
+
+        events = session.query(Events).order_by(Events.event_id).all()
+        assert [event.time_fired_ts for event in events] == [
+            (now + datetime.timedelta(seconds=idx)).timestamp() for idx in range(5)
+        ]
+        states = session.query(States).order_by(States.state_id).all()
+        assert [state.last_updated_ts for state in states] == [
+            (now + datetime.timedelta(seconds=idx)).timestamp() for idx in range(5)
+        ]
+        assert {state.last_changed_ts for state in states} == {now.timestamp()}
+
+
+def test_migrate_enables_sqlite_incremental_vacuum():
+    """Test the migration vacuums the database once to enable incremental vacuum."""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    with engine.connect() as conn:
+        conn.execute(text("PRAGMA auto_vacuum=NONE"))
+    models.Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        assert session.execute(text("PRAGMA auto_vacuum")).scalar() == 0
+        migration._apply_update(engine, session, 20, 19)
+        session.commit()
+        assert session.execute(text("PRAGMA auto_vacuum")).scalar() == 2
+
+
 def test_forgiving_add_column():
     """Test that add column will continue if column exists."""
     engine = create_engine("sqlite://", poolclass=StaticPool)
@@ -8,9 +8,14 @@ from sqlalchemy.orm import scoped_session, sessionmaker
 
 from homeassistant.components.recorder.models import (
     Base,
+    EventData,
     Events,
+    EventTypes,
     RecorderRuns,
+    StateAttributes,
     States,
+    process_datetime_to_timestamp,
+    process_float_timestamp_to_utc_isoformat,
     process_timestamp,
     process_timestamp_to_utc_isoformat,
 )
@@ -24,21 +29,51 @@ import homeassistant.util.dt as dt_util
 def test_from_event_to_db_event():
     """Test converting event to db event."""
     event = ha.Event("test_event", {"some_data": 15})
-    assert event == Events.from_event(event).to_native()
+    db_event = Events.from_event(event)
+    assert db_event.event_type is None
+    assert db_event.event_data is None
+    db_event.event_type_rel = EventTypes.from_event(event)
+    db_event.event_data_rel = EventData.from_event(event)
+    assert event == db_event.to_native()
+
+
+def test_from_event_to_db_event_data():
+    """Test converting event to db event data."""
+    event = ha.Event("test_event", {"some_data": 15})
+    db_data = EventData.from_event(event)
+    assert db_data.to_native() == {"some_data": 15}
+    assert db_data.hash == EventData.hash_shared_data(db_data.shared_data)
 
 
 def test_from_event_to_db_state():
     """Test converting event to db state."""
-    state = ha.State("sensor.temperature", "18")
+    state = ha.State("sensor.temperature", "18", {"unit_of_measurement": "°C"})
     event = ha.Event(
         EVENT_STATE_CHANGED,
         {"entity_id": "sensor.temperature", "old_state": None, "new_state": state},
         context=state.context,
     )
+    db_state = States.from_event(event)
+    assert db_state.attributes is None
+    db_state.state_attributes = StateAttributes.from_event(event)
     # We don't restore context unless we need it by joining the
     # events table on the event_id for state_changed events
     state.context = ha.Context(id=None)
-    assert state == States.from_event(event).to_native()
+    assert state == db_state.to_native()
+
+
+def test_from_event_to_db_state_attributes():
+    """Test converting event to db state attributes."""
+    attrs = {"this_attr": True}
+    state = ha.State("sensor.temperature", "18", attrs)
+    event = ha.Event(
+        EVENT_STATE_CHANGED,
+        {"entity_id": "sensor.temperature", "old_state": None, "new_state": state},
+        context=state.context,
+    )
+    db_attrs = StateAttributes.from_event(event)
+    assert db_attrs.to_native() == attrs
+    assert db_attrs.hash == StateAttributes.hash_shared_attrs(db_attrs.shared_attrs)
 
 
 def test_from_event_to_delete_state():
@@ -205,14 +240,72 @@ async def test_process_timestamp_to_utc_isoformat():
     assert process_timestamp_to_utc_isoformat(None) is None
 
 
+def test_process_datetime_to_timestamp():
+    """Test processing datetimes into seconds since the epoch."""
+    assert (
+        process_datetime_to_timestamp(datetime(2016, 7, 9, 11, 0, 0, tzinfo=dt.UTC))
+        == 1468062000.0
+    )
+    # Naive datetimes from the database are in UTC
+    assert process_datetime_to_timestamp(datetime(2016, 7, 9, 11, 0, 0)) == 1468062000.0
+    est = pytz.timezone("US/Eastern")
+    assert (
+        process_datetime_to_timestamp(est.localize(datetime(2016, 7, 9, 7, 0, 0)))
+        == 1468062000.0
+    )
+
+
+def test_process_float_timestamp_to_utc_isoformat():
+    """Test processing seconds since the epoch to UTC isoformat."""
+    assert (
+        process_float_timestamp_to_utc_isoformat(1468062000.0)
+        == "2016-07-09T11:00:00+00:00"
+    )
+    now = dt_util.utcnow()
+    assert process_float_timestamp_to_utc_isoformat(
+        process_datetime_to_timestamp(now)
+    ) == (now.isoformat())
+
+
+def test_timestamps_default_to_datetimes():
+    """Test rows created with only datetimes get their timestamps."""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = scoped_session(sessionmaker(bind=engine))
+    now = dt_util.utcnow()
+
+    session.add(Events(event_type="test_event", origin="LOCAL", time_fired=now))
+    session.add(
+        States(
+            entity_id="sensor.test",
+            domain="sensor",
+            state="on",
+            last_changed=now,
+            last_updated=now,
+        )
+    )
+    session.commit()
+
+    assert session.query(Events.time_fired_ts).scalar() == now.timestamp()
+    assert session.query(States.last_changed_ts, States.last_updated_ts).one() == (
+        now.timestamp(),
+        now.timestamp(),
+    )
+
+
 async def test_event_to_db_model():
     """Test we can round trip Event conversion."""
     event = ha.Event(
         "state_changed", {"some": "attr"}, ha.EventOrigin.local, dt_util.utcnow()
     )
-    native = Events.from_event(event).to_native()
+    db_event = Events.from_event(event)
+    db_event.event_type_rel = EventTypes.from_event(event)
+    db_event.event_data_rel = EventData.from_event(event)
+    native = db_event.to_native()
     assert native == event
 
-    native = Events.from_event(event, event_data="{}").to_native()
+    # Events without data have no event_data row
+    db_event.event_data_rel = None
+    native = db_event.to_native()
     event.data = {}
     assert native == event
@@ -1,10 +1,14 @@
 """Test pool."""
 import threading
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 
-from homeassistant.components.recorder.pool import RecorderPool
+from homeassistant.components.recorder.pool import (
+    QueryTimings,
+    RecorderPool,
+    track_query_timings,
+)
 
 
 def test_recorder_pool():
@@ -32,3 +36,25 @@ def test_recorder_pool():
     new_thread.join()
 
     assert connections[2] != connections[3]
+
+
+def test_track_query_timings():
+    """Test query timings skip the ignored thread."""
+    engine = create_engine("sqlite://", poolclass=RecorderPool)
+    timings = QueryTimings()
+    track_query_timings(engine, timings, threading.get_ident())
+
+    def _run_query():
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+    _run_query()
+    assert timings.as_dict() == {"count": 0, "total": 0.0, "mean": 0.0, "max": 0.0}
+
+    new_thread = threading.Thread(target=_run_query)
+    new_thread.start()
+    new_thread.join()
+
+    result = timings.as_dict()
+    assert result["count"] == 1
+    assert result["total"] == result["mean"] == result["max"] > 0
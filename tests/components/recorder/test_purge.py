@@ -4,12 +4,22 @@ import json
 import sqlite3
 from unittest.mock import MagicMock, patch
 
+from sqlalchemy import text
 from sqlalchemy.exc import DatabaseError, OperationalError
 from sqlalchemy.orm.session import Session
 
 from homeassistant.components import recorder
-from homeassistant.components.recorder.models import Events, RecorderRuns, States
+from homeassistant.components.recorder.const import SIGNAL_RECORDER_EVENTS_PURGED
+from homeassistant.components.recorder.models import (
+    EventData,
+    Events,
+    EventTypes,
+    RecorderRuns,
+    StateAttributes,
+    States,
+)
 from homeassistant.components.recorder.purge import purge_old_data
+from homeassistant.components.recorder.repack import REPACK_TABLES, repack_database
 from homeassistant.components.recorder.util import session_scope
 from homeassistant.const import EVENT_STATE_CHANGED
 from homeassistant.core import HomeAssistant
@@ -55,6 +65,30 @@ async def test_purge_old_states(
         finished = purge_old_data(instance, 4, repack=False)
         assert finished
         assert states.count() == 2
+        assert instance.metrics.purged_rows["states"] == 4
+
+
+async def test_purge_old_states_removes_unused_attributes(
+    hass: HomeAssistant, async_setup_recorder_instance: SetupRecorderInstanceT
+):
+    """Test shared attributes are deleted with the last state using them."""
+    instance = await async_setup_recorder_instance(hass)
+
+    await _add_test_states_with_shared_attributes(hass, instance)
+
+    with session_scope(hass=hass) as session:
+        states = session.query(States)
+        state_attributes = session.query(StateAttributes)
+        assert states.count() == 6
+        assert state_attributes.count() == 3
+
+        finished = purge_old_data(instance, 4, repack=False)
+        assert not finished
+        assert states.count() == 2
+        assert state_attributes.count() == 1
+        assert {state.attributes_id for state in states} == {
+            attributes.attributes_id for attributes in state_attributes
+        }
 
 
 async def test_purge_old_states_encouters_database_corruption(
@@ -163,14 +197,141 @@ async def test_purge_old_events(
         assert events.count() == 6
 
         # run purge_old_data()
-        finished = purge_old_data(instance, 4, repack=False)
+        with patch(
+            "homeassistant.components.recorder.purge.dispatcher_send"
+        ) as dispatcher_send:
+            finished = purge_old_data(instance, 4, repack=False)
         assert not finished
         assert events.count() == 2
+        assert dispatcher_send.call_args[0][1:2] == (SIGNAL_RECORDER_EVENTS_PURGED,)
 
         # we should only have 2 events left
-        finished = purge_old_data(instance, 4, repack=False)
+        with patch(
+            "homeassistant.components.recorder.purge.dispatcher_send"
+        ) as dispatcher_send:
+            finished = purge_old_data(instance, 4, repack=False)
         assert finished
         assert events.count() == 2
+        assert not dispatcher_send.called
+
+
+async def test_purge_old_events_removes_unused_event_data(
+    hass: HomeAssistant, async_setup_recorder_instance: SetupRecorderInstanceT
+):
+    """Test shared event data is deleted with the last event using it."""
+    instance = await async_setup_recorder_instance(hass)
+
+    await _add_test_events_with_shared_data(hass, instance)
+
+    with session_scope(hass=hass) as session:
+        events = (
+            session.query(Events)
+            .join(EventTypes)
+            .filter(EventTypes.event_type == "EVENT_TEST_SHARED")
+        )
+        event_data = session.query(EventData).filter(
+            EventData.shared_data.like('{"test_attr": %')
+        )
+        assert events.count() == 6
+        assert event_data.count() == 3
+
+        finished = purge_old_data(instance, 4, repack=False)
+        assert not finished
+        assert events.count() == 2
+        assert event_data.count() == 1
+        assert {event.data_id for event in events} == {
+            data.data_id for data in event_data
+        }
+
+
+async def test_purge_sparse_id_range(
+    hass: HomeAssistant, async_setup_recorder_instance: SetupRecorderInstanceT
+):
+    """Test the oldest rows are purged by range when their ids are far apart."""
+    instance = await async_setup_recorder_instance(hass)
+    await async_wait_recording_done(hass, instance)
+
+    eleven_days_ago = dt_util.utcnow() - timedelta(days=11)
+    with recorder.session_scope(hass=hass) as session:
+        for state_id in (1, 100000):
+            session.add(
+                States(
+                    state_id=state_id,
+                    entity_id="test.recorder2",
+                    domain="sensor",
+                    state="purgeme",
+                    last_changed=eleven_days_ago,
+                    last_updated=eleven_days_ago,
+                    created=eleven_days_ago,
+                )
+            )
+
+    with patch(
+        "homeassistant.components.recorder.purge._purge_state_ids"
+    ) as purge_state_ids:
+        while not purge_old_data(instance, 4, repack=False):
+            pass
+    assert not purge_state_ids.called
+
+    with session_scope(hass=hass) as session:
+        assert session.query(States).count() == 0
+
+
+async def test_purge_rows_recorded_out_of_time_order(
+    hass: HomeAssistant, async_setup_recorder_instance: SetupRecorderInstanceT
+):
+    """Test rows to keep between the oldest rows are not purged with them."""
+    instance = await async_setup_recorder_instance(hass)
+    await async_wait_recording_done(hass, instance)
+
+    utcnow = dt_util.utcnow()
+    eleven_days_ago = utcnow - timedelta(days=11)
+    with recorder.session_scope(hass=hass) as session:
+        old_state_id = None
+        # The clock went back between the second and the third state
+        for timestamp, state in (
+            (eleven_days_ago, "purgeme"),
+            (utcnow, "dontpurgeme"),
+            (eleven_days_ago, "purgeme"),
+            (utcnow, "dontpurgeme"),
+        ):
+            event = Events(
+                event_type="state_changed",
+                origin="LOCAL",
+                created=timestamp,
+                time_fired=timestamp,
+            )
+            session.add(event)
+            session.flush()
+            db_state = States(
+                entity_id="test.recorder2",
+                domain="sensor",
+                state=state,
+                last_changed=timestamp,
+                last_updated=timestamp,
+                created=timestamp,
+                event_id=event.event_id,
+                old_state_id=old_state_id if state == "dontpurgeme" else None,
+            )
+            session.add(db_state)
+            session.flush()
+            if state == "dontpurgeme":
+                old_state_id = db_state.state_id
+
+    while not purge_old_data(instance, 4, repack=False):
+        pass
+
+    with session_scope(hass=hass) as session:
+        states = session.query(States).order_by(States.state_id).all()
+        assert [state.state for state in states] == ["dontpurgeme", "dontpurgeme"]
+        assert states[0].old_state_id is None
+        assert states[1].old_state_id == states[0].state_id
+        assert {
+            event.event_id
+            for event in session.query(Events).filter(
+                Events.event_type == "state_changed"
+            )
+        } == {state.event_id for state in states}
 
 
 async def test_purge_old_recorder_runs(
@@ -263,6 +424,94 @@ async def test_purge_method(
         await hass.async_block_till_done()
         await async_wait_purge_done(hass, instance)
         assert "Vacuuming SQL DB to free space" in caplog.text
+        assert instance.repack_progress.running is False
+        assert instance.repack_progress.last_finished is not None
+
+
+async def test_repack_runs_incremental_vacuum_in_steps(
+    hass: HomeAssistant, async_setup_recorder_instance: SetupRecorderInstanceT
+):
+    """Test the repack releases the free pages one bounded step at a time."""
+    instance = await async_setup_recorder_instance(hass)
+
+    def _create_free_pages():
+        with session_scope(hass=hass) as session:
+            session.add_all(
+                StateAttributes(shared_attrs=json.dumps({"data": str(idx) * 4096}))
+                for idx in range(50)
+            )
+        with session_scope(hass=hass) as session:
+            session.query(StateAttributes).delete()
+            return session.execute(text("PRAGMA freelist_count")).scalar()
+
+    free_pages = await hass.async_add_executor_job(_create_free_pages)
+    assert free_pages > 2
+
+    with patch("homeassistant.components.recorder.repack.SQLITE_PAGES_PER_STEP", 1):
+        await hass.services.async_call(
+            "recorder", "purge", {"keep_days": 10, "repack": True}
+        )
+        await async_wait_purge_done(hass, instance, free_pages + 2)
+
+    progress = instance.repack_progress.as_dict()
+    assert progress["running"] is False
+    assert progress["steps"] == progress["total"] == progress["completed"]
+    assert progress["total"] >= free_pages
+
+    def _count_free_pages():
+        with session_scope(hass=hass) as session:
+            return session.execute(text("PRAGMA freelist_count")).scalar()
+
+    assert await hass.async_add_executor_job(_count_free_pages) == 0
+
+
+async def test_repack_skips_without_incremental_vacuum(
+    hass: HomeAssistant, async_setup_recorder_instance: SetupRecorderInstanceT, caplog
+):
+    """Test the repack never vacuums a database without incremental vacuum whole."""
+    instance = await async_setup_recorder_instance(hass)
+
+    def _get_auto_vacuum():
+        with session_scope(hass=hass) as session:
+            return session.execute(text("PRAGMA auto_vacuum")).scalar()
+
+    def _disable_auto_vacuum():
+        with instance.engine.connect() as conn:
+            conn.execute(text("PRAGMA auto_vacuum=NONE"))
+            conn.execute(text("VACUUM"))
+
+    await hass.async_add_executor_job(_disable_auto_vacuum)
+    assert await hass.async_add_executor_job(_get_auto_vacuum) == 0
+
+    await hass.services.async_call("recorder", "purge", {"repack": True})
+    await async_wait_purge_done(hass, instance)
+
+    assert await hass.async_add_executor_job(_get_auto_vacuum) == 0
+    assert instance.repack_progress.steps == 1
+    assert "Incremental vacuum is not enabled" in caplog.text
+
+
+async def test_repack_server_tables_in_executor(
+    hass: HomeAssistant, async_setup_recorder_instance: SetupRecorderInstanceT
+):
+    """Test the tables of a server database are repacked outside the recorder."""
+    instance = await async_setup_recorder_instance(hass)
+    engine = MagicMock()
+    engine.dialect.name = "mysql"
+    conn = engine.connect().execution_options().__enter__()
+    conn.dialect.name = "mysql"
+
+    with patch.object(instance, "engine", engine):
+        repack_database(instance)
+    assert instance.repack_progress.running
+    await hass.async_block_till_done()
+
+    statements = [str(call[0][0]) for call in conn.execute.call_args_list]
+    assert statements == [f"OPTIMIZE TABLE {table}" for table in REPACK_TABLES]
+    progress = instance.repack_progress.as_dict()
+    assert progress["running"] is False
+    assert progress["completed"] == progress["total"] == len(REPACK_TABLES)
+    assert progress["full_rebuild"] is True
 
 
 async def test_purge_edge_case(
@@ -701,6 +950,61 @@ async def _add_test_states(hass: HomeAssistant, instance: recorder.Recorder):
             old_state_id = state.state_id
 
 
+async def _add_test_states_with_shared_attributes(
+    hass: HomeAssistant, instance: recorder.Recorder
+):
+    """Add multiple states sharing attributes to the db for testing."""
+    utcnow = dt_util.utcnow()
+    five_days_ago = utcnow - timedelta(days=5)
+    eleven_days_ago = utcnow - timedelta(days=11)
+
+    await hass.async_block_till_done()
+    await async_wait_recording_done(hass, instance)
+
+    with recorder.session_scope(hass=hass) as session:
+        for event_id in range(6):
+            if event_id < 2:
+                timestamp = eleven_days_ago
+            elif event_id < 4:
+                timestamp = five_days_ago
+            else:
+                timestamp = utcnow
+
+            shared_attrs = json.dumps({"test_attr": event_id // 2})
+            state_attributes = (
+                session.query(StateAttributes)
+                .filter(StateAttributes.shared_attrs == shared_attrs)
+                .first()
+            )
+            if state_attributes is None:
+                state_attributes = StateAttributes(
+                    shared_attrs=shared_attrs,
+                    hash=StateAttributes.hash_shared_attrs(shared_attrs),
+                )
+            event = Events(
+                event_type="state_changed",
+                event_data="{}",
+                origin="LOCAL",
+                created=timestamp,
+                time_fired=timestamp,
+            )
+            session.add(event)
+            session.flush()
+            session.add(
+                States(
+                    entity_id="test.recorder2",
+                    domain="sensor",
+                    state="on",
+                    state_attributes=state_attributes,
+                    last_changed=timestamp,
+                    last_updated=timestamp,
+                    created=timestamp,
+                    event_id=event.event_id,
+                )
+            )
+            session.flush()
+
+
 async def _add_test_events(hass: HomeAssistant, instance: recorder.Recorder):
     """Add a few events for testing."""
     utcnow = dt_util.utcnow()
@@ -734,6 +1038,50 @@ async def _add_test_events(hass: HomeAssistant, instance: recorder.Recorder):
             )
 
 
+async def _add_test_events_with_shared_data(
+    hass: HomeAssistant, instance: recorder.Recorder
+):
+    """Add a few events sharing data for testing."""
+    utcnow = dt_util.utcnow()
+    five_days_ago = utcnow - timedelta(days=5)
+    eleven_days_ago = utcnow - timedelta(days=11)
+
+    await hass.async_block_till_done()
+    await async_wait_recording_done(hass, instance)
+
+    with recorder.session_scope(hass=hass) as session:
+        event_type = EventTypes(event_type="EVENT_TEST_SHARED")
+        for event_id in range(6):
+            if event_id < 2:
+                timestamp = eleven_days_ago
+            elif event_id < 4:
+                timestamp = five_days_ago
+            else:
+                timestamp = utcnow
+
+            shared_data = json.dumps({"test_attr": event_id // 2})
+            event_data = (
+                session.query(EventData)
+                .filter(EventData.shared_data == shared_data)
+                .first()
+            )
+            if event_data is None:
+                event_data = EventData(
+                    shared_data=shared_data,
+                    hash=EventData.hash_shared_data(shared_data),
+                )
+            session.add(
+                Events(
+                    event_type_rel=event_type,
+                    event_data_rel=event_data,
+                    origin="LOCAL",
+                    created=timestamp,
+                    time_fired=timestamp,
+                )
+            )
+            session.flush()
+
+
 async def _add_test_recorder_runs(hass: HomeAssistant, instance: recorder.Recorder):
     """Add a few recorder_runs for testing."""
     utcnow = dt_util.utcnow()
@@ -0,0 +1,189 @@
+"""The tests for the recorder spill file."""
+import asyncio
+import threading
+from unittest.mock import patch
+
+from sqlalchemy.exc import OperationalError
+
+from homeassistant.components import recorder
+from homeassistant.components.recorder import StatisticsTask
+from homeassistant.components.recorder.models import States
+from homeassistant.components.recorder.spill import SpillFile
+from homeassistant.components.recorder.util import session_scope
+from homeassistant.const import EVENT_STATE_CHANGED
+from homeassistant.core import Context, Event, HomeAssistant, State
+from homeassistant.util import dt as dt_util
+
+from .common import async_recorder_block_till_done, async_wait_recording_done
+from .conftest import SetupRecorderInstanceT
+
+
+def test_spill_file_round_trip(tmp_path):
+    """Test spilled events are replayed in order and removed."""
+    spill_file = SpillFile(str(tmp_path / "spill"))
+    assert not spill_file.has_events
+
+    context = Context(user_id="user", parent_id="parent")
+    old_state = State("light.kitchen", "off", {"brightness": 0})
+    new_state = State("light.kitchen", "on", {"brightness": 255}, context=context)
+    events = [
+        Event(
+            EVENT_STATE_CHANGED,
+            {
+                "entity_id": "light.kitchen",
+                "old_state": old_state,
+                "new_state": new_state,
+            },
+            context=context,
+        ),
+        Event("custom_event", {"answer": 42}, time_fired=dt_util.utcnow()),
+        Event("unserializable", {"object": object()}),
+    ]
+    spill_file.write_events(events[:1])
+    spill_file.write_events(events[1:])
+    assert spill_file.written == 2
+    assert spill_file.has_events
+
+    # A record cut short by a crash is ignored
+    with open(spill_file.path, "ab") as spill:
+        spill.write(b"\x00\x00\x01\x00{")
+
+    replayed = list(spill_file.replay_events())
+    assert replayed == events[:2]
+    assert replayed[0].data["old_state"] == old_state
+    assert replayed[0].data["new_state"] == new_state
+    assert replayed[0].context == context
+    assert spill_file.replayed == 2
+    assert not spill_file.has_events
+
+
+def test_spill_file_keeps_events_spilled_while_replaying(tmp_path):
+    """Test events spilled during a replay wait for the next replay."""
+    spill_file = SpillFile(str(tmp_path / "spill"))
+    spill_file.write_events([Event("first")])
+
+    replay = spill_file.replay_events()
+    assert next(replay).event_type == "first"
+    spill_file.write_events([Event("second")])
+    assert list(replay) == []
+
+    assert spill_file.has_events
+    assert [event.event_type for event in spill_file.replay_events()] == ["second"]
+    assert not spill_file.has_events
+
+
+async def test_events_spilled_while_recorder_is_blocked(
+    hass: HomeAssistant,
+    async_setup_recorder_instance: SetupRecorderInstanceT,
+    tmp_path,
+    caplog,
+):
+    """Test events beyond the backlog are spilled and recorded in order."""
+    instance = await async_setup_recorder_instance(hass)
+    instance._spill_file = SpillFile(str(tmp_path / "spill"))
+    release = threading.Event()
+
+    with patch.object(recorder, "MAX_QUEUE_BACKLOG", 2), patch.object(
+        recorder, "SPILL_FLUSH_EVENTS", 3
+    ), patch(
+        "homeassistant.components.recorder.statistics.compile_statistics",
+        side_effect=lambda *args: release.wait(),
+    ):
+        instance.queue.put(StatisticsTask(dt_util.utcnow()))
+        for idx in range(10):
+            hass.states.async_set("sensor.spilled", str(idx))
+            await hass.async_block_till_done()
+
+        assert instance._spill_file.written > 0
+        assert instance.queue.qsize() <= 3
+        assert "Events are spilled to" in caplog.text
+        instance._async_check_queue()
+        assert "events were spilled to" in caplog.text
+
+        release.set()
+        await async_recorder_block_till_done(hass, instance)
+        hass.states.async_set("sensor.spilled", "10")
+        await async_wait_recording_done(hass, instance)
+
+    def _get_states():
+        with session_scope(hass=hass) as session:
+            return [
+                state.state
+                for state in session.query(States)
+                .filter(States.entity_id == "sensor.spilled")
+                .order_by(States.state_id)
+            ]
+
+    assert await hass.async_add_executor_job(_get_states) == [
+        str(idx) for idx in range(11)
+    ]
+    assert not instance._spill_file.has_events
+    assert "Events are no longer spilled" in caplog.text
+
+
+async def test_events_spilled_when_commit_fails(
+    hass: HomeAssistant,
+    async_setup_recorder_instance: SetupRecorderInstanceT,
+    tmp_path,
+):
+    """Test the events a commit failed to write are spilled and replayed."""
+    instance = await async_setup_recorder_instance(hass)
+    instance._spill_file = SpillFile(str(tmp_path / "spill"))
+    await async_wait_recording_done(hass, instance)
+
+    with patch.object(instance, "db_max_retries", 1), patch.object(
+        instance,
+        "_insert_pending_rows",
+        side_effect=OperationalError("insert", "params", "forced to fail"),
+    ):
+        hass.states.async_set("sensor.spilled", "1")
+        await async_wait_recording_done(hass, instance)
+
+    assert instance._spill_file.written == 1
+    hass.states.async_set("sensor.spilled", "2")
+    await async_wait_recording_done(hass, instance)
+    await async_wait_recording_done(hass, instance)
+
+    def _get_states():
+        with session_scope(hass=hass) as session:
+            return {
+                state.state
+                for state in session.query(States).filter(
+                    States.entity_id == "sensor.spilled"
+                )
+            }
+
+    assert await hass.async_add_executor_job(_get_states) == {"1", "2"}
+    assert not instance._spill_file.has_events
+
+
+async def test_shutdown_waits_for_spilled_events_being_written(
+    hass: HomeAssistant,
+    async_setup_recorder_instance: SetupRecorderInstanceT,
+    tmp_path,
+):
+    """Test the events spilled at shutdown are written after the earlier ones."""
+    instance = await async_setup_recorder_instance(hass)
+    instance._spill_file = SpillFile(str(tmp_path / "spill"))
+    flushing = asyncio.Event()
+    release = asyncio.Event()
+    written = []
+
+    async def _async_flush(events):
+        flushing.set()
+        await release.wait()
+        written.extend(events)
+        instance._spill_flushing = False
+
+    instance._spilled_events = [Event("first")]
+    instance._spill_flush_task = hass.async_create_task(_async_flush([Event("first")]))
+    instance._spilled_events = [Event("second")]
+    await flushing.wait()
+
+    stop = hass.async_create_task(instance._async_stop_spilling())
+    await asyncio.sleep(0)
+    assert not stop.done()
+    release.set()
+    assert [event.event_type for event in await stop] == ["second"]
+    assert [event.event_type for event in written] == ["first"]
+    assert instance._spilled_events is None
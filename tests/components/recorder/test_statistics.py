@@ -0,0 +1,188 @@
+"""The tests for the recorder statistics."""
+# pylint: disable=protected-access
+from datetime import timedelta
+from unittest.mock import patch
+
+from pytest import approx
+
+from homeassistant.components.recorder import StatisticsTask
+from homeassistant.components.recorder.const import DATA_INSTANCE
+from homeassistant.components.recorder.models import Statistics, StatisticsShortTerm
+from homeassistant.components.recorder.purge import purge_old_data
+from homeassistant.components.recorder.statistics import (
+    PERIOD_5MINUTE,
+    PERIOD_HOUR,
+    period_start,
+    statistics_during_period,
+)
+from homeassistant.components.recorder.util import session_scope
+from homeassistant.const import ENERGY_KILO_WATT_HOUR, TEMP_CELSIUS
+import homeassistant.util.dt as dt_util
+
+from .common import wait_recording_done
+
+
+def _record_states(hass, zero):
+    """Record the states of a temperature and an energy sensor."""
+    temperature = {"unit_of_measurement": TEMP_CELSIUS}
+    energy = {"unit_of_measurement": ENERGY_KILO_WATT_HOUR}
+    for offset, entity_id, state, attributes in (
+        (0, "sensor.temperature", "10", temperature),
+        (0, "sensor.energy", "100", energy),
+        (0, "sensor.no_unit", "10", {}),
+        (1, "sensor.temperature", "20", temperature),
+        (1, "sensor.energy", "101", energy),
+        (2, "sensor.energy", "2", energy),
+        (2, "sensor.temperature", "unavailable", temperature),
+        (3, "sensor.temperature", "15", temperature),
+        (4, "sensor.energy", "5", energy),
+    ):
+        with patch(
+            "homeassistant.core.dt_util.utcnow",
+            return_value=zero + timedelta(minutes=offset),
+        ):
+            hass.states.set(entity_id, state, attributes)
+    wait_recording_done(hass)
+
+
+def _compile_statistics(hass, start, periods=1):
+    """Compile the statistics of periods starting at start."""
+    for period in range(periods):
+        hass.data[DATA_INSTANCE].queue.put(
+            StatisticsTask(start + StatisticsShortTerm.duration * period)
+        )
+    wait_recording_done(hass)
+
+
+def test_period_start():
+    """Test the start of the five minute period of a point in time."""
+    assert period_start(
+        dt_util.parse_datetime("2021-05-01 12:34:56.789+00:00")
+    ) == dt_util.parse_datetime("2021-05-01 12:30:00+00:00")
+    assert period_start(
+        dt_util.parse_datetime("2021-05-01 12:35:00+02:00")
+    ) == dt_util.parse_datetime("2021-05-01 10:35:00+00:00")
+
+
+def test_compile_short_term_statistics(hass_recorder):
+    """Test compiling the five minute statistics of the states."""
+    hass = hass_recorder()
+    zero = period_start(dt_util.utcnow()) - timedelta(hours=1)
+    _record_states(hass, zero)
+
+    _compile_statistics(hass, zero, periods=2)
+
+    stats = statistics_during_period(hass, zero, period=PERIOD_5MINUTE)
+    assert set(stats) == {"sensor.temperature", "sensor.energy"}
+
+    first, second = stats["sensor.temperature"]
+    assert first["start"] == zero.isoformat()
+    # 10 for one minute, 20 for two minutes and 15 for two minutes
+    assert first["mean"] == approx(16.0)
+    assert first["min"] == 10.0
+    assert first["max"] == 20.0
+    assert first["last"] == 15.0
+    assert first["sum"] is None
+    # The value is kept when the sensor does not change
+    assert second["start"] == (zero + timedelta(minutes=5)).isoformat()
+    assert (second["mean"], second["min"], second["max"], second["last"]) == (
+        approx(15.0),
+        15.0,
+        15.0,
+        15.0,
+    )
+
+    first, second = stats["sensor.energy"]
+    # The meter was reset to zero before it reached 2
+    assert first["sum"] == approx(6.0)
+    assert first["last"] == 5.0
+    assert second["sum"] == approx(6.0)
+
+
+def test_compile_statistics_unavailable(hass_recorder):
+    """Test the value is not kept when the sensor becomes unavailable."""
+    hass = hass_recorder()
+    zero = period_start(dt_util.utcnow()) - timedelta(hours=1)
+    _record_states(hass, zero)
+    with patch(
+        "homeassistant.core.dt_util.utcnow",
+        return_value=zero + timedelta(minutes=6),
+    ):
+        hass.states.set(
+            "sensor.temperature", "unavailable", {"unit_of_measurement": TEMP_CELSIUS}
+        )
+    hass.states.set(
+        "sensor.energy", "unknown", {"unit_of_measurement": ENERGY_KILO_WATT_HOUR}
+    )
+    wait_recording_done(hass)
+
+    _compile_statistics(hass, zero, periods=3)
+
+    stats = statistics_during_period(hass, zero, period=PERIOD_5MINUTE)
+    assert len(stats["sensor.temperature"]) == 1
+    assert len(stats["sensor.energy"]) == 1
+
+
+def test_compile_statistics_twice(hass_recorder):
+    """Test a period is only compiled once."""
+    hass = hass_recorder()
+    zero = period_start(dt_util.utcnow()) - timedelta(hours=1)
+    _record_states(hass, zero)
+
+    _compile_statistics(hass, zero)
+    _compile_statistics(hass, zero)
+
+    with session_scope(hass=hass) as session:
+        assert session.query(StatisticsShortTerm).count() == 2
+
+
+def test_compile_hourly_statistics(hass_recorder):
+    """Test compiling the hourly statistics from the five minute statistics."""
+    hass = hass_recorder()
+    zero = dt_util.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(
+        hours=2
+    )
+    _record_states(hass, zero)
+
+    _compile_statistics(hass, zero, periods=12)
+
+    stats = statistics_during_period(hass, zero, period=PERIOD_HOUR)
+    assert len(stats["sensor.temperature"]) == 1
+    hourly = stats["sensor.temperature"][0]
+    assert hourly["start"] == zero.isoformat()
+    assert hourly["mean"] == approx((16.0 + 15.0 * 11) / 12)
+    assert hourly["min"] == 10.0
+    assert hourly["max"] == 20.0
+    assert hourly["last"] == 15.0
+    assert stats["sensor.energy"][0]["sum"] == approx(6.0)
+
+    assert statistics_during_period(
+        hass, zero, statistic_ids=["sensor.energy"], period=PERIOD_HOUR
+    ).keys() == {"sensor.energy"}
+    assert (
+        statistics_during_period(
+            hass, zero, zero + timedelta(minutes=5), period=PERIOD_5MINUTE
+        )["sensor.temperature"][0]["start"]
+        == zero.isoformat()
+    )
+
+
+def test_purge_keeps_hourly_statistics(hass_recorder):
+    """Test purging removes the short term statistics but keeps the hourly ones."""
+    hass = hass_recorder()
+    zero = dt_util.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(
+        hours=2
+    )
+    _record_states(hass, zero)
+    _compile_statistics(hass, zero, periods=12)
+
+    with patch(
+        "homeassistant.components.recorder.purge.dt_util.utcnow",
+        return_value=zero + timedelta(days=20),
+    ):
+        while not purge_old_data(hass.data[DATA_INSTANCE], 10, repack=False):
+            pass
+
+    with session_scope(hass=hass) as session:
+        assert session.query(StatisticsShortTerm).count() == 0
+        assert session.query(Statistics).count() == 2
@@ -1,8 +1,11 @@
 """Test Websocket API messages module."""
+import json
 
+from homeassistant.components.websocket_api.const import JSON_DUMP
 from homeassistant.components.websocket_api.messages import (
     _cached_event_message as lru_event_cache,
     cached_event_message,
+    event_message,
     message_to_json,
 )
 from homeassistant.const import EVENT_STATE_CHANGED
@@ -78,18 +81,52 @@ async def test_cached_event_message_with_different_idens(hass):
     assert cache_info.currsize == 1
 
 
+async def test_cached_state_changed_event_message(hass):
+    """Test state changed messages reuse the JSON cached on the states."""
+
+    events = []
+
+    @callback
+    def _event_listener(event):
+        events.append(event)
+
+    hass.bus.async_listen(EVENT_STATE_CHANGED, _event_listener)
+
+    hass.states.async_set("light.window", "on", {"brightness": 100})
+    hass.states.async_set("light.window", "off", {"brightness": 100})
+    hass.states.async_set("light.window", "off", {"bad": _Unserializeable()})
+    await hass.async_block_till_done()
+
+    lru_event_cache.cache_clear()
+
+    for event in events[:2]:
+        msg = cached_event_message(2, event)
+        assert msg == JSON_DUMP(event_message(2, event))
+        assert json.loads(msg)["event"]["data"]["new_state"]["state"] == (
+            event.data["new_state"].state
+        )
+
+    # The old state was serialized as the new state of the first event
+    assert (
+        events[1].data["old_state"].as_json() is events[0].data["new_state"].as_json()
+    )
+
+    msg = cached_event_message(2, events[2])
+    assert json.loads(msg)["error"]["code"] == "unknown_error"
+
+
 async def test_message_to_json(caplog):
     """Test we can serialize websocket messages."""
 
     json_str = message_to_json({"id": 1, "message": "xyz"})
 
-    assert json_str == '{"id": 1, "message": "xyz"}'
+    assert json_str == '{"id":1,"message":"xyz"}'
 
     json_str2 = message_to_json({"id": 1, "message": _Unserializeable()})
 
     assert (
         json_str2
-        == '{"id": 1, "type": "result", "success": false, "error": {"code": "unknown_error", "message": "Invalid JSON in response"}}'
+        == '{"id":1,"type":"result","success":false,"error":{"code":"unknown_error","message":"Invalid JSON in response"}}'
     )
     assert "Unable to serialize to JSON" in caplog.text
 
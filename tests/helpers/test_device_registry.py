@@ -389,6 +389,40 @@ async def test_removing_area_id(registry):
     assert entry_w_area != entry_wo_area
 
 
+async def test_entries_index(registry):
+    """Test devices are looked up by area and config entry."""
+    entry_1 = registry.async_get_or_create(
+        config_entry_id="123", identifiers={("bridgeid", "0123")}
+    )
+    entry_2 = registry.async_get_or_create(
+        config_entry_id="456", identifiers={("bridgeid", "4567")}
+    )
+    entry_1 = registry.async_get_or_create(
+        config_entry_id="456", identifiers={("bridgeid", "0123")}
+    )
+    entry_2 = registry.async_update_device(entry_2.id, area_id="12345A")
+
+    assert device_registry.async_entries_for_config_entry(registry, "123") == [entry_1]
+    assert device_registry.async_entries_for_config_entry(registry, "456") == [
+        entry_2,
+        entry_1,
+    ]
+    assert device_registry.async_entries_for_area(registry, "12345A") == [entry_2]
+
+    registry.async_clear_config_entry("456")
+    registry.async_clear_area_id("12345A")
+    assert device_registry.async_entries_for_config_entry(registry, "456") == []
+    assert device_registry.async_entries_for_area(registry, "12345A") == []
+    assert device_registry.async_entries_for_config_entry(registry, "123") == [
+        registry.async_get(entry_1.id)
+    ]
+
+    # Deleted devices are not indexed
+    registry.async_clear_config_entry("123")
+    assert not registry.devices
+    assert device_registry.async_entries_for_config_entry(registry, "123") == []
+
+
 async def test_deleted_device_removing_area_id(registry):
     """Make sure we can clear area id of deleted device."""
     entry = registry.async_get_or_create(
@@ -351,6 +351,48 @@ async def test_removing_area_id(registry):
     assert entry_w_area != entry_wo_area
 
 
+async def test_entries_index(registry):
+    """Test entries are looked up by device, area, config entry and platform."""
+    mock_config = MockConfigEntry(domain="light", entry_id="mock-id-1")
+    entry_1 = registry.async_get_or_create(
+        "light", "hue", "1234", config_entry=mock_config, device_id="device-1"
+    )
+    entry_2 = registry.async_get_or_create(
+        "light", "hue", "5678", config_entry=mock_config, device_id="device-1"
+    )
+    entry_3 = registry.async_get_or_create("switch", "mqtt", "1234")
+
+    assert er.async_entries_for_device(registry, "device-1") == [entry_1, entry_2]
+    assert er.async_entries_for_config_entry(registry, "mock-id-1") == [
+        entry_1,
+        entry_2,
+    ]
+    assert er.async_entries_for_platform(registry, "hue") == [entry_1, entry_2]
+    assert er.async_entries_for_platform(registry, "mqtt") == [entry_3]
+    assert er.async_entries_for_area(registry, "area-1") == []
+
+    entry_3 = registry.async_update_entity(entry_3.entity_id, area_id="area-1")
+    entry_1 = registry.async_update_entity(
+        entry_1.entity_id, new_entity_id="light.renamed", area_id="area-1"
+    )
+    assert er.async_entries_for_area(registry, "area-1") == [entry_3, entry_1]
+    assert er.async_entries_for_device(registry, "device-1") == [entry_2, entry_1]
+
+    registry.async_remove(entry_2.entity_id)
+    registry.async_clear_area_id("area-1")
+    assert er.async_entries_for_area(registry, "area-1") == []
+    assert er.async_entries_for_device(registry, "device-1") == [
+        registry.async_get("light.renamed")
+    ]
+
+    registry.async_clear_config_entry("mock-id-1")
+    assert er.async_entries_for_device(registry, "device-1") == []
+    assert er.async_entries_for_platform(registry, "hue") == []
+    assert er.async_entries_for_platform(registry, "mqtt") == [
+        registry.async_get(entry_3.entity_id)
+    ]
+
+
 @pytest.mark.parametrize("load_registries", [False])
 async def test_migration(hass):
     """Test migration from old data to new."""
@@ -10,16 +10,19 @@ import jinja2
 import pytest
 
 from homeassistant.components import sun
-from homeassistant.const import MATCH_ALL
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP, EVENT_STATE_CHANGED, MATCH_ALL
 import homeassistant.core as ha
 from homeassistant.core import callback
 from homeassistant.exceptions import TemplateError
 from homeassistant.helpers.entity_registry import EVENT_ENTITY_REGISTRY_UPDATED
 from homeassistant.helpers.event import (
+    TEMPLATE_WORKER_MAX_BUDGET_FAILURES,
     TrackStates,
     TrackTemplate,
     TrackTemplateResult,
     async_call_later,
+    async_set_template_workers,
+    async_template_render_profile,
     async_track_point_in_time,
     async_track_point_in_utc_time,
     async_track_same_state,
@@ -532,6 +535,27 @@ async def test_async_track_state_change_event_with_empty_list(hass):
     unsub_single()
 
 
+async def test_async_track_state_change_event_matches_entity_ids_only(hass):
+    """Test async_track_state_change_event does not match domains or all."""
+    tracker = []
+
+    @ha.callback
+    def run_callback(event):
+        tracker.append(event)
+
+    unsub = async_track_state_change_event(hass, ["light", MATCH_ALL], run_callback)
+
+    hass.states.async_set("light.bowl", "on")
+    await hass.async_block_till_done()
+    assert tracker == []
+
+    hass.bus.async_fire(EVENT_STATE_CHANGED, {"entity_id": "light"})
+    await hass.async_block_till_done()
+    assert len(tracker) == 1
+
+    unsub()
+
+
 async def test_async_track_state_added_domain(hass):
     """Test async_track_state_added_domain."""
     single_entity_id_tracker = []
@@ -1292,6 +1316,314 @@ async def test_track_template_result_with_group(hass):
     assert specific_runs[-1] == 100.1 + 200.2 + 0 + 800.8
 
 
+async def test_track_template_result_batched(hass):
+    """Test batched templates render once for the changes of a loop iteration."""
+    runs = []
+    template_sum = Template(
+        "{{ (states('sensor.one') | int) + (states('sensor.two') | int) }}", hass
+    )
+    template_domain = Template("{{ states.light | count }}", hass)
+
+    @callback
+    def batched_callback(event, updates):
+        runs.append((event and event.data["entity_id"], updates))
+
+    info = async_track_template_result(
+        hass,
+        [TrackTemplate(template_sum, None), TrackTemplate(template_domain, None)],
+        batched_callback,
+        batched=True,
+    )
+    await hass.async_block_till_done()
+    assert info.listeners == {
+        "all": False,
+        "domains": {"light"},
+        "entities": {"sensor.one", "sensor.two"},
+        "time": False,
+    }
+
+    hass.states.async_set("sensor.one", "1")
+    hass.states.async_set("sensor.two", "2")
+    hass.states.async_set("sensor.other", "3")
+    await hass.async_block_till_done()
+
+    assert len(runs) == 1
+    entity_id, updates = runs.pop()
+    assert entity_id == "sensor.two"
+    assert [update.result for update in updates] == [3]
+    profile = async_template_render_profile(hass)
+    assert profile[template_sum.template]["count"] == 2
+    assert profile[template_domain.template]["count"] == 1
+
+    hass.states.async_set("light.one", "on")
+    hass.states.async_set("sensor.one", "2")
+    await hass.async_block_till_done()
+
+    assert len(runs) == 1
+    entity_id, updates = runs.pop()
+    assert entity_id == "sensor.one"
+    assert [update.result for update in updates] == [4, 1]
+
+    info.async_remove()
+    hass.states.async_set("sensor.one", "3")
+    await hass.async_block_till_done()
+    assert runs == []
+    assert async_template_render_profile(hass) == {}
+
+
+async def test_track_template_result_batched_dedupes_sources(hass):
+    """Test batched templates with the same source render once per flush."""
+    source = "{{ states('sensor.test') }}"
+    runs = []
+
+    @callback
+    def batched_callback(event, updates):
+        runs.append(updates.pop().result)
+
+    infos = [
+        async_track_template_result(
+            hass,
+            [TrackTemplate(Template(source, hass), None)],
+            batched_callback,
+            batched=True,
+        )
+        for _ in range(3)
+    ]
+    assert async_template_render_profile(hass)[source]["count"] == 3
+
+    hass.states.async_set("sensor.test", "on")
+    await hass.async_block_till_done()
+
+    assert runs == ["on", "on", "on"]
+    assert async_template_render_profile(hass)[source]["count"] == 4
+
+    # The profile is dropped with the last tracker of the source
+    infos.pop().async_remove()
+    infos.pop().async_remove()
+    assert async_template_render_profile(hass)[source]["count"] == 4
+    infos.pop().async_remove()
+    assert source not in async_template_render_profile(hass)
+
+
+async def test_track_template_result_batched_workers(hass):
+    """Test slow batched templates render in the workers until they are fast."""
+    source = "{{ states('sensor.test') }}"
+    runs = []
+
+    @callback
+    def batched_callback(event, updates):
+        runs.append(updates.pop().result)
+
+    async_set_template_workers(hass, True)
+    with patch.object(
+        Template,
+        "render_to_info_from_snapshot",
+        side_effect=Template.render_to_info_from_snapshot,
+        autospec=True,
+    ) as mock_worker_render, patch(
+        "homeassistant.helpers.event.TEMPLATE_WORKER_THRESHOLD", -1
+    ):
+        for _ in range(3):
+            async_track_template_result(
+                hass,
+                [TrackTemplate(Template(source, hass), None)],
+                batched_callback,
+                batched=True,
+            )
+        await hass.async_block_till_done()
+
+        with patch("homeassistant.helpers.event.TEMPLATE_LOOP_THRESHOLD", -1):
+            hass.states.async_set("sensor.test", "on")
+            await hass.async_block_till_done()
+        assert runs == ["on", "on", "on"]
+        # The trackers share one render in the workers
+        assert mock_worker_render.call_count == 1
+        assert async_template_render_profile(hass)[source]["count"] == 4
+
+        with patch("homeassistant.helpers.event.TEMPLATE_LOOP_THRESHOLD", 10):
+            hass.states.async_set("sensor.test", "off")
+            await hass.async_block_till_done()
+        assert runs[3:] == ["off", "off", "off"]
+        assert mock_worker_render.call_count == 2
+
+    # Fast templates move back to the event loop
+    hass.states.async_set("sensor.test", "on")
+    await hass.async_block_till_done()
+    assert runs[6:] == ["on", "on", "on"]
+    assert mock_worker_render.call_count == 2
+
+    async_set_template_workers(hass, False)
+
+
+async def test_track_template_result_batched_workers_budget(hass):
+    """Test a render in the workers over its CPU budget is an error."""
+    source = "{{ states('sensor.test') }}"
+    runs = []
+
+    @callback
+    def batched_callback(event, updates):
+        runs.append(updates.pop().result)
+
+    async_set_template_workers(hass, True)
+    with patch.object(
+        Template,
+        "render_to_info_from_snapshot",
+        side_effect=Template.render_to_info_from_snapshot,
+        autospec=True,
+    ) as mock_worker_render, patch(
+        "homeassistant.helpers.event.TEMPLATE_WORKER_THRESHOLD", -1
+    ), patch(
+        "homeassistant.helpers.event.TEMPLATE_WORKER_CPU_BUDGET", -1
+    ):
+        async_track_template_result(
+            hass,
+            [TrackTemplate(Template(source, hass), None)],
+            batched_callback,
+            batched=True,
+        )
+        hass.states.async_set("sensor.test", "on")
+        await hass.async_block_till_done()
+
+        assert len(runs) == 1
+        assert isinstance(runs[0], TemplateError)
+        assert mock_worker_render.call_count == 1
+
+        # The workers stop with Home Assistant
+        hass.bus.async_fire(EVENT_HOMEASSISTANT_STOP)
+        await hass.async_block_till_done()
+        async_track_template_result(
+            hass,
+            [TrackTemplate(Template(source, hass), None)],
+            batched_callback,
+            batched=True,
+        )
+        hass.states.async_set("sensor.test", "off")
+        await hass.async_block_till_done()
+
+    assert runs[1:] == ["off"]
+    assert mock_worker_render.call_count == 1
+
+
+async def test_track_template_result_batched_workers_budget_disabled(hass, caplog):
+    """Test a template over its CPU budget too often is no longer rendered."""
+    source = "{{ states('sensor.test') }}"
+    runs = []
+
+    @callback
+    def batched_callback(event, updates):
+        runs.append(updates.pop().result)
+
+    render_to_info_from_snapshot = Template.render_to_info_from_snapshot
+
+    def render_over_budget(template, snapshot, *args):
+        """Render tracking the states but fail like a render over budget."""
+        info = render_to_info_from_snapshot(template, snapshot)
+        timeout = TimeoutError("Template exceeded its render CPU budget")
+        info.exception = TemplateError(timeout)
+        info.exception.__cause__ = timeout
+        return info
+
+    async_set_template_workers(hass, True)
+    with patch.object(
+        Template,
+        "render_to_info_from_snapshot",
+        side_effect=render_over_budget,
+        autospec=True,
+    ) as mock_worker_render, patch(
+        "homeassistant.helpers.event.TEMPLATE_WORKER_THRESHOLD", -1
+    ), patch(
+        "homeassistant.helpers.event.TEMPLATE_LOOP_THRESHOLD", -1
+    ):
+        info = async_track_template_result(
+            hass,
+            [TrackTemplate(Template(source, hass), None)],
+            batched_callback,
+            batched=True,
+        )
+        for state in range(TEMPLATE_WORKER_MAX_BUDGET_FAILURES + 2):
+            hass.states.async_set("sensor.test", str(state))
+            await hass.async_block_till_done()
+
+        assert len(runs) == 1
+        assert isinstance(runs[0], TemplateError)
+        assert mock_worker_render.call_count == TEMPLATE_WORKER_MAX_BUDGET_FAILURES
+        assert caplog.text.count("is no longer rendered") == 1
+
+        # Not even in the event loop
+        info.async_refresh()
+        assert async_template_render_profile(hass)[source]["count"] == (
+            TEMPLATE_WORKER_MAX_BUDGET_FAILURES + 1
+        )
+
+    async_set_template_workers(hass, False)
+
+
+async def test_track_template_result_batched_workers_error(hass, caplog):
+    """Test a template failing in the workers renders in the event loop."""
+    source = "{{ states('sensor.test') }}"
+    runs = []
+
+    @callback
+    def batched_callback(event, updates):
+        runs.append(updates.pop().result)
+
+    async_set_template_workers(hass, True)
+    with patch.object(
+        Template, "render_to_info_from_snapshot", side_effect=RuntimeError("boom")
+    ) as mock_worker_render, patch(
+        "homeassistant.helpers.event.TEMPLATE_WORKER_THRESHOLD", -1
+    ):
+        async_track_template_result(
+            hass,
+            [TrackTemplate(Template(source, hass), None)],
+            batched_callback,
+            batched=True,
+        )
+        hass.states.async_set("sensor.test", "on")
+        await hass.async_block_till_done()
+
+    assert runs == ["on"]
+    assert mock_worker_render.call_count == 1
+    assert f"Error rendering template {source} in a worker" in caplog.text
+
+    async_set_template_workers(hass, False)
+
+
+async def test_track_template_result_batched_workers_registry(hass):
+    """Test templates reading the registries render in the event loop."""
+    source = "{{ device_entities('abc') }} {{ states('sensor.test') }}"
+    runs = []
+
+    @callback
+    def batched_callback(event, updates):
+        runs.append(updates.pop().result)
+
+    async_set_template_workers(hass, True)
+    with patch.object(
+        Template,
+        "render_to_info_from_snapshot",
+        side_effect=Template.render_to_info_from_snapshot,
+        autospec=True,
+    ) as mock_worker_render, patch(
+        "homeassistant.helpers.event.TEMPLATE_WORKER_THRESHOLD", -1
+    ):
+        async_track_template_result(
+            hass,
+            [TrackTemplate(Template(source, hass), None)],
+            batched_callback,
+            batched=True,
+        )
+        hass.states.async_set("sensor.test", "on")
+        await hass.async_block_till_done()
+        hass.states.async_set("sensor.test", "off")
+        await hass.async_block_till_done()
+
+    assert runs == ["[] on", "[] off"]
+    assert mock_worker_render.call_count == 1
+
+    async_set_template_workers(hass, False)
+
+
 async def test_track_template_result_and_conditional(hass):
     """Test tracking template with an and conditional."""
     specific_runs = []
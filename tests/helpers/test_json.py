@@ -1,10 +1,20 @@
 """Test Home Assistant remote methods and classes."""
 from datetime import timedelta
+import json
+import math
+from unittest.mock import patch
 
 import pytest
 
 from homeassistant import core
-from homeassistant.helpers.json import ExtendedJSONEncoder, JSONEncoder
+from homeassistant.helpers import json as json_helper
+from homeassistant.helpers.json import (
+    ExtendedJSONEncoder,
+    JSONEncoder,
+    json_bytes,
+    json_dumps,
+    json_loads,
+)
 from homeassistant.util import dt as dt_util
 
 
@@ -63,3 +73,69 @@ def test_trace_json_encoder(hass):
     # Default method falls back to repr(o)
     o = object()
     assert ha_json_enc.default(o) == {"__type": str(type(o)), "repr": repr(o)}
+
+
+def test_json_bytes(hass):
+    """Test the fast JSON backend serializes Home Assistant objects."""
+    state = core.State("test.test", "hello")
+    now = dt_util.utcnow()
+
+    data = json_loads(json_bytes({"state": state, "now": now, "set": {"milk"}}))
+    assert data == {
+        "state": json.loads(json.dumps(state.as_dict())),
+        "now": now.isoformat(),
+        "set": ["milk"],
+    }
+    assert json_dumps({1: "one", "none": None}) == '{"1":"one","none":null}'
+
+    with pytest.raises(TypeError):
+        json_bytes({"object": object()})
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        float("nan"),
+        {"value": float("inf")},
+        [None, -float("inf")],
+        [None, None, float("nan")],
+        {"null": float("nan"), "none": None},
+        {"set": {float("nan")}},
+        {"state": core.State("test.test", "on", {"value": float("nan")})},
+    ],
+)
+def test_json_bytes_not_allows_nan(data):
+    """Test the fast JSON backend raises for NaN and infinity."""
+    with pytest.raises(ValueError):
+        json_bytes(data)
+
+
+def test_json_loads_nan():
+    """Test JSON with NaN written by the standard library can be loaded."""
+    assert json_loads(b'{"a": 1}') == {"a": 1}
+    data = json_loads(json.dumps({"nan": float("nan"), "inf": float("inf")}))
+    assert math.isnan(data["nan"])
+    assert data["inf"] == float("inf")
+
+    with pytest.raises(ValueError), patch.object(
+        json_helper.json, "loads"
+    ) as mock_loads:
+        json_loads("not json")
+    # Invalid data without NaN literals is not parsed twice
+    assert not mock_loads.called
+
+
+def test_json_without_orjson(hass):
+    """Test the standard library backend is used when orjson is missing."""
+    state = core.State("test.test", "hello")
+    with patch.object(json_helper, "orjson", None):
+        assert json_dumps({1: "one", "none": None, "é": "ü"}) == (
+            '{"1":"one","none":null,"é":"ü"}'
+        )
+        assert json_loads(json_bytes({"state": state})) == {
+            "state": json.loads(json.dumps(state.as_dict()))
+        }
+        with pytest.raises(ValueError):
+            json_bytes({"value": float("nan")})
+        with pytest.raises(TypeError):
+            json_bytes({"object": object()})
@@ -4,6 +4,7 @@ import math
 import random
 from unittest.mock import patch
 
+from jinja2.exceptions import TemplateAssertionError
 import pytest
 import pytz
 import voluptuous as vol
@@ -22,6 +23,7 @@ from homeassistant.exceptions import TemplateError
 from homeassistant.helpers import device_registry as dr, template
 from homeassistant.setup import async_setup_component
 import homeassistant.util.dt as dt_util
+from homeassistant.util.lru import LRU
 from homeassistant.util.unit_system import UnitSystem
 
 from tests.common import MockConfigEntry, mock_device_registry, mock_registry
@@ -2144,35 +2146,91 @@ def test_urlencode(hass):
     assert tpl.async_render() == "the%20quick%20brown%20fox%20%3D%20true"
 
 
-async def test_cache_garbage_collection():
-    """Test caching a template."""
+async def test_compiled_template_cache(hass):
+    """Test templates with the same source are compiled once."""
     template_string = (
         "{% set dict = {'foo': 'x&y', 'bar': 42} %} {{ dict | urlencode }}"
     )
+    env = template.TemplateEnvironment(None)
+    with patch.object(
+        template.TemplateEnvironment, "_code_cache", LRU(10)
+    ), patch.object(
+        template.ImmutableSandboxedEnvironment,
+        "compile",
+        side_effect=template.ImmutableSandboxedEnvironment.compile,
+        autospec=True,
+    ) as mock_compile:
+        tpl = template.Template(template_string, hass)
+        assert tpl.async_render() == "foo=x%26y&bar=42"
+        tpl2 = template.Template(template_string, hass)
+        assert tpl2.async_render() == "foo=x%26y&bar=42"
+        # The environment without hass compiles its own code
+        env.compiled_template(template_string)
+
+    assert mock_compile.call_count == 2
+    assert tpl._compiled is tpl2._compiled  # pylint: disable=protected-access
+
+    # The cache holds on to templates no longer in use
+    del tpl, tpl2
+    assert template_string in env.template_cache
+
+    limited_tpl = template.Template(template_string, hass)
+    limited_tpl.async_render(limited=True)
+    assert (
+        limited_tpl._compiled  # pylint: disable=protected-access
+        is not env.compiled_template(template_string)
+    )
+
+
+async def test_compiled_template_cache_per_environment(hass):
+    """Test code compiled with hass is not reused by other environments."""
+    template_string = "{{ 'light.kitchen' | expand }}"
+    with patch.object(template.TemplateEnvironment, "_code_cache", LRU(10)):
+        template.Template(template_string, hass).ensure_valid()
+        with pytest.raises(TemplateAssertionError):
+            template.TemplateEnvironment(None).compile(template_string)
+
+        worker_env = template.WorkerTemplateEnvironment(hass)
+        worker_env.compiled_template(template_string)
+        assert len(template.TemplateEnvironment._code_cache) == 2
+
+
+def test_compiled_template_cache_is_bounded():
+    """Test the least recently used templates are evicted."""
+    env = template.TemplateEnvironment(None)
+    with patch.object(template.TemplateEnvironment, "_code_cache", LRU(2)):
+        env.template_cache = LRU(2)
+        for idx in range(3):
+            assert env.compiled_template(f"{{{{ {idx} }}}}").render() == str(idx)
+        assert len(template.TemplateEnvironment._code_cache) == 2
+        assert "{{ 0 }}" not in env.template_cache
+        assert "{{ 2 }}" in env.template_cache
+
+
+async def test_render_to_info_from_snapshot(hass):
+    """Test rendering against a snapshot of the states."""
+    hass.states.async_set("sensor.test", "on")
+    hass.states.async_set("light.kitchen", "off")
+    snapshot = template.StatesSnapshot(hass)
+    hass.states.async_set("sensor.test", "off")
+    hass.states.async_set("light.hall", "on")
+
     tpl = template.Template(
-        (template_string),
+        "{{ states('sensor.test') }} {{ states.light | list | count }}", hass
     )
-    tpl.ensure_valid()
-    assert template._NO_HASS_ENV.template_cache.get(
-        template_string
-    )  # pylint: disable=protected-access
+    info = await hass.async_add_executor_job(tpl.render_to_info_from_snapshot, snapshot)
+    assert_result_info(info, "on 1", ["sensor.test"], ["light"])
+    assert tpl.async_render() == "off 2"
 
-    tpl2 = template.Template(
-        (template_string),
-    )
-    tpl2.ensure_valid()
-    assert template._NO_HASS_ENV.template_cache.get(
-        template_string
-    )  # pylint: disable=protected-access
-
-    del tpl
-    assert template._NO_HASS_ENV.template_cache.get(
-        template_string
-    )  # pylint: disable=protected-access
-    del tpl2
-    assert not template._NO_HASS_ENV.template_cache.get(
-        template_string
-    )  # pylint: disable=protected-access
+    info = await hass.async_add_executor_job(
+        tpl.render_to_info_from_snapshot, snapshot, None, -1
+    )
+    assert isinstance(info.exception, TemplateError)
+
+    tpl = template.Template("{{ device_entities('abc') }}", hass)
+    assert tpl.async_render() == []
+    with pytest.raises(template.RenderInLoopError):
+        await hass.async_add_executor_job(tpl.render_to_info_from_snapshot, snapshot)
 
 
 def test_is_template_string():
@@ -3,6 +3,7 @@
 import asyncio
 from datetime import datetime, timedelta
 import functools
+import json
 import logging
 import os
 from tempfile import TemporaryDirectory
@@ -39,10 +40,15 @@ from homeassistant.exceptions import (
     MaxLengthExceeded,
     ServiceNotFound,
 )
+from homeassistant.helpers.json import JSONEncoder, json_dumps
 import homeassistant.util.dt as dt_util
 from homeassistant.util.unit_system import METRIC_SYSTEM
 
-from tests.common import async_capture_events, async_mock_service
+from tests.common import (
+    async_capture_events,
+    async_fire_time_changed,
+    async_mock_service,
+)
 
 PST = pytz.timezone("America/Los_Angeles")
 
@@ -361,6 +367,39 @@ def test_state_as_dict():
     assert state.as_dict() is state.as_dict()
 
 
+def test_state_as_json():
+    """Test the JSON of a State is serialized once."""
+    state = ha.State(
+        "happy.happy",
+        "on",
+        {"pig": "dog", "when": datetime(1984, 12, 8, 12, 0, 0), "tags": {"a"}},
+        last_changed=datetime(1984, 12, 8, 12, 0, 0),
+    )
+    assert state.as_json() == json_dumps(state.as_dict())
+    assert json.loads(state.as_json()) == json.loads(
+        json.dumps(state.as_dict(), cls=JSONEncoder)
+    )
+    assert state.as_json() is state.as_json()
+    assert state.attributes_json() == json_dumps(state.as_dict()["attributes"])
+
+    nan_state = ha.State("happy.happy", "on", {"value": float("nan")})
+    with pytest.raises(ValueError):
+        nan_state.as_json()
+
+
+async def test_statemachine_shares_attributes_json(hass):
+    """Test a new state with the same attributes reuses their JSON."""
+    hass.states.async_set("light.bowl", "on", {"brightness": 100})
+    state = hass.states.get("light.bowl")
+    attributes_json = state.attributes_json()
+
+    hass.states.async_set("light.bowl", "off", {"brightness": 100})
+    assert hass.states.get("light.bowl").attributes_json() is attributes_json
+
+    hass.states.async_set("light.bowl", "off", {"brightness": 50})
+    assert hass.states.get("light.bowl").attributes_json() == '{"brightness":50}'
+
+
 async def test_eventbus_add_remove_listener(hass):
     """Test remove_listener method."""
     old_count = len(hass.bus.async_listeners())
@@ -540,6 +579,257 @@ async def test_eventbus_max_length_exceeded(hass):
     assert exc_info.value.value == long_evt_name
 
 
+async def test_eventbus_keyed_listener(hass):
+    """Test listening for events by entity_id and domain."""
+    entity_calls = []
+    domain_calls = []
+    literal_calls = []
+    all_calls = []
+
+    @ha.callback
+    def all_listener(event):
+        all_calls.append(event)
+
+    @ha.callback
+    def entity_listener(event):
+        entity_calls.append(event)
+
+    @ha.callback
+    def domain_listener(event):
+        domain_calls.append(event)
+
+    @ha.callback
+    def literal_listener(event):
+        literal_calls.append(event)
+
+    @ha.callback
+    def no_removals(event):
+        return event.data.get("removed") is not True
+
+    unsub_entity = hass.bus.async_listen_keyed(
+        "test", entity_listener, entity_ids=["light.kitchen", "switch.fan"]
+    )
+    unsub_domain = hass.bus.async_listen_keyed(
+        "test", domain_listener, domains=["light"], event_filter=no_removals
+    )
+    unsub_literal = hass.bus.async_listen_keyed(
+        "test", literal_listener, entity_ids=["light", MATCH_ALL]
+    )
+    unsub_all = hass.bus.async_listen_keyed("test", all_listener, domains=[MATCH_ALL])
+    assert hass.bus.async_listeners()["test"] == 4
+
+    hass.bus.async_fire("test", {"entity_id": "light.kitchen"})
+    hass.bus.async_fire("test", {"entity_id": "light.bedroom", "removed": True})
+    hass.bus.async_fire("test", {"entity_id": "switch.fan"})
+    hass.bus.async_fire("test", {"entity_id": "switch.heater"})
+    hass.bus.async_fire("test", {"entity_id": ["light.kitchen"]})
+    hass.bus.async_fire("test", {"entity_id": "light"})
+    hass.bus.async_fire("test")
+    hass.bus.async_fire("other", {"entity_id": "light.kitchen"})
+    await hass.async_block_till_done()
+
+    assert [event.data["entity_id"] for event in entity_calls] == [
+        "light.kitchen",
+        "switch.fan",
+    ]
+    assert [event.data["entity_id"] for event in domain_calls] == [
+        "light.kitchen",
+        "light",
+    ]
+    assert [event.data["entity_id"] for event in literal_calls] == ["light"]
+    assert len(all_calls) == 5
+
+    unsub_entity()
+    assert hass.bus.async_listeners()["test"] == 3
+    unsub_domain()
+    unsub_literal()
+    unsub_all()
+    assert "test" not in hass.bus.async_listeners()
+
+    hass.bus.async_fire("test", {"entity_id": "light.kitchen"})
+    await hass.async_block_till_done()
+    assert len(entity_calls) == 2
+
+
+async def test_eventbus_keyed_listener_order(hass):
+    """Test keyed listeners run in the order their dispatcher was added."""
+    calls = []
+
+    @ha.callback
+    def type_listener(event):
+        calls.append(("type", event.data["entity_id"]))
+
+    @ha.callback
+    def keyed_listener(event):
+        calls.append(("keyed", event.data["entity_id"]))
+
+    @ha.callback
+    def other_keyed_listener(event):
+        calls.append(("other_keyed", event.data["entity_id"]))
+
+    hass.bus.async_listen_keyed("test", keyed_listener, domains=["light"])
+    hass.bus.async_listen("test", type_listener)
+    hass.bus.async_listen_keyed(
+        "test", other_keyed_listener, entity_ids=["light.kitchen"]
+    )
+
+    hass.bus.async_fire("test", {"entity_id": "light.kitchen"})
+    hass.bus.async_fire("test", {"entity_id": "light.bedroom"})
+    await hass.async_block_till_done()
+
+    assert calls == [
+        ("other_keyed", "light.kitchen"),
+        ("keyed", "light.kitchen"),
+        ("type", "light.kitchen"),
+        ("keyed", "light.bedroom"),
+        ("type", "light.bedroom"),
+    ]
+
+
+async def test_eventbus_keyed_listener_non_callback_filter(hass):
+    """Test the filter of a keyed listener must be a callback."""
+    with pytest.raises(ha.HomeAssistantError):
+        hass.bus.async_listen_keyed(
+            "test",
+            lambda event: None,
+            entity_ids=["light.kitchen"],
+            event_filter=lambda _: True,
+        )
+
+
+async def test_eventbus_remove_listener_while_firing(hass):
+    """Test removing a listener does not change the listeners of a fired event."""
+    calls = []
+
+    @ha.callback
+    def first_listener(event):
+        calls.append("first")
+        if "second" in calls:
+            unsub_second()
+
+    @ha.callback
+    def second_listener(event):
+        calls.append("second")
+
+    hass.bus.async_listen("test", first_listener)
+    unsub_second = hass.bus.async_listen("test", second_listener)
+
+    hass.bus.async_fire("test")
+    hass.bus.async_fire("test")
+    await hass.async_block_till_done()
+
+    # The second listener was scheduled for both events before it was removed
+    assert calls == ["first", "second", "first", "second"]
+
+    hass.bus.async_fire("test")
+    await hass.async_block_till_done()
+    assert calls[4:] == ["first"]
+
+
+async def test_eventbus_batched_listener(hass):
+    """Test the events fired in one loop iteration are delivered together."""
+    batches = []
+
+    @ha.callback
+    def listener(events):
+        batches.append([event.data["idx"] for event in events])
+
+    @ha.callback
+    def odd_only(event):
+        return event.data["idx"] % 2 == 1
+
+    unsub = hass.bus.async_listen_batched("test", listener)
+    unsub_odd = hass.bus.async_listen_batched("test", listener, event_filter=odd_only)
+
+    for idx in range(5):
+        hass.bus.async_fire("test", {"idx": idx})
+    await hass.async_block_till_done()
+    assert batches == [[0, 1, 2, 3, 4], [1, 3]]
+
+    hass.bus.async_fire("test", {"idx": 5})
+    await hass.async_block_till_done()
+    assert batches[2:] == [[5], [5]]
+
+    unsub_odd()
+    hass.bus.async_fire("test", {"idx": 7})
+    unsub()
+    await hass.async_block_till_done()
+    assert len(batches) == 4
+    assert "test" not in hass.bus.async_listeners()
+
+
+async def test_eventbus_batched_listener_max_batch_and_delay(hass):
+    """Test batches are delivered when full or once the delay passed."""
+    batches = []
+
+    async def listener(events):
+        batches.append([event.data["idx"] for event in events])
+
+    unsub = hass.bus.async_listen_batched("test", listener, max_delay=5, max_batch=3)
+
+    for idx in range(4):
+        hass.bus.async_fire("test", {"idx": idx})
+    await hass.async_block_till_done()
+    assert batches == [[0, 1, 2]]
+
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=2))
+    await hass.async_block_till_done()
+    assert batches == [[0, 1, 2]]
+
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=6))
+    await hass.async_block_till_done()
+    assert batches == [[0, 1, 2], [3]]
+
+    hass.bus.async_fire("test", {"idx": 4})
+    unsub()
+    async_fire_time_changed(hass, dt_util.utcnow() + timedelta(seconds=12))
+    await hass.async_block_till_done()
+    assert batches == [[0, 1, 2], [3]]
+
+
+async def test_eventbus_listener_profile(hass):
+    """Test the time spent per listener is recorded while profiling."""
+
+    @ha.callback
+    def callback_listener(event):
+        pass
+
+    async def coroutine_listener(event):
+        pass
+
+    def thread_listener(event):
+        pass
+
+    hass.bus.async_listen("test", callback_listener)
+    hass.bus.async_listen("test", coroutine_listener)
+    hass.bus.async_listen_keyed("test", thread_listener, entity_ids=["light.kitchen"])
+
+    hass.bus.async_fire("test", {"entity_id": "light.kitchen"})
+    await hass.async_block_till_done()
+    assert hass.bus.async_listener_profile() == {}
+
+    hass.bus.async_set_profiling(True)
+    hass.bus.async_fire("test", {"entity_id": "light.kitchen"})
+    hass.bus.async_fire("test", {"entity_id": "light.bedroom"})
+    await hass.async_block_till_done()
+
+    profile = hass.bus.async_listener_profile()
+    prefix = f"{__name__}.test_eventbus_listener_profile.<locals>"
+    assert profile.keys() == {
+        f"{prefix}.callback_listener",
+        f"{prefix}.coroutine_listener",
+        f"{prefix}.thread_listener",
+    }
+    assert profile[f"{prefix}.callback_listener"]["count"] == 2
+    assert profile[f"{prefix}.coroutine_listener"]["count"] == 2
+    assert profile[f"{prefix}.thread_listener"]["count"] == 1
+    for stats in profile.values():
+        assert 0 <= stats["max"] <= stats["total"]
+
+    hass.bus.async_set_profiling(False)
+    assert hass.bus.async_listener_profile() == {}
+
+
 def test_state_init():
     """Test state.init."""
     with pytest.raises(InvalidEntityFormatError):
@@ -706,6 +996,60 @@ async def test_statemachine_force_update(hass):
     assert len(events) == 1
 
 
+async def test_statemachine_reuses_old_state(hass):
+    """Test a new state of a known entity reuses the unchanged parts."""
+    hass.states.async_set("light.bowl", "on", {"brightness": 100})
+    state = hass.states.get("light.bowl")
+    events = async_capture_events(hass, EVENT_STATE_CHANGED)
+
+    hass.states.async_set("light.bowl", "on", state.attributes)
+    await hass.async_block_till_done()
+    assert len(events) == 0
+
+    hass.states.async_set("light.bowl", "off", {"brightness": 100})
+    await hass.async_block_till_done()
+    state2 = hass.states.get("light.bowl")
+    assert len(events) == 1
+    assert state2.state == "off"
+    assert state2.attributes is state.attributes
+    assert state2.domain == "light"
+    assert state2.object_id == "bowl"
+    assert state2.last_changed == state2.last_updated
+    assert state2.context == events[0].context
+
+    hass.states.async_set("light.bowl", "off", {"brightness": 50})
+    await hass.async_block_till_done()
+    state3 = hass.states.get("light.bowl")
+    assert state3.attributes == {"brightness": 50}
+    assert state3.last_changed == state2.last_changed
+    assert state3.as_dict()["attributes"] == {"brightness": 50}
+
+    with pytest.raises(InvalidStateError):
+        hass.states.async_set("light.bowl", "x" * 256)
+
+
+def test_state_successor_of_subclass():
+    """Test the successor of a State subclass is built by the constructor."""
+
+    class CustomState(ha.State):
+        """A State with a custom constructor."""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.custom = True
+
+    now = dt_util.utcnow()
+    context = ha.Context()
+    state = CustomState("light.bowl", "on", {"brightness": 100})
+    successor = state._async_successor("off", state.attributes, None, now, context)
+    assert type(successor) is ha.State
+    assert successor.entity_id == "light.bowl"
+    assert successor.state == "off"
+    assert successor.attributes == {"brightness": 100}
+    assert successor.last_changed == now
+    assert successor.context is context
+
+
 def test_service_call_repr():
     """Test ServiceCall repr."""
     call = ha.ServiceCall("homeassistant", "start")
@@ -1494,6 +1838,39 @@ async def test_async_entity_ids_count(hass):
 
     assert hass.states.async_entity_ids_count() == 5
     assert hass.states.async_entity_ids_count("light") == 3
+    assert hass.states.async_entity_ids_count(["light", "vacuum"]) == 4
+
+    hass.states.async_remove("vacuum.floor")
+
+    assert hass.states.async_entity_ids_count() == 4
+    assert hass.states.async_entity_ids_count("vacuum") == 0
+
+
+async def test_async_all_sorted(hass):
+    """Test async_all_sorted follows states added, updated and removed."""
+
+    hass.states.async_set("light.frog", "on")
+    hass.states.async_set("switch.link", "on")
+    hass.states.async_set("light.bowl", "on")
+
+    def entity_ids(domain_filter=None):
+        return [
+            state.entity_id for state in hass.states.async_all_sorted(domain_filter)
+        ]
+
+    assert entity_ids() == ["light.bowl", "light.frog", "switch.link"]
+    assert entity_ids("LIGHT") == ["light.bowl", "light.frog"]
+    assert entity_ids("vacuum") == []
+
+    hass.states.async_set("light.frog", "off")
+    assert hass.states.async_all_sorted("light")[1].state == "off"
+
+    hass.states.async_set("light.cow", "on")
+    hass.states.async_remove("switch.link")
+    assert entity_ids() == ["light.bowl", "light.cow", "light.frog"]
+    assert entity_ids("light") == ["light.bowl", "light.cow", "light.frog"]
+    assert entity_ids("switch") == []
+    assert hass.states.async_entity_ids("switch") == []
 
 
 async def test_hassjob_forbid_coroutine():
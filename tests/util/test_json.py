@@ -76,15 +76,17 @@ def test_overwrite_and_reload():
     assert data == TEST_JSON_B
 
 
-def test_save_bad_data():
+def test_save_bad_data(tmp_path):
     """Test error from trying to save unserialisable data."""
+    fname = str(tmp_path / "test4")
     with pytest.raises(SerializationError) as excinfo:
-        save_json("test4", {"hello": set()})
+        save_json(fname, {"hello": set()})
 
     assert (
-        "Failed to serialize to JSON: test4. Bad data at $.hello=set()(<class 'set'>"
+        f"Failed to serialize to JSON: {fname}. Bad data at $.hello=set()(<class 'set'>"
         in str(excinfo.value)
     )
+    assert not os.path.exists(fname)
 
 
 def test_load_bad_data():
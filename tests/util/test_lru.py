@@ -0,0 +1,50 @@
+"""Test the LRU mapping."""
+import pytest
+
+from homeassistant.util.lru import LRU
+
+
+def test_lru_evicts_least_recently_used():
+    """Test the least recently used item is evicted when full."""
+    lru = LRU(2)
+    lru["a"] = 1
+    lru["b"] = 2
+    assert lru["a"] == 1
+    lru["c"] = 3
+
+    assert "b" not in lru
+    assert "a" in lru
+    assert "c" in lru
+    assert len(lru) == 2
+    assert lru.maxsize == 2
+
+
+def test_lru_get_marks_used():
+    """Test get marks the key as recently used."""
+    lru = LRU(2)
+    lru["a"] = 1
+    lru["b"] = 2
+    assert lru.get("a") == 1
+    assert lru.get("missing") is None
+    assert lru.get("missing", 5) == 5
+    lru["c"] = 3
+
+    assert lru.items() == [("a", 1), ("c", 3)]
+
+
+def test_lru_pop_delete_clear():
+    """Test removing items."""
+    lru = LRU(3)
+    lru["a"] = 1
+    lru["b"] = 2
+    lru["c"] = 3
+
+    assert lru.pop("a") == 1
+    assert lru.pop("a") is None
+    del lru["b"]
+    with pytest.raises(KeyError):
+        del lru["b"]
+    assert len(lru) == 1
+
+    lru.clear()
+    assert len(lru) == 0